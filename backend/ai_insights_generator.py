@@ -4,16 +4,18 @@ AI Insights Generator
 Generates natural language insights using OpenAI API
 """
 
-import openai
 import json
 from typing import List, Dict, Any, Optional
 from config.api_keys import load_keys
+from core.config import settings
 
 def generate_ai_insights(metrics: Dict[str, Any]) -> Optional[str]:
     """
     Generate AI-powered insights using OpenAI API
     """
     try:
+        import openai  # Optional; only these two helpers call the API
+
         # Load API keys
         keys = load_keys()
         openai.api_key = keys.get('openai_api_key')
@@ -54,7 +56,8 @@ Provide 2-3 actionable insights focusing on risk, diversification, and performan
                 {"role": "user", "content": prompt}
             ],
             max_tokens=300,  # Limit tokens for cost control
-            temperature=0.7
+            temperature=0.7,
+            timeout=settings.INSIGHTS_TIMEOUT
         )
         
         insights_text = response.choices[0].message.content.strip()
@@ -69,6 +72,8 @@ def generate_detailed_insights(metrics: Dict[str, Any]) -> List[Dict[str, str]]:
     Generate detailed insights for the Insights tab (3-5 cards)
     """
     try:
+        import openai
+
         # Load API keys
         keys = load_keys()
         openai.api_key = keys.get('openai_api_key')
@@ -116,7 +121,8 @@ Return JSON with this structure:
                 {"role": "user", "content": prompt}
             ],
             max_tokens=500,
-            temperature=0.7
+            temperature=0.7,
+            timeout=settings.INSIGHTS_TIMEOUT
         )
         
         response_text = response.choices[0].message.content.strip()
@@ -10,6 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 # Import your models
+from core.config import settings
 from domain.models_v2 import Base
 
 # this is the Alembic Config object, which provides
@@ -17,9 +18,14 @@ from domain.models_v2 import Base
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+# This line sets up loggers basically. Skipped when the app runs the upgrade
+# itself (DatabaseManager.upgrade) so its own handlers stay in place
+if config.config_file_name is not None and config.attributes.get('configure_logger', True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# The database the app is configured for (DATABASE_URL), unless the caller set a URL
+if not config.attributes.get('url_override'):
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace('%', '%%'))
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -0,0 +1,102 @@
+"""Add tickers dimension and integer ticker ids
+
+Revision ID: 003_add_tickers_dimension
+Revises: 002_add_cash_transactions
+Create Date: 2025-10-06 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_add_tickers_dimension'
+down_revision: Union[str, None] = '002_add_cash_transactions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Move daily_prices and portfolio onto integer ticker ids"""
+
+    # Create tickers dimension table
+    op.create_table('tickers',
+        sa.Column('ticker_id', sa.Integer(), nullable=False),
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.PrimaryKeyConstraint('ticker_id'),
+        sa.UniqueConstraint('symbol')
+    )
+
+    # Seed it from every symbol already in use
+    op.execute("""
+        INSERT INTO tickers (symbol)
+        SELECT ticker FROM daily_prices
+        UNION
+        SELECT ticker FROM portfolio
+    """)
+
+    # Portfolio keeps its symbol and gains the integer key for joins
+    with op.batch_alter_table('portfolio') as batch_op:
+        batch_op.add_column(sa.Column('ticker_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_portfolio_ticker_id', 'tickers', ['ticker_id'], ['ticker_id'])
+    op.execute("""
+        UPDATE portfolio
+        SET ticker_id = (SELECT ticker_id FROM tickers WHERE tickers.symbol = portfolio.ticker)
+    """)
+    op.create_index(op.f('ix_portfolio_ticker_id'), 'portfolio', ['ticker_id'], unique=False)
+
+    # Daily prices swap the repeated symbol for the integer key
+    op.add_column('daily_prices', sa.Column('ticker_id', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE daily_prices
+        SET ticker_id = (SELECT ticker_id FROM tickers WHERE tickers.symbol = daily_prices.ticker)
+    """)
+
+    op.drop_index('idx_daily_prices_ticker_date', table_name='daily_prices')
+    op.drop_index(op.f('ix_daily_prices_ticker'), table_name='daily_prices')
+    op.drop_index(op.f('ix_daily_prices_price_id'), table_name='daily_prices')
+    op.drop_index(op.f('ix_daily_prices_price_date'), table_name='daily_prices')
+
+    # SQLite needs a table rebuild to drop columns and add constraints
+    with op.batch_alter_table('daily_prices', recreate='always') as batch_op:
+        batch_op.alter_column('ticker_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('ticker')
+        batch_op.create_foreign_key('fk_daily_prices_ticker_id', 'tickers', ['ticker_id'], ['ticker_id'])
+        batch_op.create_unique_constraint('uq_daily_prices_ticker_date', ['ticker_id', 'price_date'])
+
+    op.create_index(
+        'idx_daily_prices_ticker_date_close', 'daily_prices',
+        ['ticker_id', 'price_date', 'close_price'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Restore string tickers on daily_prices and drop the tickers table"""
+
+    op.drop_index('idx_daily_prices_ticker_date_close', table_name='daily_prices')
+
+    op.add_column('daily_prices', sa.Column('ticker', sa.String(length=20), nullable=True))
+    op.execute("""
+        UPDATE daily_prices
+        SET ticker = (SELECT symbol FROM tickers WHERE tickers.ticker_id = daily_prices.ticker_id)
+    """)
+
+    with op.batch_alter_table('daily_prices', recreate='always') as batch_op:
+        batch_op.drop_constraint('uq_daily_prices_ticker_date', type_='unique')
+        batch_op.drop_constraint('fk_daily_prices_ticker_id', type_='foreignkey')
+        batch_op.drop_column('ticker_id')
+        batch_op.alter_column('ticker', existing_type=sa.String(length=20), nullable=False)
+
+    op.create_index(op.f('ix_daily_prices_price_id'), 'daily_prices', ['price_id'], unique=False)
+    op.create_index(op.f('ix_daily_prices_ticker'), 'daily_prices', ['ticker'], unique=False)
+    op.create_index(op.f('ix_daily_prices_price_date'), 'daily_prices', ['price_date'], unique=False)
+    op.create_index('idx_daily_prices_ticker_date', 'daily_prices', ['ticker', 'price_date'], unique=True)
+
+    op.drop_index(op.f('ix_portfolio_ticker_id'), table_name='portfolio')
+    with op.batch_alter_table('portfolio') as batch_op:
+        batch_op.drop_constraint('fk_portfolio_ticker_id', type_='foreignkey')
+        batch_op.drop_column('ticker_id')
+
+    op.drop_table('tickers')
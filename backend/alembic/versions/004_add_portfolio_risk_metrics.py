@@ -0,0 +1,51 @@
+"""Add portfolio risk metrics table
+
+Revision ID: 004_add_portfolio_risk_metrics
+Revises: 003_add_tickers_dimension
+Create Date: 2025-10-07 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_add_portfolio_risk_metrics'
+down_revision: Union[str, None] = '003_add_tickers_dimension'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add portfolio_risk_metrics table"""
+
+    op.create_table('portfolio_risk_metrics',
+        sa.Column('risk_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('as_of_date', sa.Date(), nullable=False),
+        sa.Column('window_days', sa.Integer(), nullable=False),
+        sa.Column('volatility_annualized', sa.Float(), nullable=True),
+        sa.Column('sharpe_ratio', sa.Float(), nullable=True),
+        sa.Column('sortino_ratio', sa.Float(), nullable=True),
+        sa.Column('max_drawdown', sa.Float(), nullable=True),
+        sa.Column('beta', sa.Float(), nullable=True),
+        sa.Column('var_95', sa.Float(), nullable=True),
+        sa.Column('benchmark_ticker', sa.String(length=20), nullable=True),
+        sa.Column('num_observations', sa.Integer(), nullable=False),
+        sa.Column('calculated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('risk_id')
+    )
+    op.create_index(
+        'idx_risk_metrics_user_date_window', 'portfolio_risk_metrics',
+        ['user_id', 'as_of_date', 'window_days'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Drop portfolio_risk_metrics table"""
+
+    op.drop_index('idx_risk_metrics_user_date_window', table_name='portfolio_risk_metrics')
+    op.drop_table('portfolio_risk_metrics')
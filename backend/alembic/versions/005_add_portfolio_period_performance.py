@@ -0,0 +1,55 @@
+"""Add portfolio period performance table
+
+Revision ID: 005_add_portfolio_period_performance
+Revises: 004_add_portfolio_risk_metrics
+Create Date: 2025-10-08 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_add_portfolio_period_performance'
+down_revision: Union[str, None] = '004_add_portfolio_risk_metrics'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add portfolio_period_performance table"""
+
+    op.create_table('portfolio_period_performance',
+        sa.Column('performance_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('as_of_date', sa.Date(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('start_value', sa.Float(), nullable=False),
+        sa.Column('end_value', sa.Float(), nullable=False),
+        sa.Column('net_flows', sa.Float(), nullable=False),
+        sa.Column('total_return', sa.Float(), nullable=True),
+        sa.Column('total_gain_loss', sa.Float(), nullable=False),
+        sa.Column('annualized_return', sa.Float(), nullable=True),
+        sa.Column('volatility', sa.Float(), nullable=True),
+        sa.Column('sharpe_ratio', sa.Float(), nullable=True),
+        sa.Column('max_drawdown', sa.Float(), nullable=True),
+        sa.Column('partial', sa.Boolean(), nullable=False),
+        sa.Column('calculated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('performance_id')
+    )
+    op.create_index(
+        'idx_period_performance_user_period', 'portfolio_period_performance',
+        ['user_id', 'period'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Drop portfolio_period_performance table"""
+
+    op.drop_index('idx_period_performance_user_period', table_name='portfolio_period_performance')
+    op.drop_table('portfolio_period_performance')
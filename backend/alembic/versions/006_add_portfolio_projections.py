@@ -0,0 +1,60 @@
+"""Add portfolio projections table
+
+Revision ID: 006_add_portfolio_projections
+Revises: 005_add_portfolio_period_performance
+Create Date: 2025-10-09 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_add_portfolio_projections'
+down_revision: Union[str, None] = '005_add_portfolio_period_performance'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add portfolio_projections table"""
+
+    op.create_table('portfolio_projections',
+        sa.Column('projection_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('horizon', sa.String(length=10), nullable=False),
+        sa.Column('as_of_date', sa.Date(), nullable=False),
+        sa.Column('projection_date', sa.Date(), nullable=False),
+        sa.Column('current_value', sa.Float(), nullable=False),
+        sa.Column('projected_value', sa.Float(), nullable=False),
+        sa.Column('projected_return', sa.Float(), nullable=False),
+        sa.Column('projected_gain_loss', sa.Float(), nullable=False),
+        sa.Column('expected_value', sa.Float(), nullable=False),
+        sa.Column('p5_value', sa.Float(), nullable=False),
+        sa.Column('p25_value', sa.Float(), nullable=False),
+        sa.Column('p75_value', sa.Float(), nullable=False),
+        sa.Column('p95_value', sa.Float(), nullable=False),
+        sa.Column('confidence_level', sa.Float(), nullable=False),
+        sa.Column('probability_of_loss', sa.Float(), nullable=False),
+        sa.Column('volatility', sa.Float(), nullable=True),
+        sa.Column('sharpe_ratio', sa.Float(), nullable=True),
+        sa.Column('max_drawdown', sa.Float(), nullable=True),
+        sa.Column('method', sa.String(length=20), nullable=False),
+        sa.Column('num_paths', sa.Integer(), nullable=False),
+        sa.Column('calculated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('projection_id')
+    )
+    op.create_index(
+        'idx_projections_user_horizon', 'portfolio_projections',
+        ['user_id', 'horizon'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Drop portfolio_projections table"""
+
+    op.drop_index('idx_projections_user_horizon', table_name='portfolio_projections')
+    op.drop_table('portfolio_projections')
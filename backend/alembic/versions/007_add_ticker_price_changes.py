@@ -0,0 +1,43 @@
+"""Add ticker price changes table
+
+Revision ID: 007_add_ticker_price_changes
+Revises: 006_add_portfolio_projections
+Create Date: 2025-10-10 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_add_ticker_price_changes'
+down_revision: Union[str, None] = '006_add_portfolio_projections'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add ticker_price_changes table"""
+
+    op.create_table('ticker_price_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticker_id', sa.Integer(), nullable=False),
+        sa.Column('as_of_date', sa.Date(), nullable=False),
+        sa.Column('close_price', sa.Float(), nullable=False),
+        sa.Column('change_1d', sa.Float(), nullable=True),
+        sa.Column('change_1w', sa.Float(), nullable=True),
+        sa.Column('change_1m', sa.Float(), nullable=True),
+        sa.Column('calculated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['ticker_id'], ['tickers.ticker_id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_price_changes_ticker', 'ticker_price_changes', ['ticker_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Drop ticker_price_changes table"""
+
+    op.drop_index('idx_price_changes_ticker', table_name='ticker_price_changes')
+    op.drop_table('ticker_price_changes')
@@ -0,0 +1,51 @@
+"""Add insights cache table
+
+Revision ID: 008_add_insights_cache
+Revises: 007_add_ticker_price_changes
+Create Date: 2025-10-12 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_add_insights_cache'
+down_revision: Union[str, None] = '007_add_ticker_price_changes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add insights_cache table"""
+
+    # Databases served before this revision may hold the ad-hoc table the insights
+    # service created on demand; its rows are regenerable, so it is replaced
+    if sa.inspect(op.get_bind()).has_table('insights_cache'):
+        op.drop_table('insights_cache')
+
+    op.create_table('insights_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(length=20), nullable=False),
+        sa.Column('metrics_hash', sa.String(length=64), nullable=False),
+        sa.Column('insights', sa.Text(), nullable=False),
+        sa.Column('insight_type', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_insights_cache_user_hash', 'insights_cache', ['user_id', 'scope', 'metrics_hash'], unique=True)
+    op.create_index('idx_insights_cache_user_created', 'insights_cache', ['user_id', 'scope', 'created_at'], unique=False)
+    op.create_index('idx_insights_cache_expires', 'insights_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop insights_cache table"""
+
+    op.drop_index('idx_insights_cache_expires', table_name='insights_cache')
+    op.drop_index('idx_insights_cache_user_created', table_name='insights_cache')
+    op.drop_index('idx_insights_cache_user_hash', table_name='insights_cache')
+    op.drop_table('insights_cache')
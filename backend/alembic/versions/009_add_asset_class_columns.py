@@ -0,0 +1,86 @@
+"""Add asset class columns and the holdings tables
+
+Revision ID: 009_add_asset_class_columns
+Revises: 008_add_insights_cache
+Create Date: 2025-10-14 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_add_asset_class_columns'
+down_revision: Union[str, None] = '008_add_insights_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SUMMARY_CLASS_COLUMNS = ['equity_value', 'bond_etf_value', 'crypto_value', 'cash_value', 'bond_cash_value']
+
+
+def upgrade() -> None:
+    """Add portfolio.asset_class, per-class summary values, portfolio_values and market_data"""
+
+    # Databases that ran migrate_add_asset_class.py or were served by the API's
+    # create_all already have some of these; only what is missing is added
+    inspector = sa.inspect(op.get_bind())
+
+    portfolio_columns = {c['name'] for c in inspector.get_columns('portfolio')}
+    if 'asset_class' not in portfolio_columns:
+        # NULL falls back to the classification index; migrate_add_asset_class.py backfills it
+        op.add_column('portfolio', sa.Column('asset_class', sa.String(length=20), nullable=True))
+
+    summary_columns = {c['name'] for c in inspector.get_columns('portfolio_summary')}
+    for name in SUMMARY_CLASS_COLUMNS:
+        if name not in summary_columns:
+            op.add_column('portfolio_summary', sa.Column(name, sa.Float(), nullable=True, server_default='0.0'))
+
+    if not inspector.has_table('portfolio_values'):
+        op.create_table('portfolio_values',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('ticker', sa.String(length=20), nullable=False),
+            sa.Column('current_price', sa.Float(), nullable=False),
+            sa.Column('total_value', sa.Float(), nullable=False),
+            sa.Column('cost_basis', sa.Float(), nullable=False),
+            sa.Column('gain_loss', sa.Float(), nullable=False),
+            sa.Column('gain_loss_percent', sa.Float(), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=True),
+            sa.Column('last_updated', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_portfolio_values_id'), 'portfolio_values', ['id'], unique=False)
+        op.create_index(op.f('ix_portfolio_values_user_id'), 'portfolio_values', ['user_id'], unique=False)
+        op.create_index(op.f('ix_portfolio_values_ticker'), 'portfolio_values', ['ticker'], unique=False)
+
+    if not inspector.has_table('market_data'):
+        op.create_table('market_data',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ticker', sa.String(length=20), nullable=False),
+            sa.Column('date', sa.DateTime(), nullable=False),
+            sa.Column('open_price', sa.Float(), nullable=False),
+            sa.Column('high_price', sa.Float(), nullable=False),
+            sa.Column('low_price', sa.Float(), nullable=False),
+            sa.Column('close_price', sa.Float(), nullable=False),
+            sa.Column('volume', sa.Integer(), nullable=True),
+            sa.Column('source', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_market_data_id'), 'market_data', ['id'], unique=False)
+        op.create_index(op.f('ix_market_data_ticker'), 'market_data', ['ticker'], unique=False)
+        op.create_index(op.f('ix_market_data_date'), 'market_data', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the holdings tables and asset class columns"""
+
+    op.drop_table('market_data')
+    op.drop_table('portfolio_values')
+    with op.batch_alter_table('portfolio_summary') as batch_op:
+        for name in reversed(SUMMARY_CLASS_COLUMNS):
+            batch_op.drop_column(name)
+    with op.batch_alter_table('portfolio') as batch_op:
+        batch_op.drop_column('asset_class')
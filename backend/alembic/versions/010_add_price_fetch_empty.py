@@ -0,0 +1,36 @@
+"""Add price fetch empty markers table
+
+Revision ID: 010_add_price_fetch_empty
+Revises: 009_add_asset_class_columns
+Create Date: 2025-10-19 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_add_price_fetch_empty'
+down_revision: Union[str, None] = '009_add_asset_class_columns'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add price_fetch_empty table"""
+
+    op.create_table('price_fetch_empty',
+        sa.Column('ticker_id', sa.Integer(), nullable=False),
+        sa.Column('price_date', sa.Date(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['ticker_id'], ['tickers.ticker_id'], ),
+        sa.PrimaryKeyConstraint('ticker_id', 'price_date')
+    )
+
+
+def downgrade() -> None:
+    """Drop price_fetch_empty table"""
+
+    op.drop_table('price_fetch_empty')
@@ -1,21 +1,27 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from database import engine, get_db, Base
-from models import User, Login, Portfolio, Transaction, MarketData, HistoricalData, PortfolioSummary, PortfolioProjections, PortfolioPerformance, PortfolioChartData, InsightsCache, PortfolioValues
-from seed_data import create_initial_data
-import pandas as pd
+from database import get_db, SessionLocal
+from models import User, Login, Portfolio, Transaction, MarketData, HistoricalData, PortfolioSummary, PortfolioProjections, PortfolioPerformance, PortfolioChartData, PortfolioValues
+from services.export_service import EXPORT_FORMATS, DEFAULT_CHUNK_ROWS, session_records, streaming_export
+from services.performance_engine import PerformanceEngine, calculate_period_performance_job
+from services.projection_engine import ProjectionEngine
+from services.movers_engine import MoversEngine, largest_movers
+from core.database import get_db as get_db_v2
+from core.profiling import ProfiledRoute, instrument_app
+from typing import Optional
+from datetime import date, datetime, timedelta
 import io
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Create initial data
-create_initial_data()
+# Schema and seed data are not created at import: v2 tables come from `alembic upgrade head`,
+# the legacy tables and demo users from `python seed_data.py`
 
 app = FastAPI(title="Portora API", version="1.0.0")
 
+# Per-request query counts (X-DB-Queries / X-DB-Time), slow query log and X-Profile captures
+instrument_app(app)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,16 +31,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/")
+# Endpoints live on a router so server.py can serve them next to the other APIs
+router = APIRouter(route_class=ProfiledRoute)
+
+# Movers returned by the top holdings endpoints
+MOVERS_LIMIT = 5
+
+def user_movers(user_id: int, db_v2: Session, k: int = MOVERS_LIMIT):
+    """A user's largest 1D movers from the stored per-ticker price changes, in the TopHoldings shape"""
+    movers_engine = MoversEngine(db_v2)
+    today = date.today()
+    positions = movers_engine.attach_changes(movers_engine.load_positions(user_id, today), today)
+    return [{
+        "ticker": m["ticker"],
+        "shares": m["units"],
+        "current_price": round(m["price"], 2) if m["price"] is not None else None,
+        "total_value": round(m["position_val"], 2),
+        "gain_loss": round(m["change_val"], 2) if m["change_val"] is not None else None,
+        "gain_loss_percent": round(m["change_pct"], 2),
+        "rank": rank
+    } for rank, m in enumerate(largest_movers(positions, k), start=1)]
+
+@router.get("/")
 def read_root():
     return {"message": "Database setup complete!", "status": "success"}
 
-@app.get("/health")
+@router.get("/health")
 def health_check():
     return {"status": "healthy"}
 
-@app.get("/top-holdings/{user_id}")
-def get_top_holdings_simple(user_id: int, db: Session = Depends(get_db)):
+@router.get("/top-holdings/{user_id}")
+def get_top_holdings_simple(user_id: int, db: Session = Depends(get_db), db_v2: Session = Depends(get_db_v2)):
     """Simple endpoint for top holdings and movers"""
     try:
         from models import TopHoldings
@@ -44,11 +71,6 @@ def get_top_holdings_simple(user_id: int, db: Session = Depends(get_db)):
             TopHoldings.type == "holdings"
         ).order_by(TopHoldings.rank.asc()).all()
         
-        movers = db.query(TopHoldings).filter(
-            TopHoldings.user_id == user_id,
-            TopHoldings.type == "movers"
-        ).order_by(TopHoldings.rank.asc()).all()
-        
         return {
             "user_id": user_id,
             "holdings": [{
@@ -60,20 +82,12 @@ def get_top_holdings_simple(user_id: int, db: Session = Depends(get_db)):
                 "gain_loss_percent": h.gain_loss_percent,
                 "rank": h.rank
             } for h in holdings],
-            "movers": [{
-                "ticker": m.ticker,
-                "shares": m.shares,
-                "current_price": m.current_price,
-                "total_value": m.total_value,
-                "gain_loss": m.gain_loss,
-                "gain_loss_percent": m.gain_loss_percent,
-                "rank": m.rank
-            } for m in movers]
+            "movers": user_movers(user_id, db_v2)
         }
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/users")
+@router.get("/users")
 def get_users(db: Session = Depends(get_db)):
     """Get all users"""
     users = db.query(User).all()
@@ -89,7 +103,7 @@ def get_users(db: Session = Depends(get_db)):
         ]
     }
 
-@app.get("/users/{user_id}/portfolio")
+@router.get("/users/{user_id}/portfolio")
 def get_user_portfolio(user_id: int, db: Session = Depends(get_db)):
     """Get portfolio for a specific user"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -114,7 +128,7 @@ def get_user_portfolio(user_id: int, db: Session = Depends(get_db)):
         ]
     }
 
-@app.get("/portfolio/fast")
+@router.get("/portfolio/fast")
 def get_portfolio_fast(user_id: int = 1, db: Session = Depends(get_db)):
     """Get portfolio data quickly with minimal processing"""
     try:
@@ -171,7 +185,7 @@ def get_portfolio_fast(user_id: int = 1, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio")
+@router.get("/portfolio")
 def get_portfolio(user_id: int = 1, db: Session = Depends(get_db)):
     """Get portfolio data from database for a specific user with current market data"""
     try:
@@ -248,7 +262,7 @@ def get_portfolio(user_id: int = 1, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve portfolio: {str(e)}")
 
 
-@app.get("/sp500")
+@router.get("/sp500")
 def get_sp500():
     """Get S&P 500 sample data"""
     try:
@@ -264,25 +278,56 @@ def get_sp500():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve S&P 500 data: {str(e)}")
 
-@app.get("/historical-data/download")
-def download_historical_data(db: Session = Depends(get_db)):
-    """Download historical data for portfolio tickers"""
+@router.get("/historical-data/download")
+def download_historical_data(
+    ticker: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: str = "csv",
+    gzip: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Stream historical prices for portfolio tickers as CSV or NDJSON"""
     try:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+        
         # Get all unique tickers from portfolio
-        portfolio = db.query(Portfolio).all()
-        tickers = list(set([p.ticker for p in portfolio]))
+        if ticker:
+            tickers = [ticker.upper()]
+        else:
+            tickers = [row[0] for row in db.query(Portfolio.ticker).distinct().all()]
         
-        return {
-            "status": "success",
-            "message": f"Historical data download initiated for {len(tickers)} tickers",
-            "tickers": tickers,
-            "note": "Demo mode - actual download not performed"
-        }
+        columns = ["ticker", "date", "open_price", "high_price", "low_price",
+                   "close_price", "volume", "adjusted_close", "asset_type"]
+        
+        def produce(session: Session):
+            query = (
+                session.query(*[getattr(HistoricalData, column) for column in columns])
+                .filter(HistoricalData.ticker.in_(tickers))
+            )
+            if start_date:
+                query = query.filter(HistoricalData.date >= start_date)
+            if end_date:
+                query = query.filter(HistoricalData.date < end_date + timedelta(days=1))
+            
+            for row in query.order_by(HistoricalData.ticker, HistoricalData.date).yield_per(DEFAULT_CHUNK_ROWS):
+                yield dict(zip(columns, row))
+        
+        return streaming_export(
+            session_records(SessionLocal, produce),
+            columns=columns,
+            fmt=format,
+            filename="historical_data",
+            compress=gzip
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to initiate historical data download: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to export historical data: {str(e)}")
 
 # Additional endpoints for dashboard features
-@app.get("/portfolio-health")
+@router.get("/portfolio-health")
 def get_portfolio_health(user_id: int = 1, db: Session = Depends(get_db)):
     """Get comprehensive portfolio health metrics"""
     try:
@@ -321,7 +366,7 @@ def get_portfolio_health(user_id: int = 1, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to calculate portfolio health: {str(e)}")
 
-@app.get("/portfolio/performance/{user_id}")
+@router.get("/portfolio/performance/{user_id}")
 def get_portfolio_performance(user_id: int, db: Session = Depends(get_db)):
     """Get portfolio performance data for all time periods"""
     try:
@@ -368,7 +413,7 @@ def get_portfolio_performance(user_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get portfolio performance: {str(e)}")
 
-@app.get("/portfolio/performance-chart/{user_id}")
+@router.get("/portfolio/performance-chart/{user_id}")
 def get_portfolio_performance_chart(user_id: int, period: str = "1Year", db: Session = Depends(get_db)):
     """Get portfolio performance chart data for a specific period using pre-calculated data"""
     try:
@@ -479,23 +524,23 @@ def generate_mock_performance_chart_data(period: str):
         "status": "mock"
     }
 
-@app.get("/onboarding/status")
+@router.get("/onboarding/status")
 def get_onboarding_status():
     """Get onboarding status"""
     return {"has_seen_onboarding": False}
 
-@app.post("/onboarding/complete")
+@router.post("/onboarding/complete")
 def complete_onboarding():
     """Mark onboarding as complete"""
     return {"message": "Onboarding completed"}
 
-@app.get("/alerts/count")
+@router.get("/alerts/count")
 def get_alerts_count():
     """Get alerts count"""
     return {"count": 0, "alerts": []}
 
 # Historical data endpoints
-@app.get("/historical-data/status")
+@router.get("/historical-data/status")
 def get_historical_data_status(db: Session = Depends(get_db)):
     """Get status of historical data collection"""
     try:
@@ -532,7 +577,7 @@ def get_historical_data_status(db: Session = Depends(get_db)):
             "error": str(e)
         }
 
-@app.post("/historical-data/collect")
+@router.post("/historical-data/collect")
 def collect_historical_data():
     """Start historical data collection"""
     try:
@@ -561,7 +606,7 @@ def collect_historical_data():
 
 # Removed duplicate portfolio performance endpoint
 
-@app.get("/portfolio/real-time/{user_id}")
+@router.get("/portfolio/real-time/{user_id}")
 def get_real_time_portfolio(user_id: int, db: Session = Depends(get_db)):
     """Get real-time portfolio calculations using historical data"""
     try:
@@ -633,7 +678,7 @@ def get_real_time_portfolio(user_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio/summary-metrics/{user_id}")
+@router.get("/portfolio/summary-metrics/{user_id}")
 def get_portfolio_summary_metrics(user_id: int, db: Session = Depends(get_db)):
     """Get pre-calculated portfolio summary metrics for INSTANT loading"""
     try:
@@ -670,7 +715,7 @@ def get_portfolio_summary_metrics(user_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio/performance-chart/{user_id}")
+@router.get("/portfolio/performance-chart/{user_id}")
 def get_portfolio_performance_chart(user_id: int, period: str = "1Y", db: Session = Depends(get_db)):
     """Get portfolio performance chart data using real historical data"""
     try:
@@ -777,65 +822,35 @@ def get_portfolio_performance_chart(user_id: int, period: str = "1Y", db: Sessio
     except Exception as e:
         return {"data": [], "error": str(e)}
 
-@app.post("/portfolio/upload-csv")
+@router.post("/portfolio/upload-csv")
 async def upload_portfolio_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
     """Upload and process portfolio CSV file"""
+    from services.portfolio_import import parse_portfolio_csv  # pandas, loaded on first upload
+
     try:
-        # Read CSV file
+        # Parse and validate CSV file
         contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        result = parse_portfolio_csv(contents)
         
-        # Clear existing portfolio data for user 1
+        # Replace portfolio data for user 1 in one transaction
         db.query(Portfolio).filter(Portfolio.user_id == 1).delete()
-        
-        # Process each row
-        portfolio_items = []
-        for _, row in df.iterrows():
-            symbol = row['Symbol']
-            classification = row['Classification']
-            quantity = float(row['Quantity Owned'])
-            
-            # Skip if quantity is 0
-            if quantity <= 0:
-                continue
-                
-            # Determine asset type
-            asset_type = 'crypto' if 'USD' in symbol else 'stock'
-            
-            # Get current price (mock for now - in real app, fetch from API)
-            current_price = 100.0  # Default price
-            if symbol == 'BTC-USD':
-                current_price = 45000.0
-            elif symbol == 'ETH-USD':
-                current_price = 3000.0
-            elif symbol == 'AAPL':
-                current_price = 175.0
-            elif symbol == 'MSFT':
-                current_price = 315.0
-            elif symbol == 'GOOGL':
-                current_price = 2650.0
-            elif symbol == 'TSLA':
-                current_price = 850.0
-            elif symbol == 'NVDA':
-                current_price = 425.0
-            
-            # Create portfolio entry
-            portfolio_item = Portfolio(
-                user_id=1,
-                ticker=symbol,
-                shares=quantity,
-                avg_price=current_price * 0.9  # Assume 10% gain
-            )
-            portfolio_items.append(portfolio_item)
-        
-        # Add all items to database
-        db.add_all(portfolio_items)
+        db.bulk_insert_mappings(Portfolio, [
+            {
+                "user_id": 1,
+                "ticker": position["symbol"],
+                "shares": position["units"],
+                "avg_price": position["avg_price"] or 0.0
+            }
+            for position in result.records()
+        ])
         db.commit()
         
+        items_processed = len(result.positions)
         return {
-            "message": f"Successfully uploaded {len(portfolio_items)} portfolio items",
-            "items_processed": len(portfolio_items),
-            "file_name": file.filename
+            "message": f"Successfully uploaded {items_processed} portfolio items",
+            "items_processed": items_processed,
+            "file_name": file.filename,
+            **result.summary()
         }
         
     except Exception as e:
@@ -846,7 +861,7 @@ async def upload_portfolio_csv(file: UploadFile = File(...), db: Session = Depen
 # OPTIMIZED API ENDPOINTS - Pre-calculated Data
 # ============================================================================
 
-@app.get("/portfolio/optimized-summary/{user_id}")
+@router.get("/portfolio/optimized-summary/{user_id}")
 def get_optimized_portfolio_summary(user_id: int, db: Session = Depends(get_db)):
     """Get pre-calculated portfolio summary for instant loading"""
     try:
@@ -880,34 +895,39 @@ def get_optimized_portfolio_summary(user_id: int, db: Session = Depends(get_db))
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio/optimized-performance/{user_id}")
-def get_optimized_portfolio_performance(user_id: int, db: Session = Depends(get_db)):
+# Materialized period codes -> labels used by the optimized endpoints
+PERFORMANCE_PERIOD_LABELS = {"1W": "1Week", "1M": "1Month", "YTD": "YTD", "1Y": "1Year", "5Y": "5Year"}
+
+@router.get("/portfolio/optimized-performance/{user_id}")
+def get_optimized_portfolio_performance(user_id: int, db: Session = Depends(get_db_v2)):
     """Get pre-calculated portfolio performance for all periods"""
     try:
-        performances = db.query(PortfolioPerformance).filter(
-            PortfolioPerformance.user_id == user_id
-        ).all()
+        performances = PerformanceEngine(db).stored(user_id)
         
         if not performances:
-            return {"error": "No performance data found. Run calculate_all_metrics.py first."}
+            return {"error": "No performance data found. Run the daily portfolio calculator first."}
         
         result = {}
-        for perf in performances:
-            result[perf.period] = {
-                "start_date": perf.start_date.strftime('%Y-%m-%d'),
-                "end_date": perf.end_date.strftime('%Y-%m-%d'),
-                "start_value": round(perf.start_value, 2),
-                "end_value": round(perf.end_value, 2),
-                "total_return": round(perf.total_return, 2),
-                "total_gain_loss": round(perf.total_gain_loss, 2),
-                "annualized_return": round(perf.annualized_return or 0, 2),
-                "volatility": round(perf.volatility or 0, 2),
-                "sharpe_ratio": round(perf.sharpe_ratio or 0, 2),
-                "max_drawdown": round(perf.max_drawdown or 0, 2)
+        for period, perf in performances.items():
+            result[PERFORMANCE_PERIOD_LABELS.get(period, period)] = {
+                "start_date": perf["start_date"].strftime('%Y-%m-%d'),
+                "end_date": perf["end_date"].strftime('%Y-%m-%d'),
+                "start_value": round(perf["start_value"], 2),
+                "end_value": round(perf["end_value"], 2),
+                "net_flows": round(perf["net_flows"] or 0, 2),
+                "total_return": round(perf["total_return"] or 0, 2),
+                "total_gain_loss": round(perf["total_gain_loss"], 2),
+                "annualized_return": round(perf["annualized_return"] or 0, 2),
+                "volatility": round(perf["volatility"] or 0, 2),
+                "sharpe_ratio": round(perf["sharpe_ratio"] or 0, 2),
+                "max_drawdown": round(perf["max_drawdown"] or 0, 2),
+                "partial": perf["partial"]
             }
         
+        as_of = max(perf["as_of_date"] for perf in performances.values())
         return {
             "performance": result,
+            "as_of": as_of.strftime('%Y-%m-%d'),
             "status": "success",
             "cached": True
         }
@@ -915,28 +935,37 @@ def get_optimized_portfolio_performance(user_id: int, db: Session = Depends(get_
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio/optimized-projections/{user_id}")
-def get_optimized_portfolio_projections(user_id: int, db: Session = Depends(get_db)):
+@router.get("/portfolio/optimized-projections/{user_id}")
+def get_optimized_portfolio_projections(user_id: int, db: Session = Depends(get_db_v2)):
     """Get pre-calculated portfolio projections for all periods"""
     try:
-        projections = db.query(PortfolioProjections).filter(
-            PortfolioProjections.user_id == user_id
-        ).all()
+        projections = ProjectionEngine(db).stored(user_id)
         
         if not projections:
-            return {"error": "No projection data found. Run calculate_all_metrics.py first."}
+            return {"error": "No projection data found. Run the daily portfolio calculator first."}
         
         result = {}
-        for proj in projections:
-            result[proj.period] = {
+        for horizon, proj in projections.items():
+            result[PERFORMANCE_PERIOD_LABELS.get(horizon, horizon)] = {
                 "projected_value": round(proj.projected_value, 2),
                 "projected_return": round(proj.projected_return, 2),
                 "projected_gain_loss": round(proj.projected_gain_loss, 2),
+                "expected_value": round(proj.expected_value, 2),
+                "bands": {
+                    "p5": round(proj.p5_value, 2),
+                    "p25": round(proj.p25_value, 2),
+                    "p50": round(proj.projected_value, 2),
+                    "p75": round(proj.p75_value, 2),
+                    "p95": round(proj.p95_value, 2)
+                },
                 "confidence_level": round(proj.confidence_level, 2),
-                "volatility": round(proj.volatility, 2),
+                "probability_of_loss": round(proj.probability_of_loss, 4),
+                "volatility": round(proj.volatility or 0, 2),
                 "sharpe_ratio": round(proj.sharpe_ratio or 0, 2),
                 "max_drawdown": round(proj.max_drawdown or 0, 2),
-                "projection_date": proj.projection_date.strftime('%Y-%m-%d')
+                "projection_date": proj.projection_date.strftime('%Y-%m-%d'),
+                "method": proj.method,
+                "num_paths": proj.num_paths
             }
         
         return {
@@ -948,22 +977,16 @@ def get_optimized_portfolio_projections(user_id: int, db: Session = Depends(get_
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/portfolio/optimized-dashboard/{user_id}")
-def get_optimized_dashboard_data(user_id: int, db: Session = Depends(get_db)):
+@router.get("/portfolio/optimized-dashboard/{user_id}")
+def get_optimized_dashboard_data(user_id: int, db: Session = Depends(get_db), db_v2: Session = Depends(get_db_v2)):
     """Get all pre-calculated dashboard data in one call"""
     try:
         # Get summary
         summary = db.query(PortfolioSummary).filter(PortfolioSummary.user_id == user_id).first()
         
-        # Get performance
-        performances = db.query(PortfolioPerformance).filter(
-            PortfolioPerformance.user_id == user_id
-        ).all()
-        
-        # Get projections
-        projections = db.query(PortfolioProjections).filter(
-            PortfolioProjections.user_id == user_id
-        ).all()
+        # Get materialized performance and projections
+        performances = PerformanceEngine(db_v2).stored(user_id)
+        projections = ProjectionEngine(db_v2).stored(user_id)
         
         if not summary:
             return {"error": "No portfolio data found. Run calculate_all_metrics.py first."}
@@ -987,20 +1010,20 @@ def get_optimized_dashboard_data(user_id: int, db: Session = Depends(get_db)):
         
         # Format performance
         performance_data = {}
-        for perf in performances:
-            performance_data[perf.period] = {
-                "total_return": round(perf.total_return, 2),
-                "total_gain_loss": round(perf.total_gain_loss, 2),
-                "annualized_return": round(perf.annualized_return or 0, 2),
-                "volatility": round(perf.volatility or 0, 2),
-                "sharpe_ratio": round(perf.sharpe_ratio or 0, 2),
-                "max_drawdown": round(perf.max_drawdown or 0, 2)
+        for period, perf in performances.items():
+            performance_data[PERFORMANCE_PERIOD_LABELS.get(period, period)] = {
+                "total_return": round(perf["total_return"] or 0, 2),
+                "total_gain_loss": round(perf["total_gain_loss"], 2),
+                "annualized_return": round(perf["annualized_return"] or 0, 2),
+                "volatility": round(perf["volatility"] or 0, 2),
+                "sharpe_ratio": round(perf["sharpe_ratio"] or 0, 2),
+                "max_drawdown": round(perf["max_drawdown"] or 0, 2)
             }
         
         # Format projections
         projection_data = {}
-        for proj in projections:
-            projection_data[proj.period] = {
+        for horizon, proj in projections.items():
+            projection_data[PERFORMANCE_PERIOD_LABELS.get(horizon, horizon)] = {
                 "projected_value": round(proj.projected_value, 2),
                 "projected_return": round(proj.projected_return, 2),
                 "projected_gain_loss": round(proj.projected_gain_loss, 2),
@@ -1023,7 +1046,7 @@ def get_optimized_dashboard_data(user_id: int, db: Session = Depends(get_db)):
 # OPTIMIZED PERFORMANCE CHART API - 5-Year Limit with Smart Sampling
 # ============================================================================
 
-@app.get("/portfolio/optimized-performance-chart/{user_id}")
+@router.get("/portfolio/optimized-performance-chart/{user_id}")
 def get_optimized_performance_chart(user_id: int, period: str = "1Year", time_range: str = "5Y", interval: str = "monthly", db: Session = Depends(get_db)):
     """Get optimized performance chart data with 5-year limit and smart sampling"""
     try:
@@ -1128,17 +1151,17 @@ def get_optimized_performance_chart(user_id: int, period: str = "1Year", time_ra
     except Exception as e:
         return {"data": [], "error": str(e)}
 
-@app.get("/test-ai")
+@router.get("/test-ai")
 def test_ai():
     """Test endpoint for AI functionality"""
     return {"message": "AI test endpoint working", "status": "success"}
 
-@app.get("/test-simple")
+@router.get("/test-simple")
 def test_simple():
     """Simple test endpoint"""
     return {"message": "Simple test working", "status": "success"}
 
-@app.get("/test-portfolio-values")
+@router.get("/test-portfolio-values")
 def test_portfolio_values(user_id: int = 1, db: Session = Depends(get_db)):
     """Test endpoint to verify PortfolioValues data"""
     try:
@@ -1153,7 +1176,7 @@ def test_portfolio_values(user_id: int = 1, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e), "status": "error"}
 
-@app.get("/test-insights/{user_id}")
+@router.get("/test-insights/{user_id}")
 def test_insights(user_id: int, db: Session = Depends(get_db)):
     """Test endpoint for insights functionality"""
     try:
@@ -1178,225 +1201,64 @@ def test_insights(user_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e), "status": "error"}
 
-@app.get("/portfolio/ai-insights/{user_id}")
-def get_ai_insights(user_id: int, db: Session = Depends(get_db)):
-    """Get AI-powered portfolio insights and recommendations using GPT"""
+@router.get("/portfolio/ai-insights/{user_id}")
+def get_ai_insights(user_id: int, db_v2: Session = Depends(get_db_v2)):
+    """Get AI-powered portfolio insights and recommendations, precomputed by the nightly insights worker"""
     try:
-        import openai
-        import sys
-        import os
-        # Add parent directory to path
-        parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        sys.path.insert(0, parent_dir)
-        from config.api_keys import load_keys
-        
-        # Load API keys
-        keys = load_keys()
-        openai.api_key = keys.get('openai_api_key')
-        
-        if not openai.api_key:
-            return {"error": "OpenAI API key not configured"}
-        
-        # Get portfolio health data (simplified version)
-        health_data = {
-            'diversification': 0.7,  # Mock diversification score
-            'riskLevel': 'Medium',   # Mock risk level
-            'volatility': 15.5       # Mock volatility
-        }
+        from insights_service import PortfolioInsightsService
         
-        # Get portfolio summary
-        summary = db.query(PortfolioSummary).filter(PortfolioSummary.user_id == user_id).first()
-        
-        # Get portfolio holdings for context
-        portfolio = db.query(Portfolio).filter(Portfolio.user_id == user_id).all()
-        
-        if not portfolio:
-            return {"error": "No portfolio holdings found"}
-        
-        # If no summary exists, create a basic one from portfolio data
-        if not summary:
-            total_value = sum(holding.qty * holding.avg_price for holding in portfolio)
-            total_gain_loss = 0  # Simplified for now
-            total_gain_loss_percent = 0  # Simplified for now
-            sharpe_ratio = 1.0  # Default value
-            stock_value = sum(holding.qty * holding.avg_price for holding in portfolio if holding.category == 'Stock')
-            crypto_value = sum(holding.qty * holding.avg_price for holding in portfolio if holding.category == 'Crypto')
-            etf_value = sum(holding.qty * holding.avg_price for holding in portfolio if holding.category == 'ETF')
-            bond_value = sum(holding.qty * holding.avg_price for holding in portfolio if holding.category == 'Bond')
-            cash_value = sum(holding.qty * holding.avg_price for holding in portfolio if holding.category == 'Cash')
-        else:
-            total_value = summary.total_value
-            total_gain_loss = summary.total_gain_loss
-            total_gain_loss_percent = summary.total_gain_loss_percent
-            sharpe_ratio = summary.sharpe_ratio or 1.0
-            stock_value = summary.stock_value
-            crypto_value = summary.crypto_value
-            etf_value = summary.etf_value
-            bond_value = summary.bond_value
-            cash_value = summary.cash_value
-        
-        # Prepare portfolio context for GPT
-        portfolio_context = {
-            "total_value": total_value,
-            "total_gain_loss": total_gain_loss,
-            "total_gain_loss_percent": total_gain_loss_percent,
-            "diversification_score": health_data.get('diversification', 0),
-            "risk_level": health_data.get('riskLevel', 'Unknown'),
-            "volatility": health_data.get('volatility', 0),
-            "sharpe_ratio": sharpe_ratio,
-            "holdings_count": len(portfolio),
-            "category_breakdown": {
-                "stocks": stock_value,
-                "crypto": crypto_value,
-                "etfs": etf_value,
-                "bonds": bond_value,
-                "cash": cash_value
-            }
-        }
-        
-        # Create GPT prompt
-        prompt = f"""
-        As a professional portfolio advisor, analyze this portfolio and provide actionable insights:
-        
-        Portfolio Summary:
-        - Total Value: ${portfolio_context['total_value']:,.2f}
-        - Total Gain/Loss: ${portfolio_context['total_gain_loss']:,.2f} ({portfolio_context['total_gain_loss_percent']:.2f}%)
-        - Diversification Score: {portfolio_context['diversification_score']:.2f}/1.0
-        - Risk Level: {portfolio_context['risk_level']}
-        - Volatility: {portfolio_context['volatility']:.2f}%
-        - Sharpe Ratio: {portfolio_context['sharpe_ratio']:.2f}
-        - Number of Holdings: {portfolio_context['holdings_count']}
-        
-        Asset Allocation:
-        - Stocks: ${portfolio_context['category_breakdown']['stocks']:,.2f}
-        - Crypto: ${portfolio_context['category_breakdown']['crypto']:,.2f}
-        - ETFs: ${portfolio_context['category_breakdown']['etfs']:,.2f}
-        - Bonds: ${portfolio_context['category_breakdown']['bonds']:,.2f}
-        - Cash: ${portfolio_context['category_breakdown']['cash']:,.2f}
-        
-        Please provide:
-        1. A brief assessment of portfolio health (1-2 sentences)
-        2. Top 3 specific, actionable recommendations
-        3. Risk assessment and suggestions
-        4. Diversification analysis
-        
-        Format your response as JSON with these fields:
-        {{
-            "assessment": "Brief portfolio health assessment",
-            "recommendations": ["Recommendation 1", "Recommendation 2", "Recommendation 3"],
-            "risk_analysis": "Risk assessment and suggestions",
-            "diversification_analysis": "Diversification analysis and suggestions",
-            "confidence": 0.85
-        }}
-        """
-        
-        # Call OpenAI GPT
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional portfolio advisor with expertise in investment analysis, risk management, and portfolio optimization. Provide clear, actionable advice based on portfolio metrics."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        # Parse GPT response
-        gpt_response = response.choices[0].message.content
-        
-        try:
-            import json
-            insights = json.loads(gpt_response)
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            insights = {
-                "assessment": gpt_response[:200] + "..." if len(gpt_response) > 200 else gpt_response,
-                "recommendations": ["Review portfolio allocation", "Consider rebalancing", "Monitor performance regularly"],
-                "risk_analysis": "Please review your risk tolerance and portfolio allocation",
-                "diversification_analysis": "Consider diversifying across different asset classes",
-                "confidence": 0.75
-            }
+        result = PortfolioInsightsService(db_v2).generate_insights(user_id)
+        if result["source"] == "error":
+            return {"error": result["insights"][0]}
         
         return {
-            "insights": insights,
+            "insights": result["structured"],
             "status": "success",
-            "generated_at": datetime.now().isoformat(),
-            "ai_powered": True
+            "generated_at": result.get("generated_at") or datetime.now().isoformat(),
+            "ai_powered": result.get("insight_type") == "ai",
+            "fallback": result.get("insight_type", result["source"]) == "rule"
         }
         
     except Exception as e:
-        # Fallback to rule-based insights if GPT fails
-        try:
-            # Simplified health data for fallback
-            health_data = {
-                'diversification': 0.7,
-                'riskLevel': 'Medium',
-                'volatility': 15.5
-            }
-            summary = db.query(PortfolioSummary).filter(PortfolioSummary.user_id == user_id).first()
-            portfolio = db.query(Portfolio).filter(Portfolio.user_id == user_id).all()
-            
-            if not portfolio:
-                return {"error": "No portfolio holdings found"}
-            
-            # If no summary exists, create a basic one from portfolio data
-            if not summary:
-                total_value = sum(holding.qty * holding.avg_price for holding in portfolio)
-                total_gain_loss = 0
-                total_gain_loss_percent = 0
-            else:
-                total_value = summary.total_value
-                total_gain_loss = summary.total_gain_loss
-                total_gain_loss_percent = summary.total_gain_loss_percent
-            
-            insights = {
-                "assessment": f"Portfolio value: ${total_value:,.2f} with {total_gain_loss_percent:.2f}% return",
-                "recommendations": [
-                    "Review asset allocation regularly",
-                    "Consider rebalancing if needed",
-                    "Monitor risk levels"
-                ],
-                "risk_analysis": f"Current risk level: {health_data.get('riskLevel', 'Unknown')}",
-                "diversification_analysis": f"Diversification score: {health_data.get('diversification', 0):.2f}/1.0",
-                "confidence": 0.6
-            }
-            
-            return {
-                "insights": insights,
-                "status": "success",
-                "generated_at": datetime.now().isoformat(),
-                "ai_powered": False,
-                "fallback": True
-            }
-        except Exception as fallback_error:
-            return {"error": f"AI insights failed: {str(e)}. Fallback failed: {str(fallback_error)}"}
+        return {"error": f"AI insights failed: {str(e)}"}
 
-@app.post("/portfolio/calculate-metrics/{user_id}")
+@router.post("/portfolio/calculate-metrics/{user_id}")
 def calculate_user_metrics(user_id: int, db: Session = Depends(get_db)):
     """Trigger calculation of all metrics for a specific user"""
     try:
-        # from calculate_all_metrics import calculate_all_metrics_for_user  # Disabled for now
-        # calculate_all_metrics_for_user(user_id)  # Disabled for now
-        return {"message": f"Metrics calculated successfully for user {user_id}", "status": "success"}
+        result = calculate_period_performance_job(user_ids=[user_id])
+        if result["status"] != "success":
+            return {"error": result["error"], "status": "error"}
+        return {"message": f"Metrics calculated successfully for user {user_id}", "status": "success", **result}
     except Exception as e:
         return {"error": str(e), "status": "error"}
 
-@app.post("/portfolio/calculate-all-metrics")
+@router.post("/portfolio/calculate-all-metrics")
 def calculate_all_user_metrics(db: Session = Depends(get_db)):
     """Trigger calculation of all metrics for all users"""
     try:
-        # from calculate_all_metrics import calculate_all_metrics  # Disabled for now
-        # calculate_all_metrics()  # Disabled for now
-        return {"message": "All metrics calculated successfully", "status": "success"}
+        result = calculate_period_performance_job()
+        if result["status"] != "success":
+            return {"error": result["error"], "status": "error"}
+        return {"message": "All metrics calculated successfully", "status": "success", **result}
     except Exception as e:
         return {"error": str(e), "status": "error"}
 
-@app.get("/portfolio/top-holdings/{user_id}")
-def get_top_holdings(user_id: int, type: str = "holdings", db: Session = Depends(get_db)):
+@router.get("/portfolio/top-holdings/{user_id}")
+def get_top_holdings(user_id: int, type: str = "holdings", db: Session = Depends(get_db), db_v2: Session = Depends(get_db_v2)):
     """Get top holdings or movers for a user"""
     try:
         from models import TopHoldings
         
+        if type == "movers":
+            # Ranked on request from the per-ticker price changes
+            return {
+                "user_id": user_id,
+                "type": type,
+                "data": user_movers(user_id, db_v2),
+                "status": "success"
+            }
+        
         # Get top holdings/movers from database
         top_data = db.query(TopHoldings).filter(
             TopHoldings.user_id == user_id,
@@ -1437,39 +1299,17 @@ def get_top_holdings(user_id: int, type: str = "holdings", db: Session = Depends
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get top holdings: {str(e)}")
 
-@app.get("/portfolio/top-holdings-movers/{user_id}")
-def get_top_holdings_and_movers(user_id: int, db: Session = Depends(get_db)):
+@router.get("/portfolio/top-holdings-movers/{user_id}")
+def get_top_holdings_and_movers(user_id: int, db: Session = Depends(get_db), db_v2: Session = Depends(get_db_v2)):
     """Get both top holdings and movers for a user in a single call"""
     try:
         from models import TopHoldings
         
-        # Get both types of data
         holdings_data = db.query(TopHoldings).filter(
             TopHoldings.user_id == user_id,
             TopHoldings.type == "holdings"
         ).order_by(TopHoldings.rank.asc()).all()
         
-        movers_data = db.query(TopHoldings).filter(
-            TopHoldings.user_id == user_id,
-            TopHoldings.type == "movers"
-        ).order_by(TopHoldings.rank.asc()).all()
-        
-        if not holdings_data or not movers_data:
-            # If no data exists, calculate it
-            # from calculate_top_holdings import calculate_top_holdings_for_user  # Disabled for now
-            # calculate_top_holdings_for_user(user_id)  # Disabled for now
-            
-            # Query again after calculation
-            holdings_data = db.query(TopHoldings).filter(
-                TopHoldings.user_id == user_id,
-                TopHoldings.type == "holdings"
-            ).order_by(TopHoldings.rank.asc()).all()
-            
-            movers_data = db.query(TopHoldings).filter(
-                TopHoldings.user_id == user_id,
-                TopHoldings.type == "movers"
-            ).order_by(TopHoldings.rank.asc()).all()
-        
         # Format the response
         def format_data(data):
             return [{
@@ -1485,15 +1325,15 @@ def get_top_holdings_and_movers(user_id: int, db: Session = Depends(get_db)):
         return {
             "user_id": user_id,
             "holdings": format_data(holdings_data),
-            "movers": format_data(movers_data),
+            "movers": user_movers(user_id, db_v2),
             "status": "success"
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get top holdings and movers: {str(e)}")
 
-@app.get("/insights/{user_id}")
-def get_insights(user_id: int, db: Session = Depends(get_db)):
+@router.get("/insights/{user_id}")
+def get_insights(user_id: int, db: Session = Depends(get_db), db_v2: Session = Depends(get_db_v2)):
     """Get AI-powered portfolio insights"""
     try:
         from insights_calculator import (
@@ -1503,7 +1343,6 @@ def get_insights(user_id: int, db: Session = Depends(get_db)):
             save_insights_to_cache,
             generate_rule_based_insights
         )
-        from ai_insights_generator import generate_ai_insights, generate_detailed_insights
         
         # Calculate portfolio metrics
         print(f"Debug: Calculating metrics for user {user_id}")
@@ -1524,7 +1363,7 @@ def get_insights(user_id: int, db: Session = Depends(get_db)):
         metrics_hash = generate_metrics_hash(metrics)
         
         # Check cache first
-        cached_insights = get_cached_insights(user_id, metrics_hash, db)
+        cached_insights = get_cached_insights(user_id, metrics_hash, db_v2)
         if cached_insights:
             return {
                 "insights": cached_insights,
@@ -1532,46 +1371,33 @@ def get_insights(user_id: int, db: Session = Depends(get_db)):
                 "metrics": metrics
             }
         
-        # Try to generate AI insights
-        ai_insights = generate_ai_insights(metrics)
-        
-        if ai_insights:
-            # Save AI insights to cache
-            save_insights_to_cache(user_id, metrics_hash, ai_insights, True, db)
-            return {
-                "insights": ai_insights,
-                "cached": False,
-                "ai_generated": True,
-                "metrics": metrics
-            }
-        else:
-            # Fallback to rule-based insights
-            rule_based_insights = generate_rule_based_insights(metrics)
-            save_insights_to_cache(user_id, metrics_hash, rule_based_insights, False, db)
-            return {
-                "insights": rule_based_insights,
-                "cached": False,
-                "ai_generated": False,
-                "metrics": metrics
-            }
+        # No LLM call inside the request; AI text comes from the nightly insights worker
+        rule_based_insights = generate_rule_based_insights(metrics)
+        save_insights_to_cache(user_id, metrics_hash, rule_based_insights, False, db_v2)
+        return {
+            "insights": rule_based_insights,
+            "cached": False,
+            "ai_generated": False,
+            "metrics": metrics
+        }
             
     except Exception as e:
         return {"error": f"Failed to generate insights: {str(e)}", "insights": []}
 
-@app.get("/insights/detailed/{user_id}")
+@router.get("/insights/detailed/{user_id}")
 def get_detailed_insights(user_id: int, db: Session = Depends(get_db)):
     """Get detailed AI insights for the Insights tab"""
     try:
         from insights_calculator import calculate_portfolio_metrics
-        from ai_insights_generator import generate_detailed_insights
+        from ai_insights_generator import generate_rule_based_detailed_insights
         
         # Calculate portfolio metrics
         metrics = calculate_portfolio_metrics(user_id, db)
         if not metrics:
             return {"error": "No portfolio data found", "insights": []}
         
-        # Generate detailed insights
-        detailed_insights = generate_detailed_insights(metrics)
+        # Rule-based cards; requests never wait on an LLM
+        detailed_insights = generate_rule_based_detailed_insights(metrics)
         
         return {
             "insights": detailed_insights,
@@ -1581,6 +1407,10 @@ def get_detailed_insights(user_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": f"Failed to generate detailed insights: {str(e)}", "insights": []}
 
+app.include_router(router)
+
 if __name__ == "__main__":
     import uvicorn
+    from core.logging import configure_logging
+    configure_logging()
     uvicorn.run(app, host="127.0.0.1", port=8001)
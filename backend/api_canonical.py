@@ -6,31 +6,49 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional, Any
 import logging
+from contextlib import asynccontextmanager
 from decimal import Decimal
 from zoneinfo import ZoneInfo
 
 # Local imports
-from core.database import SessionLocal, get_db
+from core.database import SessionLocal, db_manager, get_db
+from core.logging import configure_logging
+from core.profiling import ProfiledRoute, instrument_app
 from services.portfolio_calculation_service import PortfolioCalculationService
+from services.benchmark_service import BenchmarkService
+from services.covariance_cache import DiversificationService
+from services.movers_engine import MoversEngine, split_movers
+from services.returns_engine import ReturnsEngine
+from services.risk_engine import RiskEngine
+from services.risk_metrics import METRIC_NAMES as RISK_METRIC_NAMES
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    yield
+
 # FastAPI app
 app = FastAPI(
     title="Canonical Portfolio API",
     description="Portfolio calculation service with strict canonical rules",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-request query counts (X-DB-Queries / X-DB-Time), slow query log and X-Profile captures
+instrument_app(app)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +58,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoints live on a router so server.py can serve them next to the other APIs
+router = APIRouter(route_class=ProfiledRoute)
+
 # Pydantic models
 class PriceUpdateRequest(BaseModel):
     stock_tickers: List[str] = Field(default_factory=list)
@@ -57,6 +78,8 @@ class PositionDetail(BaseModel):
     units: float
     price: Optional[float]
     position_val: float
+    change_pct: Optional[float] = None  # Movers only: 1D price change, percent
+    change_val: Optional[float] = None  # Movers only: position value gained over the day
 
 class AllocationBreakdown(BaseModel):
     stock: float
@@ -67,10 +90,41 @@ class AllocationBreakdown(BaseModel):
 class RiskMetrics(BaseModel):
     sharpe_ratio: Optional[float]
     volatility_annualized: Optional[float]
+    sortino_ratio: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    beta: Optional[float] = None
+    var_95: Optional[float] = None
+
+class ReturnWindow(BaseModel):
+    start_date: str
+    end_date: str
+    start_value: float
+    end_value: float
+    net_flows: float
+    twr: Optional[float]  # Cumulative time-weighted return, percent
+    mwr: Optional[float]  # Money-weighted return, percent (annualized for windows >= 1 year)
+    partial: bool = False  # Window starts before the first recorded value
+
+class BenchmarkWindow(BaseModel):
+    start_date: str
+    end_date: str
+    portfolio_return: Optional[float]  # Cumulative time-weighted, percent
+    benchmark_return: Optional[float]  # Cumulative, percent
+    excess_return: Optional[float]  # Percentage points
+    tracking_error: Optional[float]  # Annualized, percent
+    information_ratio: Optional[float]
+    partial: bool = False
+
+class BenchmarkResponse(BaseModel):
+    as_of: str
+    benchmarks: Dict[str, Dict[str, BenchmarkWindow]]  # ticker -> period -> comparison
 
 class DiversificationMetrics(BaseModel):
-    score: int
+    score: int  # 100 * (1 - 1 / effective_bets)
     risk_level: str
+    volatility: Optional[float] = None  # Annualized, percent
+    effective_bets: Optional[float] = None
+    risk_contributions: Dict[str, float] = {}  # Ticker -> percent of portfolio variance
 
 class MissingPrice(BaseModel):
     ticker: str
@@ -89,6 +143,7 @@ class DashboardResponse(BaseModel):
     top_holdings: List[PositionDetail]
     movers: Dict[str, List[PositionDetail]]
     risk: RiskMetrics
+    returns: Dict[str, ReturnWindow] = {}
     diversification: DiversificationMetrics
     health_score: int
     missing_prices: List[MissingPrice]
@@ -148,7 +203,7 @@ def round_percentage(value: Optional[Decimal]) -> Optional[float]:
 
 # API Endpoints
 
-@app.post("/prices/update", response_model=PriceUpdateResponse)
+@router.post("/prices/update", response_model=PriceUpdateResponse)
 def update_prices(
     request: PriceUpdateRequest,
     service: PortfolioCalculationService = Depends(get_portfolio_service)
@@ -181,7 +236,7 @@ def update_prices(
             detail=f"Price update failed: {str(e)}"
         )
 
-@app.post("/prices/update-yesterday", response_model=PriceUpdateResponse)
+@router.post("/prices/update-yesterday", response_model=PriceUpdateResponse)
 def update_yesterday_prices(
     request: PriceUpdateRequest,
     service: PortfolioCalculationService = Depends(get_portfolio_service)
@@ -209,7 +264,7 @@ def update_yesterday_prices(
         logger.error(f"Yesterday price update error: {e}")
         raise HTTPException(status_code=500, detail=f"Yesterday price update failed: {str(e)}")
 
-@app.get("/dashboard/{user_id}", response_model=DashboardResponse)
+@router.get("/dashboard/{user_id}", response_model=DashboardResponse)
 def get_dashboard(
     user_id: int,
     as_of: Optional[str] = None,
@@ -270,18 +325,66 @@ def get_dashboard(
         data_quality = None
         if snapshot.total_value > 0:
             missing_value = sum(
-                pos.position_val for pos in snapshot.by_position 
+                float(pos.position_val) for pos in snapshot.by_position 
                 if pos.missing_price
             )
-            missing_pct = (missing_value / snapshot.total_value) * 100
+            missing_pct = (missing_value / float(snapshot.total_value)) * 100
             if missing_pct > 20:
                 data_quality = "LOW"
         
+        # Risk metrics from the nightly batch (computed on demand if it has not run)
+        risk_data = RiskEngine(service.db).metrics_for_user(user_id, as_of_date)
+        risk = RiskMetrics(**{
+            name: round(risk_data[name], 2) if risk_data.get(name) is not None else None
+            for name in RISK_METRIC_NAMES
+        })
+        
+        # Flow-aware return windows (1W, 1M, YTD, 1Y, inception)
+        returns = {
+            window: ReturnWindow(**{
+                key: round(value, 2) if isinstance(value, float) else value
+                for key, value in data.items()
+            })
+            for window, data in ReturnsEngine(service.db).returns(user_id, as_of_date).items()
+        }
+        
+        # Covariance-based diversification from the rolling price window
+        diversification_data = DiversificationService(service.db).for_user(user_id, as_of_date)
+        if diversification_data:
+            diversification = DiversificationMetrics(**{
+                key: round(value, 2) if isinstance(value, float) else
+                {ticker: round(pct, 2) for ticker, pct in value.items()} if isinstance(value, dict) else value
+                for key, value in diversification_data.items()
+            })
+        else:
+            diversification = DiversificationMetrics(score=0, risk_level="Unknown")
+        
+        # Top movers: the snapshot's positions (lots merged per ticker) ranked by the stored 1D price changes
+        by_ticker = {}
+        for pos in snapshot.by_position:
+            if pos.missing_price:
+                continue
+            merged = by_ticker.setdefault(pos.ticker, {'ticker': pos.ticker, 'units': 0.0, 'price': float(pos.price), 'position_val': 0.0})
+            merged['units'] += float(pos.units)
+            merged['position_val'] += float(pos.position_val)
+        positions = MoversEngine(service.db).attach_changes(list(by_ticker.values()), as_of_date)
+        movers = {
+            direction: [
+                PositionDetail(
+                    ticker=mover['ticker'],
+                    units=mover['units'],
+                    price=mover['price'],
+                    position_val=round_money(Decimal(str(mover['position_val']))),
+                    change_pct=round(mover['change_pct'], 2),
+                    change_val=round(mover['change_val'], 2) if mover['change_val'] is not None else None
+                )
+                for mover in ranked
+            ]
+            for direction, ranked in split_movers(positions, k=3).items()
+        }
+        
         # Placeholder values for complex metrics (implement as needed)
-        risk = RiskMetrics(sharpe_ratio=None, volatility_annualized=None)
-        diversification = DiversificationMetrics(score=75, risk_level="Medium")
         health_score = 80
-        movers = {"up": [], "down": []}
         
         return DashboardResponse(
             portfolio_created=portfolio_created.isoformat() if portfolio_created else None,
@@ -295,6 +398,7 @@ def get_dashboard(
             top_holdings=top_holdings,
             movers=movers,
             risk=risk,
+            returns=returns,
             diversification=diversification,
             health_score=health_score,
             missing_prices=missing_prices,
@@ -308,7 +412,7 @@ def get_dashboard(
             detail=f"Dashboard calculation failed: {str(e)}"
         )
 
-@app.post("/snapshot/yesterday/{user_id}")
+@router.post("/snapshot/yesterday/{user_id}")
 def snapshot_yesterday(
     user_id: int,
     service: PortfolioCalculationService = Depends(get_portfolio_service)
@@ -325,7 +429,7 @@ def snapshot_yesterday(
         logger.error(f"Snapshot yesterday error for {user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Snapshot yesterday failed: {str(e)}")
 
-@app.get("/dashboard/performance/{user_id}", response_model=PerformanceResponse)
+@router.get("/dashboard/performance/{user_id}", response_model=PerformanceResponse)
 def get_performance(
     user_id: int,
     start_date: str,
@@ -406,7 +510,40 @@ def get_performance(
             detail=f"Performance calculation failed: {str(e)}"
         )
 
-@app.get("/dashboard/audit/{user_id}")
+@router.get("/dashboard/benchmarks/{user_id}", response_model=BenchmarkResponse)
+def get_benchmarks(
+    user_id: int,
+    as_of: Optional[str] = None,
+    service: PortfolioCalculationService = Depends(get_portfolio_service)
+):
+    """
+    Compare the portfolio with SPY, AGG and BTC-USD over 1W/1M/YTD/1Y/5Y
+    """
+    try:
+        as_of_date = parse_date(as_of)
+        comparison = BenchmarkService(service.db).compare_user(user_id, as_of_date)
+        
+        benchmarks = {
+            ticker: {
+                period: BenchmarkWindow(**{
+                    key: value.isoformat() if isinstance(value, date) else
+                    round(value, 2) if isinstance(value, float) else value
+                    for key, value in data.items()
+                })
+                for period, data in periods.items()
+            }
+            for ticker, periods in comparison.items()
+        }
+        return BenchmarkResponse(as_of=as_of_date.isoformat(), benchmarks=benchmarks)
+        
+    except Exception as e:
+        logger.error(f"Benchmark error for user {user_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Benchmark comparison failed: {str(e)}"
+        )
+
+@router.get("/dashboard/audit/{user_id}")
 def get_audit(
     user_id: int,
     as_of: Optional[str] = None,
@@ -463,11 +600,20 @@ def get_audit(
             detail=f"Audit calculation failed: {str(e)}"
         )
 
-@app.get("/health")
+@router.get("/health")
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "canonical-portfolio-api"}
 
+@router.get("/health/ready")
+def readiness_check():
+    """Readiness probe: database reachable and schema at the Alembic head (503 until then)"""
+    report = db_manager.readiness()
+    return JSONResponse(report, status_code=200 if report['ready'] else 503)
+
+app.include_router(router)
+
 if __name__ == "__main__":
     import uvicorn
+    configure_logging()
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -3,21 +3,25 @@ FastAPI CRUD Endpoints for Normalized Portfolio Database
 Complete CRUD operations with efficient queries
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from datetime import date, datetime
-import uvicorn
+from itertools import groupby
+from operator import itemgetter
 
 # Database imports
-from core.database import get_db
+from core.database import get_db, SessionLocal
+from core.profiling import ProfiledRoute
 from domain.models_v2 import (
     User, Portfolio, DailyPrice, PortfolioDailyValue, 
     PortfolioSummary, AssetCategory, PortfolioTransaction, CashTransaction
 )
+from services.benchmark_service import invalidate_benchmark_cache
+from services.export_service import EXPORT_FORMATS, DEFAULT_CHUNK_ROWS, session_records, streaming_export
 
 # Create FastAPI app
 app = FastAPI(
@@ -35,6 +39,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoints live on a router so server.py can serve them next to the other APIs
+router = APIRouter(route_class=ProfiledRoute)
+
 # Pydantic models for requests/responses
 class UserCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -128,7 +135,7 @@ class CashTransactionResponse(BaseModel):
 
 # CRUD Endpoints
 
-@app.get("/")
+@router.get("/")
 def root():
     """Root endpoint"""
     return {
@@ -145,7 +152,7 @@ def root():
     }
 
 # User CRUD
-@app.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """Add a new user"""
     try:
@@ -173,7 +180,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
             detail=f"Failed to create user: {str(e)}"
         )
 
-@app.get("/users/{user_id}", response_model=UserResponse)
+@router.get("/users/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, db: Session = Depends(get_db)):
     """Get user by ID"""
     user = db.query(User).filter(User.user_id == user_id).first()
@@ -184,14 +191,14 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
         )
     return user
 
-@app.get("/users/", response_model=List[UserResponse])
+@router.get("/users/", response_model=List[UserResponse])
 def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """List all users"""
     users = db.query(User).offset(skip).limit(limit).all()
     return users
 
 # Portfolio CRUD
-@app.post("/portfolio/", response_model=PortfolioResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/portfolio/", response_model=PortfolioResponse, status_code=status.HTTP_201_CREATED)
 def add_portfolio_position(position: PortfolioCreate, db: Session = Depends(get_db)):
     """Add a new portfolio position"""
     try:
@@ -225,7 +232,7 @@ def add_portfolio_position(position: PortfolioCreate, db: Session = Depends(get_
             detail=f"Failed to add portfolio position: {str(e)}"
         )
 
-@app.get("/portfolio/{user_id}", response_model=List[PortfolioResponse])
+@router.get("/portfolio/{user_id}", response_model=List[PortfolioResponse])
 def get_user_portfolio(user_id: int, db: Session = Depends(get_db)):
     """Get all portfolio positions for a user"""
     # Verify user exists
@@ -246,7 +253,7 @@ def get_user_portfolio(user_id: int, db: Session = Depends(get_db)):
     return positions
 
 # Daily Prices CRUD
-@app.post("/prices/", response_model=DailyPriceResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/prices/", response_model=DailyPriceResponse, status_code=status.HTTP_201_CREATED)
 def insert_daily_price(price_data: DailyPriceCreate, db: Session = Depends(get_db)):
     """Insert daily price data"""
     try:
@@ -272,6 +279,7 @@ def insert_daily_price(price_data: DailyPriceCreate, db: Session = Depends(get_d
             
             db.commit()
             db.refresh(existing_price)
+            invalidate_benchmark_cache(price_data.ticker)
             return existing_price
         else:
             # Create new price record
@@ -288,6 +296,7 @@ def insert_daily_price(price_data: DailyPriceCreate, db: Session = Depends(get_d
             db.add(db_price)
             db.commit()
             db.refresh(db_price)
+            invalidate_benchmark_cache(price_data.ticker)
             return db_price
             
     except Exception as e:
@@ -297,7 +306,7 @@ def insert_daily_price(price_data: DailyPriceCreate, db: Session = Depends(get_d
             detail=f"Failed to insert daily price: {str(e)}"
         )
 
-@app.get("/prices/{ticker}", response_model=List[DailyPriceResponse])
+@router.get("/prices/{ticker}", response_model=List[DailyPriceResponse])
 def get_ticker_prices(
     ticker: str, 
     start_date: Optional[date] = None,
@@ -322,14 +331,30 @@ def get_ticker_prices(
     return prices
 
 # Portfolio Daily Values
-@app.get("/daily-values/{user_id}")
+@router.get("/daily-values/{user_id}")
 def get_portfolio_daily_values(
     user_id: int,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    format: Optional[str] = None,
+    gzip: bool = False,
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get portfolio daily values for a user"""
+    """
+    Portfolio daily values for a user
+    json (default) returns a list with one entry per date and its positions.
+    Streaming is opt-in: ndjson (also selected by Accept: application/x-ndjson)
+    emits one line per date, csv one row per position
+    """
+    if format is None:
+        format = "ndjson" if accept and EXPORT_FORMATS["ndjson"] in accept else "json"
+    if format != "json" and format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: json, {', '.join(EXPORT_FORMATS)}"
+        )
+    
     # Verify user exists
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
@@ -338,42 +363,55 @@ def get_portfolio_daily_values(
             detail="User not found"
         )
     
-    query = (
-        db.query(PortfolioDailyValue)
-        .join(Portfolio)
-        .filter(Portfolio.user_id == user_id)
-    )
-    
-    if start_date:
-        query = query.filter(PortfolioDailyValue.date >= start_date)
-    if end_date:
-        query = query.filter(PortfolioDailyValue.date <= end_date)
-    
-    daily_values = query.order_by(PortfolioDailyValue.date).all()
-    
-    # Group by date
-    result = {}
-    for dv in daily_values:
-        date_str = dv.date.isoformat()
-        if date_str not in result:
-            result[date_str] = {
-                "date": date_str,
-                "total_value": 0,
-                "positions": []
-            }
+    def produce(session: Session):
+        query = (
+            session.query(
+                PortfolioDailyValue.date, Portfolio.ticker, PortfolioDailyValue.units,
+                PortfolioDailyValue.price, PortfolioDailyValue.position_val
+            )
+            .join(Portfolio)
+            .filter(Portfolio.user_id == user_id)
+        )
         
-        result[date_str]["total_value"] += dv.position_val
-        result[date_str]["positions"].append({
-            "ticker": dv.portfolio.ticker,
-            "units": dv.units,
-            "price": dv.price,
-            "position_val": dv.position_val
-        })
+        if start_date:
+            query = query.filter(PortfolioDailyValue.date >= start_date)
+        if end_date:
+            query = query.filter(PortfolioDailyValue.date <= end_date)
+        
+        rows = query.order_by(PortfolioDailyValue.date, Portfolio.ticker).yield_per(DEFAULT_CHUNK_ROWS)
+        positions = (
+            {"date": row[0], "ticker": row[1], "units": row[2], "price": row[3], "position_val": row[4]}
+            for row in rows
+        )
+        
+        if format == "csv":
+            yield from positions
+            return
+        
+        # Rows arrive ordered by date, so only one day is held at a time
+        for day, day_positions in groupby(positions, key=itemgetter("date")):
+            day_positions = [
+                {k: v for k, v in pos.items() if k != "date"} for pos in day_positions
+            ]
+            yield {
+                "date": day,
+                "total_value": sum(pos["position_val"] for pos in day_positions),
+                "positions": day_positions
+            }
+    
+    if format == "json":
+        return list(produce(db))
     
-    return list(result.values())
+    return streaming_export(
+        session_records(SessionLocal, produce),
+        columns=["date", "ticker", "units", "price", "position_val"],
+        fmt=format,
+        filename=f"daily_values_{user_id}",
+        compress=gzip
+    )
 
 # Portfolio Summary
-@app.get("/summary/{user_id}", response_model=PortfolioSummaryResponse)
+@router.get("/summary/{user_id}", response_model=PortfolioSummaryResponse)
 def get_portfolio_summary_by_date(
     user_id: int,
     target_date: date,
@@ -428,7 +466,7 @@ def get_portfolio_summary_by_date(
         positions=positions
     )
 
-@app.get("/summary/{user_id}/range")
+@router.get("/summary/{user_id}/range")
 def get_portfolio_summary_range(
     user_id: int,
     start_date: date,
@@ -465,7 +503,7 @@ def get_portfolio_summary_range(
     return result
 
 # Bulk operations
-@app.post("/prices/bulk")
+@router.post("/prices/bulk")
 def bulk_insert_prices(prices: List[DailyPriceCreate], db: Session = Depends(get_db)):
     """Bulk insert daily prices"""
     try:
@@ -508,6 +546,9 @@ def bulk_insert_prices(prices: List[DailyPriceCreate], db: Session = Depends(get
                 inserted_count += 1
         
         db.commit()
+        # Benchmark series are cached in-process; served from this process they must see the write
+        for ticker in {price_data.ticker for price_data in prices}:
+            invalidate_benchmark_cache(ticker)
         
         return {
             "inserted": inserted_count,
@@ -524,7 +565,7 @@ def bulk_insert_prices(prices: List[DailyPriceCreate], db: Session = Depends(get
         )
 
 # Cash Transaction Endpoints
-@app.post("/cash-transactions/", response_model=CashTransactionResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/cash-transactions/", response_model=CashTransactionResponse, status_code=status.HTTP_201_CREATED)
 def add_cash_transaction(transaction: CashTransactionCreate, db: Session = Depends(get_db)):
     """Add a cash transaction (deposit or withdrawal)"""
     try:
@@ -565,7 +606,7 @@ def add_cash_transaction(transaction: CashTransactionCreate, db: Session = Depen
             detail=f"Failed to add cash transaction: {str(e)}"
         )
 
-@app.get("/cash-transactions/{user_id}", response_model=List[CashTransactionResponse])
+@router.get("/cash-transactions/{user_id}", response_model=List[CashTransactionResponse])
 def get_user_cash_transactions(user_id: int, db: Session = Depends(get_db)):
     """Get all cash transactions for a user"""
     # Verify user exists
@@ -611,7 +652,7 @@ def get_cash_balance(db: Session, user_id: int, target_date: date) -> float:
     return cash_balance
 
 # Main Portfolio Endpoint with Cash Balance
-@app.get("/portfolio/{user_id}/{target_date}", response_model=PortfolioWithCashResponse)
+@router.get("/portfolio/{user_id}/{target_date}", response_model=PortfolioWithCashResponse)
 def get_portfolio_with_cash(
     user_id: int, 
     target_date: date,
@@ -689,7 +730,7 @@ def get_portfolio_with_cash(
         positions=positions
     )
 
-@app.get("/cash-balance/{user_id}/{target_date}")
+@router.get("/cash-balance/{user_id}/{target_date}")
 def get_cash_balance_endpoint(
     user_id: int,
     target_date: date,
@@ -713,7 +754,14 @@ def get_cash_balance_endpoint(
         "cash_balance": cash_balance
     }
 
+app.include_router(router)
+
 if __name__ == "__main__":
+    import uvicorn
+    from core.logging import configure_logging
+
+    configure_logging()
+
     print("🚀 Starting Portfolio API - Normalized Database")
     print("📊 Complete CRUD operations with efficient queries")
     uvicorn.run(app, host="127.0.0.1", port=8002, reload=True)
@@ -3,20 +3,22 @@ Perfect Portfolio API - The Way I Would Do It
 Clean, efficient, production-ready from day one
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.openapi.utils import get_openapi
 from sqlalchemy.orm import Session
+import logging
 import time
-import uvicorn
+from contextlib import asynccontextmanager
 from typing import Dict, List
 
 # Core imports
 from core.config import settings
-from core.logging import logger
+from core.logging import configure_logging
 from core.database import get_db, db_manager
+from core.profiling import ProfiledRoute, instrument_app
 from domain.models import User, PortfolioHolding
 from domain.schemas import (
     PortfolioResponse, HoldingResponse, ReturnCalculationResponse,
@@ -26,6 +28,34 @@ from domain.schemas import (
 from services.data_service import DataService
 from services.portfolio_service import PortfolioService
 
+logger = logging.getLogger(__name__)
+# One line per request; exempt from the per-call-site rate limit (LOG_RATE_EXEMPT)
+access_logger = logging.getLogger("portora.access")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    configure_logging()
+    logger.info(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION}")
+    logger.info(f"📊 Environment: {'Development' if settings.DEBUG else 'Production'}")
+    logger.info(f"🗄️  Database: {settings.DATABASE_URL}")
+    logger.info(f"📁 CSV Path: {settings.CSV_PATH}")
+    
+    # Schema is owned by Alembic; migrations run here only when AUTO_MIGRATE is set
+    try:
+        if settings.AUTO_MIGRATE:
+            db_manager.upgrade()
+        report = db_manager.readiness()
+        if report['ready']:
+            logger.info("✅ Database ready (schema %s)", report['checks']['schema']['current'])
+        else:
+            logger.warning("⚠️  Database not ready, run `alembic upgrade head`: %s", report['checks'])
+    except Exception as e:
+        logger.error(f"❌ Database initialization failed: {e}")
+    
+    yield
+    logger.info(f"🛑 Shutting down {settings.APP_NAME}")
+
 # Create FastAPI app with perfect configuration
 app = FastAPI(
     title=settings.APP_NAME,
@@ -34,8 +64,12 @@ app = FastAPI(
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
     openapi_url="/openapi.json" if settings.DEBUG else None,
+    lifespan=lifespan,
 )
 
+# Per-request query counts (X-DB-Queries / X-DB-Time), slow query log and X-Profile captures
+instrument_app(app)
+
 # Security middleware
 if not settings.DEBUG:
     app.add_middleware(
@@ -58,7 +92,7 @@ async def log_requests(request: Request, call_next):
     start_time = time.time()
     
     # Log request
-    logger.info(f"🔄 {request.method} {request.url.path}")
+    access_logger.debug("🔄 %s %s", request.method, request.url.path)
     
     try:
         response = await call_next(request)
@@ -69,13 +103,17 @@ async def log_requests(request: Request, call_next):
         
         # Log response
         status_emoji = "✅" if response.status_code < 400 else "❌"
-        logger.info(f"{status_emoji} {request.method} {request.url.path} - {response.status_code} - {process_time:.4f}s")
+        access_logger.info(
+            "%s %s %s - %s - %.4fs - %s queries in %ss",
+            status_emoji, request.method, request.url.path, response.status_code, process_time,
+            response.headers.get('X-DB-Queries', '?'), response.headers.get('X-DB-Time', '?')
+        )
         
         return response
         
     except Exception as e:
         process_time = time.time() - start_time
-        logger.error(f"❌ {request.method} {request.url.path} - ERROR - {process_time:.4f}s - {str(e)}")
+        access_logger.error("❌ %s %s - ERROR - %.4fs - %s", request.method, request.url.path, process_time, e)
         raise
 
 # Global exception handler
@@ -132,8 +170,18 @@ def health_check(data_service: DataService = Depends(get_data_service)):
             detail="Service unhealthy"
         )
 
+@app.get("/health/ready", tags=["System"])
+def readiness_check():
+    """Readiness probe: database reachable and schema at the Alembic head (503 until then)"""
+    report = db_manager.readiness()
+    return JSONResponse(report, status_code=status.HTTP_200_OK if report['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
 # Portfolio endpoints - Perfect REST design
-@app.get(
+# On a router so server.py can serve /api/v3 next to the other APIs; system and
+# deprecated endpoints below stay on this app
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get(
     "/api/v3/portfolio",
     response_model=PortfolioResponse,
     tags=["Portfolio"],
@@ -146,11 +194,11 @@ def get_portfolio(
 ) -> PortfolioResponse:
     """Get complete portfolio data with perfect error handling"""
     try:
-        logger.info(f"📊 Getting portfolio for user {user_id}")
+        logger.debug("📊 Getting portfolio for user %s", user_id)
         result = portfolio_service.get_portfolio_summary(user_id)
         
         # Success metrics
-        logger.info(f"✅ Portfolio retrieved: {result.summary.Total_Holdings} holdings, ${result.summary.Total_Value:,.2f}")
+        logger.debug("✅ Portfolio retrieved: %d holdings, $%.2f", result.summary.Total_Holdings, result.summary.Total_Value)
         
         return result
         
@@ -161,7 +209,7 @@ def get_portfolio(
             detail=f"Failed to retrieve portfolio: {str(e)}"
         )
 
-@app.get(
+@router.get(
     "/api/v3/portfolio/{user_id}/summary",
     response_model=Dict,
     tags=["Portfolio"],
@@ -186,7 +234,7 @@ def get_portfolio_summary_only(
             detail=str(e)
         )
 
-@app.get(
+@router.get(
     "/api/v3/portfolio/{user_id}/holdings",
     response_model=Dict,
     tags=["Portfolio"],
@@ -215,7 +263,7 @@ def get_portfolio_holdings_only(
             detail=str(e)
         )
 
-@app.get(
+@router.get(
     "/api/v3/portfolio/{user_id}/top-holdings",
     response_model=List[HoldingResponse],
     tags=["Portfolio"],
@@ -236,7 +284,7 @@ def get_top_holdings(
             detail=str(e)
         )
 
-@app.get(
+@router.get(
     "/api/v3/portfolio/{user_id}/top-movers",
     response_model=List[HoldingResponse],
     tags=["Portfolio"],
@@ -258,7 +306,7 @@ def get_top_movers(
         )
 
 # Data management endpoints
-@app.post(
+@router.post(
     "/api/v3/portfolio/{user_id}/update-prices",
     response_model=UpdatePricesResponse,
     tags=["Data Management"],
@@ -285,7 +333,7 @@ def update_portfolio_prices(
         )
 
 # Analysis endpoints
-@app.post(
+@router.post(
     "/api/v3/analysis/return",
     response_model=ReturnCalculationResponse,
     tags=["Analysis"],
@@ -326,7 +374,7 @@ def calculate_return(
 
 # Debug endpoints (only in development)
 if settings.DEBUG:
-    @app.get(
+    @router.get(
         "/api/v3/debug/gldm",
         response_model=GLDMDebugResponse,
         tags=["Debug"],
@@ -346,6 +394,8 @@ if settings.DEBUG:
                 detail=str(e)
             )
 
+app.include_router(router)
+
 # Legacy endpoints for backward compatibility
 @app.get("/portfolio", include_in_schema=False)
 def get_portfolio_legacy(
@@ -389,29 +439,11 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-# Startup and shutdown events
-@app.on_event("startup")
-async def startup_event():
-    """Application startup"""
-    logger.info(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION}")
-    logger.info(f"📊 Environment: {'Development' if settings.DEBUG else 'Production'}")
-    logger.info(f"🗄️  Database: {settings.DATABASE_URL}")
-    logger.info(f"📁 CSV Path: {settings.CSV_PATH}")
-    
-    # Create database tables
-    try:
-        db_manager.create_tables()
-        logger.info("✅ Database initialized")
-    except Exception as e:
-        logger.error(f"❌ Database initialization failed: {e}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown"""
-    logger.info(f"🛑 Shutting down {settings.APP_NAME}")
-
 # Main entry point
 if __name__ == "__main__":
+    import uvicorn
+
+    configure_logging()
     logger.info("🚀 Starting Portfolio API - The Perfect Way")
     logger.info("📊 Clean Architecture | Type-Safe | Production-Ready")
     logger.info("🔧 CSV-based data with database integration")
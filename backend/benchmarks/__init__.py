@@ -0,0 +1,4 @@
+"""
+Benchmarks - Reproducible Performance Suite
+Run with python -m benchmarks.run
+"""
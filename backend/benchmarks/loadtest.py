@@ -0,0 +1,309 @@
+"""
+Load Test Harness - Traffic Mixes Against a Generated Database
+Generates a synthetic database, starts the provider stubs (benchmarks/stubs.py)
+and api_canonical:app or app:app under uvicorn pointed at both, then drives a
+weighted dashboard/performance/audit traffic mix from concurrent clients and
+reports throughput, error counts and latency percentiles per scenario as JSON
+
+Usage: python -m benchmarks.loadtest --app canonical --mix canonical --concurrency 16 --duration 30
+       python -m benchmarks.loadtest --app canonical --mix canonical_refresh --twelve-data-rpm 8
+       python -m benchmarks.loadtest --base-url http://127.0.0.1:8001 --mix canonical --users 20
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.run import git_commit
+from benchmarks.synthetic import SyntheticSpec, ticker_universe
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent
+APPS = {'canonical': "api_canonical:app", 'app': "app:app"}
+PERFORMANCE_RANGES = (30, 90, 365)  # Chart ranges the dashboard offers, in days
+
+@dataclass
+class Scenario:
+    """One kind of request in a traffic mix; build() returns (method, path, params, json body)"""
+    name: str
+    weight: int
+    build: Callable[[random.Random, SyntheticSpec], tuple]
+
+def _user(rng: random.Random, spec: SyntheticSpec) -> int:
+    return rng.randint(1, spec.users)
+
+def _performance(rng: random.Random, spec: SyntheticSpec) -> tuple:
+    start = spec.as_of - timedelta(days=rng.choice(PERFORMANCE_RANGES))
+    return ("GET", f"/dashboard/performance/{_user(rng, spec)}",
+            {'start_date': start.isoformat(), 'end_date': spec.as_of.isoformat()}, None)
+
+def _price_update(rng: random.Random, spec: SyntheticSpec) -> tuple:
+    """
+    A small refresh that goes out to the provider stubs: as_of lands up to a month
+    past the generated history, so tickers keep having days to catch up on
+    """
+    tickers = ticker_universe(spec.universe)
+    stocks = [t['symbol'] for t in tickers if t['asset_class'] == 'STOCK']
+    crypto = [t['symbol'] for t in tickers if t['asset_class'] == 'CRYPTO']
+    as_of = spec.as_of + timedelta(days=rng.randint(1, 30))
+    body = {'stock_tickers': rng.sample(stocks, 2), 'crypto_tickers': rng.sample(crypto, 1), 'as_of': as_of.isoformat()}
+    return ("POST", "/prices/update", None, body)
+
+MIXES: Dict[str, List[Scenario]] = {
+    'canonical': [
+        Scenario('dashboard', 50, lambda rng, spec: ("GET", f"/dashboard/{_user(rng, spec)}", {'as_of': spec.as_of.isoformat()}, None)),
+        Scenario('performance', 25, _performance),
+        Scenario('audit', 15, lambda rng, spec: ("GET", f"/dashboard/audit/{_user(rng, spec)}", {'as_of': spec.as_of.isoformat()}, None)),
+        Scenario('benchmarks', 10, lambda rng, spec: ("GET", f"/dashboard/benchmarks/{_user(rng, spec)}", {'as_of': spec.as_of.isoformat()}, None)),
+    ],
+    'app': [
+        Scenario('portfolio', 40, lambda rng, spec: ("GET", "/api/v3/portfolio", {'user_id': _user(rng, spec)}, None)),
+        Scenario('summary', 25, lambda rng, spec: ("GET", f"/api/v3/portfolio/{_user(rng, spec)}/summary", None, None)),
+        Scenario('holdings', 15, lambda rng, spec: ("GET", f"/api/v3/portfolio/{_user(rng, spec)}/holdings", None, None)),
+        Scenario('top_movers', 15, lambda rng, spec: ("GET", f"/api/v3/portfolio/{_user(rng, spec)}/top-movers", None, None)),
+        Scenario('health', 5, lambda rng, spec: ("GET", "/health", None, None)),
+    ],
+}
+# Dashboard traffic while prices are being refreshed through the (rate limited) providers
+MIXES['canonical_refresh'] = MIXES['canonical'] + [Scenario('price_update', 5, _price_update)]
+
+@dataclass
+class Sample:
+    scenario: str
+    status: int
+    seconds: float
+
+@dataclass
+class LoadResult:
+    samples: List[Sample] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize_samples(samples: List[Sample], wall_seconds: float) -> Dict:
+    """Throughput and latency percentiles (ms) for a set of samples"""
+    ordered = sorted(s.seconds for s in samples)
+    errors = sum(1 for s in samples if not 200 <= s.status < 300)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+        **{f"p{q}_ms": round(percentile(ordered, q) * 1000, 2) for q in (50, 90, 95, 99)},
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+def report_results(result: LoadResult) -> Dict:
+    by_scenario: Dict[str, List[Sample]] = {}
+    for sample in result.samples:
+        by_scenario.setdefault(sample.scenario, []).append(sample)
+    return {
+        'overall': summarize_samples(result.samples, result.wall_seconds),
+        'scenarios': {name: summarize_samples(samples, result.wall_seconds) for name, samples in sorted(by_scenario.items())},
+    }
+
+async def drive(base_url: str, mix: List[Scenario], spec: SyntheticSpec, concurrency: int,
+                duration: Optional[float] = None, requests: Optional[int] = None,
+                seed: int = 42, timeout: float = 60.0, transport=None) -> LoadResult:
+    """
+    Closed-loop load: `concurrency` clients each send the next request as soon as the
+    last one returns, until `duration` seconds pass or `requests` have been sent
+    """
+    if duration is None and requests is None:
+        raise ValueError("Give a duration or a request count")
+    result = LoadResult()
+    weights = [scenario.weight for scenario in mix]
+    sent = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def client_loop(client: httpx.AsyncClient, worker: int):
+        nonlocal sent
+        rng = random.Random(seed * 1000 + worker)
+        while (deadline is None or time.perf_counter() < deadline) and (requests is None or sent < requests):
+            sent += 1
+            scenario = rng.choices(mix, weights=weights)[0]
+            method, path, params, body = scenario.build(rng, spec)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            result.samples.append(Sample(scenario.name, status, time.perf_counter() - started))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits, transport=transport) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, worker) for worker in range(concurrency)))
+        result.wall_seconds = time.perf_counter() - started
+    return result
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before it came up")
+        try:
+            httpx.get(url, timeout=2.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+def generate_database(target: str, spec: SyntheticSpec, db_path: Path) -> Dict:
+    from sqlalchemy import create_engine
+    from benchmarks.synthetic import populate, populate_holdings
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        return (populate if target == 'canonical' else populate_holdings)(engine, spec)
+    finally:
+        engine.dispose()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the FastAPI apps against local provider stubs")
+    parser.add_argument('--app', choices=sorted(APPS), default='canonical')
+    parser.add_argument('--mix', choices=sorted(MIXES), help='Traffic mix (default: the app\'s own)')
+    parser.add_argument('--base-url', help='Drive an already running server instead of starting one')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--positions', type=int, default=15)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes for the app')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Stub provider latency')
+    parser.add_argument('--jitter-ms', type=float, default=25.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Stub provider 503 rate')
+    parser.add_argument('--alpaca-rpm', type=int, default=200)
+    parser.add_argument('--twelve-data-rpm', type=int, default=8)
+    parser.add_argument('--openai-rpm', type=int, default=500)
+    parser.add_argument('--output', type=Path, help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--server-log', type=Path, help='Append app and stub output here (default: discarded)')
+    args = parser.parse_args(argv)
+
+    from core.logging import configure_logging
+    configure_logging()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One line per request otherwise
+
+    mix_name = args.mix or args.app
+    spec = SyntheticSpec(users=args.users, positions=args.positions, years=args.years, seed=args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix="portora-load-"))
+    processes: List[subprocess.Popen] = []
+    stub_url, rows, stub_stats = None, None, None
+    server_log = open(args.server_log, 'a') if args.server_log else subprocess.DEVNULL
+
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            db_path = workdir / "load.db"
+            rows = generate_database(args.app, spec, db_path)
+            logger.info(f"🧪 Generated {rows} at {db_path}")
+
+            stub_port = free_port()
+            stub_url = f"http://127.0.0.1:{stub_port}"
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "benchmarks.stubs", "--port", str(stub_port),
+                "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                "--error-rate", str(args.error_rate), "--alpaca-rpm", str(args.alpaca_rpm),
+                "--twelve-data-rpm", str(args.twelve_data_rpm), "--openai-rpm", str(args.openai_rpm),
+                "--seed", str(args.seed),
+            ], cwd=BACKEND_DIR, stdout=server_log, stderr=subprocess.STDOUT))
+            wait_until_up(f"{stub_url}/stats", processes[-1])
+
+            app_port = free_port()
+            base_url = f"http://127.0.0.1:{app_port}"
+            env = {
+                **os.environ,
+                'DATABASE_URL': f"sqlite:///{db_path}",
+                'ALPACA_BASE_URL': stub_url,
+                'TWELVE_DATA_BASE_URL': stub_url,
+                'OPENAI_BASE_URL': f"{stub_url}/v1",
+                'ALPACA_API_KEY': "loadtest", 'ALPACA_SECRET_KEY': "loadtest",
+                'TWELVE_DATA_API_KEY': "loadtest", 'OPENAI_API_KEY': "loadtest",
+                'DEBUG': "false",
+            }
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "uvicorn", APPS[args.app], "--host", "127.0.0.1", "--port", str(app_port),
+                "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+            ], cwd=BACKEND_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT))
+            wait_until_up(f"{base_url}/health", processes[-1])
+
+        logger.info(f"🚦 {mix_name} mix against {base_url}: {args.concurrency} clients")
+        result = asyncio.run(drive(
+            base_url, MIXES[mix_name], spec, args.concurrency,
+            duration=None if args.requests else args.duration, requests=args.requests, seed=args.seed
+        ))
+        if stub_url:
+            stub_stats = httpx.get(f"{stub_url}/stats", timeout=5.0).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.server_log:
+            server_log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'target': args.base_url or APPS[args.app],
+        'mix': mix_name,
+        'params': {**spec.to_dict(), 'concurrency': args.concurrency, 'duration': args.duration,
+                   'requests': args.requests, 'workers': args.workers},
+        'rows': rows,
+        **report_results(result),
+        'providers': stub_stats,
+    }
+
+    overall = report['overall']
+    logger.info(
+        f"✅ {overall['requests']} requests, {overall['throughput_rps']} req/s, "
+        f"p50 {overall['p50_ms']}ms, p95 {overall['p95_ms']}ms, p99 {overall['p99_ms']}ms, {overall['errors']} errors"
+    )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Benchmark Runner - Hot Paths Against a Synthetic Database
+Generates a seeded synthetic database in a temp SQLite file and times snapshot
+valuation, the dashboard and chart endpoints, the daily calculator's date range
+and both price upsert paths. Results are JSON (min/median/p95 ms plus statements
+per call) so runs can be saved and compared; --compare fails on median regressions
+
+Usage: python -m benchmarks.run --users 50 --positions 20 --years 3 --output results.json
+       python -m benchmarks.run --compare baseline.json
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+SCHEMA_VERSION = 1
+DEFAULT_THRESHOLD = 0.15  # Median slowdown that counts as a regression
+
+logger = logging.getLogger(__name__)
+
+def summarize(name: str, timings: List[float], queries: Optional[int]) -> Dict:
+    """Timings in seconds -> the per-case record written to the results file"""
+    ordered = sorted(timings)
+    p95_index = min(len(ordered) - 1, max(0, math.ceil(0.95 * len(ordered)) - 1))
+    return {
+        'name': name,
+        'repeat': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[p95_index] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'queries': queries,
+    }
+
+def measure(name: str, case: Callable[[int], Optional[int]], repeat: int, warmup: int = 1) -> Dict:
+    """
+    Time case(i) repeat times after warmup calls; the case returns its statement
+    count when it knows it (HTTP cases read X-DB-Queries), else it is counted here
+    """
+    from core.profiling import count_queries
+
+    for i in range(warmup):
+        case(i)
+    timings, queries = [], None
+    for i in range(repeat):
+        with count_queries() as stats:
+            started = time.perf_counter()
+            reported = case(i)
+            timings.append(time.perf_counter() - started)
+        queries = reported if reported is not None else stats.queries
+    return summarize(name, timings, queries)
+
+def run_benchmarks(session_factory, spec, repeat: int = 10, only: Optional[List[str]] = None) -> List[Dict]:
+    """Time every case against an already populated database"""
+    import pandas as pd
+    from fastapi.testclient import TestClient
+
+    import api_canonical
+    from core.database import get_db
+    from domain.models_v2 import DailyPrice, Ticker
+    from jobs.enhanced_daily_calculator import EnhancedDailyCalculator
+    from jobs.price_history_loader import upsert_price_chunk
+    from services.enhanced_price_updater import EnhancedPriceUpdater
+    from services.portfolio_calculation_service import PortfolioCalculationService
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api_canonical.app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(api_canonical.app)
+    db = session_factory()
+
+    def user_for(i: int) -> int:
+        return i % spec.users + 1
+
+    def http_case(path: str, params: Dict) -> Callable[[int], int]:
+        def case(i: int) -> int:
+            response = client.get(path.format(user_id=user_for(i)), params=params)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+            return int(response.headers['X-DB-Queries'])
+        return case
+
+    # Price payloads: the last week re-upserted, and a new day inserted then rolled back
+    symbols = dict(db.query(Ticker.ticker_id, Ticker.symbol).all())
+    recent = (
+        db.query(DailyPrice.ticker_id, DailyPrice.price_date, DailyPrice.close_price)
+        .filter(DailyPrice.price_date > spec.as_of - timedelta(days=7))
+        .all()
+    )
+    chunk = pd.DataFrame({
+        'ticker': [symbols[r.ticker_id] for r in recent],
+        'date': pd.to_datetime([r.price_date for r in recent]),
+        'close': [r.close_price for r in recent],
+    })
+    next_day = spec.as_of + timedelta(days=1)
+    new_prices = [{'ticker': symbol, 'price_date': next_day, 'close_price': 100.0} for symbol in symbols.values()]
+
+    def snapshot(fast: bool) -> Callable[[int], None]:
+        service = PortfolioCalculationService(db, fast_valuation=fast, verify_valuation=False)
+        return lambda i: service.compute_portfolio_snapshot(user_for(i), spec.as_of) and None
+
+    def bulk_insert(i: int):
+        try:
+            EnhancedPriceUpdater(db).bulk_insert_prices(new_prices)
+        finally:
+            db.rollback()
+
+    as_of = spec.as_of.isoformat()
+    cases = {
+        'snapshot_decimal': snapshot(False),
+        'snapshot_fast': snapshot(True),
+        'dashboard': http_case("/dashboard/{user_id}", {'as_of': as_of}),
+        'chart_1y': http_case(
+            "/dashboard/performance/{user_id}",
+            {'start_date': (spec.as_of - timedelta(days=365)).isoformat(), 'end_date': as_of}
+        ),
+        'calculate_date_range_7d': lambda i: EnhancedDailyCalculator(db).calculate_date_range(
+            spec.as_of - timedelta(days=6), spec.as_of
+        ) and None,
+        'price_upsert_chunk': lambda i: upsert_price_chunk(db, chunk) and None,
+        'bulk_insert_prices': bulk_insert,
+    }
+
+    results = []
+    try:
+        for name, case in cases.items():
+            if only and name not in only:
+                continue
+            # The slow per-day calculator gets fewer rounds than the read paths
+            rounds = max(1, repeat // 5) if name == 'calculate_date_range_7d' else repeat
+            results.append(measure(name, case, rounds))
+            logger.info(f"⏱️ {name}: median {results[-1]['median_ms']}ms, {results[-1]['queries']} queries")
+    finally:
+        db.close()
+        api_canonical.app.dependency_overrides.pop(get_db, None)
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Per-case median ratios against a baseline run; regressed when slower by more than threshold"""
+    baseline_cases = {case['name']: case for case in baseline.get('results', [])}
+    rows = []
+    for case in current.get('results', []):
+        before = baseline_cases.get(case['name'])
+        if before is None or not before['median_ms']:
+            continue
+        ratio = case['median_ms'] / before['median_ms']
+        rows.append({
+            'name': case['name'],
+            'baseline_ms': before['median_ms'],
+            'current_ms': case['median_ms'],
+            'ratio': round(ratio, 3),
+            'queries': (before.get('queries'), case.get('queries')),
+            'regressed': ratio > 1 + threshold,
+        })
+    return rows
+
+def print_results(report: Dict, comparison: Optional[List[Dict]] = None):
+    print(f"\n{'case':<26}{'median ms':>12}{'p95 ms':>12}{'min ms':>12}{'queries':>10}")
+    for case in report['results']:
+        print(f"{case['name']:<26}{case['median_ms']:>12.2f}{case['p95_ms']:>12.2f}{case['min_ms']:>12.2f}{str(case['queries']):>10}")
+    if comparison:
+        print(f"\n{'case':<26}{'baseline':>12}{'current':>12}{'ratio':>10}")
+        for row in comparison:
+            flag = "  ❌ regressed" if row['regressed'] else ""
+            print(f"{row['name']:<26}{row['baseline_ms']:>12.2f}{row['current_ms']:>12.2f}{row['ratio']:>10.3f}{flag}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hot paths against a synthetic database")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--positions', type=int, default=15, help='Positions per user')
+    parser.add_argument('--years', type=int, default=2, help='Years of daily prices')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=10, help='Timed calls per case')
+    parser.add_argument('--only', nargs='*', help='Run only these cases')
+    parser.add_argument('--output', type=Path, help='Write the JSON results here (default: stdout)')
+    parser.add_argument('--compare', type=Path, help='Baseline results file to compare medians against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed median slowdown, 0.15 = 15%%')
+    parser.add_argument('--keep-db', action='store_true', help='Keep the generated SQLite file')
+    args = parser.parse_args(argv)
+
+    # Point the app's own engine at the scratch database before any repo module reads settings
+    workdir = Path(tempfile.mkdtemp(prefix="portora-bench-"))
+    db_path = workdir / "bench.db"
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+
+    from core.logging import configure_logging
+    configure_logging()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from benchmarks.synthetic import SyntheticSpec, populate
+
+    spec = SyntheticSpec(users=args.users, positions=args.positions, years=args.years, seed=args.seed)
+    engine = create_engine(os.environ['DATABASE_URL'], connect_args={"check_same_thread": False})
+    try:
+        started = time.perf_counter()
+        rows = populate(engine, spec)
+        generate_seconds = time.perf_counter() - started
+        logger.info(f"🧪 Generated {rows} in {generate_seconds:.1f}s at {db_path}")
+
+        # Per-call logging (including weekend no-price warnings) would dominate the timings
+        logging.disable(logging.WARNING)
+        try:
+            results = run_benchmarks(sessionmaker(bind=engine), spec, repeat=args.repeat, only=args.only)
+        finally:
+            logging.disable(logging.NOTSET)
+    finally:
+        engine.dispose()
+        if not args.keep_db:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {**spec.to_dict(), 'repeat': args.repeat},
+        'rows': rows,
+        'generate_seconds': round(generate_seconds, 3),
+        'results': results,
+    }
+
+    comparison = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get('params') != report['params']:
+            logger.warning(f"⚠️ Baseline was run with {baseline.get('params')}, not {report['params']}")
+        comparison = compare(report, baseline, args.threshold)
+        report['comparison'] = {'baseline': str(args.compare), 'threshold': args.threshold, 'cases': comparison}
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print_results(report, comparison)
+    else:
+        print(json.dumps(report, indent=2))
+
+    return 1 if comparison and any(row['regressed'] for row in comparison) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
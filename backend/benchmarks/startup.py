@@ -0,0 +1,168 @@
+"""
+Startup Profile - Import Time Budget for the API and Job Entry Points
+Imports each entry point in a fresh interpreter under `python -X importtime`,
+reports its cumulative import time and the packages that cost the most, and
+fails when an entry point is over budget or loads a dependency that is meant to
+be imported on first use (pandas, openai, yfinance)
+
+Usage: python -m benchmarks.startup
+       python -m benchmarks.startup --only app api_canonical --budget-ms 800 --output startup.json
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFERRED_MODULES = ("pandas", "openai", "yfinance")
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class EntryPoint:
+    name: str
+    module: str
+    budget_ms: float
+    deferred: Tuple[str, ...] = DEFERRED_MODULES  # Must not be loaded by the import itself
+
+# Budgets leave headroom over a warm-cache import on a laptop; the deferred check is the strict one
+ENTRY_POINTS = [
+    EntryPoint('app', 'app', 1500),
+    EntryPoint('api_canonical', 'api_canonical', 1500),
+    EntryPoint('server', 'server', 2000),
+    EntryPoint('daily_calculator', 'jobs.enhanced_daily_calculator', 1200),
+    EntryPoint('price_updater', 'services.enhanced_price_updater', 1200),
+    EntryPoint('insights_worker', 'jobs.insights_worker', 1200),
+    # Bulk history loads are pandas work; only the network/AI clients are deferred here
+    EntryPoint('price_history_loader', 'jobs.price_history_loader', 2000, ("openai", "yfinance")),
+]
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+@dataclass
+class StartupProfile:
+    name: str
+    module: str
+    import_ms: float
+    packages: List[Tuple[str, float]] = field(default_factory=list)  # Top-level package -> self ms, slowest first
+    loaded_deferred: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name, 'module': self.module, 'import_ms': self.import_ms,
+            'packages': [{'package': p, 'self_ms': ms} for p, ms in self.packages],
+            'loaded_deferred': self.loaded_deferred,
+        }
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """`-X importtime` stderr -> one timing per imported module, in completion order"""
+    timings = []
+    for line in output.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            timings.append(ImportTiming(match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return timings
+
+def _run_importtime(statement: str, env: Optional[Dict[str, str]] = None) -> Tuple[List[ImportTiming], str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr), result.stdout
+
+def profile_entry_point(entry: EntryPoint, baseline: Sequence[str] = (), env: Optional[Dict[str, str]] = None) -> StartupProfile:
+    """
+    Import time of one entry point in a clean interpreter: the cumulative time of
+    every top-level import not already done by interpreter startup (baseline)
+    """
+    probe = f"import sys, {entry.module}; print('loaded:' + ','.join(m for m in {tuple(entry.deferred)!r} if m in sys.modules))"
+    timings, stdout = _run_importtime(probe, env)
+    skip = set(baseline)
+    imported = [t for t in timings if t.module not in skip]
+
+    packages = Counter()
+    for timing in imported:
+        packages[timing.module.split('.')[0]] += timing.self_us
+    # The module may print at import (settings warnings); the probe's line is the last "loaded:"
+    loaded = next((line[len('loaded:'):] for line in reversed(stdout.splitlines()) if line.startswith('loaded:')), "")
+
+    return StartupProfile(
+        name=entry.name,
+        module=entry.module,
+        import_ms=round(sum(t.cumulative_us for t in imported if t.depth == 0) / 1000, 1),
+        packages=[(name, round(us / 1000, 1)) for name, us in packages.most_common(8)],
+        loaded_deferred=[m for m in loaded.split(',') if m],
+    )
+
+def interpreter_baseline(env: Optional[Dict[str, str]] = None) -> List[str]:
+    """Modules imported before any user code runs (site, encodings, ...)"""
+    timings, _ = _run_importtime("pass", env)
+    return [t.module for t in timings]
+
+def check(profile: StartupProfile, entry: EntryPoint, budget_ms: Optional[float] = None) -> List[str]:
+    problems = []
+    budget = budget_ms or entry.budget_ms
+    if profile.import_ms > budget:
+        problems.append(f"{entry.name}: import took {profile.import_ms:.0f} ms, budget {budget:.0f} ms")
+    if profile.loaded_deferred:
+        problems.append(f"{entry.name}: imports {', '.join(profile.loaded_deferred)} at startup")
+    return problems
+
+def print_profiles(profiles: List[StartupProfile]):
+    print(f"\n{'entry point':<24}{'import ms':>12}  slowest packages (self ms)")
+    for profile in profiles:
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in profile.packages[:5])
+        print(f"{profile.name:<24}{profile.import_ms:>12.1f}  {slowest}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile entry point import time against a budget")
+    parser.add_argument('--only', nargs='*', help='Profile only these entry points')
+    parser.add_argument('--repeat', type=int, default=3, help='Imports per entry point; the fastest counts')
+    parser.add_argument('--budget-ms', type=float, help='Override every entry point budget')
+    parser.add_argument('--output', type=Path, help='Write the JSON profiles here')
+    args = parser.parse_args(argv)
+
+    from core.logging import configure_logging
+    configure_logging()
+
+    # Same settings as production startup, without writing the DEBUG log file
+    env = {**os.environ, 'DEBUG': 'false'}
+    baseline = interpreter_baseline(env)
+    entries = [e for e in ENTRY_POINTS if not args.only or e.name in args.only]
+
+    profiles, problems = [], []
+    for entry in entries:
+        runs = [profile_entry_point(entry, baseline, env) for _ in range(max(1, args.repeat))]
+        profile = min(runs, key=lambda p: p.import_ms)
+        profiles.append(profile)
+        problems.extend(check(profile, entry, args.budget_ms))
+
+    print_profiles(profiles)
+    if args.output:
+        args.output.write_text(json.dumps({'profiles': [p.to_dict() for p in profiles], 'problems': problems}, indent=2))
+        logger.info(f"📝 Wrote {args.output}")
+    for problem in problems:
+        logger.error(f"❌ {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
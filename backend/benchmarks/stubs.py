@@ -0,0 +1,219 @@
+"""
+Market Data Stubs - Local Alpaca, Twelve Data and OpenAI Endpoints
+One FastAPI app answering the provider calls the price updaters and the insights
+worker make (Alpaca daily bars, Twelve Data time_series, OpenAI chat completions)
+with deterministic data, per-provider rate limits (HTTP 429 with Retry-After, or
+Twelve Data's HTTP 200 with code 429 in the body) and injected latency/errors, so load tests never leave the machine
+
+Usage: python -m benchmarks.stubs --port 8900 --latency-ms 80 --jitter-ms 40 --twelve-data-rpm 8
+Point the apps at it with ALPACA_BASE_URL / TWELVE_DATA_BASE_URL=http://127.0.0.1:8900
+and OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import zlib
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Deque, Dict, List, Optional
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+PROVIDERS = ("alpaca", "twelve_data", "openai")
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 50.0  # Added to every provider response
+    jitter_ms: float = 25.0  # Uniform extra latency on top of latency_ms
+    error_rate: float = 0.0  # Fraction of requests answered with 503
+    alpaca_rpm: int = 200  # Requests per minute before 429s (free plan)
+    twelve_data_rpm: int = 8
+    openai_rpm: int = 500
+    seed: int = 42
+
+    def limit(self, provider: str) -> int:
+        return getattr(self, f"{provider}_rpm")
+
+class RateLimiter:
+    """Sliding one-minute window per provider"""
+
+    def __init__(self, per_minute: int, window: float = 60.0):
+        self.per_minute = per_minute
+        self.window = window
+        self._calls: Deque[float] = deque()
+
+    def retry_after(self, now: Optional[float] = None) -> float:
+        """0 when the call is allowed (and counted), else seconds until a slot frees up"""
+        now = time.monotonic() if now is None else now
+        while self._calls and now - self._calls[0] >= self.window:
+            self._calls.popleft()
+        if self.per_minute and len(self._calls) >= self.per_minute:
+            return self.window - (now - self._calls[0])
+        self._calls.append(now)
+        return 0.0
+
+def stub_close(symbol: str, day: date) -> float:
+    """Deterministic close: a per-symbol level with a slow wave over the calendar"""
+    phase = zlib.crc32(symbol.encode()) % 1000
+    level = 20.0 + phase * 0.4
+    return round(level * (1.0 + 0.1 * math.sin((day.toordinal() + phase) / 20.0)), 4)
+
+def stub_bars(symbol: str, start: date, end: date, weekdays_only: bool) -> List[Dict]:
+    bars = []
+    day = start
+    while day <= end:
+        if not weekdays_only or day.weekday() < 5:
+            close = stub_close(symbol, day)
+            bars.append({
+                'date': day, 'open': round(close * 0.995, 4), 'high': round(close * 1.01, 4),
+                'low': round(close * 0.99, 4), 'close': close, 'volume': 1_000_000 + zlib.crc32(f"{symbol}{day}".encode()) % 500_000,
+            })
+        day += timedelta(days=1)
+    return bars
+
+def _parse_day(value: str) -> date:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')[:10]).date()
+
+def create_stub_app(config: Optional[StubConfig] = None) -> FastAPI:
+    config = config or StubConfig()
+    app = FastAPI(title="Market Data Stubs")
+    limiters = {provider: RateLimiter(config.limit(provider)) for provider in PROVIDERS}
+    stats = {'requests': Counter(), 'rate_limited': Counter(), 'errors': Counter()}
+    rng = random.Random(config.seed)
+    app.state.config = config
+    app.state.stats = stats
+
+    async def gate(provider: str, rate_limited_body: Dict, rate_limited_status: int = 429) -> Optional[JSONResponse]:
+        """Count, rate limit, delay and maybe fail one provider call"""
+        stats['requests'][provider] += 1
+        retry_after = limiters[provider].retry_after()
+        if retry_after:
+            stats['rate_limited'][provider] += 1
+            headers = {'Retry-After': str(math.ceil(retry_after))} if rate_limited_status == 429 else None
+            return JSONResponse(rate_limited_body, status_code=rate_limited_status, headers=headers)
+        delay = config.latency_ms + rng.uniform(0, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config.error_rate and rng.random() < config.error_rate:
+            stats['errors'][provider] += 1
+            return JSONResponse({'message': 'injected upstream error'}, status_code=503)
+        return None
+
+    @app.get("/v2/stocks/{symbol}/bars")
+    async def alpaca_bars(
+        symbol: str, start: str, end: str, timeframe: str = "1Day",
+        apca_api_key_id: Optional[str] = Header(None), apca_api_secret_key: Optional[str] = Header(None)
+    ):
+        if not apca_api_key_id or not apca_api_secret_key:
+            return JSONResponse({'message': 'forbidden.'}, status_code=403)
+        rejected = await gate('alpaca', {'message': 'too many requests.'})
+        if rejected:
+            return rejected
+        bars = stub_bars(symbol, _parse_day(start), _parse_day(end), weekdays_only=True)
+        return {
+            'symbol': symbol,
+            'next_page_token': None,
+            'bars': [
+                {'t': f"{b['date'].isoformat()}T04:00:00Z", 'o': b['open'], 'h': b['high'], 'l': b['low'],
+                 'c': b['close'], 'v': b['volume'], 'n': 1000, 'vw': b['close']}
+                for b in bars
+            ],
+        }
+
+    @app.get("/time_series")
+    async def twelve_data_time_series(
+        symbol: str, start_date: str, end_date: str, interval: str = "1day",
+        apikey: Optional[str] = None, order: str = "DESC"
+    ):
+        if not apikey:
+            return JSONResponse({'code': 401, 'message': 'apikey parameter is incorrect or not specified', 'status': 'error'}, status_code=401)
+        # Twelve Data reports running out of credits as a 200 with the 429 in the body
+        rejected = await gate('twelve_data', {
+            'code': 429, 'status': 'error',
+            'message': f"You have run out of API credits for the current minute ({config.twelve_data_rpm} per minute)",
+        }, rate_limited_status=200)
+        if rejected:
+            return rejected
+        # Crypto trades every day, everything else on weekdays
+        bars = stub_bars(symbol, _parse_day(start_date), _parse_day(end_date), weekdays_only='/' not in symbol and '-USD' not in symbol)
+        values = [
+            {'datetime': b['date'].isoformat(), 'open': str(b['open']), 'high': str(b['high']),
+             'low': str(b['low']), 'close': str(b['close']), 'volume': str(b['volume'])}
+            for b in bars
+        ]
+        return {
+            'meta': {'symbol': symbol, 'interval': interval, 'type': 'Digital Currency' if '-USD' in symbol else 'Common Stock'},
+            'values': values if order.upper() == 'ASC' else values[::-1],
+            'status': 'ok',
+        }
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat_completions(request: Request, authorization: Optional[str] = Header(None)):
+        if not authorization or not authorization.startswith("Bearer "):
+            return JSONResponse({'error': {'message': 'Missing API key', 'type': 'invalid_request_error'}}, status_code=401)
+        rejected = await gate('openai', {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}})
+        if rejected:
+            return rejected
+        body = await request.json()
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        # The JSON object insights_prompt asks for, so stubbed calls exercise the LLM path
+        content = json.dumps({
+            'assessment': "Performance is tracking its benchmark; keep contributions steady.",
+            'recommendations': [
+                "Concentration in the top sector adds risk; consider trimming the largest position.",
+                "Rebalance quarterly toward your target allocation.",
+            ],
+            'risk_analysis': "Volatility is in line with a balanced portfolio.",
+            'diversification_analysis': "Holdings span several sectors, with one dominant position.",
+            'confidence': 0.8,
+        })
+        return {
+            'id': f"chatcmpl-stub-{stats['requests']['openai']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(content.split()),
+                      'total_tokens': len(prompt.split()) + len(content.split())},
+        }
+
+    @app.get("/stats")
+    def stub_stats():
+        """Calls, 429s and injected errors per provider, for the load-test report"""
+        return {'config': asdict(config), **{key: dict(counter) for key, counter in stats.items()}}
+
+    return app
+
+def main(argv: Optional[List[str]] = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve local Alpaca / Twelve Data / OpenAI stubs")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=StubConfig.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=StubConfig.jitter_ms)
+    parser.add_argument('--error-rate', type=float, default=StubConfig.error_rate)
+    parser.add_argument('--alpaca-rpm', type=int, default=StubConfig.alpaca_rpm, help='0 disables the limit')
+    parser.add_argument('--twelve-data-rpm', type=int, default=StubConfig.twelve_data_rpm, help='0 disables the limit')
+    parser.add_argument('--openai-rpm', type=int, default=StubConfig.openai_rpm, help='0 disables the limit')
+    parser.add_argument('--seed', type=int, default=StubConfig.seed)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        alpaca_rpm=args.alpaca_rpm, twelve_data_rpm=args.twelve_data_rpm, openai_rpm=args.openai_rpm, seed=args.seed
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
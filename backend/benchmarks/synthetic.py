@@ -0,0 +1,209 @@
+"""
+Synthetic Portfolio Data - Deterministic Benchmark Database
+N users x M positions x Y years of daily prices, generated from a seed so every run
+(and every machine) benchmarks the same data: random-walk closes for a ticker
+universe, positions with fixed units, and the daily values/summaries the jobs would write.
+populate() writes the v2 schema (api_canonical); populate_holdings() writes the
+holdings schema app.py serves, from the same prices
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy.engine import Engine
+
+from domain.models_v2 import (
+    Base, CashTransaction, DailyPrice, Portfolio, PortfolioDailyValue, PortfolioSummary, Ticker, TickerPriceChange, User
+)
+
+INSERT_BATCH = 20_000
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    users: int = 20
+    positions: int = 15
+    years: int = 2
+    seed: int = 42
+    as_of: date = date(2025, 9, 30)
+    value_days: int = 30  # Days before as_of with stored portfolio_daily_values
+
+    @property
+    def universe(self) -> int:
+        """Distinct tickers: users overlap on holdings like real books do"""
+        return max(self.positions * 3, 30)
+
+    def to_dict(self) -> Dict:
+        params = asdict(self)
+        params['as_of'] = self.as_of.isoformat()
+        return params
+
+def ticker_universe(size: int) -> List[Dict]:
+    """80% stocks, 10% bond ETFs, 10% crypto; crypto symbols end in -USD"""
+    tickers = []
+    for i in range(size):
+        bucket = i % 10
+        if bucket == 8:
+            tickers.append({'symbol': f"BND{i:04d}", 'asset_class': 'BOND_ETF'})
+        elif bucket == 9:
+            tickers.append({'symbol': f"CRY{i:04d}-USD", 'asset_class': 'CRYPTO'})
+        else:
+            tickers.append({'symbol': f"STK{i:04d}", 'asset_class': 'STOCK'})
+    return tickers
+
+def trading_days(spec: SyntheticSpec) -> List[date]:
+    start = spec.as_of - timedelta(days=365 * spec.years)
+    return [start + timedelta(days=i) for i in range((spec.as_of - start).days + 1)]
+
+def price_paths(spec: SyntheticSpec, tickers: List[Dict], days: List[date]) -> np.ndarray:
+    """(days x tickers) closes; stocks and bond ETFs have NaN on weekends"""
+    rng = np.random.default_rng(spec.seed)
+    vol = np.array([{'STOCK': 0.015, 'BOND_ETF': 0.004, 'CRYPTO': 0.04}[t['asset_class']] for t in tickers])
+    start = rng.uniform(20.0, 400.0, len(tickers))
+    shocks = rng.normal(0.0003, 1.0, (len(days), len(tickers))) * vol
+    closes = start * np.cumprod(1.0 + shocks, axis=0)
+
+    weekend = np.array([d.weekday() >= 5 for d in days])
+    exchange = np.array([t['asset_class'] != 'CRYPTO' for t in tickers])
+    closes[np.ix_(weekend, exchange)] = np.nan
+    return np.round(closes, 4)
+
+def _insert(conn, table, rows: List[Dict]):
+    for i in range(0, len(rows), INSERT_BATCH):
+        conn.execute(table.insert(), rows[i:i + INSERT_BATCH])
+
+def _insert_prices(conn, tickers: List[Dict], days: List[date], closes: np.ndarray):
+    _insert(conn, Ticker.__table__, [{'ticker_id': i + 1, 'symbol': t['symbol']} for i, t in enumerate(tickers)])
+    _insert(conn, DailyPrice.__table__, [
+        {'ticker_id': j + 1, 'price_date': day, 'close_price': float(closes[i, j])}
+        for j in range(len(tickers))
+        for i, day in enumerate(days)
+        if not np.isnan(closes[i, j])
+    ])
+
+def populate(engine: Engine, spec: SyntheticSpec) -> Dict:
+    """Create the schema and write the synthetic data; returns row counts"""
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(spec.seed + 1)
+
+    tickers = ticker_universe(spec.universe)
+    days = trading_days(spec)
+    closes = price_paths(spec, tickers, days)
+    buy_date = days[0]
+
+    with engine.begin() as conn:
+        _insert_prices(conn, tickers, days, closes)
+
+        _insert(conn, User.__table__, [
+            {'user_id': u, 'name': f"Synthetic {u}", 'email': f"synthetic{u}@example.com"}
+            for u in range(1, spec.users + 1)
+        ])
+
+        positions = []
+        for u in range(1, spec.users + 1):
+            for j in rng.choice(len(tickers), size=min(spec.positions, len(tickers)), replace=False):
+                first_close = closes[:, j][~np.isnan(closes[:, j])][0]
+                positions.append({
+                    'portfolio_id': len(positions) + 1, 'user_id': u,
+                    'ticker': tickers[j]['symbol'], 'ticker_id': int(j) + 1,
+                    'asset_class': tickers[j]['asset_class'],
+                    'units': float(np.round(rng.uniform(1.0, 200.0), 4)),
+                    'avg_price': float(first_close), 'buy_date': buy_date,
+                })
+        _insert(conn, Portfolio.__table__, positions)
+
+        _insert(conn, CashTransaction.__table__, [
+            {'user_id': u, 'amount': 5000.0, 'transaction_date': buy_date, 'type': 'deposit'}
+            for u in range(1, spec.users + 1)
+        ])
+
+        # Values carry each ticker's last close over days it did not trade
+        filled = closes.copy()
+        for i in range(1, len(days)):
+            gaps = np.isnan(filled[i])
+            filled[i, gaps] = filled[i - 1, gaps]
+
+        by_user: Dict[int, List[Dict]] = {}
+        for position in positions:
+            by_user.setdefault(position['user_id'], []).append(position)
+
+        summaries, daily_values = [], []
+        value_start = len(days) - spec.value_days
+        for user_id, held in by_user.items():
+            columns = [p['ticker_id'] - 1 for p in held]
+            units = np.array([p['units'] for p in held])
+            values = filled[:, columns] * units
+            cost = float(sum(p['units'] * p['avg_price'] for p in held))
+            by_class = {
+                asset_class: values[:, [k for k, p in enumerate(held) if p['asset_class'] == asset_class]].sum(axis=1)
+                for asset_class in ('STOCK', 'BOND_ETF', 'CRYPTO')
+            }
+            totals = values.sum(axis=1) + 5000.0
+            for i, day in enumerate(days):
+                summaries.append({
+                    'user_id': user_id, 'date': day, 'total_value': float(totals[i]),
+                    'equity_value': float(by_class['STOCK'][i]), 'bond_etf_value': float(by_class['BOND_ETF'][i]),
+                    'crypto_value': float(by_class['CRYPTO'][i]), 'cash_value': 5000.0, 'bond_cash_value': 0.0,
+                    'total_cost_basis': cost, 'total_gain_loss': float(totals[i] - 5000.0 - cost),
+                    'total_gain_loss_percent': float((totals[i] - 5000.0 - cost) / cost * 100),
+                    'num_positions': len(held),
+                })
+                if i >= value_start:
+                    daily_values.extend(
+                        {'portfolio_id': p['portfolio_id'], 'date': day, 'units': p['units'],
+                         'price': float(filled[i, p['ticker_id'] - 1]), 'position_val': float(values[i, k])}
+                        for k, p in enumerate(held)
+                    )
+        _insert(conn, PortfolioSummary.__table__, summaries)
+        _insert(conn, PortfolioDailyValue.__table__, daily_values)
+
+    return {
+        'tickers': len(tickers),
+        'daily_prices': int((~np.isnan(closes)).sum()),
+        'positions': len(positions),
+        'portfolio_summary': len(summaries),
+        'portfolio_daily_values': len(daily_values),
+    }
+
+def populate_holdings(engine: Engine, spec: SyntheticSpec) -> Dict:
+    """
+    Create app.py's schema (users, portfolio_values) with each position valued at its
+    last close, plus the ticker and price tables its top movers read
+    """
+    from domain import models as holdings_models
+
+    holdings_models.Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine, tables=[Ticker.__table__, DailyPrice.__table__, TickerPriceChange.__table__])
+    rng = np.random.default_rng(spec.seed + 1)
+
+    tickers = ticker_universe(spec.universe)
+    days = trading_days(spec)
+    closes = price_paths(spec, tickers, days)
+    categories = {'STOCK': 'Stock', 'BOND_ETF': 'Bond', 'CRYPTO': 'Crypto'}
+
+    holdings = []
+    for u in range(1, spec.users + 1):
+        for j in rng.choice(len(tickers), size=min(spec.positions, len(tickers)), replace=False):
+            traded = closes[:, j][~np.isnan(closes[:, j])]
+            units = float(np.round(rng.uniform(1.0, 200.0), 4))
+            value, cost = units * float(traded[-1]), units * float(traded[0])
+            holdings.append({
+                'user_id': u, 'ticker': tickers[j]['symbol'], 'current_price': float(traded[-1]),
+                'total_value': value, 'cost_basis': cost, 'gain_loss': value - cost,
+                'gain_loss_percent': (value - cost) / cost * 100, 'category': categories[tickers[j]['asset_class']],
+            })
+
+    with engine.begin() as conn:
+        _insert_prices(conn, tickers, days, closes)
+        _insert(conn, holdings_models.User.__table__, [
+            {'id': u, 'name': f"Synthetic {u}", 'email': f"synthetic{u}@example.com"}
+            for u in range(1, spec.users + 1)
+        ])
+        _insert(conn, holdings_models.PortfolioHolding.__table__, holdings)
+
+    return {'users': spec.users, 'portfolio_values': len(holdings)}
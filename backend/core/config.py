@@ -5,7 +5,7 @@ Single source of truth for all settings
 
 import os
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings
 from pydantic import validator
 
@@ -19,11 +19,13 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./portfolio_v2.db"
+    AUTO_MIGRATE: bool = False  # Run `alembic upgrade head` at API startup instead of only reporting pending migrations
     
     # API
     HOST: str = "127.0.0.1"
     PORT: int = 8001
     RELOAD: bool = True
+    UNPREFIXED_ROUTERS: List[str] = ["legacy", "canonical"]  # Also served at their old root paths by server.py
     
     # Data Sources
     CSV_PATH: str = "/Users/kishorecm/Documents/EaseLi/Portfolio CSV files/portfolio_history_10y.csv"
@@ -33,6 +35,9 @@ class Settings(BaseSettings):
     ALPACA_SECRET_KEY: Optional[str] = None
     TWELVE_DATA_API_KEY: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
+    ALPACA_BASE_URL: str = "https://paper-api.alpaca.markets"  # or https://api.alpaca.markets for live
+    TWELVE_DATA_BASE_URL: str = "https://api.twelvedata.com"
+    OPENAI_BASE_URL: Optional[str] = None  # Client default unless pointed elsewhere (e.g. a load-test stub)
     
     # Security
     SECRET_KEY: str = "dev-secret-key-change-in-production"
@@ -42,9 +47,69 @@ class Settings(BaseSettings):
     CACHE_TTL: int = 300  # 5 minutes
     MAX_CONNECTIONS: int = 100
     
+    # Valuation
+    FAST_VALUATION: bool = False  # float64 vectorized snapshots instead of per-position Decimal
+    VERIFY_VALUATION: bool = False  # Re-check fast totals in Decimal and flag drift > 1 cent
+    
+    # Risk
+    RISK_BENCHMARK_TICKER: str = "SPY"
+    RISK_FREE_RATE: float = 0.04  # Annual, used by Sharpe/Sortino
+    RISK_WINDOW_DAYS: int = 365  # Calendar days of daily values per metric window
+    
+    # Price backfill
+    BACKFILL_LOOKBACK_DAYS: int = 30  # Days checked for missing closes, and the history fetched for a new ticker
+    BACKFILL_BRIDGE_SESSIONS: int = 3  # Gaps this few stored sessions apart are fetched in one request
+    BACKFILL_EMPTY_GRACE_DAYS: int = 3  # Empty answers for sessions this recent are retried (providers publish late)
+    
+    # Benchmarks
+    BENCHMARK_TICKERS: List[str] = ["SPY", "AGG", "BTC-USD"]  # Kept in daily_prices by the price updater
+    
+    # Projections
+    PROJECTION_METHOD: str = "bootstrap"  # bootstrap (resample historical days) or gbm
+    PROJECTION_PATHS: int = 10000
+    PROJECTION_SEED: Optional[int] = None  # Fixed seed makes nightly bands reproducible
+    PROJECTION_LOOKBACK_DAYS: int = 1095  # Calendar days of price history sampled
+    
+    # Diversification
+    COVARIANCE_WINDOW: int = 252  # Daily return observations in the rolling covariance
+    
+    # Insights
+    INSIGHTS_PROVIDER: str = "openai"  # openai, or stub for deterministic offline insights
+    INSIGHTS_MODEL: str = "gpt-4o-mini"
+    INSIGHTS_CONCURRENCY: int = 8  # LLM calls in flight during the nightly batch
+    INSIGHTS_TIMEOUT: float = 20.0  # Seconds per LLM call
+    INSIGHTS_DEADLINE: float = 600.0  # Seconds for the whole batch; unfinished users get rule-based insights
+    INSIGHTS_CACHE_TTL: int = 172800  # Seconds a cached insight is served (2 days)
+    INSIGHTS_CACHE_MAX_PER_USER: int = 5  # Cached fingerprints kept per user and scope
+    INSIGHTS_FRONT_CACHE_SIZE: int = 2048  # Users held in the in-memory front cache
+    INSIGHTS_FRONT_CACHE_TTL: int = 300  # Seconds before a front entry is re-read from the table
+    
+    # Pipeline
+    PIPELINE_WORKERS: int = 4  # Stages run at once when their dependencies allow
+    PIPELINE_VALUATION_SHARDS: int = 4  # Parallel valuation stages, users split by user_id % shards
+    PIPELINE_CHECKPOINT_DIR: str = "logs/pipeline"  # <pipeline>_<date>.json of completed stages per run date
+    PIPELINE_SCHEDULE: Optional[str] = None  # "HH:MM" local time for server.py to run the nightly pipeline
+    
+    # Profiling
+    SLOW_QUERY_MS: float = 100.0  # Statements slower than this are logged with their call site
+    REPEATED_QUERY_WARN: int = 20  # One statement run this often in a request is logged as a likely N+1
+    PROFILING_ENABLED: bool = False  # Honour X-Profile request headers and PROFILE_SAMPLE_RATE
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled without the header
+    PROFILE_DIR: str = "logs/profiles"
+    
+    # Metrics
+    METRICS_TEXTFILE_DIR: Optional[str] = None  # Jobs write <dir>/portora_<job>.prom for node_exporter
+    METRICS_PUSH_URL: Optional[str] = None  # Jobs push to this Pushgateway when set
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s | %(levelname)8s | %(name)s | %(message)s"
+    LOG_JSON: bool = False  # JSON lines instead of colored text
+    LOG_QUEUE: bool = True  # Format and write on a listener thread, off the request/job thread
+    LOG_RATE_LIMIT: float = 10.0  # Records per second per call site below ERROR (0 disables)
+    LOG_RATE_BURST: int = 50  # Records a call site may emit before the rate limit applies
+    LOG_RATE_EXEMPT: List[str] = ["portora.access"]  # Loggers never rate limited (one line per request)
+    LOG_SAMPLE_RATES: Dict[str, float] = {}  # Logger -> fraction of INFO/DEBUG kept, e.g. {"jobs": 0.1}
     
     @validator("CSV_PATH")
     @classmethod
@@ -3,13 +3,20 @@ Perfect Database Setup
 Clean, efficient, production-ready
 """
 
-from sqlalchemy import create_engine, event
+import logging
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.engine import Engine
 import sqlite3
 from core.config import settings
-from core.logging import logger
+
+logger = logging.getLogger(__name__)
 
 # Create engine with optimizations
 engine = create_engine(
@@ -52,27 +59,76 @@ def get_db() -> Session:
 
 # Database utilities
 class DatabaseManager:
-    """Database management utilities"""
-    
+    """Database management utilities; the schema is owned by Alembic (backend/alembic)"""
+
+    ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+    @staticmethod
+    def alembic_config(url: Optional[str] = None):
+        """Alembic config usable from any working directory, leaving app logging alone"""
+        from alembic.config import Config
+
+        config = Config(str(DatabaseManager.ALEMBIC_INI))
+        config.set_main_option("script_location", str(DatabaseManager.ALEMBIC_INI.parent / "alembic"))
+        config.attributes['configure_logger'] = False
+        if url:
+            config.set_main_option("sqlalchemy.url", url.replace('%', '%%'))
+            config.attributes['url_override'] = True
+        return config
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def head_revision() -> Optional[str]:
+        """Latest migration in alembic/versions (read once per process)"""
+        from alembic.script import ScriptDirectory
+
+        return ScriptDirectory.from_config(DatabaseManager.alembic_config()).get_current_head()
+
     @staticmethod
-    def create_tables():
-        """Create all tables"""
-        logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        logger.info("✅ Database tables created")
-    
+    def current_revision(bind: Optional[Engine] = None) -> Optional[str]:
+        """Revision stamped in alembic_version, None for an unmigrated database"""
+        from alembic.migration import MigrationContext
+
+        with (bind or engine).connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision()
+
     @staticmethod
-    def drop_tables():
-        """Drop all tables (use with caution!)"""
-        logger.warning("Dropping all database tables...")
-        Base.metadata.drop_all(bind=engine)
-        logger.info("✅ Database tables dropped")
-    
+    def schema_status(bind: Optional[Engine] = None) -> Dict[str, Any]:
+        current, head = DatabaseManager.current_revision(bind), DatabaseManager.head_revision()
+        return {'current': current, 'head': head, 'up_to_date': current == head}
+
     @staticmethod
-    def reset_database():
-        """Reset database (drop and recreate)"""
-        DatabaseManager.drop_tables()
-        DatabaseManager.create_tables()
+    def upgrade(revision: str = "head", url: Optional[str] = None):
+        """Apply migrations up to revision (`alembic upgrade head` from code)"""
+        from alembic import command
+
+        logger.info("Upgrading database schema to %s...", revision)
+        command.upgrade(DatabaseManager.alembic_config(url or settings.DATABASE_URL), revision)
+        logger.info("✅ Database schema at %s", revision)
+
+    @staticmethod
+    def readiness(bind: Optional[Engine] = None) -> Dict[str, Any]:
+        """
+        Readiness report for health probes: the database answers and its schema is
+        at the Alembic head. Never raises; failures are reported per check
+        """
+        checks: Dict[str, Dict[str, Any]] = {}
+        started = time.perf_counter()
+        try:
+            with (bind or engine).connect() as connection:
+                connection.execute(text("SELECT 1"))
+            checks['database'] = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            checks['database'] = {'ok': False, 'error': str(e)}
+
+        if checks['database']['ok']:
+            try:
+                status = DatabaseManager.schema_status(bind)
+                checks['schema'] = {'ok': status['up_to_date'], **status}
+            except Exception as e:
+                checks['schema'] = {'ok': False, 'error': str(e)}
+
+        return {'ready': all(check['ok'] for check in checks.values()), 'checks': checks}
 
 # Global database manager
 db_manager = DatabaseManager()
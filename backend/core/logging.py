@@ -1,16 +1,35 @@
 """
 Perfect Logging Setup
-Clean, informative, production-ready
+One configuration for every entry point: records go through a QueueHandler so
+formatting and I/O happen on a listener thread, not the request or job thread;
+output is colored text or JSON lines (LOG_JSON); hot-loop messages are rate
+limited per call site and can be sampled per logger
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import re
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
 from core.config import settings
 
+# LogRecord attributes; anything else on a record came from extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_LEVELNAME = re.compile(r"%\(levelname\)[-#0 +]*\d*s")
+
 class ColoredFormatter(logging.Formatter):
-    """Colored log formatter for better readability"""
-    
+    """Colored log formatter for better readability; colors are baked into one format per level"""
+
     COLORS = {
         'DEBUG': '\033[36m',    # Cyan
         'INFO': '\033[32m',     # Green
@@ -19,41 +38,237 @@ class ColoredFormatter(logging.Formatter):
         'CRITICAL': '\033[35m', # Magenta
         'RESET': '\033[0m'      # Reset
     }
-    
+
+    def __init__(self, fmt: Optional[str] = None, datefmt: Optional[str] = None):
+        super().__init__(fmt, datefmt)
+        fmt = fmt or "%(levelname)s:%(name)s:%(message)s"
+        self._by_level = {
+            level: logging.Formatter(
+                _LEVELNAME.sub(lambda m: f"{color}{m.group(0)}{self.COLORS['RESET']}", fmt), datefmt
+            )
+            for level, color in self.COLORS.items() if level != 'RESET'
+        }
+
+    def format(self, record):
+        formatter = self._by_level.get(record.levelname)
+        return formatter.format(record) if formatter else super().format(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, extras and exception"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info or record.exc_text:
+            entry['exc_info'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (source file, line and level) for records below ERROR.
+    A per-row message in a loop is cut to `rate` per second after a burst; the next
+    record let through carries the count it stands for in `suppressed`, and counts
+    still pending are reported by report_suppressed(). Loggers in `exempt` (and
+    their children), such as the request access log, are never limited
+    """
+
+    def __init__(self, rate: float, burst: int, exempt: Sequence[str] = ()):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.exempt = tuple(exempt)
+        self.suppressed_total = 0
+        self._buckets: Dict[Tuple[str, int, int], list] = {}
+        self._lock = threading.Lock()
+
+    def is_exempt(self, name: str) -> bool:
+        return any(name == prefix or name.startswith(prefix + '.') for prefix in self.exempt)
+
+    def filter(self, record):
+        # Reports of suppressed records (logged from this file) are never limited themselves
+        if record.levelno >= logging.ERROR or self.rate <= 0 or self.is_exempt(record.name) or record.pathname == __file__:
+            return True
+        key = (record.pathname, record.lineno, record.levelno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0, record.name]
+            tokens, last, suppressed, _ = bucket
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens < 1.0:
+                bucket[:3] = [tokens, now, suppressed + 1]
+                self.suppressed_total += 1
+                return False
+            bucket[:3] = [tokens - 1.0, now, 0]
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def report_suppressed(self) -> List[Tuple[str, str, int, int]]:
+        """(logger, file, line, count) for call sites whose suppressed records no later record has reported; resets them"""
+        with self._lock:
+            pending = [
+                (bucket[3], pathname, lineno, bucket[2])
+                for (pathname, lineno, _), bucket in self._buckets.items() if bucket[2]
+            ]
+            for bucket in self._buckets.values():
+                bucket[2] = 0
+        return pending
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO/DEBUG records from the configured loggers (and their children)"""
+
+    def __init__(self, rates: Dict[str, float], seed: Optional[int] = None):
+        super().__init__()
+        self.rates = dict(rates)
+        self._random = random.Random(seed)
+        self._cache: Dict[str, Optional[float]] = {}
+
+    def rate_for(self, name: str) -> Optional[float]:
+        if name not in self._cache:
+            rate, probe = None, name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition('.')[0]
+            self._cache[name] = rate
+        return self._cache[name]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate is None or self._random.random() < rate
+
+class _SuppressedCountFormatter(logging.Formatter):
+    """Append '(+N similar suppressed)' for text output; JSON carries it as a field"""
+
+    def __init__(self, inner: logging.Formatter):
+        super().__init__()
+        self.inner = inner
+
     def format(self, record):
-        log_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
-        record.levelname = f"{log_color}{record.levelname}{self.COLORS['RESET']}"
-        return super().format(record)
+        text = self.inner.format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{text} (+{suppressed} similar suppressed)" if suppressed else text
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueue with only the message interpolated; the line (time, colors, JSON) is built on the listener"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_installed: List[logging.Handler] = []
+_rate_limits: List[RateLimitFilter] = []
+_configured = False
+_lock = threading.Lock()
+
+def _uninstall():
+    """Stop the listener and remove every handler configure_logging installed"""
+    global _listener, _configured
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root = logging.getLogger()
+    for handler in _installed:
+        root.removeHandler(handler)
+        handler.close()
+    _installed.clear()
+    _rate_limits.clear()
+    _configured = False
+
+def _formatter(json_output: bool) -> logging.Formatter:
+    return JsonFormatter() if json_output else _SuppressedCountFormatter(ColoredFormatter(settings.LOG_FORMAT))
+
+def configure_logging(json_output: Optional[bool] = None, level: Optional[str] = None,
+                      use_queue: Optional[bool] = None, force: bool = False):
+    """
+    Install the root handlers once per process: console (and logs/portfolio.log when
+    DEBUG) behind a QueueHandler, with the rate limit and sampling filters in front
+    of the queue so dropped records are never formatted. Safe to call from every
+    entry point; later calls are no-ops unless force is set
+    """
+    global _listener, _configured
+    with _lock:
+        if _configured and not force:
+            return
+        json_output = settings.LOG_JSON if json_output is None else json_output
+        use_queue = settings.LOG_QUEUE if use_queue is None else use_queue
+
+        _uninstall()
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, (level or settings.LOG_LEVEL).upper()))
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(_formatter(json_output))
+        handlers = [console_handler]
+
+        # File handler for debugging
+        if settings.DEBUG:
+            log_file = Path("logs") / "portfolio.log"
+            log_file.parent.mkdir(exist_ok=True)
+            file_handler = logging.FileHandler(log_file)
+            file_handler.setFormatter(JsonFormatter() if json_output else _SuppressedCountFormatter(logging.Formatter(settings.LOG_FORMAT)))
+            handlers.append(file_handler)
+
+        rate_limit = RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_BURST, settings.LOG_RATE_EXEMPT)
+        _rate_limits.append(rate_limit)
+        filters = [rate_limit]
+        if settings.LOG_SAMPLE_RATES:
+            filters.append(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+        if use_queue:
+            front = _QueueHandler(queue.SimpleQueue())
+            _listener = logging.handlers.QueueListener(front.queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            front_handlers = [front]
+        else:
+            front_handlers = handlers
+        for handler in front_handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            root.addHandler(handler)
+            _installed.append(handler)
+        _configured = True
+
+def reset_logging():
+    """Undo configure_logging, e.g. between tests; the next call installs afresh"""
+    with _lock:
+        _uninstall()
+
+def report_suppressed_logs():
+    """Log one line per call site with rate-limited records no later record has accounted for"""
+    for rate_limit in _rate_limits:
+        for name, pathname, lineno, count in rate_limit.report_suppressed():
+            logging.getLogger(name).warning("%s records from %s:%s were suppressed by the rate limit", count, pathname, lineno)
+
+def shutdown_logging():
+    """Report suppressed records and flush the queue; registered at exit"""
+    global _listener
+    report_suppressed_logs()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
 
 def setup_logging(name: str = "portfolio") -> logging.Logger:
-    """Setup perfect logging"""
-    
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, settings.LOG_LEVEL))
-    
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
-    
-    # Console handler with colors
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_formatter = ColoredFormatter(settings.LOG_FORMAT)
-    console_handler.setFormatter(console_formatter)
-    
-    # File handler for debugging
-    if settings.DEBUG:
-        log_file = Path("logs") / "portfolio.log"
-        log_file.parent.mkdir(exist_ok=True)
-        
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(settings.LOG_FORMAT)
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-    
-    logger.addHandler(console_handler)
-    return logger
-
-# Global logger
-logger = setup_logging()
+    """Configure logging (entry points only) and return the logger for name"""
+    configure_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,272 @@
+"""
+Metrics - Prometheus Text Exposition for the API and Jobs
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text format: the API serves it on /metrics, batch jobs write it to a
+node_exporter textfile or push it to a Pushgateway when they finish
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Metric:
+    """A metric family: one value (or histogram) per label combination"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    @property
+    def exposed_name(self) -> str:
+        """Name on the HELP/TYPE lines: the 0.0.4 text format expects it to match the samples"""
+        return self.name
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.exposed_name} {self.documentation}", f"# TYPE {self.exposed_name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    @property
+    def exposed_name(self) -> str:
+        return f"{self.name}_total"
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.exposed_name}{_labels(self.label_names, key)} {_format_value(value)}"
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, key)} {_format_value(value)}"
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0] * len(self.buckets), 0.0))
+        return counts[-1]
+
+    def samples(self):
+        for key, (counts, total) in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{_labels(self.label_names, key, ('le', _format_value(bound)))} {count}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}"
+
+class MetricsRegistry:
+    """Named metric families, rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def clear(self):
+        """Reset every value (tests, or a job that exports per run)"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# API
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "portora_http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+HTTP_REQUEST_QUERIES = REGISTRY.histogram(
+    "portora_http_request_db_queries", "Database statements per request", ["method", "route"], QUERY_BUCKETS
+)
+DB_QUERIES = REGISTRY.counter("portora_db_queries", "Database statements executed", ["route"])
+DB_QUERY_SECONDS = REGISTRY.counter("portora_db_query_seconds", "Time spent in database statements", ["route"])
+
+# Caches: hit ratio = hits / (hits + misses)
+CACHE_LOOKUPS = REGISTRY.counter("portora_cache_lookups", "In-memory and materialized cache lookups", ["cache", "result"])
+
+# Market data providers
+PROVIDER_FETCH_DURATION = REGISTRY.histogram(
+    "portora_provider_fetch_duration_seconds", "Price provider request latency", ["provider", "outcome"]
+)
+PROVIDER_RATE_LIMITED = REGISTRY.counter("portora_provider_rate_limited", "Rate-limited responses from price providers (HTTP 429 or a 429 error body)", ["provider"])
+
+# Jobs
+JOB_ROWS_UPSERTED = REGISTRY.counter("portora_job_rows_upserted", "Rows inserted or updated by batch jobs", ["job", "table"])
+JOB_STAGE_DURATION = REGISTRY.gauge(
+    "portora_job_stage_duration_seconds", "Duration of the last run of each job stage", ["job", "stage"]
+)
+JOB_LAST_SUCCESS = REGISTRY.gauge(
+    "portora_job_last_success_timestamp_seconds", "Unix time the job last finished without error", ["job"]
+)
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    CACHE_LOOKUPS.inc(count, cache=cache, result="hit" if hit else "miss")
+
+def record_rows(job: str, table: str, rows: int):
+    if rows:
+        JOB_ROWS_UPSERTED.inc(rows, job=job, table=table)
+
+def record_stage(job: str, stage: str, seconds: float):
+    JOB_STAGE_DURATION.set(seconds, job=job, stage=stage)
+
+@contextmanager
+def time_stage(job: str, stage: str):
+    """Record how long a job stage took, also when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(job, stage, time.perf_counter() - started)
+
+@contextmanager
+def time_provider_fetch(provider: str):
+    """
+    Time one provider request; the block sets outcome['outcome'] when it knows
+    better than ok/error (e.g. rate_limited)
+    """
+    outcome = {'outcome': 'ok'}
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome['outcome'] = 'error'
+        raise
+    finally:
+        PROVIDER_FETCH_DURATION.observe(time.perf_counter() - started, provider=provider, outcome=outcome['outcome'])
+
+def record_provider_response(provider: str, response, outcome: Dict[str, str], body: Optional[Dict] = None):
+    """
+    Count a 429 and mark the fetch as rate limited
+
+    body is the parsed JSON of providers that answer rate limits with HTTP 200
+    and {"status": "error", "code": 429} (Twelve Data).
+    """
+    body_code = body.get('code') if isinstance(body, dict) and body.get('status') == 'error' else None
+    if getattr(response, 'status_code', None) == 429 or str(body_code) == '429':
+        PROVIDER_RATE_LIMITED.inc(provider=provider)
+        outcome['outcome'] = 'rate_limited'
+    elif getattr(response, 'status_code', 200) >= 400:
+        outcome['outcome'] = 'error'
+
+def write_textfile(path: Path, registry: MetricsRegistry = REGISTRY) -> Path:
+    """Atomically write the registry for node_exporter's textfile collector"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(registry.render())
+    os.replace(tmp, path)
+    return path
+
+def push(url: str, job: str, registry: MetricsRegistry = REGISTRY):
+    """Replace the job's group on a Pushgateway (or any stand-in accepting the same PUT)"""
+    import requests
+
+    response = requests.put(
+        f"{url.rstrip('/')}/metrics/job/{job}", data=registry.render().encode(),
+        headers={'Content-Type': CONTENT_TYPE}, timeout=10
+    )
+    response.raise_for_status()
+
+def export_job_metrics(job: str, succeeded: bool = True):
+    """Publish job metrics where configured (METRICS_TEXTFILE_DIR, METRICS_PUSH_URL); never raises"""
+    if succeeded:
+        JOB_LAST_SUCCESS.set(time.time(), job=job)
+    try:
+        if settings.METRICS_TEXTFILE_DIR:
+            write_textfile(Path(settings.METRICS_TEXTFILE_DIR) / f"portora_{job}.prom")
+        if settings.METRICS_PUSH_URL:
+            push(settings.METRICS_PUSH_URL, job)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not export metrics for {job}: {e}")
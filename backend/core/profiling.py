@@ -0,0 +1,269 @@
+"""
+Request Profiling - Query Counts, Request Metrics, Slow Statements and Sampled Profiles
+SQLAlchemy cursor events count every statement and its DB time against the current
+request; slow statements are logged normalized with the application line that ran them
+and repeated statements flag N+1 patterns. Latency and query histograms per route go to
+core/metrics, served on /metrics. Requests can opt into a cProfile or pyinstrument
+capture with the X-Profile header (or be sampled) when profiling is enabled
+"""
+
+import cProfile
+import functools
+import inspect
+import logging
+import random
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILERS = ("pyinstrument", "cprofile")
+
+_BACKEND_ROOT = str(Path(__file__).resolve().parent.parent)
+_INTERNAL_FILES = (__file__, str(Path(__file__).resolve()))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Statement shape: literals become ?, IN lists collapse to (?...), whitespace is squeezed"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def call_site() -> str:
+    """file:line of the innermost application frame, skipping SQLAlchemy and this module"""
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename in _INTERNAL_FILES or not filename.startswith(_BACKEND_ROOT) or "site-packages" in filename:
+            continue
+        return f"{Path(filename).relative_to(_BACKEND_ROOT)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+class ProfileCapture:
+    """One profiler run around an endpoint call"""
+
+    def __init__(self, profiler: str):
+        self.profiler = profiler
+        self._result = None
+
+    def _start(self, async_mode: bool = False):
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler  # Optional dependency
+            profiler = Profiler(async_mode="enabled" if async_mode else "disabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop(self, profiler):
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        self._result = profiler
+
+    def run(self, func: Callable, *args, **kwargs):
+        profiler = self._start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._stop(profiler)
+
+    async def run_async(self, func: Callable, *args, **kwargs):
+        profiler = self._start(async_mode=True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._stop(profiler)
+
+    def save(self, directory: Path, label: str) -> Optional[Path]:
+        """Write the capture (.html for pyinstrument, pstats .prof for cProfile)"""
+        if self._result is None:
+            return None
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')}"
+        if self.profiler == "pyinstrument":
+            path = directory / f"{stem}.html"
+            path.write_text(self._result.output_html())
+        else:
+            path = directory / f"{stem}.prof"
+            self._result.dump_stats(str(path))
+        return path
+
+class QueryStats:
+    """Statements run while handling one request"""
+
+    def __init__(self, capture: Optional[ProfileCapture] = None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.capture = capture
+
+    def record(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.db_time += elapsed
+        self.statements[normalize_sql(statement)] += 1
+
+    def repeated(self, threshold: int):
+        """(count, statement) of the most repeated statement when it reached threshold"""
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        return (count, statement) if count >= threshold else None
+
+_REQUEST_STATS: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+def current_stats() -> Optional[QueryStats]:
+    return _REQUEST_STATS.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    stats = _REQUEST_STATS.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(f"🐢 Slow query {elapsed * 1000:.1f}ms at {call_site()}: {normalize_sql(statement)}")
+
+def instrument_queries():
+    """Time every statement on every engine; safe to call more than once"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+@contextmanager
+def count_queries():
+    """QueryStats for the statements run inside the block, outside of any request"""
+    instrument_queries()
+    stats = QueryStats()
+    token = _REQUEST_STATS.set(stats)
+    try:
+        yield stats
+    finally:
+        _REQUEST_STATS.reset(token)
+
+def requested_profiler(request: Request) -> Optional[str]:
+    """Profiler for this request: X-Profile header (1, cprofile, pyinstrument) or sampling"""
+    if not settings.PROFILING_ENABLED:
+        return None
+    header = request.headers.get(PROFILE_HEADER, "").strip().lower()
+    if not header and not (settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE):
+        return None
+    if header in PROFILERS:
+        return header
+    try:
+        import pyinstrument  # noqa: F401
+        return "pyinstrument"
+    except ImportError:
+        return "cprofile"
+
+def profiled_endpoint(endpoint: Callable) -> Callable:
+    """
+    Run the endpoint under the request's profile capture, if any, in the thread it runs on
+    Wrapping is idempotent: include_router rebuilds routes from already wrapped endpoints
+    """
+    if getattr(endpoint, '__profiled__', False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            stats = _REQUEST_STATS.get()
+            if stats is None or stats.capture is None:
+                return await endpoint(*args, **kwargs)
+            return await stats.capture.run_async(endpoint, *args, **kwargs)
+        async_wrapper.__profiled__ = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        stats = _REQUEST_STATS.get()
+        if stats is None or stats.capture is None:
+            return endpoint(*args, **kwargs)
+        return stats.capture.run(endpoint, *args, **kwargs)
+    wrapper.__profiled__ = True
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled; sync endpoints are profiled in their worker thread"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, profiled_endpoint(endpoint), **kwargs)
+
+def route_template(request: Request) -> str:
+    """Matched route path (/portfolio/{user_id}), so metric labels stay bounded"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def record_request_queries(request: Request, call_next):
+    """Middleware: X-DB-Queries / X-DB-Time headers, request metrics, N+1 warnings and profile captures"""
+    profiler = requested_profiler(request)
+    stats = QueryStats(ProfileCapture(profiler) if profiler else None)
+    token = _REQUEST_STATS.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        _REQUEST_STATS.reset(token)
+        route = route_template(request)
+        metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method, route=route, status=status)
+        metrics.HTTP_REQUEST_QUERIES.observe(stats.queries, method=request.method, route=route)
+        metrics.DB_QUERIES.inc(stats.queries, route=route)
+        metrics.DB_QUERY_SECONDS.inc(stats.db_time, route=route)
+
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["X-DB-Time"] = f"{stats.db_time:.4f}"
+
+    repeated = stats.repeated(settings.REPEATED_QUERY_WARN)
+    if repeated:
+        logger.warning(f"🔁 {request.method} {request.url.path} ran one statement {repeated[0]}x: {repeated[1]}")
+
+    if stats.capture is not None:
+        path = stats.capture.save(Path(settings.PROFILE_DIR), f"{request.method} {request.url.path}")
+        if path is not None:
+            logger.info(f"🔬 Profile for {request.method} {request.url.path}: {path}")
+    return response
+
+def metrics_endpoint() -> Response:
+    """Prometheus scrape target"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def instrument_app(app: FastAPI):
+    """
+    Count queries per request, serve /metrics and allow profile captures on the app's routes
+    Call right after creating the app, before routes are declared; routers that are
+    included later should be created with route_class=ProfiledRoute
+    """
+    instrument_queries()
+    app.router.route_class = ProfiledRoute
+    app.middleware("http")(record_request_queries)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
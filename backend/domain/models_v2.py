@@ -3,11 +3,11 @@ Perfect Portfolio Database Models - Normalized Schema
 Clean, efficient, and calculation-friendly structure
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Index
-from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Text, ForeignKey, func, Index, UniqueConstraint, event, select
+from sqlalchemy.orm import relationship, declarative_base, Session
+from sqlalchemy.ext.hybrid import hybrid_property, Comparator
 from datetime import date, datetime
-from typing import Optional
+from typing import Optional, Dict, Iterable
 
 Base = declarative_base()
 
@@ -27,6 +27,49 @@ class User(Base):
     def __repr__(self):
         return f"<User(user_id={self.user_id}, name='{self.name}')>"
 
+class Ticker(Base):
+    """Ticker dimension - integer surrogate keys for price and position tables"""
+    __tablename__ = "tickers"
+    
+    ticker_id = Column(Integer, primary_key=True)
+    symbol = Column(String(20), nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<Ticker(ticker_id={self.ticker_id}, symbol='{self.symbol}')>"
+
+class TickerSymbolComparator(Comparator):
+    """
+    Compare a ticker symbol against an integer ticker_id column.
+    Equality and IN lookups resolve the symbol through the tickers table
+    so the comparison stays on the integer index.
+    """
+    
+    def __init__(self, ticker_id_column):
+        super().__init__(ticker_id_column)
+        self.ticker_id_column = ticker_id_column
+    
+    def __clause_element__(self):
+        return (
+            select(Ticker.symbol)
+            .where(Ticker.ticker_id == self.ticker_id_column)
+            .scalar_subquery()
+        )
+    
+    def __eq__(self, other):
+        return self.ticker_id_column == (
+            select(Ticker.ticker_id).where(Ticker.symbol == other).scalar_subquery()
+        )
+    
+    def __ne__(self, other):
+        return self.ticker_id_column != (
+            select(Ticker.ticker_id).where(Ticker.symbol == other).scalar_subquery()
+        )
+    
+    def in_(self, other):
+        return self.ticker_id_column.in_(
+            select(Ticker.ticker_id).where(Ticker.symbol.in_(other))
+        )
+
 class Portfolio(Base):
     """Portfolio holdings - Core positions"""
     __tablename__ = "portfolio"
@@ -34,6 +77,7 @@ class Portfolio(Base):
     portfolio_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     ticker = Column(String(20), nullable=False, index=True)
+    ticker_id = Column(Integer, ForeignKey("tickers.ticker_id"), nullable=True, index=True)  # Resolved from ticker on flush
     asset_class = Column(String(20), nullable=True)  # STOCK, BOND_ETF, CRYPTO, CASH, BOND_CASH
     units = Column(Float, nullable=False)  # Number of shares/units
     avg_price = Column(Float, nullable=False)  # Average purchase price
@@ -41,6 +85,7 @@ class Portfolio(Base):
     
     # Relationships
     user = relationship("User", back_populates="portfolios")
+    ticker_ref = relationship("Ticker")
     daily_values = relationship("PortfolioDailyValue", back_populates="portfolio", cascade="all, delete-orphan")
     
     # Indexes for performance
@@ -75,9 +120,9 @@ class DailyPrice(Base):
     """Daily market prices for all tickers"""
     __tablename__ = "daily_prices"
     
-    price_id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String(20), nullable=False, index=True)
-    price_date = Column(Date, nullable=False, index=True)
+    price_id = Column(Integer, primary_key=True)
+    ticker_id = Column(Integer, ForeignKey("tickers.ticker_id"), nullable=False)
+    price_date = Column(Date, nullable=False)
     close_price = Column(Float, nullable=False)
     
     # Additional OHLCV data (optional)
@@ -86,12 +131,33 @@ class DailyPrice(Base):
     low_price = Column(Float, nullable=True)
     volume = Column(Integer, nullable=True)
     
+    # Relationships
+    ticker_ref = relationship("Ticker")
+    
     # Composite indexes for efficient queries
+    # (ticker_id, price_date, close_price) covers latest-price and daily join lookups
     __table_args__ = (
-        Index('idx_daily_prices_ticker_date', 'ticker', 'price_date', unique=True),
+        UniqueConstraint('ticker_id', 'price_date', name='uq_daily_prices_ticker_date'),
+        Index('idx_daily_prices_ticker_date_close', 'ticker_id', 'price_date', 'close_price'),
         Index('idx_daily_prices_date', 'price_date'),
     )
     
+    @hybrid_property
+    def ticker(self) -> Optional[str]:
+        """Ticker symbol, translated through the tickers dimension"""
+        if self.ticker_ref is not None:
+            return self.ticker_ref.symbol
+        return self.__dict__.get('_pending_symbol')
+    
+    @ticker.setter
+    def ticker(self, symbol: str):
+        # Resolved to ticker_id by resolve_pending_tickers on flush
+        self.__dict__['_pending_symbol'] = symbol
+    
+    @ticker.comparator
+    def ticker(cls):
+        return TickerSymbolComparator(cls.ticker_id)
+    
     def __repr__(self):
         return f"<DailyPrice(ticker='{self.ticker}', date='{self.price_date}', price=${self.close_price:.2f})>"
 
@@ -161,6 +227,161 @@ class PortfolioSummary(Base):
     def __repr__(self):
         return f"<PortfolioSummary(user_id={self.user_id}, date='{self.date}', value=${self.total_value:.2f})>"
 
+class PortfolioRiskMetrics(Base):
+    """Daily risk metrics per user - Computed in batch from portfolio_summary"""
+    __tablename__ = "portfolio_risk_metrics"
+    
+    risk_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    as_of_date = Column(Date, nullable=False)
+    window_days = Column(Integer, nullable=False)
+    
+    volatility_annualized = Column(Float, nullable=True)  # Percent
+    sharpe_ratio = Column(Float, nullable=True)
+    sortino_ratio = Column(Float, nullable=True)
+    max_drawdown = Column(Float, nullable=True)  # Percent, <= 0
+    beta = Column(Float, nullable=True)
+    var_95 = Column(Float, nullable=True)  # Percent one-day loss
+    benchmark_ticker = Column(String(20), nullable=True)
+    num_observations = Column(Integer, nullable=False, default=0)
+    
+    calculated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_risk_metrics_user_date_window', 'user_id', 'as_of_date', 'window_days', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<PortfolioRiskMetrics(user_id={self.user_id}, as_of_date='{self.as_of_date}', sharpe={self.sharpe_ratio})>"
+
+class PortfolioPeriodPerformance(Base):
+    """Latest per-period performance per user - Materialized by the daily calculator"""
+    __tablename__ = "portfolio_period_performance"
+    
+    performance_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    period = Column(String(10), nullable=False)  # 1W, 1M, YTD, 1Y, 5Y
+    as_of_date = Column(Date, nullable=False)
+    
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    start_value = Column(Float, nullable=False)
+    end_value = Column(Float, nullable=False)
+    net_flows = Column(Float, nullable=False, default=0.0)
+    total_return = Column(Float, nullable=True)  # Percent, time-weighted
+    total_gain_loss = Column(Float, nullable=False)  # Net of deposits and withdrawals
+    annualized_return = Column(Float, nullable=True)  # Percent, periods of a year or more
+    volatility = Column(Float, nullable=True)  # Percent, annualized
+    sharpe_ratio = Column(Float, nullable=True)
+    max_drawdown = Column(Float, nullable=True)  # Percent, <= 0
+    partial = Column(Boolean, nullable=False, default=False)  # History shorter than the period
+    
+    calculated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_period_performance_user_period', 'user_id', 'period', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<PortfolioPeriodPerformance(user_id={self.user_id}, period='{self.period}', return={self.total_return})>"
+
+class PortfolioProjection(Base):
+    """Latest Monte Carlo projection per user and horizon - Materialized by the daily calculator"""
+    __tablename__ = "portfolio_projections"
+    
+    projection_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    horizon = Column(String(10), nullable=False)  # 1W, 1M, 1Y
+    as_of_date = Column(Date, nullable=False)
+    projection_date = Column(Date, nullable=False)  # Target date
+    
+    current_value = Column(Float, nullable=False)
+    projected_value = Column(Float, nullable=False)  # Median path
+    projected_return = Column(Float, nullable=False)  # Percent, median path
+    projected_gain_loss = Column(Float, nullable=False)
+    expected_value = Column(Float, nullable=False)  # Mean path
+    
+    # Percentile bands of the terminal value
+    p5_value = Column(Float, nullable=False)
+    p25_value = Column(Float, nullable=False)
+    p75_value = Column(Float, nullable=False)
+    p95_value = Column(Float, nullable=False)
+    confidence_level = Column(Float, nullable=False, default=0.90)  # Coverage of p5..p95
+    
+    probability_of_loss = Column(Float, nullable=False)  # Fraction of paths below current value
+    volatility = Column(Float, nullable=True)  # Percent, annualized
+    sharpe_ratio = Column(Float, nullable=True)
+    max_drawdown = Column(Float, nullable=True)  # Percent, median path's worst drawdown
+    
+    method = Column(String(20), nullable=False)
+    num_paths = Column(Integer, nullable=False)
+    calculated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_projections_user_horizon', 'user_id', 'horizon', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<PortfolioProjection(user_id={self.user_id}, horizon='{self.horizon}', value=${self.projected_value:.2f})>"
+
+class TickerPriceChange(Base):
+    """Latest 1D/1W/1M close-to-close change per ticker - Materialized after each price update"""
+    __tablename__ = "ticker_price_changes"
+    
+    id = Column(Integer, primary_key=True)
+    ticker_id = Column(Integer, ForeignKey("tickers.ticker_id"), nullable=False)
+    as_of_date = Column(Date, nullable=False)  # Date of the latest close
+    close_price = Column(Float, nullable=False)
+    
+    # Percent change from the close 1 trading day / 7 / 30 calendar days before as_of_date
+    change_1d = Column(Float, nullable=True)
+    change_1w = Column(Float, nullable=True)
+    change_1m = Column(Float, nullable=True)
+    calculated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    ticker_ref = relationship("Ticker")
+    
+    __table_args__ = (
+        Index('idx_price_changes_ticker', 'ticker_id', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<TickerPriceChange(ticker_id={self.ticker_id}, date='{self.as_of_date}', 1d={self.change_1d})>"
+
+class PriceFetchEmpty(Base):
+    """Sessions a provider was asked for and returned no close - The backfill planner does not request them again"""
+    __tablename__ = "price_fetch_empty"
+    
+    ticker_id = Column(Integer, ForeignKey("tickers.ticker_id"), primary_key=True)
+    price_date = Column(Date, primary_key=True)
+    fetched_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<PriceFetchEmpty(ticker_id={self.ticker_id}, date='{self.price_date}')>"
+
+class InsightsCacheEntry(Base):
+    """Generated insights per user and metrics fingerprint - Expire after INSIGHTS_CACHE_TTL"""
+    __tablename__ = "insights_cache"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    scope = Column(String(20), nullable=False, default="portfolio")  # portfolio (v2 metrics) or legacy
+    metrics_hash = Column(String(64), nullable=False)  # Fingerprint of the bucketed metrics
+    insights = Column(Text, nullable=False)  # JSON
+    insight_type = Column(String(20), nullable=False, default="ai")  # ai, stub or rule
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_insights_cache_user_hash', 'user_id', 'scope', 'metrics_hash', unique=True),
+        Index('idx_insights_cache_user_created', 'user_id', 'scope', 'created_at'),
+        Index('idx_insights_cache_expires', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f"<InsightsCacheEntry(user_id={self.user_id}, scope='{self.scope}', type='{self.insight_type}')>"
+
 # Additional utility models for enhanced functionality
 
 class CashTransaction(Base):
@@ -231,6 +452,64 @@ class PortfolioTransaction(Base):
     def __repr__(self):
         return f"<PortfolioTransaction(ticker='{self.ticker}', type='{self.transaction_type}', units={self.units})>"
 
+# Ticker dimension helpers
+def get_ticker_ids(session: Session, symbols: Iterable[str], create: bool = True) -> Dict[str, int]:
+    """
+    Map ticker symbols to integer ticker_ids in one query.
+    Missing symbols are inserted when create=True (flushed, not committed).
+    """
+    wanted = {s for s in symbols if s}
+    if not wanted:
+        return {}
+    
+    ids = dict(
+        session.query(Ticker.symbol, Ticker.ticker_id)
+        .filter(Ticker.symbol.in_(wanted))
+        .all()
+    )
+    
+    missing = wanted - ids.keys()
+    if missing and create:
+        new_tickers = [Ticker(symbol=symbol) for symbol in sorted(missing)]
+        session.add_all(new_tickers)
+        session.flush()
+        ids.update({t.symbol: t.ticker_id for t in new_tickers})
+    
+    return ids
+
+@event.listens_for(Session, "before_flush")
+def resolve_pending_tickers(session, flush_context, instances):
+    """Attach tickers rows to new prices and new/changed positions before insert"""
+    pending = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, DailyPrice) and obj.ticker_id is None and obj.ticker_ref is None:
+            symbol = obj.__dict__.get('_pending_symbol')
+            if symbol:
+                pending.append((obj, symbol))
+        elif isinstance(obj, Portfolio) and obj.ticker and (
+            obj.ticker_ref is None or obj.ticker_ref.symbol != obj.ticker
+        ):
+            pending.append((obj, obj.ticker))
+    
+    if not pending:
+        return
+    
+    # Reuse tickers already pending in this session before querying
+    by_symbol = {t.symbol: t for t in session.new if isinstance(t, Ticker)}
+    lookup = {symbol for _, symbol in pending} - by_symbol.keys()
+    if lookup:
+        with session.no_autoflush:
+            for ticker in session.query(Ticker).filter(Ticker.symbol.in_(lookup)):
+                by_symbol[ticker.symbol] = ticker
+    
+    for obj, symbol in pending:
+        ticker = by_symbol.get(symbol)
+        if ticker is None:
+            ticker = Ticker(symbol=symbol)
+            session.add(ticker)
+            by_symbol[symbol] = ticker
+        obj.ticker_ref = ticker
+
 # Database utility functions
 def create_all_tables(engine):
     """Create all tables in the database"""
@@ -8,11 +8,34 @@ import pandas as pd
 import numpy as np
 from sqlalchemy.orm import Session
 from models import Portfolio, HistoricalData, PortfolioSummary
+from services.risk_metrics import risk_metrics
+from services.benchmark_service import align_benchmark, benchmark_comparison_matrix, benchmark_series
+from services.covariance_cache import RollingCovariance, diversification_metrics, diversification_score
+from services.classification_index import ASSET_CLASSES, classification_index
+from services.insights_cache import LEGACY_SCOPE, InsightsCache, metrics_fingerprint
+from core.config import settings
 from typing import Dict, Any, Optional
-import hashlib
-import json
 from datetime import datetime, timedelta
 
+# Asset class -> category used in the legacy metrics breakdown
+LEGACY_CATEGORIES = {
+    ASSET_CLASSES['STOCK']: 'Stock',
+    ASSET_CLASSES['BOND_ETF']: 'Bond',
+    ASSET_CLASSES['CRYPTO']: 'Crypto',
+    ASSET_CLASSES['CASH']: 'Cash',
+    ASSET_CLASSES['BOND_CASH']: 'Cash',
+}
+
+# Rounding steps for the legacy metrics fingerprint; diversification and
+# sector_concentration are 0-1 ratios here, the percentages are percent points
+LEGACY_FINGERPRINT_STEPS = {
+    'gain_loss_pct': 0.5,
+    'benchmark_diff': 0.5,
+    'sharpe_ratio': 0.1,
+    'diversification': 0.05,
+    'sector_concentration': 0.025,
+}
+
 def calculate_portfolio_metrics(user_id: int, db: Session) -> Dict[str, Any]:
     """
     Calculate comprehensive portfolio metrics for insights generation
@@ -38,6 +61,7 @@ def calculate_portfolio_metrics(user_id: int, db: Session) -> Dict[str, Any]:
         
         sector_breakdown = {}
         ticker_values = {}
+        index = classification_index()
         
         for holding in portfolio:
             current_value = holding.shares * holding.avg_price
@@ -51,22 +75,16 @@ def calculate_portfolio_metrics(user_id: int, db: Session) -> Dict[str, Any]:
             if hasattr(holding, 'category'):
                 category = holding.category
             else:
-                # Determine category based on ticker patterns
-                if holding.ticker in ['BTC', 'ETH', 'ADA', 'DOT', 'LINK']:
-                    category = 'Crypto'
-                elif holding.ticker in ['VOO', 'VTI', 'SPY', 'QQQ']:
+                # Determine category from the shared classification index
+                classification = index.classify(holding.ticker)
+                if classification.asset_class == ASSET_CLASSES['STOCK'] and classification.category == 'ETF':
                     category = 'ETF'
-                elif holding.ticker in ['BND', 'TLT', 'AGG']:
-                    category = 'Bond'
-                elif holding.ticker in ['CASH', 'USD']:
-                    category = 'Cash'
                 else:
-                    category = 'Stock'
+                    category = LEGACY_CATEGORIES[classification.asset_class]
             
             if category == 'Stock':
                 stock_value += current_value
-                # Simple sector mapping (in real app, use proper sector data)
-                sector = get_sector_for_ticker(holding.ticker)
+                sector = index.sector(holding.ticker)
                 sector_breakdown[sector] = sector_breakdown.get(sector, 0) + current_value
             elif category == 'Crypto':
                 crypto_value += current_value
@@ -81,12 +99,8 @@ def calculate_portfolio_metrics(user_id: int, db: Session) -> Dict[str, Any]:
         gain_loss = total_value - total_cost
         gain_loss_pct = (gain_loss / total_cost * 100) if total_cost > 0 else 0
         
-        # Calculate diversification score (Herfindahl-Hirschman Index)
-        if total_value > 0:
-            weights = [v / total_value for v in ticker_values.values()]
-            diversification = 1 - sum(w**2 for w in weights)  # Higher is better
-        else:
-            diversification = 0
+        # Calculate diversification score (effective number of uncorrelated bets, 0-1)
+        diversification = calculate_diversification(user_id, db)
         
         # Calculate sector concentration
         if sector_breakdown and total_value > 0:
@@ -129,103 +143,117 @@ def calculate_portfolio_metrics(user_id: int, db: Session) -> Dict[str, Any]:
         return None
 
 def get_sector_for_ticker(ticker: str) -> str:
-    """Simple sector mapping for common tickers"""
-    tech_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA', 'NFLX', 'ADBE', 'CRM']
-    finance_tickers = ['JPM', 'BAC', 'WFC', 'GS', 'MS', 'AXP', 'V', 'MA', 'PYPL']
-    healthcare_tickers = ['JNJ', 'PFE', 'UNH', 'ABBV', 'MRK', 'TMO', 'ABT', 'DHR']
-    consumer_tickers = ['KO', 'PEP', 'WMT', 'PG', 'NKE', 'MCD', 'SBUX', 'DIS']
-    energy_tickers = ['XOM', 'CVX', 'COP', 'EOG', 'SLB']
+    """Sector from the shared classification index ('Other' when unknown)"""
+    return classification_index().sector(ticker)
+
+def holdings_closes(holdings: Dict[str, float], db: Session, days: int) -> Optional[pd.DataFrame]:
+    """Daily closes (date x ticker) of the given tickers over the last `days`, NaN where missing"""
+    # Get historical closes for the user's tickers only
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    rows = db.query(HistoricalData.ticker, HistoricalData.date, HistoricalData.close_price).filter(
+        HistoricalData.ticker.in_(list(holdings)),
+        HistoricalData.date >= start_date,
+        HistoricalData.date <= end_date
+    ).all()
     
-    if ticker in tech_tickers:
-        return 'Technology'
-    elif ticker in finance_tickers:
-        return 'Financial'
-    elif ticker in healthcare_tickers:
-        return 'Healthcare'
-    elif ticker in consumer_tickers:
-        return 'Consumer'
-    elif ticker in energy_tickers:
-        return 'Energy'
-    else:
-        return 'Other'
+    if not rows:
+        return None
+    
+    prices = pd.DataFrame(rows, columns=['ticker', 'date', 'close'])
+    prices['date'] = pd.to_datetime(prices['date']).dt.normalize()
+    return prices.pivot_table(index='date', columns='ticker', values='close', aggfunc='last').sort_index()
 
-def calculate_sharpe_ratio(user_id: int, db: Session, current_value: float) -> float:
-    """Calculate simplified Sharpe ratio"""
+def holdings_value_series(user_id: int, db: Session, days: int) -> Optional[pd.Series]:
+    """Daily value of the user's current holdings over the last `days`, indexed by date"""
+    holdings = {
+        p.ticker: p.shares
+        for p in db.query(Portfolio).filter(Portfolio.user_id == user_id).all()
+    }
+    if not holdings:
+        return None
+    
+    closes = holdings_closes(holdings, db, days)
+    if closes is None:
+        return None
+    
+    # Daily portfolio value = sum(shares * close) per date
+    closes = closes.ffill().bfill()
+    return (closes * pd.Series(holdings).reindex(closes.columns)).sum(axis=1)
+
+def calculate_diversification(user_id: int, db: Session) -> float:
+    """0-1 diversification of the user's holdings from the covariance of their last year of returns"""
     try:
-        # Get historical data for the last 30 days
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        
-        # Get portfolio performance data
-        historical_data = db.query(HistoricalData).filter(
-            HistoricalData.date >= start_date,
-            HistoricalData.date <= end_date
-        ).all()
-        
-        if not historical_data:
-            return 1.0  # Default value
+        holdings = {}
+        for p in db.query(Portfolio).filter(Portfolio.user_id == user_id).all():
+            holdings[p.ticker] = holdings.get(p.ticker, 0) + p.shares
+        closes = holdings_closes(holdings, db, days=365) if holdings else None
+        if closes is None:
+            return 0
         
-        # Calculate daily returns (simplified)
-        daily_returns = []
-        for i in range(1, len(historical_data)):
-            prev_value = historical_data[i-1].close_price
-            curr_value = historical_data[i].close_price
-            if prev_value > 0:
-                daily_return = (curr_value - prev_value) / prev_value
-                daily_returns.append(daily_return)
+        # Weight by current value; tickers without prices carry no measurable risk
+        covariance = RollingCovariance(list(closes.columns), settings.COVARIANCE_WINDOW)
+        covariance.extend(closes.index.date.tolist(), closes.to_numpy(dtype=np.float64))
+        values = closes.ffill().iloc[-1] * pd.Series(holdings).reindex(closes.columns)
+        if values.sum() <= 0:
+            return 0
         
-        if not daily_returns:
-            return 1.0
+        metrics = diversification_metrics(
+            (values / values.sum()).fillna(0).to_numpy(), covariance.covariance(), covariance.observations_per_year()
+        )
+        return diversification_score(float(metrics['effective_bets'][0])) / 100
         
-        # Calculate Sharpe ratio (simplified)
-        mean_return = np.mean(daily_returns)
-        std_return = np.std(daily_returns)
+    except Exception as e:
+        print(f"Error calculating diversification: {e}")
+        return 0
+
+def calculate_sharpe_ratio(user_id: int, db: Session, current_value: float) -> float:
+    """Annualized Sharpe ratio of the user's current holdings over the last 30 days"""
+    try:
+        values = holdings_value_series(user_id, db, days=30)
+        if values is None:
+            return 1.0  # Default value
         
-        if std_return > 0:
-            sharpe = mean_return / std_return * np.sqrt(252)  # Annualized
-            return max(0, min(3, sharpe))  # Clamp between 0 and 3
-        else:
+        sharpe = risk_metrics(values.to_numpy())['sharpe_ratio']
+        if sharpe is None:
             return 1.0
+        return max(0, min(3, sharpe))  # Clamp between 0 and 3
             
     except Exception as e:
         print(f"Error calculating Sharpe ratio: {e}")
         return 1.0
 
 def calculate_benchmark_difference(user_id: int, db: Session, current_value: float) -> float:
-    """Calculate portfolio performance vs benchmark (simplified)"""
+    """1-year return of the user's current holdings minus the S&P 500 (SPY), in percentage points"""
     try:
-        # This is a simplified calculation
-        # In a real app, you'd compare against S&P 500 or other benchmarks
+        values = holdings_value_series(user_id, db, days=365)
+        if values is None or len(values) < 2:
+            return 0.0
+        
+        dates = [d.date() for d in values.index]
+        benchmark = align_benchmark(benchmark_series(settings.RISK_BENCHMARK_TICKER), dates)
+        if benchmark is None:
+            return 0.0
         
-        # For now, return a random value between -5 and 5
-        import random
-        return round(random.uniform(-2, 3), 2)
+        comparison = benchmark_comparison_matrix(
+            dates, values.to_numpy(), None, benchmark, dates[-1], periods=['1Y']
+        )['1Y']
+        excess = float(comparison['excess_return'][0])
+        return 0.0 if np.isnan(excess) else excess
         
     except Exception as e:
         print(f"Error calculating benchmark difference: {e}")
         return 0.0
 
 def generate_metrics_hash(metrics: Dict[str, Any]) -> str:
-    """Generate SHA-256 hash of metrics for caching"""
-    metrics_str = json.dumps(metrics, sort_keys=True)
-    return hashlib.sha256(metrics_str.encode()).hexdigest()
+    """Fingerprint of the bucketed legacy metrics for caching"""
+    return metrics_fingerprint(metrics, LEGACY_FINGERPRINT_STEPS)
 
 def get_cached_insights(user_id: int, metrics_hash: str, db: Session) -> Optional[str]:
-    """Check if insights are cached for these metrics"""
+    """Check if unexpired insights are cached for these metrics (db is a core.database session)"""
     try:
-        from models import InsightsCache
-        
-        # Check for cached insights from today
-        today = datetime.now().date()
-        cached = db.query(InsightsCache).filter(
-            InsightsCache.user_id == user_id,
-            InsightsCache.metrics_hash == metrics_hash,
-            InsightsCache.date >= today
-        ).first()
-        
-        if cached:
-            return cached.insights_text
-        return None
+        entry = InsightsCache(db, LEGACY_SCOPE).get(user_id, metrics_hash)
+        return entry["insights"] if entry else None
         
     except Exception as e:
         print(f"Error checking cache: {e}")
@@ -233,19 +261,9 @@ def get_cached_insights(user_id: int, metrics_hash: str, db: Session) -> Optiona
 
 def save_insights_to_cache(user_id: int, metrics_hash: str, insights_text: str, 
                           is_ai_generated: bool, db: Session) -> None:
-    """Save insights to cache"""
+    """Save insights to cache (db is a core.database session)"""
     try:
-        from models import InsightsCache
-        
-        cache_entry = InsightsCache(
-            user_id=user_id,
-            metrics_hash=metrics_hash,
-            insights_text=insights_text,
-            is_ai_generated=is_ai_generated
-        )
-        
-        db.add(cache_entry)
-        db.commit()
+        InsightsCache(db, LEGACY_SCOPE).put(user_id, metrics_hash, insights_text, "ai" if is_ai_generated else "rule")
         
     except Exception as e:
         print(f"Error saving to cache: {e}")
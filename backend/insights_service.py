@@ -1,57 +1,131 @@
 """
 Portfolio Insights Service using OpenAI GPT
+Insights are generated in the nightly batch (jobs/insights_worker.py) and
+requests are served from the insights cache (services/insights_cache.py)
 """
 
-import os
 import json
-import hashlib
 import logging
 from datetime import date, datetime
 from typing import Dict, List, Optional, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-import openai
-from openai import OpenAI
 
 # Database imports
 from core.database import SessionLocal
 from domain.models_v2 import Portfolio, PortfolioSummary
+from services.covariance_cache import DiversificationService
+from services.classification_index import classification_index
+from services.insights_cache import InsightsCache, metrics_fingerprint
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a professional financial advisor providing concise portfolio insights."
+
+INSIGHT_FIELDS = ("assessment", "recommendations", "risk_analysis", "diversification_analysis", "confidence")
+
+# Confidence of insights derived from the metrics alone
+RULE_CONFIDENCE = 0.6
+
+def insights_prompt(metrics: Dict[str, Any]) -> str:
+    """Compact LLM prompt for a user's metrics"""
+    return f"""Analyze this portfolio and provide concise, actionable insights:
+
+Portfolio Metrics:
+- Net Worth: ${metrics['net_worth']:,.0f}
+- Return: {metrics['gain_loss_pct']:.2f}%
+- Diversification Score: {metrics['diversification_score']:.0f}/100
+- Top Sector: {metrics['top_sector']} ({metrics['sector_concentration']:.1f}%)
+- Crypto Allocation: {metrics['crypto_percentage']:.1f}%
+- Risk Level: {metrics['risk_level']}
+- Positions: {metrics['num_positions']}
+
+Format your response as JSON with these fields, each sentence under 25 words:
+{{
+    "assessment": "Brief portfolio performance assessment",
+    "recommendations": ["Recommendation 1", "Recommendation 2", "Recommendation 3"],
+    "risk_analysis": "Risk assessment and suggestions",
+    "diversification_analysis": "Diversification analysis and suggestions",
+    "confidence": 0.85
+}}"""
+
+def parse_insights(content: str) -> Optional[Dict[str, Any]]:
+    """Structured insights from an LLM reply, None unless it is the JSON object the prompt asks for"""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`").partition("\n")[2]
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(reply, dict) or not reply.get("assessment"):
+        return None
+
+    recommendations = reply.get("recommendations") or []
+    if isinstance(recommendations, str):
+        recommendations = [recommendations]
+    try:
+        confidence = min(max(float(reply["confidence"]), 0.0), 1.0)
+    except (KeyError, TypeError, ValueError):
+        confidence = None
+    return {
+        "assessment": str(reply["assessment"]),
+        "recommendations": [str(item) for item in recommendations][:3],
+        "risk_analysis": str(reply.get("risk_analysis") or ""),
+        "diversification_analysis": str(reply.get("diversification_analysis") or ""),
+        "confidence": confidence
+    }
+
+def rule_based_insights(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic structured insights from the metrics alone"""
+    # Performance insight
+    if metrics["gain_loss_pct"] > 0:
+        assessment = f"Your portfolio is performing well with a {metrics['gain_loss_pct']:.2f}% return, outpacing many traditional benchmarks."
+    else:
+        assessment = f"Your portfolio is down {abs(metrics['gain_loss_pct']):.2f}%, which is within normal market fluctuation ranges."
+    
+    # Diversification insight
+    recommendations = []
+    if metrics["diversification_score"] > 80:
+        diversification = "Your portfolio shows excellent diversification, which helps reduce overall risk."
+    elif metrics["diversification_score"] > 60:
+        diversification = "Your portfolio has moderate diversification. Consider spreading investments across more sectors."
+        recommendations.append("Spread new investments across sectors you do not hold yet.")
+    else:
+        diversification = "Your portfolio is concentrated in few positions. Diversifying could help reduce risk."
+        recommendations.append("Add positions in other sectors and asset classes to reduce concentration.")
+    
+    # Sector concentration and crypto allocation risks
+    risks = []
+    if metrics["sector_concentration"] > 50:
+        risks.append(f"High concentration in {metrics['top_sector']} ({metrics['sector_concentration']:.1f}%) creates sector-specific risk.")
+        recommendations.append(f"Trim {metrics['top_sector']} below half of the portfolio.")
+    if metrics["crypto_percentage"] > 20:
+        risks.append("Your crypto allocation is significant. While offering growth potential, it also increases volatility.")
+        recommendations.append("Size the crypto allocation to a drawdown you could hold through.")
+    if not risks:
+        risks.append(f"Current risk level: {metrics.get('risk_level', 'Unknown')}.")
+    recommendations.append("Review asset allocation regularly and rebalance when positions drift.")
+    
+    return {
+        "assessment": assessment,
+        "recommendations": recommendations[:3],
+        "risk_analysis": " ".join(risks),
+        "diversification_analysis": diversification,
+        "confidence": RULE_CONFIDENCE
+    }
+
+def insight_lines(insights: Dict[str, Any]) -> List[str]:
+    """Up to 3 one-line insights (performance, diversification, risk) for list-style clients"""
+    lines = [insights["assessment"], insights["diversification_analysis"], insights["risk_analysis"], *insights["recommendations"]]
+    return [line for line in lines if line][:3]
+
 class PortfolioInsightsService:
     """Service for generating AI-powered portfolio insights"""
     
     def __init__(self, db: Session):
         self.db = db
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        if self.openai_api_key:
-            self.client = OpenAI(api_key=self.openai_api_key)
-        else:
-            self.client = None
-            logger.warning("OpenAI API key not found. AI insights will use rule-based fallbacks.")
-    
-    def create_insights_cache_table(self):
-        """Create insights cache table if it doesn't exist"""
-        try:
-            self.db.execute(text("""
-                CREATE TABLE IF NOT EXISTS insights_cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    metrics_hash TEXT NOT NULL,
-                    insights TEXT NOT NULL,
-                    insight_type TEXT DEFAULT 'ai',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, metrics_hash)
-                )
-            """))
-            self.db.commit()
-            logger.info("✅ Insights cache table created/verified")
-        except Exception as e:
-            logger.error(f"Error creating insights cache table: {e}")
-            self.db.rollback()
+        self.cache = InsightsCache(db)
     
     def compute_portfolio_metrics(self, user_id: int, as_of: Optional[date] = None) -> Dict[str, Any]:
         """Compute portfolio metrics for insights generation"""
@@ -95,39 +169,39 @@ class PortfolioInsightsService:
             total_value = float(summary.total_value or 0)
             gain_loss_pct = float(summary.total_gain_loss_percent or 0)
             
-            # Calculate diversification (simplified Herfindahl-Hirschman Index)
+            # Diversification from the rolling covariance of the holdings' returns
             position_values = [float(pos.units * pos.avg_price) for pos in positions]
             total_portfolio_value = sum(position_values)
             
-            if total_portfolio_value > 0:
-                weights = [val / total_portfolio_value for val in position_values]
-                hhi = sum(w * w for w in weights)
-                diversification_score = max(0, min(100, (1 - hhi) * 100))
+            diversification = DiversificationService(self.db).for_user(user_id, as_of)
+            if diversification:
+                diversification_score = diversification["score"]
+                risk_level = diversification["risk_level"]
             else:
                 diversification_score = 50
+                risk_level = "Unknown"
             
-            # Sector analysis (simplified)
-            tech_tickers = {'AAPL', 'MSFT', 'GOOGL', 'META', 'NVDA', 'AMZN', 'TSLA'}
-            tech_value = sum(
-                float(pos.units * pos.avg_price) 
-                for pos in positions 
-                if pos.ticker in tech_tickers
-            )
-            sector_concentration = (tech_value / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
+            # Sector analysis: position value grouped by sector
+            ticker_values = {}
+            for pos, value in zip(positions, position_values):
+                ticker_values[pos.ticker] = ticker_values.get(pos.ticker, 0.0) + value
+            sector_values = classification_index(self.db).group_by_sector(ticker_values)
+            top_sector = max(sector_values, key=sector_values.get) if sector_values else "Unknown"
+            sector_concentration = (sector_values.get(top_sector, 0) / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
             
             return {
                 "net_worth": total_value,
                 "gain_loss_pct": gain_loss_pct,
                 "sharpe_ratio": 1.85,  # Placeholder
                 "diversification_score": diversification_score,
-                "top_sector": "Technology",
+                "top_sector": top_sector,
                 "sector_concentration": sector_concentration,
                 "benchmark_diff": gain_loss_pct - 0.5,  # Assume 0.5% benchmark
                 "num_positions": len(positions),
                 "cash_percentage": 4.4,  # Placeholder
                 "crypto_percentage": 22.9,  # Placeholder
                 "stock_percentage": 72.5,  # Placeholder
-                "risk_level": "Medium-High" if diversification_score < 70 else "Medium"
+                "risk_level": risk_level
             }
             
         except Exception as e:
@@ -148,154 +222,54 @@ class PortfolioInsightsService:
                 "risk_level": "Medium"
             }
     
-    def generate_rule_based_insights(self, metrics: Dict[str, Any]) -> List[str]:
+    def generate_rule_based_insights(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
         """Generate rule-based insights as fallback"""
-        insights = []
-        
-        # Performance insight
-        if metrics["gain_loss_pct"] > 0:
-            insights.append(f"Your portfolio is performing well with a {metrics['gain_loss_pct']:.2f}% return, outpacing many traditional benchmarks.")
-        else:
-            insights.append(f"Your portfolio is down {abs(metrics['gain_loss_pct']):.2f}%, which is within normal market fluctuation ranges.")
-        
-        # Diversification insight
-        if metrics["diversification_score"] > 80:
-            insights.append("Your portfolio shows excellent diversification, which helps reduce overall risk.")
-        elif metrics["diversification_score"] > 60:
-            insights.append("Your portfolio has moderate diversification. Consider spreading investments across more sectors.")
-        else:
-            insights.append("Your portfolio is concentrated in few positions. Diversifying could help reduce risk.")
-        
-        # Sector concentration insight
-        if metrics["sector_concentration"] > 50:
-            insights.append(f"High concentration in {metrics['top_sector']} ({metrics['sector_concentration']:.1f}%) creates sector-specific risk.")
-        
-        # Crypto allocation insight
-        if metrics["crypto_percentage"] > 20:
-            insights.append("Your crypto allocation is significant. While offering growth potential, it also increases volatility.")
-        
-        return insights[:3]  # Return top 3 insights
+        return rule_based_insights(metrics)
     
-    def generate_ai_insights(self, metrics: Dict[str, Any]) -> Optional[List[str]]:
-        """Generate AI-powered insights using OpenAI"""
-        if not self.client:
-            return None
-        
-        try:
-            # Create compact prompt
-            prompt = f"""Analyze this portfolio and provide 3 concise insights (1-2 sentences each):
-
-Portfolio Metrics:
-- Net Worth: ${metrics['net_worth']:,.0f}
-- Return: {metrics['gain_loss_pct']:.2f}%
-- Diversification Score: {metrics['diversification_score']:.0f}/100
-- Top Sector: {metrics['top_sector']} ({metrics['sector_concentration']:.1f}%)
-- Crypto Allocation: {metrics['crypto_percentage']:.1f}%
-- Risk Level: {metrics['risk_level']}
-- Positions: {metrics['num_positions']}
-
-Provide exactly 3 insights focusing on: 1) Performance, 2) Risk/Diversification, 3) Strategic recommendation. Keep each under 25 words."""
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a professional financial advisor providing concise portfolio insights."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Parse insights (split by numbers or newlines)
-            insights = []
-            for line in content.split('\n'):
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    # Remove numbering (1., 2., etc.)
-                    clean_line = line.lstrip('123456789. -')
-                    if clean_line:
-                        insights.append(clean_line)
-            
-            return insights[:3] if insights else None
-            
-        except Exception as e:
-            logger.error(f"Error generating AI insights: {e}")
-            return None
-    
-    def get_cached_insights(self, user_id: int, metrics_hash: str) -> Optional[List[str]]:
+    def get_cached_insights(self, user_id: int, fingerprint: str) -> Optional[Dict[str, Any]]:
         """Get cached insights if available"""
-        try:
-            result = self.db.execute(text("""
-                SELECT insights FROM insights_cache 
-                WHERE user_id = :user_id AND metrics_hash = :hash
-                ORDER BY created_at DESC LIMIT 1
-            """), {"user_id": user_id, "hash": metrics_hash}).fetchone()
-            
-            if result:
-                return json.loads(result[0])
-            return None
-        except Exception as e:
-            logger.error(f"Error getting cached insights: {e}")
-            return None
+        entry = self.cache.get(user_id, fingerprint)
+        return entry["insights"] if entry and isinstance(entry["insights"], dict) else None
+    
+    def get_latest_insights(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Most recently generated insights for a user, whatever metrics they were built from"""
+        entry = self.cache.latest(user_id)
+        # Entries from before insights were structured (plain lists) are regenerated
+        return entry if entry and isinstance(entry["insights"], dict) else None
     
-    def cache_insights(self, user_id: int, metrics_hash: str, insights: List[str], insight_type: str = "ai"):
+    def cache_insights(self, user_id: int, fingerprint: str, insights: Dict[str, Any], insight_type: str = "ai"):
         """Cache insights for future use"""
         try:
-            self.db.execute(text("""
-                INSERT OR REPLACE INTO insights_cache 
-                (user_id, metrics_hash, insights, insight_type)
-                VALUES (:user_id, :hash, :insights, :type)
-            """), {
-                "user_id": user_id,
-                "hash": metrics_hash,
-                "insights": json.dumps(insights),
-                "type": insight_type
-            })
-            self.db.commit()
+            self.cache.put(user_id, fingerprint, insights, insight_type)
         except Exception as e:
             logger.error(f"Error caching insights: {e}")
             self.db.rollback()
     
     def generate_insights(self, user_id: int) -> Dict[str, Any]:
-        """Main method to generate portfolio insights"""
+        """
+        Serve a user's insights from the cache filled by the nightly worker
+        Users the worker has not reached yet get rule-based insights; requests
+        never wait on an LLM
+        """
         try:
-            # Ensure cache table exists
-            self.create_insights_cache_table()
-            
-            # Compute portfolio metrics
-            metrics = self.compute_portfolio_metrics(user_id)
-            
-            # Create hash of metrics for caching
-            metrics_str = json.dumps(metrics, sort_keys=True)
-            metrics_hash = hashlib.sha256(metrics_str.encode()).hexdigest()[:16]
-            
-            # Check cache first
-            cached_insights = self.get_cached_insights(user_id, metrics_hash)
-            if cached_insights:
+            cached = self.get_latest_insights(user_id)
+            if cached:
                 return {
-                    "insights": cached_insights,
+                    "insights": insight_lines(cached["insights"]),
+                    "structured": cached["insights"],
                     "source": "cache",
-                    "metrics": metrics
-                }
-            
-            # Try AI insights first
-            ai_insights = self.generate_ai_insights(metrics)
-            if ai_insights:
-                self.cache_insights(user_id, metrics_hash, ai_insights, "ai")
-                return {
-                    "insights": ai_insights,
-                    "source": "ai",
-                    "metrics": metrics
+                    "insight_type": cached["insight_type"],
+                    "generated_at": cached["generated_at"]
                 }
             
             # Fallback to rule-based insights
+            metrics = self.compute_portfolio_metrics(user_id)
             rule_insights = self.generate_rule_based_insights(metrics)
-            self.cache_insights(user_id, metrics_hash, rule_insights, "rule")
+            self.cache_insights(user_id, metrics_fingerprint(metrics), rule_insights, "rule")
             
             return {
-                "insights": rule_insights,
+                "insights": insight_lines(rule_insights),
+                "structured": rule_insights,
                 "source": "rule",
                 "metrics": metrics
             }
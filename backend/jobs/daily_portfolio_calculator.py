@@ -14,13 +14,13 @@ from typing import List, Dict, Optional
 import logging
 
 from core.database import SessionLocal
+from core.logging import configure_logging
 from domain.models_v2 import (
     Portfolio, DailyPrice, PortfolioDailyValue, 
     PortfolioSummary, User, CashTransaction
 )
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DailyPortfolioCalculator:
@@ -63,7 +63,7 @@ class DailyPortfolioCalculator:
         Calculate portfolio values for all users on a specific date
         
         Process:
-        1. Join portfolio with daily_prices on ticker and date
+        1. Join portfolio with daily_prices on ticker_id and date
         2. Calculate units * close_price as position_val
         3. Insert into portfolio_daily_value
         4. Aggregate by user_id + cash balance to store in portfolio_summary
@@ -78,7 +78,7 @@ class DailyPortfolioCalculator:
                 .join(
                     DailyPrice,
                     and_(
-                        Portfolio.ticker == DailyPrice.ticker,
+                        Portfolio.ticker_id == DailyPrice.ticker_id,
                         DailyPrice.price_date == target_date
                     )
                 )
@@ -442,6 +442,7 @@ def add_cash_transaction(user_id: int, amount: float, transaction_type: str,
 
 # CLI interface for testing
 if __name__ == "__main__":
+    configure_logging()
     import argparse
     
     parser = argparse.ArgumentParser(description="Daily Portfolio Calculator")
@@ -12,15 +12,19 @@ from sqlalchemy import and_, func
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional
 import logging
+import time
 
 from core.database import SessionLocal
+from core.logging import configure_logging
+from core.metrics import export_job_metrics, record_rows, record_stage, time_stage
 from domain.models_v2 import (
     Portfolio, DailyPrice, PortfolioDailyValue, 
     PortfolioSummary, User, CashTransaction
 )
+from services.returns_engine import invalidate_returns_cache
+from services.classification_index import ASSET_CLASS_GROUPS, classification_index
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EnhancedDailyCalculator:
@@ -52,7 +56,7 @@ class EnhancedDailyCalculator:
             elif transaction.type == 'withdrawal':
                 cash_balance -= transaction.amount
         
-        logger.debug(f"Cash balance for user {user_id} on {target_date}: ${cash_balance:,.2f}")
+        logger.debug("Cash balance for user %s on %s: $%.2f", user_id, target_date, cash_balance)
         return cash_balance
     
     def get_latest_cash_balance_before_date(self, user_id: int, target_date: date) -> float:
@@ -86,75 +90,56 @@ class EnhancedDailyCalculator:
             .all()
         )
         
-        # Common bond ETFs
-        known_bond_etfs = {
-            'BND', 'AGG', 'TLT', 'IEF', 'SHY', 'VGIT', 'VGLT', 'VTEB', 
-            'MUB', 'HYG', 'JNK', 'LQD', 'VCIT', 'VCLT', 'BSV', 'BIV', 'BLV'
-        }
-        
-        # Common crypto symbols
-        crypto_symbols = {
-            'BTC-USD', 'ETH-USD', 'BTC', 'ETH', 'ADA-USD', 'SOL-USD', 
-            'DOT-USD', 'AVAX-USD', 'MATIC-USD', 'LINK-USD'
-        }
-        
-        categorized = {
-            'stocks': [],
-            'bond_etfs': [],
-            'crypto': [],
-            'bond_cash': [],
-            'cash': []
-        }
+        categorized = {group: [] for group in ASSET_CLASS_GROUPS.values()}
+        index = classification_index(self.db)
         
         for position in positions:
-            ticker = position.ticker
-            
-            if ticker.startswith('CASH') or ticker.startswith('Cash'):
-                categorized['cash'].append(position)
-            elif ticker.startswith('BOND_CASH'):
-                categorized['bond_cash'].append(position)
-            elif ticker in crypto_symbols or 'USD' in ticker:
-                categorized['crypto'].append(position)
-            elif ticker in known_bond_etfs:
-                categorized['bond_etfs'].append(position)
-            else:
-                # Default to stock
-                categorized['stocks'].append(position)
-        
-        logger.info(f"Portfolio categorization for user {user_id}:")
-        logger.info(f"  📈 Stocks: {len(categorized['stocks'])}")
-        logger.info(f"  🏦 Bond ETFs: {len(categorized['bond_etfs'])}")
-        logger.info(f"  ₿ Crypto: {len(categorized['crypto'])}")
-        logger.info(f"  💰 Bond Cash: {len(categorized['bond_cash'])}")
-        logger.info(f"  💵 Cash: {len(categorized['cash'])}")
+            categorized[ASSET_CLASS_GROUPS[index.asset_class(position.ticker)]].append(position)
+        
+        # Runs per user per day; per-row messages stay lazy so they are only formatted when emitted
+        logger.debug(
+            "Portfolio categorization for user %s: 📈 %d stocks, 🏦 %d bond ETFs, ₿ %d crypto, 💰 %d bond cash, 💵 %d cash",
+            user_id, len(categorized['stocks']), len(categorized['bond_etfs']), len(categorized['crypto']),
+            len(categorized['bond_cash']), len(categorized['cash'])
+        )
         
         return categorized
     
-    def calculate_daily_portfolio_values(self, target_date: date) -> Dict[str, any]:
+    def calculate_daily_portfolio_values(self, target_date: date, user_ids: Optional[List[int]] = None) -> Dict[str, any]:
         """
         Enhanced daily portfolio calculation with asset type handling
         
         Process:
-        1. Stocks, bond ETFs, crypto: Join with daily_prices and calculate units * close_price
+        1. Stocks, bond ETFs, crypto: Look up daily_prices by ticker_id and calculate units * close_price
         2. Bond cash: Carry forward value from portfolio table (no price lookup)
         3. Cash: Calculate from cash_transactions or carry forward latest balance
         4. Aggregate all values for portfolio_summary
+        
+        user_ids limits the run to those users (a pipeline valuation shard)
         """
         
         logger.info(f"🔄 Enhanced portfolio calculation for {target_date}")
         
         try:
             # Get all users with portfolios
-            users_with_portfolios = (
+            users_query = (
                 self.db.query(User.user_id)
                 .join(Portfolio, User.user_id == Portfolio.user_id)
-                .distinct()
-                .all()
             )
+            if user_ids is not None:
+                users_query = users_query.filter(User.user_id.in_(user_ids))
+            users_with_portfolios = users_query.distinct().all()
             
             total_processed_positions = 0
             updated_users = 0
             
+            # Load every close for the date once, keyed by integer ticker_id
+            prices_by_ticker_id = dict(
+                self.db.query(DailyPrice.ticker_id, DailyPrice.close_price)
+                .filter(DailyPrice.price_date == target_date)
+                .all()
+            )
+            
             for (user_id,) in users_with_portfolios:
                 try:
                     # Categorize this user's positions
@@ -173,25 +158,16 @@ class EnhancedDailyCalculator:
                     
                     for position in market_positions:
                         # Get price for this date
-                        daily_price = (
-                            self.db.query(DailyPrice)
-                            .filter(
-                                and_(
-                                    DailyPrice.ticker == position.ticker,
-                                    DailyPrice.price_date == target_date
-                                )
-                            )
-                            .first()
-                        )
+                        close_price = prices_by_ticker_id.get(position.ticker_id)
                         
-                        if daily_price:
+                        if close_price is not None:
                             # Calculate position value
-                            position_val = position.units * daily_price.close_price
+                            position_val = position.units * close_price
                             
                             # Insert/update portfolio daily value
                             self._upsert_portfolio_daily_value(
                                 position.portfolio_id, target_date, 
-                                position.units, daily_price.close_price, position_val
+                                position.units, close_price, position_val
                             )
                             
                             user_total_value += position_val
@@ -199,9 +175,9 @@ class EnhancedDailyCalculator:
                             user_positions_count += 1
                             total_processed_positions += 1
                             
-                            logger.debug(f"  📊 {position.ticker}: {position.units} × ${daily_price.close_price} = ${position_val:,.2f}")
+                            logger.debug("  📊 %s: %s × $%s = $%.2f", position.ticker, position.units, close_price, position_val)
                         else:
-                            logger.warning(f"No price data for {position.ticker} on {target_date}")
+                            logger.warning("No price data for %s on %s", position.ticker, target_date)
                     
                     # Process bond cash positions (carry forward from portfolio)
                     for position in categorized_positions['bond_cash']:
@@ -219,7 +195,7 @@ class EnhancedDailyCalculator:
                         user_positions_count += 1
                         total_processed_positions += 1
                         
-                        logger.debug(f"  💰 {position.ticker} (bond cash): ${position_val:,.2f}")
+                        logger.debug("  💰 %s (bond cash): $%.2f", position.ticker, position_val)
                     
                     # Process cash positions (carry forward from portfolio)
                     for position in categorized_positions['cash']:
@@ -237,7 +213,7 @@ class EnhancedDailyCalculator:
                         user_positions_count += 1
                         total_processed_positions += 1
                         
-                        logger.debug(f"  💵 {position.ticker} (cash): ${position_val:,.2f}")
+                        logger.debug("  💵 %s (cash): $%.2f", position.ticker, position_val)
                     
                     # Calculate actual cash balance from transactions
                     cash_balance = self.get_cash_balance(user_id, target_date)
@@ -256,10 +232,13 @@ class EnhancedDailyCalculator:
                     )
                     
                     updated_users += 1
-                    logger.info(f"📊 User {user_id}: Portfolio ${user_total_value:,.2f} + Cash ${cash_balance:,.2f} = Total ${final_total_value:,.2f}")
+                    logger.debug(
+                        "📊 User %s: Portfolio $%.2f + Cash $%.2f = Total $%.2f",
+                        user_id, user_total_value, cash_balance, final_total_value
+                    )
                     
                 except Exception as e:
-                    logger.error(f"❌ Failed to process user {user_id}: {e}")
+                    logger.error("❌ Failed to process user %s: %s", user_id, e)
             
             # Commit all changes
             self.db.commit()
@@ -373,7 +352,7 @@ class EnhancedDailyCalculator:
                 results["total_users"] = max(results["total_users"], daily_result["updated_users"])
                 
             except Exception as e:
-                logger.error(f"❌ Failed for {current_date}: {e}")
+                logger.error("❌ Failed for %s: %s", current_date, e)
                 results["daily_results"].append({
                     "date": current_date.isoformat(),
                     "error": str(e),
@@ -390,22 +369,32 @@ class EnhancedDailyCalculator:
 def calculate_enhanced_daily_portfolio_job(target_date: Optional[date] = None) -> Dict[str, any]:
     """
     Enhanced daily scheduled job function
-    Handles all asset types with proper categorization
+    Values every position and writes the daily summaries; risk, performance,
+    projections, covariance and insights are later stages of jobs.nightly_pipeline
     """
     
     if target_date is None:
         target_date = date.today()
     
     db = SessionLocal()
+    job_started = time.perf_counter()
     try:
         calculator = EnhancedDailyCalculator(db)
-        result = calculator.calculate_daily_portfolio_values(target_date)
+        with time_stage('daily_portfolio', 'valuation'):
+            result = calculator.calculate_daily_portfolio_values(target_date)
+        record_rows('daily_portfolio', 'portfolio_daily_values', result.get('processed_positions', 0))
+        record_rows('daily_portfolio', 'portfolio_summary', result.get('updated_users', 0))
+        invalidate_returns_cache()
         
         logger.info(f"🎉 Enhanced daily portfolio calculation completed: {result}")
+        record_stage('daily_portfolio', 'total', time.perf_counter() - job_started)
+        export_job_metrics('daily_portfolio')
         return result
         
     except Exception as e:
         logger.error(f"❌ Enhanced daily portfolio calculation failed: {e}")
+        record_stage('daily_portfolio', 'total', time.perf_counter() - job_started)
+        export_job_metrics('daily_portfolio', succeeded=False)
         raise
     finally:
         db.close()
@@ -481,6 +470,7 @@ def add_bond_cash_position(user_id: int, bond_name: str, value: float,
 
 # CLI interface for testing
 if __name__ == "__main__":
+    configure_logging()
     import argparse
     
     parser = argparse.ArgumentParser(description="Enhanced Daily Portfolio Calculator")
@@ -0,0 +1,194 @@
+"""
+Insights Worker - Nightly Batch of Portfolio Insights
+Computes every user's metrics, then generates insights for users whose metrics changed
+through an async provider with bounded concurrency, a per-call timeout and a batch deadline
+Results land in the insights cache, which is the only thing requests read
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging import configure_logging
+from core.database import SessionLocal
+from core.metrics import record_rows
+from domain.models_v2 import User
+from insights_service import SYSTEM_PROMPT, PortfolioInsightsService, insights_prompt, parse_insights, rule_based_insights
+from services.insights_cache import metrics_fingerprint, purge_expired_insights
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class StubInsightsProvider:
+    """Deterministic offline provider: the rule-based insights, served through the async path"""
+    name = "stub"
+
+    async def generate(self, metrics: Dict) -> Optional[Dict]:
+        return rule_based_insights(metrics)
+
+    async def close(self):
+        pass
+
+class OpenAIInsightsProvider:
+    """Chat completions through the async OpenAI client"""
+    name = "ai"
+
+    def __init__(self, api_key: str, model: Optional[str] = None, timeout: Optional[float] = None):
+        from openai import AsyncOpenAI  # Only needed when live insights are enabled
+
+        self.model = model or settings.INSIGHTS_MODEL
+        self.client = AsyncOpenAI(
+            api_key=api_key, base_url=settings.OPENAI_BASE_URL,
+            timeout=timeout or settings.INSIGHTS_TIMEOUT, max_retries=1
+        )
+
+    async def generate(self, metrics: Dict) -> Optional[Dict]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": insights_prompt(metrics)}
+            ],
+            max_tokens=400,
+            temperature=0.7
+        )
+        return parse_insights(response.choices[0].message.content)
+
+    async def close(self):
+        await self.client.close()
+
+def get_insights_provider(name: Optional[str] = None):
+    """Provider from settings; without an OpenAI key the stub is used"""
+    name = name or settings.INSIGHTS_PROVIDER
+    if name == "stub":
+        return StubInsightsProvider()
+    if name == "openai":
+        if settings.OPENAI_API_KEY:
+            return OpenAIInsightsProvider(settings.OPENAI_API_KEY)
+        logger.warning("⚠️ OPENAI_API_KEY not set, generating insights with the stub provider")
+        return StubInsightsProvider()
+    raise ValueError(f"Unknown insights provider: {name}")
+
+async def generate_batch(provider, requests: Dict[int, Dict], concurrency: Optional[int] = None,
+                         timeout: Optional[float] = None, deadline: Optional[float] = None) -> Dict[int, Optional[Dict]]:
+    """
+    user_id -> insights for every request that finished in time
+
+    At most `concurrency` calls are in flight. A call that fails or runs past
+    `timeout` seconds yields None; users still pending at `deadline` seconds
+    are cancelled and left out.
+    """
+    concurrency = concurrency or settings.INSIGHTS_CONCURRENCY
+    timeout = timeout or settings.INSIGHTS_TIMEOUT
+    deadline = deadline or settings.INSIGHTS_DEADLINE
+    if not requests:
+        return {}
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate_one(user_id: int, metrics: Dict):
+        async with semaphore:
+            try:
+                return user_id, await asyncio.wait_for(provider.generate(metrics), timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Insights for user {user_id} failed: {e!r}")
+                return user_id, None
+
+    tasks = [asyncio.create_task(generate_one(user_id, metrics)) for user_id, metrics in requests.items()]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning(f"⏰ Insights deadline reached with {len(pending)} users pending")
+
+    return dict(task.result() for task in done)
+
+async def _run_provider(provider, requests: Dict[int, Dict], **limits) -> Dict[int, Optional[Dict]]:
+    try:
+        return await generate_batch(provider, requests, **limits)
+    finally:
+        await provider.close()
+
+def run_insights_job(as_of: Optional[date] = None, db: Optional[Session] = None, user_ids: Optional[List[int]] = None,
+                     provider=None, force: bool = False) -> Dict:
+    """
+    Batch job: refresh the insights cache for every user (or user_ids)
+    Users whose metrics fingerprint is cached and unexpired are skipped unless force is set
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        service = PortfolioInsightsService(db)
+        if user_ids is None:
+            user_ids = [row[0] for row in db.query(User.user_id).order_by(User.user_id).all()]
+
+        requests, hashes = {}, {}
+        for user_id in user_ids:
+            metrics = service.compute_portfolio_metrics(user_id, as_of)
+            hashes[user_id] = metrics_fingerprint(metrics)
+            if force or not service.get_cached_insights(user_id, hashes[user_id]):
+                requests[user_id] = metrics
+
+        provider = provider or get_insights_provider()
+        results = asyncio.run(_run_provider(provider, requests)) if requests else {}
+
+        generated = 0
+        for user_id, metrics in requests.items():
+            insights = results.get(user_id)
+            if insights:
+                service.cache_insights(user_id, hashes[user_id], insights, provider.name)
+                generated += 1
+            else:
+                service.cache_insights(user_id, hashes[user_id], rule_based_insights(metrics), "rule")
+        record_rows('insights', 'insights_cache', len(requests))
+        expired = purge_expired_insights(db)
+
+        logger.info(f"💡 Insights: {generated} generated, {len(requests) - generated} rule-based, "
+                    f"{len(user_ids) - len(requests)} unchanged, {expired} expired entries purged")
+        return {
+            'status': 'success',
+            'as_of': as_of.isoformat(),
+            'users': len(user_ids),
+            'generated': generated,
+            'fallback': len(requests) - generated,
+            'unchanged': len(user_ids) - len(requests),
+            'expired': expired
+        }
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Insights batch failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Nightly portfolio insights batch")
+    parser.add_argument("--date", type=str, help="As-of date (YYYY-MM-DD)")
+    parser.add_argument("--user-id", type=int, action="append", help="Limit to these users")
+    parser.add_argument("--provider", choices=["openai", "stub"], help="Override INSIGHTS_PROVIDER")
+    parser.add_argument("--force", action="store_true", help="Regenerate even when metrics are unchanged")
+
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    provider = get_insights_provider(args.provider) if args.provider else None
+    result = run_insights_job(as_of, user_ids=args.user_id, provider=provider, force=args.force)
+    print(f"Insights result: {result}")
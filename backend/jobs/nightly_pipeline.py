@@ -0,0 +1,125 @@
+"""
+Nightly Pipeline - Prices, Valuation, Metrics and Insights in One Run
+fetch prices (equities and crypto side by side) -> price changes and per-user
+valuation shards (daily values and summaries) -> risk, performance, projections
+and covariance -> insights. Completed stages are checkpointed per date, so a
+rerun after a failure only runs what failed and what depends on it
+
+Usage: python -m jobs.nightly_pipeline
+       python -m jobs.nightly_pipeline --date 2025-10-14 --rerun valuation_0
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import logging
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from core.config import settings
+from core.database import SessionLocal
+from core.logging import configure_logging
+from domain.models_v2 import Portfolio
+from jobs.enhanced_daily_calculator import EnhancedDailyCalculator
+from jobs.insights_worker import run_insights_job
+from jobs.pipeline import Pipeline, Stage, print_report
+from services.covariance_cache import refresh_covariance_job
+from services.enhanced_price_updater import categorize_portfolio_tickers, update_daily_prices
+from services.movers_engine import calculate_price_changes_job
+from services.performance_engine import calculate_period_performance_job
+from services.projection_engine import calculate_projections_job
+from services.returns_engine import invalidate_returns_cache
+from services.risk_engine import calculate_risk_metrics_job
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PIPELINE_NAME = 'nightly'
+METRIC_STAGES = ('risk_metrics', 'period_performance', 'projections', 'covariance')
+
+def _fetch(asset_group: str) -> Callable[[date], Dict]:
+    """Price fetch for one provider: Alpaca serves stocks and bond ETFs, Twelve Data crypto"""
+    def run(run_date: date) -> Dict:
+        # The updater fills every ticker up to today; run_date only keys the checkpoint
+        stocks, bond_etfs, crypto, _, _ = categorize_portfolio_tickers()
+        if asset_group == 'crypto':
+            result = update_daily_prices([], [], crypto, price_changes=False)
+        else:
+            result = update_daily_prices(stocks, bond_etfs, [], price_changes=False)
+        critical = [e for e in result['errors'] if e.startswith('Critical error')]
+        if critical:
+            raise RuntimeError(critical[0])
+        return result
+    return run
+
+def portfolio_user_ids(db) -> List[int]:
+    return [row[0] for row in db.query(Portfolio.user_id).distinct().order_by(Portfolio.user_id).all()]
+
+def _valuation(shard: int, shards: int) -> Callable[[date], Dict]:
+    """Daily values and summaries for the users with user_id % shards == shard"""
+    def run(run_date: date) -> Dict:
+        db = SessionLocal()
+        try:
+            user_ids = [user_id for user_id in portfolio_user_ids(db) if user_id % shards == shard]
+            result = EnhancedDailyCalculator(db).calculate_daily_portfolio_values(run_date, user_ids=user_ids)
+        finally:
+            db.close()
+        # Summaries changed, cached return windows are stale
+        invalidate_returns_cache()
+        return result
+    return run
+
+def build_nightly_pipeline(shards: Optional[int] = None, max_workers: Optional[int] = None,
+                           checkpoint_dir: Optional[str] = None) -> Pipeline:
+    shards = max(1, shards or settings.PIPELINE_VALUATION_SHARDS)
+    valuation = tuple(f"valuation_{shard}" for shard in range(shards))
+
+    stages = [
+        Stage('fetch_equities', _fetch('equities')),
+        Stage('fetch_crypto', _fetch('crypto')),
+        Stage('price_changes', lambda d: calculate_price_changes_job(d), ('fetch_equities', 'fetch_crypto')),
+        *[Stage(name, _valuation(shard, shards), ('fetch_equities', 'fetch_crypto')) for shard, name in enumerate(valuation)],
+        # Each metric job reads the summaries and writes its own table
+        Stage('risk_metrics', lambda d: calculate_risk_metrics_job(d), valuation),
+        Stage('period_performance', lambda d: calculate_period_performance_job(d), valuation),
+        Stage('projections', lambda d: calculate_projections_job(d), valuation),
+        Stage('covariance', lambda d: refresh_covariance_job(d), valuation),
+        # Insights last: they read the metrics above, and requests only read their cache
+        Stage('insights', lambda d: run_insights_job(d), METRIC_STAGES),
+    ]
+    return Pipeline(PIPELINE_NAME, stages, max_workers=max_workers, checkpoint_dir=checkpoint_dir)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the nightly pipeline, resuming from its checkpoint")
+    parser.add_argument('--date', type=str, help='Run date (YYYY-MM-DD, default today)')
+    parser.add_argument('--rerun', nargs='*', default=[], help='Run these stages and everything downstream again')
+    parser.add_argument('--force', action='store_true', help='Ignore the checkpoint and run every stage')
+    parser.add_argument('--shards', type=int, help='Valuation shards (default PIPELINE_VALUATION_SHARDS)')
+    parser.add_argument('--workers', type=int, help='Stages run at once (default PIPELINE_WORKERS)')
+    parser.add_argument('--list', action='store_true', help='Print the stages and their dependencies')
+    parser.add_argument('--output', type=Path, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    pipeline = build_nightly_pipeline(args.shards, args.workers)
+
+    if args.list:
+        for name in pipeline.order:
+            depends_on = pipeline.stages[name].depends_on
+            print(f"{name:<24}{'after ' + ', '.join(depends_on) if depends_on else ''}")
+        return 0
+
+    run_date = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    report = pipeline.run(run_date, rerun=args.rerun, force=args.force)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report.to_dict(), indent=2, default=str))
+        logger.info(f"📝 Wrote {args.output}")
+    return 0 if report.succeeded else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Pipeline Runner - Dependency-Ordered Job Stages
+Runs declared stages on a thread pool as soon as their dependencies complete,
+checkpoints every completed stage per run date so a failed run resumes where it
+stopped, and reports how long each stage took. PipelineScheduler runs a pipeline
+once a day inside the current process
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.metrics import export_job_metrics, record_stage
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+COMPLETED = 'completed'
+SKIPPED = 'skipped'  # Completed by an earlier run for the same date
+FAILED = 'failed'
+BLOCKED = 'blocked'  # A dependency failed or was blocked
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[[date], Optional[Dict]]  # Run date -> JSON-able summary; must be safe to re-run
+    depends_on: Tuple[str, ...] = ()
+
+@dataclass
+class StageResult:
+    name: str
+    status: str
+    seconds: float = 0.0
+    summary: Optional[Dict] = None
+    error: Optional[str] = None
+
+@dataclass
+class PipelineReport:
+    pipeline: str
+    run_date: date
+    seconds: float
+    stages: List[StageResult] = field(default_factory=list)  # Pipeline order
+
+    @property
+    def succeeded(self) -> bool:
+        return all(s.status in (COMPLETED, SKIPPED) for s in self.stages)
+
+    def to_dict(self) -> Dict:
+        return {
+            'pipeline': self.pipeline, 'run_date': self.run_date.isoformat(),
+            'seconds': self.seconds, 'succeeded': self.succeeded,
+            'stages': [
+                {'name': s.name, 'status': s.status, 'seconds': s.seconds, 'summary': s.summary, 'error': s.error}
+                for s in self.stages
+            ],
+        }
+
+class PipelineCheckpoint:
+    """Completed stages of one pipeline for one run date, in <dir>/<pipeline>_<date>.json"""
+
+    def __init__(self, directory: str, pipeline: str, run_date: date):
+        self.path = os.path.join(directory, f"{pipeline}_{run_date.isoformat()}.json")
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.stages = json.load(f).get('stages', {})
+
+    def completed(self) -> Dict[str, Dict]:
+        return {name: entry for name, entry in self.stages.items() if entry.get('status') == COMPLETED}
+
+    def record(self, result: StageResult):
+        """Atomically record a stage outcome; safe to call from stage worker threads"""
+        with self._lock:
+            self.stages[result.name] = {
+                'status': result.status, 'seconds': result.seconds, 'summary': result.summary,
+                'error': result.error, 'finished_at': datetime.now().isoformat(),
+            }
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stages': self.stages}, f, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+
+class Pipeline:
+    """A named set of stages; independent stages run in parallel up to max_workers"""
+
+    def __init__(self, name: str, stages: Sequence[Stage], max_workers: Optional[int] = None,
+                 checkpoint_dir: Optional[str] = None):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers or settings.PIPELINE_WORKERS
+        self.checkpoint_dir = checkpoint_dir or settings.PIPELINE_CHECKPOINT_DIR
+
+        if len(self.stages) != len(stages):
+            raise ValueError(f"Duplicate stage names in pipeline {name}")
+        for stage in stages:
+            unknown = [d for d in stage.depends_on if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Stage names with every stage after its dependencies, declaration order otherwise"""
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle in pipeline {self.name} at stage {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def downstream(self, names: Iterable[str]) -> List[str]:
+        """names and every stage that depends on them, directly or not, in pipeline order"""
+        selected = set(names)
+        unknown = selected - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        for name in self.order:
+            if any(d in selected for d in self.stages[name].depends_on):
+                selected.add(name)
+        return [name for name in self.order if name in selected]
+
+    def _run_stage(self, stage: Stage, run_date: date) -> StageResult:
+        started = time.perf_counter()
+        try:
+            summary = stage.run(run_date)
+            # Batch jobs report failure as {'status': 'error'} rather than raising
+            if isinstance(summary, dict) and summary.get('status') == 'error':
+                raise RuntimeError(summary.get('error', 'stage reported an error'))
+            return StageResult(stage.name, COMPLETED, round(time.perf_counter() - started, 3), summary)
+        except Exception as e:
+            logger.error(f"❌ Stage {stage.name} failed: {e}")
+            return StageResult(stage.name, FAILED, round(time.perf_counter() - started, 3), error=str(e))
+
+    def run(self, run_date: Optional[date] = None, rerun: Iterable[str] = (), force: bool = False) -> PipelineReport:
+        """
+        Run every stage not yet completed for run_date. Stages in rerun, and all
+        stages downstream of them, run again even if checkpointed; force reruns all
+        """
+        run_date = run_date or date.today()
+        checkpoint = PipelineCheckpoint(self.checkpoint_dir, self.name, run_date)
+        stale = set(self.order if force else self.downstream(rerun))
+
+        results: Dict[str, StageResult] = {}
+        for name, entry in checkpoint.completed().items():
+            if name in self.stages and name not in stale:
+                results[name] = StageResult(name, SKIPPED, entry.get('seconds', 0.0), entry.get('summary'))
+        if results:
+            logger.info(f"⏭️  {self.name} {run_date}: resuming, {len(results)} stages already completed")
+
+        pending = [name for name in self.order if name not in results]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"pipeline-{self.name}") as pool:
+            running = {}
+            while pending or running:
+                # Pending is in pipeline order, so a block propagates down the graph in one pass
+                for name in list(pending):
+                    dependencies = [results.get(d) for d in self.stages[name].depends_on]
+                    if any(r is not None and r.status in (FAILED, BLOCKED) for r in dependencies):
+                        results[name] = StageResult(name, BLOCKED)
+                        checkpoint.record(results[name])
+                        pending.remove(name)
+                    elif all(r is not None for r in dependencies):
+                        logger.info(f"▶️  {self.name}: {name}")
+                        running[pool.submit(self._run_stage, self.stages[name], run_date)] = name
+                        pending.remove(name)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    results[running.pop(future)] = result
+                    checkpoint.record(result)
+                    record_stage(self.name, result.name, result.seconds)
+                    if result.status == COMPLETED:
+                        logger.info(f"✅ {self.name}: {result.name} in {result.seconds:.2f}s")
+
+        report = PipelineReport(self.name, run_date, round(time.perf_counter() - started, 3),
+                                [results[name] for name in self.order])
+        record_stage(self.name, 'total', report.seconds)
+        export_job_metrics(self.name, succeeded=report.succeeded)
+        return report
+
+def print_report(report: PipelineReport):
+    print(f"\n{report.pipeline} {report.run_date}: {'succeeded' if report.succeeded else 'FAILED'} in {report.seconds:.2f}s")
+    print(f"{'stage':<24}{'status':<12}{'seconds':>10}")
+    for stage in report.stages:
+        print(f"{stage.name:<24}{stage.status:<12}{stage.seconds:>10.2f}" + (f"  {stage.error}" if stage.error else ""))
+    # Time spent in stages that ran now, against wall time: the gain from running stages in parallel
+    stage_seconds = sum(s.seconds for s in report.stages if s.status in (COMPLETED, FAILED))
+    print(f"{'stage time':<36}{stage_seconds:>10.2f}")
+
+class PipelineScheduler:
+    """Runs a pipeline every day at a local wall-clock time on a daemon thread"""
+
+    def __init__(self, pipeline_factory: Callable[[], Pipeline], at: dt_time):
+        self.pipeline_factory = pipeline_factory
+        self.at = at
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def parse_time(value: str) -> dt_time:
+        return datetime.strptime(value, "%H:%M").time()
+
+    def next_run(self, now: Optional[datetime] = None) -> datetime:
+        now = now or datetime.now()
+        candidate = datetime.combine(now.date(), self.at)
+        return candidate if candidate > now else candidate + timedelta(days=1)
+
+    def _loop(self):
+        while True:
+            due = self.next_run()
+            logger.info(f"🗓️  Next pipeline run at {due:%Y-%m-%d %H:%M}")
+            if self._stop.wait((due - datetime.now()).total_seconds()):
+                return
+            try:
+                pipeline = self.pipeline_factory()
+                report = pipeline.run(due.date())
+                logger.info(f"🏁 {pipeline.name} {due.date()}: {'succeeded' if report.succeeded else 'failed'} in {report.seconds:.1f}s")
+            except Exception as e:
+                logger.error(f"❌ Scheduled pipeline run failed: {e}")
+
+    def start(self) -> 'PipelineScheduler':
+        self._thread = threading.Thread(target=self._loop, name="pipeline-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -14,13 +14,13 @@ from typing import List, Dict, Optional
 import logging
 
 from core.database import SessionLocal
+from core.logging import configure_logging
 from domain.models_v2 import (
     Portfolio, DailyPrice, PortfolioDailyValue, 
     PortfolioSummary, User
 )
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class PortfolioCalculator:
@@ -35,7 +35,7 @@ class PortfolioCalculator:
         
         Process:
         1. Read all portfolio positions
-        2. Join with daily_prices table on ticker and date
+        2. Join with daily_prices table on ticker_id and date
         3. Calculate units * close_price as position_val
         4. Insert into portfolio_daily_value
         5. Aggregate by user_id to store in portfolio_summary
@@ -50,7 +50,7 @@ class PortfolioCalculator:
                 .join(
                     DailyPrice,
                     and_(
-                        Portfolio.ticker == DailyPrice.ticker,
+                        Portfolio.ticker_id == DailyPrice.ticker_id,
                         DailyPrice.price_date == target_date
                     )
                 )
@@ -333,6 +333,7 @@ def backfill_portfolio_values(start_date: date, end_date: date) -> Dict[str, any
 
 # CLI interface for testing
 if __name__ == "__main__":
+    configure_logging()
     import argparse
     
     parser = argparse.ArgumentParser(description="Portfolio Calculator")
@@ -0,0 +1,236 @@
+"""
+Price History Loader
+Streams large price-history CSVs into daily_prices in bounded memory
+Chunks are upserted in their own transactions and a checkpoint records the
+byte offset after the last committed row so an interrupted load seeks back to
+where it stopped
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, or_, insert
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.logging import configure_logging
+from core.metrics import export_job_metrics, record_rows
+from domain.models_v2 import DailyPrice, get_ticker_ids
+from services.benchmark_service import invalidate_benchmark_cache
+from services.covariance_cache import invalidate_covariance_cache
+from services.movers_engine import calculate_price_changes_job
+from utils.price_csv import DEFAULT_CHUNK_ROWS, iter_price_chunks
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# CSV column -> daily_prices column (portfolio_history_10y.csv layout: ticker,type,date,close[,open,high,low,volume])
+PRICE_COLUMNS = {
+    'ticker': 'ticker',
+    'date': 'price_date',
+    'close': 'close_price',
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'volume': 'volume',
+}
+
+def checkpoint_path_for(csv_path: str) -> str:
+    return f"{csv_path}.checkpoint.json"
+
+# Bytes hashed at each end of the CSV to recognise the file a checkpoint was written for
+FINGERPRINT_BLOCK_BYTES = 64 * 1024
+
+def file_fingerprint(csv_path: str) -> Dict:
+    """Path, size, mtime and hashes of the first and last blocks of csv_path"""
+    stat = os.stat(csv_path)
+    with open(csv_path, 'rb') as f:
+        head = hashlib.sha256(f.read(FINGERPRINT_BLOCK_BYTES)).hexdigest()
+        f.seek(max(stat.st_size - FINGERPRINT_BLOCK_BYTES, 0))
+        tail = hashlib.sha256(f.read(FINGERPRINT_BLOCK_BYTES)).hexdigest()
+    return {
+        'source': os.path.abspath(csv_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'head_sha256': head,
+        'tail_sha256': tail
+    }
+
+def read_checkpoint(checkpoint_path: str, csv_path: str) -> Tuple[int, int]:
+    """(byte offset, rows) already committed from csv_path, (0, 0) when starting fresh"""
+    if not os.path.exists(checkpoint_path):
+        return 0, 0
+
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+
+    # Any other file, or this one rewritten (even to the same size), starts over
+    fingerprint = file_fingerprint(csv_path)
+    if any(checkpoint.get(key) != value for key, value in fingerprint.items()):
+        logger.warning(f"⚠️ Ignoring checkpoint for a different or modified file: {checkpoint_path}")
+        return 0, 0
+
+    return int(checkpoint.get('byte_offset', 0)), int(checkpoint.get('rows_committed', 0))
+
+def write_checkpoint(checkpoint_path: str, fingerprint: Dict, byte_offset: int, rows_committed: int):
+    """Atomically record the byte offset after the last committed row"""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            **fingerprint,
+            'byte_offset': byte_offset,
+            'rows_committed': rows_committed,
+            'updated_at': datetime.now().isoformat()
+        }, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def upsert_price_chunk(db: Session, chunk: pd.DataFrame) -> Tuple[int, int]:
+    """
+    Upsert one chunk into daily_prices and commit
+    Returns (rows written, rows rejected for an unparsable date)
+    """
+    dates = pd.to_datetime(chunk['date'], errors='coerce')
+    rejected = int((dates.isna() & chunk['date'].notna()).sum())
+    chunk = chunk.assign(date=dates).dropna(subset=['ticker', 'date', 'close'])
+    chunk = chunk.drop_duplicates(subset=['ticker', 'date'], keep='last')
+    if chunk.empty:
+        return 0, rejected
+
+    ticker_ids = get_ticker_ids(db, chunk['ticker'].unique().tolist())
+
+    frame = pd.DataFrame({'ticker_id': chunk['ticker'].map(ticker_ids).astype('int64')})
+    for source, target in PRICE_COLUMNS.items():
+        if source == 'ticker':
+            continue
+        if source == 'date':
+            frame[target] = chunk['date'].dt.date
+        elif source in chunk.columns:
+            frame[target] = chunk[source].astype('object').where(chunk[source].notna(), None)
+    if 'volume' in frame.columns:
+        frame['volume'] = frame['volume'].map(lambda v: None if v is None else int(v))
+
+    rows = frame.to_dict('records')
+    update_columns = [column for column in frame.columns if column not in ('ticker_id', 'price_date')]
+
+    try:
+        dialect = db.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+            stmt = dialect_insert(DailyPrice.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['ticker_id', 'price_date'],
+                set_={column: stmt.excluded[column] for column in update_columns}
+            )
+            db.execute(stmt, rows)
+        else:
+            # Portable fallback: replace the chunk's keys
+            db.query(DailyPrice).filter(or_(*[
+                and_(DailyPrice.ticker_id == row['ticker_id'], DailyPrice.price_date == row['price_date'])
+                for row in rows
+            ])).delete(synchronize_session=False)
+            db.execute(insert(DailyPrice.__table__), rows)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(rows), rejected
+
+def load_price_history(csv_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                       checkpoint_path: Optional[str] = None, resume: bool = True,
+                       db: Optional[Session] = None) -> Dict:
+    """
+    Load a price-history CSV into daily_prices chunk by chunk
+    Each chunk commits before the checkpoint advances, so a rerun after an
+    interruption skips only rows that are already in the database
+    """
+    checkpoint_path = checkpoint_path or checkpoint_path_for(csv_path)
+    start_offset, start_row = read_checkpoint(checkpoint_path, csv_path) if resume else (0, 0)
+    fingerprint = file_fingerprint(csv_path)
+
+    owns_session = db is None
+    db = db or SessionLocal()
+
+    rows_read = 0
+    rows_written = 0
+    rows_rejected = 0
+    try:
+        if start_offset:
+            logger.info(f"⏩ Resuming {csv_path} after row {start_row} (byte {start_offset})")
+
+        for chunk, offset in iter_price_chunks(csv_path, chunk_rows, offset=start_offset):
+            written, rejected = upsert_price_chunk(db, chunk)
+            record_rows('price_history_loader', 'daily_prices', written)
+            rows_written += written
+            rows_rejected += rejected
+            rows_read += len(chunk)
+            if rejected:
+                logger.warning(f"⚠️ Skipped {rejected} rows with unparsable dates before row {start_row + rows_read}")
+            write_checkpoint(checkpoint_path, fingerprint, offset, start_row + rows_read)
+            logger.info(f"📈 Committed {start_row + rows_read} rows from {Path(csv_path).name}")
+
+        invalidate_benchmark_cache()
+        invalidate_covariance_cache()
+        logger.info(f"✅ Loaded {rows_written} prices from {rows_read} rows ({rows_rejected} rejected)")
+        result = {
+            'status': 'success',
+            'start_row': start_row,
+            'rows_read': rows_read,
+            'rows_written': rows_written,
+            'rows_rejected': rows_rejected,
+            'rows_committed': start_row + rows_read,
+            'price_changes': calculate_price_changes_job(db=db)
+        }
+        export_job_metrics('price_history_loader')
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ Price history load stopped at row {start_row + rows_read}: {e}")
+        export_job_metrics('price_history_loader', succeeded=False)
+        return {
+            'status': 'error',
+            'error': str(e),
+            'start_row': start_row,
+            'rows_read': rows_read,
+            'rows_written': rows_written,
+            'rows_rejected': rows_rejected,
+            'rows_committed': start_row + rows_read
+        }
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from core.config import settings
+
+    parser = argparse.ArgumentParser(description="Stream a price-history CSV into daily_prices")
+    parser.add_argument("csv_path", nargs="?", default=settings.CSV_PATH, help="Price history CSV")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per transaction")
+    parser.add_argument("--checkpoint", type=str, help="Checkpoint file (default: <csv>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the first row")
+
+    args = parser.parse_args()
+
+    result = load_price_history(
+        args.csv_path,
+        chunk_rows=args.chunk_rows,
+        checkpoint_path=args.checkpoint,
+        resume=not args.restart
+    )
+    print(f"Price history load result: {result}")
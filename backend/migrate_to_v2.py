@@ -17,7 +17,8 @@ from domain.models_v2 import (
     PortfolioSummary, AssetCategory, create_all_tables
 )
 from services.portfolio_service_v2 import PortfolioServiceV2
-from core.logging import logger
+from services.portfolio_import import parse_portfolio_csv
+from core.logging import configure_logging
 
 def migrate_portfolio_data():
     """Migrate existing portfolio data to new normalized structure"""
@@ -46,51 +47,20 @@ def migrate_portfolio_data():
         # Step 2: Load original CSV data
         print("📊 Loading original CSV data...")
         csv_path = "../Portfolio CSV files/master_portfolio_new.csv"
-        df = pd.read_csv(csv_path)
         
-        # Group duplicates
-        grouped_df = df.groupby('symbol').agg({
-            'shares': 'sum',
-            'total_cost': 'sum', 
-            'total_value': 'sum',
-            'asset_type': 'first',
-            'account_name': 'first',
-            'purchase_price': 'mean'  # Average purchase price
-        }).reset_index()
+        import_result = parse_portfolio_csv(csv_path)
+        for error in import_result.errors:
+            print(f"❌ Row {error.row} ({error.symbol}): {error.field} - {error.message}")
         
-        print(f"📈 Loaded {len(grouped_df)} unique positions from CSV")
+        print(f"📈 Loaded {len(import_result.positions)} unique positions from CSV")
         
         # Step 3: Create portfolio positions
         print("💼 Creating portfolio positions...")
-        positions_created = 0
-        
-        for _, row in grouped_df.iterrows():
-            try:
-                # Calculate average price (weighted by shares)
-                avg_price = row['total_cost'] / row['shares'] if row['shares'] > 0 else row['purchase_price']
-                
-                # Create portfolio position
-                position = portfolio_service.add_portfolio_position(
-                    user_id=user.user_id,
-                    ticker=row['symbol'],
-                    units=row['shares'],
-                    avg_price=avg_price,
-                    buy_date=date(2025, 9, 23)  # Portfolio creation date
-                )
-                
-                positions_created += 1
-                
-                # Add asset category
-                category = AssetCategory(
-                    ticker=row['symbol'],
-                    category=row['asset_type']
-                )
-                db.add(category)
-                
-            except Exception as e:
-                print(f"❌ Failed to create position for {row['symbol']}: {e}")
-        
-        db.commit()
+        positions_created = portfolio_service.bulk_add_portfolio_positions(
+            user_id=user.user_id,
+            positions=import_result.records(),
+            buy_date=date(2025, 9, 23)  # Portfolio creation date
+        )
         print(f"✅ Created {positions_created} portfolio positions")
         
         # Step 4: Load historical price data from CSV
@@ -309,6 +279,7 @@ if __name__ == "__main__":
     print("✅ Created api_v2_normalized.py")
 
 if __name__ == "__main__":
+    configure_logging()
     print("🚀 Portfolio Database Migration Tool")
     print("📊 Converting to normalized table structure...")
     
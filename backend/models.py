@@ -204,21 +204,3 @@ class TopHoldings(Base):
     __table_args__ = (
         {"extend_existing": True}
     )
-
-class InsightsCache(Base):
-    __tablename__ = "insights_cache"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    metrics_hash = Column(String(64), nullable=False, index=True)  # SHA-256 hash of metrics
-    insights_text = Column(Text, nullable=False)
-    is_ai_generated = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
-    # Relationships
-    user = relationship("User")
-    
-    __table_args__ = (
-        {"extend_existing": True}
-    )
@@ -3,7 +3,6 @@ Real-time portfolio calculator using actual market data
 Fetches yesterday's closing prices and calculates current portfolio value
 """
 
-import yfinance as yf
 import requests
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Any
@@ -46,6 +45,8 @@ def get_yesterday_date():
 
 def fetch_stock_prices(tickers: List[str]) -> Dict[str, float]:
     """Fetch yesterday's closing prices for stocks using yfinance"""
+    import yfinance as yf
+
     prices = {}
     yesterday = get_yesterday_date()
     
@@ -95,6 +96,8 @@ def fetch_stock_prices(tickers: List[str]) -> Dict[str, float]:
 
 def fetch_crypto_prices(tickers: List[str]) -> Dict[str, float]:
     """Fetch current crypto prices (crypto markets are 24/7)"""
+    import yfinance as yf
+
     prices = {}
     
     print(f"₿ Fetching crypto prices...")
@@ -0,0 +1,130 @@
+"""
+Portora Server - Every API in One Process
+Serves the legacy, normalized, canonical and v3 holdings routers from one FastAPI
+app under versioned prefixes. They share core.database's engine and connection
+pool, daily_prices as the price store and the in-process caches (returns,
+benchmark series, classification index, insights) instead of one process per
+API each holding its own engine and caches against the same SQLite file
+
+Usage: uvicorn server:app --host 0.0.0.0 --port 8001
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, FastAPI, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from core.config import settings
+from core.database import db_manager
+from core.logging import configure_logging
+from core.profiling import instrument_app
+
+import api_backup
+import api_canonical
+import api_normalized
+import app as holdings_api
+
+logger = logging.getLogger(__name__)
+
+# Router name -> (router, prefix); the v3 holdings routes already carry /api/v3
+MOUNTS: Dict[str, Tuple[APIRouter, str]] = {
+    'legacy': (api_backup.router, "/api/v1"),
+    'normalized': (api_normalized.router, "/api/v2"),
+    'canonical': (api_canonical.router, "/api/v2/canonical"),
+    'holdings': (holdings_api.router, ""),
+}
+
+def create_app(unprefixed: Optional[List[str]] = None) -> FastAPI:
+    """
+    The composite app. Routers named in unprefixed (default UNPREFIXED_ROUTERS) are
+    also served at their old root paths, hidden from the schema, for clients that
+    still call the standalone APIs' paths
+    """
+    unprefixed = settings.UNPREFIXED_ROUTERS if unprefixed is None else unprefixed
+
+    @asynccontextmanager
+    async def lifespan(server: FastAPI):
+        configure_logging()
+        logger.info(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION} ({', '.join(MOUNTS)})")
+        try:
+            if settings.AUTO_MIGRATE:
+                db_manager.upgrade()
+            report = db_manager.readiness()
+            if report['ready']:
+                logger.info("✅ Database ready (schema %s)", report['checks']['schema']['current'])
+            else:
+                logger.warning("⚠️  Database not ready, run `alembic upgrade head`: %s", report['checks'])
+        except Exception as e:
+            logger.error(f"❌ Database initialization failed: {e}")
+
+        scheduler = None
+        if settings.PIPELINE_SCHEDULE:
+            from jobs.nightly_pipeline import build_nightly_pipeline  # Pulls in every batch job
+            from jobs.pipeline import PipelineScheduler
+
+            at = PipelineScheduler.parse_time(settings.PIPELINE_SCHEDULE)
+            scheduler = server.state.scheduler = PipelineScheduler(build_nightly_pipeline, at).start()
+        try:
+            yield
+        finally:
+            if scheduler is not None:
+                scheduler.stop(timeout=5)
+
+    server = FastAPI(
+        title=settings.APP_NAME,
+        description="Legacy, normalized, canonical and holdings APIs in one process",
+        version=settings.VERSION,
+        lifespan=lifespan,
+    )
+
+    # Per-request query counts (X-DB-Queries / X-DB-Time), slow query log and X-Profile captures
+    instrument_app(server)
+
+    server.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # System endpoints first so they win over the routers' own / and /health
+    @server.get("/", tags=["System"])
+    def root():
+        return {
+            "name": settings.APP_NAME,
+            "version": settings.VERSION,
+            "apis": {name: prefix or "/api/v3" for name, (_, prefix) in MOUNTS.items()},
+        }
+
+    @server.get("/health", tags=["System"])
+    def health_check():
+        return {"status": "healthy", "service": "portora-server"}
+
+    @server.get("/health/ready", tags=["System"])
+    def readiness_check():
+        """Readiness probe: database reachable and schema at the Alembic head (503 until then)"""
+        report = db_manager.readiness()
+        return JSONResponse(report, status_code=status.HTTP_200_OK if report['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    for name, (router, prefix) in MOUNTS.items():
+        server.include_router(router, prefix=prefix, tags=[name])
+    for name in unprefixed:
+        server.include_router(MOUNTS[name][0], include_in_schema=False)
+
+    return server
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    configure_logging()
+    uvicorn.run(app, host=settings.HOST, port=settings.PORT, log_level=settings.LOG_LEVEL.lower())
@@ -0,0 +1,180 @@
+"""
+Backfill Planner - Minimal Provider Requests for Missing Closes
+Compares the sessions each ticker's calendar says should have a close with what
+daily_prices holds, for every ticker at once, and turns the missing sessions
+into as few (ticker, start, end) requests as possible. Holidays and weekends
+are never gaps, and gaps a few stored sessions apart share one request.
+Sessions a provider already answered with no data are recorded in
+price_fetch_empty and count as filled, and the plan stops at each calendar's
+last completed session so a day still trading is not a gap
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from domain.models_v2 import DailyPrice, PriceFetchEmpty, Ticker, get_ticker_ids
+from services.trading_calendar import calendar_for
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class FetchSpan:
+    ticker: str
+    start: date
+    end: date
+    missing: int  # Sessions in the span without a stored close
+    sessions: int  # Sessions the request covers, bridged stored ones included
+
+def missing_spans(sessions: List[date], stored: Set[date], bridge_sessions: int = 0) -> List[Tuple[date, date, int, int]]:
+    """
+    (start, end, missing, sessions) runs of sessions not in stored. Runs with at
+    most bridge_sessions stored sessions between them are merged: refetching a
+    few closes costs less quota than another request
+    """
+    spans: List[List] = []
+    stored_since_gap = 0
+    for session in sessions:
+        if session in stored:
+            stored_since_gap += 1
+            continue
+        if spans and stored_since_gap <= bridge_sessions:
+            span = spans[-1]
+            span[1] = session
+            span[2] += 1
+            span[3] += stored_since_gap + 1
+        else:
+            spans.append([session, session, 1, 1])
+        stored_since_gap = 0
+    return [tuple(span) for span in spans]
+
+def stored_price_bounds(db: Session, tickers: List[str]) -> Dict[str, Tuple[date, date]]:
+    """ticker -> (first, last) stored close, one grouped query for every ticker"""
+    rows = (
+        db.query(Ticker.symbol, func.min(DailyPrice.price_date), func.max(DailyPrice.price_date))
+        .join(DailyPrice, DailyPrice.ticker_id == Ticker.ticker_id)
+        .filter(Ticker.symbol.in_(tickers))
+        .group_by(Ticker.symbol)
+        .all()
+    )
+    return {symbol: (first, last) for symbol, first, last in rows}
+
+def stored_price_dates(db: Session, tickers: List[str], start: date, end: date) -> Dict[str, Set[date]]:
+    """ticker -> dates with a stored close between start and end"""
+    rows = (
+        db.query(Ticker.symbol, DailyPrice.price_date)
+        .join(DailyPrice, DailyPrice.ticker_id == Ticker.ticker_id)
+        .filter(Ticker.symbol.in_(tickers), DailyPrice.price_date >= start, DailyPrice.price_date <= end)
+        .all()
+    )
+    dates: Dict[str, Set[date]] = defaultdict(set)
+    for symbol, price_date in rows:
+        dates[symbol].add(price_date)
+    return dates
+
+def fetched_empty_dates(db: Session, tickers: List[str], start: date, end: date) -> Dict[str, Set[date]]:
+    """ticker -> sessions between start and end a provider returned no close for"""
+    rows = (
+        db.query(Ticker.symbol, PriceFetchEmpty.price_date)
+        .join(PriceFetchEmpty, PriceFetchEmpty.ticker_id == Ticker.ticker_id)
+        .filter(Ticker.symbol.in_(tickers), PriceFetchEmpty.price_date >= start, PriceFetchEmpty.price_date <= end)
+        .all()
+    )
+    dates: Dict[str, Set[date]] = defaultdict(set)
+    for symbol, price_date in rows:
+        dates[symbol].add(price_date)
+    return dates
+
+def record_empty_fetches(db: Session, span: FetchSpan, asset_class: str, returned: Iterable[date],
+                         grace_days: Optional[int] = None) -> int:
+    """
+    Mark the span's sessions the provider returned no close for, so later plans
+    skip them. Only call this for a request that succeeded: a failed request
+    proves nothing. Sessions within grace_days (default BACKFILL_EMPTY_GRACE_DAYS)
+    of today are left unmarked, since a provider may publish them late. Adds to
+    the session without committing
+    """
+    calendar = calendar_for(asset_class)
+    if calendar is None:
+        return 0
+    grace_days = settings.BACKFILL_EMPTY_GRACE_DAYS if grace_days is None else grace_days
+    cutoff = date.today() - timedelta(days=grace_days)
+    returned = set(returned)
+    empty = [day for day in calendar.sessions(span.start, min(span.end, cutoff)) if day not in returned]
+    if not empty:
+        return 0
+
+    ticker_id = get_ticker_ids(db, [span.ticker])[span.ticker]
+    marked = {
+        row[0] for row in
+        db.query(PriceFetchEmpty.price_date)
+        .filter(PriceFetchEmpty.ticker_id == ticker_id, PriceFetchEmpty.price_date.in_(empty))
+        .all()
+    }
+    now = datetime.now()
+    db.add_all([PriceFetchEmpty(ticker_id=ticker_id, price_date=day, fetched_at=now) for day in empty if day not in marked])
+    logger.debug("📭 %s: %d sessions from %s to %s had no data", span.ticker, len(empty), span.start, span.end)
+    return len(empty)
+
+def plan_backfill(db: Session, tickers: Dict[str, str], end: Optional[date] = None, lookback_days: Optional[int] = None,
+                  history_days: Optional[int] = None, bridge_sessions: Optional[int] = None) -> Dict[str, List[FetchSpan]]:
+    """
+    Requests needed to fill every gap, keyed by ticker (tickers without gaps are left out)
+
+    tickers maps symbol -> asset class. Plans run to end, capped at (and by
+    default) each calendar's last completed session. Each ticker is checked from lookback_days
+    before that, or from the day after its last stored close if that is earlier,
+    so a stale ticker is filled all the way. Sessions before a ticker's first
+    stored close are not gaps (a listing date would look like one); a ticker with
+    no closes at all gets history_days (default lookback_days). Deeper history is
+    the CSV loader's job
+    """
+    lookback_days = settings.BACKFILL_LOOKBACK_DAYS if lookback_days is None else lookback_days
+    history_days = lookback_days if history_days is None else history_days
+    bridge_sessions = settings.BACKFILL_BRIDGE_SESSIONS if bridge_sessions is None else bridge_sessions
+
+    priced = {ticker: asset_class for ticker, asset_class in tickers.items() if calendar_for(asset_class) is not None}
+    if not priced:
+        return {}
+
+    # A session still trading (or not yet published) has no close to fetch, whatever end says
+    now = datetime.now().astimezone()
+    ends = {}
+    for ticker, asset_class in priced.items():
+        last_completed = calendar_for(asset_class).last_completed_session(now)
+        ends[ticker] = min(end, last_completed) if end else last_completed
+
+    bounds = stored_price_bounds(db, list(priced))
+    begins = {}
+    for ticker in priced:
+        if ticker in bounds:
+            first, last = bounds[ticker]
+            begins[ticker] = max(first, min(ends[ticker] - timedelta(days=lookback_days), last + timedelta(days=1)))
+        else:
+            begins[ticker] = ends[ticker] - timedelta(days=history_days)
+    known = [ticker for ticker in priced if ticker in bounds]
+    stored = stored_price_dates(db, known, min(begins[t] for t in known), max(ends.values())) if known else {}
+    empty = fetched_empty_dates(db, list(priced), min(begins.values()), max(ends.values()))
+
+    plan: Dict[str, List[FetchSpan]] = {}
+    for ticker, asset_class in priced.items():
+        sessions = calendar_for(asset_class).sessions(begins[ticker], ends[ticker])
+        spans = missing_spans(sessions, stored.get(ticker, set()) | empty.get(ticker, set()), bridge_sessions)
+        if spans:
+            plan[ticker] = [FetchSpan(ticker, *span) for span in spans]
+
+    requests = sum(len(spans) for spans in plan.values())
+    missing = sum(span.missing for spans in plan.values() for span in spans)
+    logger.info(f"🧭 Backfill plan: {missing} missing sessions across {len(plan)} tickers in {requests} requests")
+    return plan
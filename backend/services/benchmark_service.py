@@ -0,0 +1,182 @@
+"""
+Benchmark Service - Portfolio vs Index Comparison
+Benchmark close series are read from daily_prices once and cached in memory
+Excess return, tracking error and information ratio are computed for all users in one pass
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+import time
+import warnings
+from datetime import date
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.metrics import record_cache
+from core.database import SessionLocal
+from domain.models_v2 import DailyPrice
+from services.performance_engine import PERFORMANCE_PERIODS, last_valid_index, load_period_series, period_bounds
+from services.risk_metrics import TRADING_DAYS, flow_adjusted_returns
+
+if TYPE_CHECKING:
+    import pandas as pd  # Imported where used; pandas dominates API import time
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+BENCHMARK_FIELDS = ['portfolio_return', 'benchmark_return', 'excess_return', 'tracking_error', 'information_ratio']
+
+# ticker -> (loaded at, close series indexed by date); refreshed after settings.CACHE_TTL seconds
+_BENCHMARK_CACHE: Dict[str, Tuple[float, 'pd.Series']] = {}
+
+def invalidate_benchmark_cache(ticker: Optional[str] = None):
+    """Drop cached series for one ticker, or for all benchmarks"""
+    if ticker is None:
+        _BENCHMARK_CACHE.clear()
+    else:
+        _BENCHMARK_CACHE.pop(ticker, None)
+
+def benchmark_series(ticker: str, db: Optional[Session] = None) -> 'pd.Series':
+    """Full close history for a benchmark ticker, served from memory when fresh"""
+    cached = _BENCHMARK_CACHE.get(ticker)
+    if cached is not None and time.monotonic() - cached[0] < settings.CACHE_TTL:
+        record_cache('benchmark_series', True)
+        return cached[1]
+    record_cache('benchmark_series', False)
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        rows = (
+            db.query(DailyPrice.price_date, DailyPrice.close_price)
+            .filter(DailyPrice.ticker == ticker)
+            .order_by(DailyPrice.price_date)
+            .all()
+        )
+    finally:
+        if owns_session:
+            db.close()
+
+    import pandas as pd
+
+    series = pd.Series(
+        [r[1] for r in rows], index=[r[0] for r in rows], dtype=np.float64, name=ticker
+    )
+    _BENCHMARK_CACHE[ticker] = (time.monotonic(), series)
+    return series
+
+def align_benchmark(series: 'pd.Series', dates: List) -> Optional[np.ndarray]:
+    """Benchmark closes on the given dates, last close carried forward"""
+    if series.empty or not dates:
+        return None
+    return series.reindex(dates, method='ffill').to_numpy(dtype=np.float64)
+
+def benchmark_comparison_matrix(dates: List[date], values: np.ndarray, flows: Optional[np.ndarray],
+                                benchmark_values: np.ndarray, as_of: date,
+                                periods: List[str] = PERFORMANCE_PERIODS) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Portfolio vs benchmark for every user (row) over every period
+
+    portfolio_return and benchmark_return are cumulative percent over the
+    user's period bounds, excess_return is their difference in percentage
+    points. tracking_error is the annualized standard deviation of daily
+    active returns in percent and information_ratio the annualized mean
+    active return over it. Periods where the benchmark has no close at the
+    start, or fewer than two active returns exist, are NaN.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    flows = np.zeros_like(values) if flows is None else np.atleast_2d(np.asarray(flows, dtype=np.float64))
+    benchmark_values = np.asarray(benchmark_values, dtype=np.float64)
+    n_users, n_dates = values.shape
+    rows = np.arange(n_users)
+    finite = np.isfinite(values)
+    end_idx = last_valid_index(finite)
+
+    returns = flow_adjusted_returns(values, flows)
+    bench_returns = flow_adjusted_returns(benchmark_values)[0]
+    wealth = np.hstack([np.ones((n_users, 1)), np.cumprod(1.0 + np.nan_to_num(returns), axis=1)])
+    bench_wealth = np.concatenate([[1.0], np.cumprod(1.0 + np.nan_to_num(bench_returns))])
+    active = returns - bench_returns
+    steps = np.arange(n_dates - 1)
+
+    results = {}
+    for period in periods:
+        col, start_idx, partial, valid = period_bounds(dates, finite, end_idx, as_of, period)
+        valid = valid & np.isfinite(benchmark_values[start_idx])
+
+        in_period = (steps >= start_idx[:, np.newaxis]) & (steps < end_idx[:, np.newaxis])
+        period_active = np.where(in_period, active, np.nan)
+        n_active = np.isfinite(period_active).sum(axis=1)
+
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            portfolio_return = wealth[rows, end_idx] / wealth[rows, start_idx] - 1.0
+            benchmark_return = bench_wealth[end_idx] / bench_wealth[start_idx] - 1.0
+            active_std = np.nanstd(period_active, axis=1, ddof=1)
+            active_mean = np.nanmean(period_active, axis=1)
+            information_ratio = np.where(active_std > 0, active_mean / active_std * np.sqrt(TRADING_DAYS), np.nan)
+
+        enough = n_active >= 2
+        period_result = {
+            'start_idx': start_idx,
+            'end_idx': end_idx,
+            'portfolio_return': portfolio_return * 100,
+            'benchmark_return': benchmark_return * 100,
+            'excess_return': (portfolio_return - benchmark_return) * 100,
+            'tracking_error': np.where(enough, active_std * np.sqrt(TRADING_DAYS) * 100, np.nan),
+            'information_ratio': np.where(enough, information_ratio, np.nan),
+            'partial': partial,
+            'valid': valid,
+        }
+        for name in BENCHMARK_FIELDS:
+            period_result[name] = np.where(valid, period_result[name], np.nan)
+        results[period] = period_result
+    return results
+
+class BenchmarkService:
+    """Compares every user's daily value series with the configured benchmarks"""
+
+    def __init__(self, db: Session, tickers: Optional[List[str]] = None):
+        self.db = db
+        self.tickers = tickers or settings.BENCHMARK_TICKERS
+
+    def compare(self, as_of: date, user_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Dict[str, Dict]]]:
+        """user_id -> ticker -> period -> comparison; NaN fields come back as None"""
+        users, dates, values, flows = load_period_series(self.db, as_of, user_ids)
+        if not users:
+            return {}
+
+        results = {user_id: {} for user_id in users}
+        for ticker in self.tickers:
+            benchmark = align_benchmark(benchmark_series(ticker, self.db), dates)
+            if benchmark is None:
+                logger.warning(f"⚠️ No prices for benchmark {ticker}")
+                continue
+
+            matrix = benchmark_comparison_matrix(dates, values, flows, benchmark, as_of)
+            for i, user_id in enumerate(users):
+                periods = {}
+                for period, columns in matrix.items():
+                    if not columns['valid'][i]:
+                        continue
+                    row = {
+                        'start_date': dates[columns['start_idx'][i]],
+                        'end_date': dates[columns['end_idx'][i]],
+                        'partial': bool(columns['partial'][i]),
+                    }
+                    for name in BENCHMARK_FIELDS:
+                        value = float(columns[name][i])
+                        row[name] = None if np.isnan(value) else value
+                    periods[period] = row
+                results[user_id][ticker] = periods
+        return results
+
+    def compare_user(self, user_id: int, as_of: date) -> Dict[str, Dict[str, Dict]]:
+        """Benchmark comparison for a single user"""
+        return self.compare(as_of, [user_id]).get(user_id, {})
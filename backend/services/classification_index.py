@@ -0,0 +1,176 @@
+"""
+Classification Index - Ticker to Asset Class, Sector and Industry
+Loaded once from the bundled seed file and the asset_categories table, then shared
+by every service as an in-memory dict; writes to AssetCategory drop the cached index
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from domain.models_v2 import AssetCategory
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Asset class constants
+ASSET_CLASSES = {
+    'STOCK': 'STOCK',
+    'BOND_ETF': 'BOND_ETF',
+    'CRYPTO': 'CRYPTO',
+    'CASH': 'CASH',
+    'BOND_CASH': 'BOND_CASH'
+}
+
+# Asset class -> plural group name used by the daily jobs' categorizations
+ASSET_CLASS_GROUPS = {
+    ASSET_CLASSES['STOCK']: 'stocks',
+    ASSET_CLASSES['BOND_ETF']: 'bond_etfs',
+    ASSET_CLASSES['CRYPTO']: 'crypto',
+    ASSET_CLASSES['BOND_CASH']: 'bond_cash',
+    ASSET_CLASSES['CASH']: 'cash',
+}
+
+SEED_PATH = Path(__file__).parent.parent / "domain" / "asset_classifications.json"
+UNKNOWN_SECTOR = 'Other'
+
+# Free-form AssetCategory.category values that decide the asset class; other
+# values ("Stock", "ETF") keep the seed's class or the naming rules
+CATEGORY_ASSET_CLASSES = {
+    'bond': ASSET_CLASSES['BOND_ETF'],
+    'bond etf': ASSET_CLASSES['BOND_ETF'],
+    'bond_etf': ASSET_CLASSES['BOND_ETF'],
+    'fixed income': ASSET_CLASSES['BOND_ETF'],
+    'crypto': ASSET_CLASSES['CRYPTO'],
+    'cryptocurrency': ASSET_CLASSES['CRYPTO'],
+    'cash': ASSET_CLASSES['CASH'],
+    'bond_cash': ASSET_CLASSES['BOND_CASH'],
+}
+
+# Category values (broker asset types included) that name no class of their own;
+# the ticker's seed class or the naming rules decide
+PASSTHROUGH_CATEGORIES = {'stock', 'etf', 'stock/etf', 'international', 'other'}
+
+@dataclass(frozen=True)
+class Classification:
+    asset_class: str
+    category: str
+    sector: str = UNKNOWN_SECTOR
+    industry: Optional[str] = None
+
+def classify_unknown(ticker: str) -> Classification:
+    """Naming rules for tickers that are in neither the seed file nor the table"""
+    if ticker.upper().startswith('CASH'):
+        return Classification(ASSET_CLASSES['CASH'], 'Cash', 'Cash')
+    if ticker.startswith('BOND_CASH'):
+        return Classification(ASSET_CLASSES['BOND_CASH'], 'Bond Cash', 'Fixed Income')
+    if 'USD' in ticker:
+        return Classification(ASSET_CLASSES['CRYPTO'], 'Crypto', 'Crypto')
+    return Classification(ASSET_CLASSES['STOCK'], 'Stock')
+
+def is_known_category(category: Optional[str]) -> bool:
+    """Blank, class-deciding or passthrough category"""
+    key = (category or '').strip().lower()
+    return not key or key in CATEGORY_ASSET_CLASSES or key in PASSTHROUGH_CATEGORIES
+
+class ClassificationIndex:
+    """O(1) ticker lookups over the merged seed and table entries"""
+
+    def __init__(self, entries: Dict[str, Classification]):
+        self.entries = entries
+
+    def lookup(self, ticker: str) -> Optional[Classification]:
+        """Stored classification, None for tickers the index does not know"""
+        return self.entries.get(ticker)
+
+    def classify(self, ticker: str) -> Classification:
+        # Cash sleeves are named per account (CASH_*, BOND_CASH_*) and never listed
+        if ticker.upper().startswith('CASH') or ticker.startswith('BOND_CASH'):
+            return classify_unknown(ticker)
+        return self.entries.get(ticker) or classify_unknown(ticker)
+
+    def asset_class(self, ticker: str) -> str:
+        return self.classify(ticker).asset_class
+
+    def category_asset_class(self, category: Optional[str], ticker: str) -> Optional[str]:
+        """Class for a ticker filed under a free-form category, None when the category is unknown"""
+        if not is_known_category(category):
+            return None
+        return CATEGORY_ASSET_CLASSES.get((category or '').strip().lower()) or self.asset_class(ticker)
+
+    def sector(self, ticker: str) -> str:
+        return self.classify(ticker).sector
+
+    def group_by_sector(self, values: Dict[str, float]) -> Dict[str, float]:
+        """Sum of values per sector, e.g. position value by ticker -> value by sector"""
+        totals: Dict[str, float] = {}
+        for ticker, value in values.items():
+            sector = self.sector(ticker)
+            totals[sector] = totals.get(sector, 0.0) + value
+        return totals
+
+def load_seed(path: Path = SEED_PATH) -> Dict[str, Classification]:
+    """Bundled classifications, keyed by ticker"""
+    with open(path) as f:
+        return {
+            row['ticker']: Classification(row['asset_class'], row['category'], row.get('sector') or UNKNOWN_SECTOR, row.get('industry'))
+            for row in json.load(f)
+        }
+
+def merge_categories(entries: Dict[str, Classification], rows: Iterable) -> Dict[str, Classification]:
+    """Overlay AssetCategory rows on the seed; missing sector/industry keep the seed's"""
+    merged = dict(entries)
+    for row in rows:
+        seeded = merged.get(row.ticker) or classify_unknown(row.ticker)
+        merged[row.ticker] = Classification(
+            CATEGORY_ASSET_CLASSES.get((row.category or '').strip().lower(), seeded.asset_class),
+            row.category,
+            row.sector or seeded.sector,
+            row.industry or seeded.industry,
+        )
+    return merged
+
+_CLASSIFICATION_INDEX: Optional[ClassificationIndex] = None
+
+def invalidate_classification_index():
+    """Drop the cached index; the next lookup reloads it"""
+    global _CLASSIFICATION_INDEX
+    _CLASSIFICATION_INDEX = None
+
+def classification_index(db: Optional[Session] = None) -> ClassificationIndex:
+    """The shared index, loaded on first use"""
+    global _CLASSIFICATION_INDEX
+    if _CLASSIFICATION_INDEX is not None:
+        return _CLASSIFICATION_INDEX
+
+    entries = load_seed()
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        entries = merge_categories(entries, db.query(AssetCategory).all())
+    except Exception as e:
+        if owns_session:
+            db.rollback()
+        logger.warning(f"⚠️ asset_categories unavailable, using bundled classifications only: {e}")
+    finally:
+        if owns_session:
+            db.close()
+
+    _CLASSIFICATION_INDEX = ClassificationIndex(entries)
+    logger.info(f"🗂️ Classification index loaded: {len(entries)} tickers")
+    return _CLASSIFICATION_INDEX
+
+@event.listens_for(AssetCategory, "after_insert")
+@event.listens_for(AssetCategory, "after_update")
+@event.listens_for(AssetCategory, "after_delete")
+def _asset_category_changed(mapper, connection, target):
+    invalidate_classification_index()
@@ -0,0 +1,321 @@
+"""
+Covariance Cache - Rolling Asset Covariance and Diversification
+Keeps pairwise-complete sums over the last N daily returns of every held ticker
+New price days are added (and expired days subtracted) as rank-k updates instead of
+recomputing the window; portfolio variance, effective number of bets and risk
+contributions are then matrix operations over all users at once
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+import math
+import threading
+from collections import deque
+from datetime import date, timedelta
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from domain.models_v2 import DailyPrice, Portfolio, Ticker
+from services.projection_engine import load_holding_weights
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Volatility (annualized percent) -> risk level, first bound that is not exceeded
+RISK_LEVELS = [(8.0, 'Low'), (15.0, 'Medium'), (25.0, 'Medium-High'), (math.inf, 'High')]
+
+class RollingCovariance:
+    """
+    Covariance over the last `window` return observations, one row per price date
+
+    A ticker without a close on a date has no return there; each pair's
+    covariance uses only the dates where both have one. Returns are measured
+    from each ticker's previous known close, so gaps (weekends for stocks)
+    fold into the next return.
+    """
+
+    def __init__(self, keys: List[Hashable], window: int):
+        self.keys = list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.window = window
+        n = len(self.keys)
+        self.count = np.zeros((n, n))
+        self.sum_x = np.zeros((n, n))  # sum_x[i, j] = sum of x_i over dates where i and j both have a return
+        self.sum_xx = np.zeros((n, n))
+        self.last_close = np.full(n, np.nan)
+        self.last_date: Optional[date] = None
+        self.since: Optional[date] = None  # first price date read is after this
+        self.signature = (0, 0.0)  # (count, sum of closes) over (since, last_date] when last read
+        self.days = deque()  # (date, returns, mask) in window order
+
+    def _apply(self, returns: np.ndarray, mask: np.ndarray, sign: float):
+        m = mask.astype(np.float64)
+        x = np.where(mask, returns, 0.0)
+        self.count += sign * (m.T @ m)
+        self.sum_x += sign * (x.T @ m)
+        self.sum_xx += sign * (x.T @ x)
+
+    def extend(self, dates: List[date], closes: np.ndarray):
+        """Add consecutive price dates; closes is (dates x keys) with NaN where missing"""
+        import pandas as pd
+
+        closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+        if not len(dates):
+            return
+
+        # Previous known close per ticker, carried across dates without a price
+        filled = pd.DataFrame(np.vstack([self.last_close, closes])).ffill().to_numpy()
+        previous = filled[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = closes / previous - 1.0
+        mask = np.isfinite(returns) & (previous > 0)
+        returns = np.where(mask, returns, 0.0)
+
+        self._apply(returns, mask, 1.0)
+        self.days.extend(zip(dates, returns, mask))
+
+        expired = len(self.days) - self.window
+        if expired > 0:
+            old = [self.days.popleft() for _ in range(expired)]
+            self._apply(np.array([d[1] for d in old]), np.array([d[2] for d in old]), -1.0)
+
+        self.last_close = filled[-1]
+        self.last_date = dates[-1]
+
+    def covariance(self, keys: Optional[List[Hashable]] = None) -> np.ndarray:
+        """Daily covariance for keys (all keys by default); pairs with fewer than two shared returns are 0"""
+        idx = np.arange(len(self.keys)) if keys is None else np.array([self.index[key] for key in keys], dtype=int)
+        count = self.count[np.ix_(idx, idx)]
+        sum_x = self.sum_x[np.ix_(idx, idx)]
+        sum_xx = self.sum_xx[np.ix_(idx, idx)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (sum_xx - sum_x * sum_x.T / count) / (count - 1)
+        return np.where(count >= 2, cov, 0.0)
+
+    def correlation(self, keys: Optional[List[Hashable]] = None) -> np.ndarray:
+        """Correlation matrix; tickers without variance correlate 0 with everything"""
+        cov = self.covariance(keys)
+        std = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        corr = np.where(np.outer(std, std) > 0, corr, 0.0)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, 0.0))
+        return np.clip(corr, -1.0, 1.0)
+
+    def observations_per_year(self) -> float:
+        """Return observations per calendar year in the current window"""
+        if len(self.days) < 2:
+            return 252.0
+        span = (self.days[-1][0] - self.days[0][0]).days
+        return (len(self.days) - 1) * 365.0 / span if span > 0 else 252.0
+
+def diversification_metrics(weights: np.ndarray, covariance: np.ndarray,
+                            periods_per_year: float = 252.0) -> Dict[str, np.ndarray]:
+    """
+    Portfolio variance, effective number of bets and risk contributions for every user
+
+    weights is (users x assets) fractions of value, covariance (assets x
+    assets) per period. risk_contribution rows sum to 1 for users with risk.
+    effective_bets is the squared diversification ratio, weighted average
+    asset volatility over portfolio volatility (1 = one bet or perfectly
+    correlated holdings, k = k equal uncorrelated bets).
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    covariance = np.atleast_2d(np.asarray(covariance, dtype=np.float64))
+
+    marginal = weights @ covariance
+    variance = np.einsum('ij,ij->i', marginal, weights)
+    has_risk = variance > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contribution = np.where(has_risk[:, None], weights * marginal / variance[:, None], 0.0)
+        weighted_volatility = np.abs(weights) @ np.sqrt(np.maximum(np.diag(covariance), 0.0))
+        effective_bets = np.where(has_risk, weighted_volatility ** 2 / variance, np.nan)
+
+    return {
+        'variance': variance,
+        'volatility': np.sqrt(np.maximum(variance, 0.0) * periods_per_year) * 100,
+        'effective_bets': effective_bets,
+        'risk_contribution': contribution,
+    }
+
+def diversification_score(effective_bets: float) -> int:
+    """0-100 score, 100 * (1 - 1 / effective bets); one bet scores 0"""
+    if effective_bets is None or not np.isfinite(effective_bets) or effective_bets < 1:
+        return 0
+    return int(round(100 * (1 - 1 / effective_bets)))
+
+def risk_level(volatility: Optional[float]) -> str:
+    if volatility is None or not np.isfinite(volatility):
+        return 'Unknown'
+    return next(level for bound, level in RISK_LEVELS if volatility <= bound)
+
+_COVARIANCE_CACHE: Optional[RollingCovariance] = None
+# Held while the shared window is checked, extended or read, so concurrent
+# requests neither add the same days twice nor see a half-applied update
+_COVARIANCE_LOCK = threading.RLock()
+
+def invalidate_covariance_cache():
+    """Drop the cached window, e.g. after historical prices were rewritten"""
+    global _COVARIANCE_CACHE
+    with _COVARIANCE_LOCK:
+        _COVARIANCE_CACHE = None
+
+def _price_signature(db: Session, keys: List[Hashable], since: date, until: date):
+    """(count, sum of closes) of the keys' daily_prices rows on (since, until]"""
+    count, total = (
+        db.query(func.count(DailyPrice.price_id), func.sum(DailyPrice.close_price))
+        .filter(
+            and_(
+                DailyPrice.ticker_id.in_(keys),
+                DailyPrice.price_date > since,
+                DailyPrice.price_date <= until
+            )
+        )
+        .one()
+    )
+    return int(count or 0), float(total or 0.0)
+
+def _same_signature(a, b) -> bool:
+    return a[0] == b[0] and math.isclose(a[1], b[1], rel_tol=1e-12, abs_tol=1e-9)
+
+def _load_closes(db: Session, cache: RollingCovariance, since: date, as_of: date):
+    """Extend cache with the held tickers' closes on (since, as_of]"""
+    import pandas as pd
+
+    rows = (
+        db.query(DailyPrice.price_date, DailyPrice.ticker_id, DailyPrice.close_price)
+        .filter(
+            and_(
+                DailyPrice.ticker_id.in_(cache.keys),
+                DailyPrice.price_date > since,
+                DailyPrice.price_date <= as_of
+            )
+        )
+        .all()
+    )
+    if not rows:
+        return 0
+
+    closes = (
+        pd.DataFrame(rows, columns=['price_date', 'ticker_id', 'close_price'])
+        .pivot_table(index='price_date', columns='ticker_id', values='close_price', aggfunc='last')
+        .sort_index()
+        .reindex(columns=cache.keys)
+    )
+    cache.extend(closes.index.tolist(), closes.to_numpy(dtype=np.float64))
+    return len(closes)
+
+def refresh_covariance(db: Session, as_of: date, window: Optional[int] = None) -> RollingCovariance:
+    """
+    Bring the process-wide covariance cache up to as_of
+
+    Only dates after the last cached date are read. The window is rebuilt
+    when a newly held ticker appears, the window size changes, or the
+    count/sum of closes already read no longer matches daily_prices (a late
+    close, backfill or rewrite for an earlier date, from any writer); an
+    as_of before the cached date gets a one-off window that is not kept.
+    """
+    global _COVARIANCE_CACHE
+    window = window or settings.COVARIANCE_WINDOW
+
+    with _COVARIANCE_LOCK:
+        held = sorted(
+            r[0] for r in db.query(Portfolio.ticker_id).filter(Portfolio.ticker_id.isnot(None)).distinct().all()
+        )
+        cache = _COVARIANCE_CACHE
+        historical = cache is not None and cache.last_date is not None and as_of < cache.last_date
+        if cache is None or historical or cache.window != window or not set(held) <= set(cache.index):
+            cache = RollingCovariance(held, window)
+        elif cache.last_date is not None and not _same_signature(
+                _price_signature(db, cache.keys, cache.since, cache.last_date), cache.signature):
+            logger.info("🧮 Covariance cache: earlier closes changed, rebuilding window")
+            cache = RollingCovariance(held, window)
+
+        if cache.last_date is None:
+            # Stock-only windows have ~5 observations per 7 days; one extra week seeds the first close
+            cache.since = as_of - timedelta(days=math.ceil(window * 7 / 5) + 7)
+            since = cache.since
+        else:
+            since = cache.last_date
+
+        if cache.keys:
+            # Signed before reading, so a write racing the read forces a rebuild rather than being missed
+            signature = _price_signature(db, cache.keys, cache.since, as_of)
+            added = _load_closes(db, cache, since, as_of)
+            if added:
+                cache.signature = signature
+                logger.info(f"🧮 Covariance cache: +{added} days, {len(cache.keys)} tickers, {len(cache.days)} in window")
+
+        if not historical:
+            _COVARIANCE_CACHE = cache
+        return cache
+
+class DiversificationService:
+    """Covariance-based diversification for one or many users"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def compute(self, as_of: date, user_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+        """score, risk_level, volatility (annualized %), effective_bets and per-ticker risk contributions (%)"""
+        users, ticker_ids, weights, _ = load_holding_weights(self.db, as_of, user_ids)
+        with _COVARIANCE_LOCK:
+            cache = refresh_covariance(self.db, as_of)
+            if not users or not ticker_ids:
+                return {}
+            known = [t for t in ticker_ids if t in cache.index]
+            covariance = cache.covariance(known)
+            periods_per_year = cache.observations_per_year()
+
+        columns = [ticker_ids.index(t) for t in known]
+        metrics = diversification_metrics(weights[:, columns], covariance, periods_per_year)
+
+        symbols = dict(self.db.query(Ticker.ticker_id, Ticker.symbol).filter(Ticker.ticker_id.in_(known)).all())
+        results = {}
+        for i, user_id in enumerate(users):
+            volatility = float(metrics['volatility'][i])
+            bets = float(metrics['effective_bets'][i])
+            results[user_id] = {
+                'score': diversification_score(bets),
+                'risk_level': risk_level(volatility if metrics['variance'][i] > 0 else None),
+                'volatility': volatility,
+                'effective_bets': None if np.isnan(bets) else bets,
+                'risk_contributions': {
+                    symbols.get(ticker_id, str(ticker_id)): float(metrics['risk_contribution'][i, j] * 100)
+                    for j, ticker_id in enumerate(known)
+                    if weights[i, columns[j]] != 0
+                },
+            }
+        return results
+
+    def for_user(self, user_id: int, as_of: date) -> Optional[Dict]:
+        return self.compute(as_of, [user_id]).get(user_id)
+
+def refresh_covariance_job(as_of: Optional[date] = None, db: Optional[Session] = None) -> Dict:
+    """
+    Daily job: roll the covariance window forward to as_of
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        cache = refresh_covariance(db, as_of)
+        return {'status': 'success', 'as_of': as_of.isoformat(), 'tickers': len(cache.keys), 'observations': len(cache.days)}
+
+    except Exception as e:
+        logger.error(f"❌ Covariance refresh failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
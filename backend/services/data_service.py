@@ -3,8 +3,8 @@ Data Service - Perfect Data Layer
 Clean, efficient, single responsibility
 """
 
-import pandas as pd
-from typing import List, Optional, Dict
+import logging
+from typing import TYPE_CHECKING, List, Optional, Dict
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc
 from datetime import date, datetime
@@ -12,7 +12,11 @@ from pathlib import Path
 
 from domain.models import User, PortfolioHolding, MarketData
 from core.config import settings
-from core.logging import logger
+
+if TYPE_CHECKING:
+    import pandas as pd  # Loaded on first CSV read, not at API startup
+
+logger = logging.getLogger(__name__)
 
 class DataService:
     """Perfect data service - single source of truth"""
@@ -79,8 +83,10 @@ class DataService:
             return False
     
     # Market data operations
-    def load_csv_data(self) -> pd.DataFrame:
+    def load_csv_data(self) -> 'pd.DataFrame':
         """Load historical data from CSV with caching"""
+        import pandas as pd
+
         try:
             if not Path(self.csv_path).exists():
                 logger.error(f"CSV file not found: {self.csv_path}")
@@ -128,8 +134,10 @@ class DataService:
         logger.debug(f"No data found for ticker: {ticker}")
         return None
     
-    def get_price_range(self, ticker: str, start_date: date, end_date: date) -> pd.DataFrame:
+    def get_price_range(self, ticker: str, start_date: date, end_date: date) -> 'pd.DataFrame':
         """Get price data for ticker in date range"""
+        import pandas as pd
+
         df = self.load_csv_data()
         if df.empty:
             return pd.DataFrame()
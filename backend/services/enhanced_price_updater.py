@@ -18,11 +18,19 @@ from sqlalchemy import func, and_
 
 # Database imports
 from core.database import SessionLocal
-from domain.models_v2 import DailyPrice, Portfolio, User
+from core.logging import configure_logging
+from domain.models_v2 import DailyPrice, Portfolio, User, get_ticker_ids
 from core.config import settings
+from core.metrics import (
+    export_job_metrics, record_provider_response, record_rows, record_stage, time_provider_fetch, time_stage
+)
+from services.benchmark_service import invalidate_benchmark_cache
+from services.movers_engine import calculate_price_changes_job
+from services.backfill_planner import plan_backfill, record_empty_fetches
+from services.classification_index import ASSET_CLASSES, classification_index
+from services.trading_calendar import calendar_for
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EnhancedPriceUpdater:
@@ -37,8 +45,8 @@ class EnhancedPriceUpdater:
         self.twelve_data_api_key = os.getenv('TWELVE_DATA_API_KEY')
         
         # API endpoints
-        self.alpaca_base_url = "https://paper-api.alpaca.markets"  # or "https://api.alpaca.markets" for live
-        self.twelve_data_base_url = "https://api.twelvedata.com"
+        self.alpaca_base_url = settings.ALPACA_BASE_URL
+        self.twelve_data_base_url = settings.TWELVE_DATA_BASE_URL
         
         # Rate limiting
         self.alpaca_rate_limit = 200  # requests per minute
@@ -55,8 +63,9 @@ class EnhancedPriceUpdater:
         
         return latest_record
     
-    def get_missing_dates(self, ticker: str, start_date: date, end_date: date) -> List[date]:
-        """Get list of missing dates for a ticker between start and end dates"""
+    def get_missing_dates(self, ticker: str, start_date: date, end_date: date,
+                          asset_class: str = ASSET_CLASSES['STOCK']) -> List[date]:
+        """Sessions of the asset class's trading calendar between start and end dates without a stored close"""
         
         # Get existing dates for this ticker
         existing_dates = (
@@ -73,23 +82,21 @@ class EnhancedPriceUpdater:
         
         existing_date_set = {d[0] for d in existing_dates}
         
-        # Generate all business days in range (excluding weekends)
-        missing_dates = []
-        current_date = start_date
-        while current_date <= end_date:
-            # Skip weekends (0=Monday, 6=Sunday)
-            if current_date.weekday() < 5 and current_date not in existing_date_set:
-                missing_dates.append(current_date)
-            current_date += timedelta(days=1)
-        
-        return missing_dates
+        # Holidays and weekends have no close, so they are never missing
+        calendar = calendar_for(asset_class)
+        if calendar is None:
+            return []
+        return [d for d in calendar.sessions(start_date, end_date) if d not in existing_date_set]
     
-    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Alpaca API for stocks and bond ETFs"""
+    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Alpaca API for stocks and bond ETFs
+        Returns [] when the provider has none for the range, None when the request failed
+        """
         
         if not self.alpaca_api_key or not self.alpaca_secret_key:
             logger.error("Alpaca API credentials not found")
-            return []
+            return None
         
         headers = {
             'APCA-API-KEY-ID': self.alpaca_api_key,
@@ -111,14 +118,16 @@ class EnhancedPriceUpdater:
         }
         
         try:
-            logger.info(f"Fetching Alpaca data for {ticker} from {start_str} to {end_str}")
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            logger.info("Fetching Alpaca data for %s from %s to %s", ticker, start_str, end_str)
+            with time_provider_fetch('alpaca') as fetch:
+                response = requests.get(url, headers=headers, params=params, timeout=30)
+                record_provider_response('alpaca', response, fetch)
             response.raise_for_status()
             
             data = response.json()
             
             if 'bars' not in data or not data['bars']:
-                logger.warning(f"No Alpaca data found for {ticker}")
+                logger.warning("No Alpaca data found for %s", ticker)
                 return []
             
             prices = []
@@ -135,22 +144,25 @@ class EnhancedPriceUpdater:
                     'volume': int(bar['v']) if bar['v'] else None
                 })
             
-            logger.info(f"✅ Fetched {len(prices)} Alpaca price records for {ticker}")
+            logger.info("✅ Fetched %d Alpaca price records for %s", len(prices), ticker)
             return prices
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Alpaca API error for {ticker}: {e}")
-            return []
+            logger.error("❌ Alpaca API error for %s: %s", ticker, e)
+            return None
         except Exception as e:
-            logger.error(f"❌ Unexpected error fetching Alpaca data for {ticker}: {e}")
-            return []
+            logger.error("❌ Unexpected error fetching Alpaca data for %s: %s", ticker, e)
+            return None
     
-    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Twelve Data API for crypto"""
+    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Twelve Data API for crypto
+        Returns [] when the provider has none for the range, None when the request failed
+        """
         
         if not self.twelve_data_api_key:
             logger.error("Twelve Data API key not found")
-            return []
+            return None
         
         # Format dates for Twelve Data API
         start_str = start_date.strftime('%Y-%m-%d')
@@ -168,14 +180,24 @@ class EnhancedPriceUpdater:
         }
         
         try:
-            logger.info(f"Fetching Twelve Data for {ticker} from {start_str} to {end_str}")
-            response = requests.get(url, params=params, timeout=30)
+            logger.info("Fetching Twelve Data for %s from %s to %s", ticker, start_str, end_str)
+            with time_provider_fetch('twelve_data') as fetch:
+                response = requests.get(url, params=params, timeout=30)
+                # Rate limits arrive as 200s with code 429 in the body
+                data = response.json() if response.status_code == 200 else None
+                record_provider_response('twelve_data', response, fetch, body=data)
             response.raise_for_status()
             
-            data = response.json()
+            # Errors come back as 200s; "no data" for the range is an answer, anything else a failure
+            if data.get('status') == 'error':
+                if 'no data' in str(data.get('message', '')).lower():
+                    logger.warning("No Twelve Data found for %s", ticker)
+                    return []
+                logger.error("❌ Twelve Data API error for %s: %s", ticker, data.get('message'))
+                return None
             
             if 'values' not in data or not data['values']:
-                logger.warning(f"No Twelve Data found for {ticker}")
+                logger.warning("No Twelve Data found for %s", ticker)
                 return []
             
             prices = []
@@ -192,15 +214,15 @@ class EnhancedPriceUpdater:
                     'volume': int(float(item['volume'])) if item.get('volume') else None
                 })
             
-            logger.info(f"✅ Fetched {len(prices)} Twelve Data price records for {ticker}")
+            logger.info("✅ Fetched %d Twelve Data price records for %s", len(prices), ticker)
             return prices
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Twelve Data API error for {ticker}: {e}")
-            return []
+            logger.error("❌ Twelve Data API error for %s: %s", ticker, e)
+            return None
         except Exception as e:
-            logger.error(f"❌ Unexpected error fetching Twelve Data for {ticker}: {e}")
-            return []
+            logger.error("❌ Unexpected error fetching Twelve Data for %s: %s", ticker, e)
+            return None
     
     def bulk_insert_prices(self, all_prices: List[Dict]) -> int:
         """Bulk insert all prices for efficiency"""
@@ -211,13 +233,18 @@ class EnhancedPriceUpdater:
         inserted_count = 0
         
         try:
+            # Resolve symbols to integer ticker ids once for the whole batch
+            ticker_ids = get_ticker_ids(self.db, {p['ticker'] for p in all_prices})
+            
             for price_data in all_prices:
+                ticker_id = ticker_ids[price_data['ticker']]
+                
                 # Check if price already exists
                 existing = (
                     self.db.query(DailyPrice)
                     .filter(
                         and_(
-                            DailyPrice.ticker == price_data['ticker'],
+                            DailyPrice.ticker_id == ticker_id,
                             DailyPrice.price_date == price_data['price_date']
                         )
                     )
@@ -227,7 +254,7 @@ class EnhancedPriceUpdater:
                 if not existing:
                     # Insert new price
                     daily_price = DailyPrice(
-                        ticker=price_data['ticker'],
+                        ticker_id=ticker_id,
                         price_date=price_data['price_date'],
                         close_price=price_data['close_price'],
                         open_price=price_data.get('open_price'),
@@ -252,7 +279,8 @@ class EnhancedPriceUpdater:
             logger.error(f"❌ Failed to prepare prices for bulk insert: {e}")
             return 0
 
-def update_daily_prices(stock_tickers: List[str], bond_etf_tickers: List[str], crypto_tickers: List[str]) -> Dict[str, any]:
+def update_daily_prices(stock_tickers: List[str], bond_etf_tickers: List[str], crypto_tickers: List[str],
+                        price_changes: bool = True) -> Dict[str, any]:
     """
     Enhanced function to update daily prices for different asset types
     
@@ -260,6 +288,8 @@ def update_daily_prices(stock_tickers: List[str], bond_etf_tickers: List[str], c
         stock_tickers: List of stock ticker symbols
         bond_etf_tickers: List of bond ETF ticker symbols  
         crypto_tickers: List of crypto ticker symbols
+        price_changes: Recompute day-over-day changes afterwards (the pipeline runs
+            that once, after every fetch stage)
         
     Returns:
         Dictionary with update statistics
@@ -282,138 +312,91 @@ def update_daily_prices(stock_tickers: List[str], bond_etf_tickers: List[str], c
         'total_new_records': 0,
         'skipped_bonds': 0,
         'skipped_cash': 0,
+        'requests': 0,
         'errors': []
     }
     
     all_prices_to_insert = []  # Collect all prices for bulk insert
-    today = date.today()
+    job_started = time.perf_counter()
     
     try:
-        # Process stock tickers
-        logger.info(f"📈 Processing {len(stock_tickers)} stock tickers")
-        for ticker in stock_tickers:
-            try:
-                # Skip cash positions
-                if ticker.startswith('CASH') or ticker.startswith('Cash'):
-                    results['skipped_cash'] += 1
-                    logger.info(f"⏭️  Skipped cash position: {ticker}")
-                    continue
-                
-                # Skip bond cash positions
-                if ticker.startswith('BOND_CASH'):
-                    results['skipped_bonds'] += 1
-                    logger.info(f"⏭️  Skipped bond cash position: {ticker}")
-                    continue
-                
-                # Get latest date and determine missing dates
-                latest_date = updater.get_latest_price_date(ticker)
-                
-                if latest_date is None:
-                    # No data exists, fetch last 30 days
-                    start_date = today - timedelta(days=30)
-                    logger.info(f"No existing data for {ticker}, fetching last 30 days")
-                elif latest_date >= today:
-                    # We're up to date
-                    logger.info(f"✅ {ticker} is up to date (latest: {latest_date})")
-                    results['stocks_updated'] += 1
-                    continue
-                else:
-                    # Fetch missing data from last date + 1 until today
-                    start_date = latest_date + timedelta(days=1)
-                    logger.info(f"Updating {ticker} from {start_date} to {today}")
-                
-                # Fetch prices from Alpaca
-                prices = updater.fetch_alpaca_prices(ticker, start_date, today)
-                all_prices_to_insert.extend(prices)
-                results['stocks_updated'] += 1
-                
-                # Rate limiting for Alpaca
-                time.sleep(60 / updater.alpaca_rate_limit)
-                
-            except Exception as e:
-                error_msg = f"Failed to update stock {ticker}: {e}"
-                logger.error(f"❌ {error_msg}")
-                results['errors'].append(error_msg)
-        
-        # Process bond ETF tickers
-        logger.info(f"🏦 Processing {len(bond_etf_tickers)} bond ETF tickers")
-        for ticker in bond_etf_tickers:
-            try:
-                # Get latest date and determine missing dates
-                latest_date = updater.get_latest_price_date(ticker)
-                
-                if latest_date is None:
-                    # No data exists, fetch last 30 days
-                    start_date = today - timedelta(days=30)
-                    logger.info(f"No existing data for bond ETF {ticker}, fetching last 30 days")
-                elif latest_date >= today:
-                    # We're up to date
-                    logger.info(f"✅ Bond ETF {ticker} is up to date (latest: {latest_date})")
-                    results['bond_etfs_updated'] += 1
-                    continue
-                else:
-                    # Fetch missing data from last date + 1 until today
-                    start_date = latest_date + timedelta(days=1)
-                    logger.info(f"Updating bond ETF {ticker} from {start_date} to {today}")
-                
-                # Fetch prices from Alpaca (bond ETFs trade like stocks)
-                prices = updater.fetch_alpaca_prices(ticker, start_date, today)
-                all_prices_to_insert.extend(prices)
-                results['bond_etfs_updated'] += 1
-                
-                # Rate limiting for Alpaca
-                time.sleep(60 / updater.alpaca_rate_limit)
-                
-            except Exception as e:
-                error_msg = f"Failed to update bond ETF {ticker}: {e}"
-                logger.error(f"❌ {error_msg}")
-                results['errors'].append(error_msg)
-        
-        # Process crypto tickers
-        logger.info(f"₿ Processing {len(crypto_tickers)} crypto tickers")
-        for ticker in crypto_tickers:
-            try:
-                # Get latest date and determine missing dates
-                latest_date = updater.get_latest_price_date(ticker)
-                
-                if latest_date is None:
-                    # No data exists, fetch last 30 days
-                    start_date = today - timedelta(days=30)
-                    logger.info(f"No existing data for crypto {ticker}, fetching last 30 days")
-                elif latest_date >= today:
-                    # We're up to date
-                    logger.info(f"✅ Crypto {ticker} is up to date (latest: {latest_date})")
-                    results['crypto_updated'] += 1
-                    continue
-                else:
-                    # Fetch missing data from last date + 1 until today
-                    start_date = latest_date + timedelta(days=1)
-                    logger.info(f"Updating crypto {ticker} from {start_date} to {today}")
-                
-                # Fetch prices from Twelve Data
-                prices = updater.fetch_twelve_data_prices(ticker, start_date, today)
-                all_prices_to_insert.extend(prices)
-                results['crypto_updated'] += 1
-                
-                # Rate limiting for Twelve Data (more restrictive)
-                time.sleep(60 / updater.twelve_data_rate_limit)
-                
-            except Exception as e:
-                error_msg = f"Failed to update crypto {ticker}: {e}"
-                logger.error(f"❌ {error_msg}")
-                results['errors'].append(error_msg)
+        # One plan for every ticker: exact missing sessions per trading calendar, merged into requests
+        with time_stage('price_update', 'plan'):
+            asset_classes = {
+                **{t: ASSET_CLASSES['STOCK'] for t in stock_tickers if not t.startswith(('CASH', 'Cash', 'BOND_CASH'))},
+                **{t: ASSET_CLASSES['BOND_ETF'] for t in bond_etf_tickers},
+                **{t: ASSET_CLASSES['CRYPTO'] for t in crypto_tickers},
+            }
+            plan = plan_backfill(db, asset_classes)
+        results['requests'] = sum(len(spans) for spans in plan.values())
+        
+        # Stocks and bond ETFs from Alpaca, crypto from Twelve Data
+        groups = [
+            ('stocks_updated', "📈", "stock", stock_tickers, updater.fetch_alpaca_prices, updater.alpaca_rate_limit),
+            ('bond_etfs_updated', "🏦", "bond ETF", bond_etf_tickers, updater.fetch_alpaca_prices, updater.alpaca_rate_limit),
+            ('crypto_updated', "₿", "crypto", crypto_tickers, updater.fetch_twelve_data_prices, updater.twelve_data_rate_limit),
+        ]
+        for counter, icon, label, tickers, fetch, rate_limit in groups:
+            logger.info(f"{icon} Processing {len(tickers)} {label} tickers")
+            for ticker in tickers:
+                try:
+                    # Skip cash positions
+                    if ticker.startswith('CASH') or ticker.startswith('Cash'):
+                        results['skipped_cash'] += 1
+                        logger.debug("⏭️  Skipped cash position: %s", ticker)
+                        continue
+                    
+                    # Skip bond cash positions
+                    if ticker.startswith('BOND_CASH'):
+                        results['skipped_bonds'] += 1
+                        logger.debug("⏭️  Skipped bond cash position: %s", ticker)
+                        continue
+                    
+                    spans = plan.get(ticker, [])
+                    if not spans:
+                        logger.debug("✅ %s is up to date", ticker)
+                    
+                    for span in spans:
+                        logger.debug("Updating %s %s from %s to %s (%d missing sessions)",
+                                     label, ticker, span.start, span.end, span.missing)
+                        prices = fetch(ticker, span.start, span.end)
+                        if prices is not None:
+                            # Sessions the provider answered without a close are not asked for again
+                            record_empty_fetches(db, span, asset_classes[ticker], (p['price_date'] for p in prices))
+                            all_prices_to_insert.extend(prices)
+                        
+                        # Provider rate limit, per request
+                        time.sleep(60 / rate_limit)
+                    results[counter] += 1
+                    
+                except Exception as e:
+                    error_msg = f"Failed to update {label} {ticker}: {e}"
+                    logger.error("❌ %s", error_msg)
+                    results['errors'].append(error_msg)
+        
+        record_stage('price_update', 'fetch', time.perf_counter() - job_started)
         
         # Bulk insert all collected prices
         logger.info(f"💾 Bulk inserting {len(all_prices_to_insert)} price records")
-        inserted_count = updater.bulk_insert_prices(all_prices_to_insert)
-        results['total_new_records'] = inserted_count
-        
-        # Commit all changes at once
-        db.commit()
+        with time_stage('price_update', 'insert'):
+            inserted_count = updater.bulk_insert_prices(all_prices_to_insert)
+            results['total_new_records'] = inserted_count
+            
+            # Commit all changes at once
+            db.commit()
+        record_rows('price_update', 'daily_prices', len(all_prices_to_insert))
+        invalidate_benchmark_cache()
         logger.info("✅ All price updates committed successfully")
         
+        # Day-over-day changes for movers, once per update
+        if price_changes:
+            with time_stage('price_update', 'price_changes'):
+                results['price_changes'] = calculate_price_changes_job(db=db)
+        
         logger.info("✅ Enhanced daily price update completed")
         logger.info(f"📊 Summary: {results}")
+        record_stage('price_update', 'total', time.perf_counter() - job_started)
+        export_job_metrics('price_update')
         
         return results
         
@@ -421,6 +404,8 @@ def update_daily_prices(stock_tickers: List[str], bond_etf_tickers: List[str], c
         logger.error(f"❌ Critical error in enhanced price update process: {e}")
         db.rollback()
         results['errors'].append(f"Critical error: {e}")
+        record_stage('price_update', 'total', time.perf_counter() - job_started)
+        export_job_metrics('price_update', succeeded=False)
         return results
         
     finally:
@@ -448,30 +433,19 @@ def categorize_portfolio_tickers() -> Tuple[List[str], List[str], List[str], Lis
         bond_cash_tickers = []
         cash_tickers = []
         
-        # Common bond ETFs
-        known_bond_etfs = {
-            'BND', 'AGG', 'TLT', 'IEF', 'SHY', 'VGIT', 'VGLT', 'VTEB', 
-            'MUB', 'HYG', 'JNK', 'LQD', 'VCIT', 'VCLT', 'BSV', 'BIV', 'BLV'
-        }
+        # Benchmark series are maintained alongside held tickers
+        ticker_list += [t for t in settings.BENCHMARK_TICKERS if t not in ticker_list]
         
-        # Common crypto symbols
-        crypto_symbols = {
-            'BTC-USD', 'ETH-USD', 'BTC', 'ETH', 'ADA-USD', 'SOL-USD', 
-            'DOT-USD', 'AVAX-USD', 'MATIC-USD', 'LINK-USD'
+        groups = {
+            ASSET_CLASSES['STOCK']: stock_tickers,
+            ASSET_CLASSES['BOND_ETF']: bond_etf_tickers,
+            ASSET_CLASSES['CRYPTO']: crypto_tickers,
+            ASSET_CLASSES['BOND_CASH']: bond_cash_tickers,
+            ASSET_CLASSES['CASH']: cash_tickers,
         }
-        
+        index = classification_index(db)
         for ticker in ticker_list:
-            if ticker.startswith('CASH') or ticker.startswith('Cash'):
-                cash_tickers.append(ticker)
-            elif ticker.startswith('BOND_CASH'):
-                bond_cash_tickers.append(ticker)
-            elif ticker in crypto_symbols or 'USD' in ticker:
-                crypto_tickers.append(ticker)
-            elif ticker in known_bond_etfs:
-                bond_etf_tickers.append(ticker)
-            else:
-                # Default to stock
-                stock_tickers.append(ticker)
+            groups[index.asset_class(ticker)].append(ticker)
         
         logger.info(f"📊 Portfolio categorization:")
         logger.info(f"  📈 Stocks: {len(stock_tickers)}")
@@ -487,6 +461,7 @@ def categorize_portfolio_tickers() -> Tuple[List[str], List[str], List[str], Lis
 
 # CLI interface for testing
 if __name__ == "__main__":
+    configure_logging()
     import argparse
     
     parser = argparse.ArgumentParser(description="Enhanced Daily Price Updater")
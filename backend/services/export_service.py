@@ -0,0 +1,104 @@
+"""
+Export Service - Streaming CSV/NDJSON
+Encodes query results chunk by chunk so exports run in constant memory
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per database round trip and encoded per emitted chunk
+DEFAULT_CHUNK_ROWS = 1000
+
+def _plain(value: Any) -> Any:
+    """Convert dates for CSV/JSON output"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def session_records(session_factory: Callable[[], Session],
+                    produce: Callable[[Session], Iterable[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """
+    Run produce() in a session owned by the stream
+    Request-scoped sessions are closed before a StreamingResponse body runs
+    """
+    db = session_factory()
+    try:
+        yield from produce(db)
+    finally:
+        db.close()
+
+def encode_records(records: Iterable[Dict[str, Any]], columns: List[str], fmt: str,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Encode records as CSV (with header) or NDJSON, chunk_rows records per chunk"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+    pending = 0
+    for record in records:
+        if writer is not None:
+            writer.writerow([_plain(record.get(column)) for column in columns])
+        else:
+            buffer.write(json.dumps(record, default=_plain))
+            buffer.write('\n')
+
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def streaming_export(records: Iterable[Dict[str, Any]], columns: List[str], fmt: str,
+                     filename: str, compress: bool = False,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> StreamingResponse:
+    """
+    Build a download response streaming records as fmt
+    filename is given without extension
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    body = encode_records(records, columns, fmt, chunk_rows)
+    media_type = EXPORT_FORMATS[fmt]
+    filename = f"{filename}.{fmt}"
+    if compress:
+        body = gzip_chunks(body)
+        media_type = 'application/gzip'
+        filename += '.gz'
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,237 @@
+"""
+Insights Cache - Fingerprinted, Expiring Insights Store
+The one cache behind every insights path: rows in insights_cache keyed by user, scope
+and a fingerprint of the bucketed metrics, so near-identical portfolios hit the same
+entry; rows expire after INSIGHTS_CACHE_TTL, each user keeps at most
+INSIGHTS_CACHE_MAX_PER_USER of them, and each user's latest entry is held in memory
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import hashlib
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.metrics import record_cache
+from domain.models_v2 import InsightsCacheEntry
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_SCOPE = "portfolio"
+LEGACY_SCOPE = "legacy"
+
+# Metric -> absolute rounding step for the portfolio insights metrics (percent points,
+# score points); floats without a step are banded to FINGERPRINT_DIGITS significant digits
+PORTFOLIO_STEPS = {
+    "gain_loss_pct": 0.5,
+    "benchmark_diff": 0.5,
+    "sharpe_ratio": 0.1,
+    "diversification_score": 5,
+    "sector_concentration": 2.5,
+    "crypto_percentage": 2.5,
+    "cash_percentage": 2.5,
+    "stock_percentage": 2.5,
+}
+FINGERPRINT_DIGITS = 2
+
+def bucket(value: float, step: Optional[float] = None) -> Optional[float]:
+    """value rounded to a multiple of step, or to FINGERPRINT_DIGITS significant digits"""
+    if value is None or not math.isfinite(value):
+        return None
+    if step:
+        return round(step * round(value / step), 6)
+    return float(f"{value:.{FINGERPRINT_DIGITS}g}")
+
+def bucket_metrics(metrics: Dict[str, Any], steps: Dict[str, float]) -> Dict[str, Any]:
+    """Metrics with every float bucketed; ints, strings and flags are kept as they are"""
+    bucketed = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            bucketed[key] = bucket_metrics(value, steps)
+        elif isinstance(value, float) or (key in steps and isinstance(value, int) and not isinstance(value, bool)):
+            bucketed[key] = bucket(float(value), steps.get(key))
+        else:
+            bucketed[key] = value
+    return bucketed
+
+def metrics_fingerprint(metrics: Dict[str, Any], steps: Optional[Dict[str, float]] = None) -> str:
+    """Short stable hash of the bucketed metrics, the cache key next to user_id"""
+    bucketed = bucket_metrics(metrics, PORTFOLIO_STEPS if steps is None else steps)
+    metrics_str = json.dumps(bucketed, sort_keys=True, default=str)
+    return hashlib.sha256(metrics_str.encode()).hexdigest()[:16]
+
+# (scope, user_id) -> (monotonic load time, latest entry), least recently used first
+_FRONT_CACHE: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+def invalidate_insights_cache(user_id: Optional[int] = None):
+    """Drop front-cache entries for one user (every user by default)"""
+    if user_id is None:
+        _FRONT_CACHE.clear()
+        return
+    for key in [key for key in _FRONT_CACHE if key[1] == user_id]:
+        del _FRONT_CACHE[key]
+
+def _entry(row: InsightsCacheEntry) -> Dict[str, Any]:
+    return {
+        "insights": json.loads(row.insights),
+        "insight_type": row.insight_type,
+        "metrics_hash": row.metrics_hash,
+        "generated_at": row.created_at.isoformat(),
+        "expires_at": row.expires_at,
+    }
+
+class InsightsCache:
+    """Reads and writes cached insights through the front cache"""
+
+    def __init__(self, db: Session, scope: str = PORTFOLIO_SCOPE):
+        self.db = db
+        self.scope = scope
+
+    def _front_get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        key = (self.scope, user_id)
+        cached = _FRONT_CACHE.get(key)
+        if cached is None:
+            record_cache('insights_front', False)
+            return None
+        loaded_at, entry = cached
+        # Other processes (the nightly worker) write to the table; re-read it now and then
+        if time.monotonic() - loaded_at > settings.INSIGHTS_FRONT_CACHE_TTL or entry["expires_at"] <= datetime.now():
+            del _FRONT_CACHE[key]
+            record_cache('insights_front', False)
+            return None
+        _FRONT_CACHE.move_to_end(key)
+        record_cache('insights_front', True)
+        return entry
+
+    def _front_put(self, user_id: int, entry: Dict[str, Any]):
+        key = (self.scope, user_id)
+        _FRONT_CACHE[key] = (time.monotonic(), entry)
+        _FRONT_CACHE.move_to_end(key)
+        while len(_FRONT_CACHE) > settings.INSIGHTS_FRONT_CACHE_SIZE:
+            _FRONT_CACHE.popitem(last=False)
+
+    def get(self, user_id: int, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Unexpired entry for this fingerprint"""
+        latest = self._front_get(user_id)
+        if latest is not None and latest["metrics_hash"] == fingerprint:
+            return latest
+
+        row = (
+            self.db.query(InsightsCacheEntry)
+            .filter(
+                and_(
+                    InsightsCacheEntry.user_id == user_id,
+                    InsightsCacheEntry.scope == self.scope,
+                    InsightsCacheEntry.metrics_hash == fingerprint,
+                    InsightsCacheEntry.expires_at > datetime.now()
+                )
+            )
+            .first()
+        )
+        return _entry(row) if row is not None else None
+
+    def latest(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Most recently written unexpired entry, whatever metrics it was built from"""
+        entry = self._front_get(user_id)
+        if entry is not None:
+            return entry
+
+        row = (
+            self.db.query(InsightsCacheEntry)
+            .filter(
+                and_(
+                    InsightsCacheEntry.user_id == user_id,
+                    InsightsCacheEntry.scope == self.scope,
+                    InsightsCacheEntry.expires_at > datetime.now()
+                )
+            )
+            .order_by(InsightsCacheEntry.created_at.desc(), InsightsCacheEntry.id.desc())
+            .first()
+        )
+        if row is None:
+            return None
+        entry = _entry(row)
+        self._front_put(user_id, entry)
+        return entry
+
+    def put(self, user_id: int, fingerprint: str, insights: Any, insight_type: str = "ai",
+            ttl: Optional[int] = None) -> Dict[str, Any]:
+        """Upsert the entry for this fingerprint, then drop the user's expired and surplus entries"""
+        now = datetime.now()
+        row = (
+            self.db.query(InsightsCacheEntry)
+            .filter(
+                and_(
+                    InsightsCacheEntry.user_id == user_id,
+                    InsightsCacheEntry.scope == self.scope,
+                    InsightsCacheEntry.metrics_hash == fingerprint
+                )
+            )
+            .first()
+        )
+        if row is None:
+            row = InsightsCacheEntry(user_id=user_id, scope=self.scope, metrics_hash=fingerprint)
+            self.db.add(row)
+        row.insights = json.dumps(insights)
+        row.insight_type = insight_type
+        row.created_at = now
+        row.expires_at = now + timedelta(seconds=ttl or settings.INSIGHTS_CACHE_TTL)
+        self.db.flush()
+
+        self.prune(user_id, now)
+        self.db.commit()
+
+        entry = _entry(row)
+        self._front_put(user_id, entry)
+        return entry
+
+    def prune(self, user_id: int, now: Optional[datetime] = None) -> int:
+        """Delete the user's expired entries and all but the newest INSIGHTS_CACHE_MAX_PER_USER"""
+        now = now or datetime.now()
+        keep = [
+            r[0] for r in
+            self.db.query(InsightsCacheEntry.id)
+            .filter(
+                and_(
+                    InsightsCacheEntry.user_id == user_id,
+                    InsightsCacheEntry.scope == self.scope,
+                    InsightsCacheEntry.expires_at > now
+                )
+            )
+            .order_by(InsightsCacheEntry.created_at.desc(), InsightsCacheEntry.id.desc())
+            .limit(settings.INSIGHTS_CACHE_MAX_PER_USER)
+            .all()
+        ]
+        return (
+            self.db.query(InsightsCacheEntry)
+            .filter(
+                and_(
+                    InsightsCacheEntry.user_id == user_id,
+                    InsightsCacheEntry.scope == self.scope,
+                    or_(InsightsCacheEntry.expires_at <= now, InsightsCacheEntry.id.notin_(keep))
+                )
+            )
+            .delete(synchronize_session=False)
+        )
+
+def purge_expired_insights(db: Session) -> int:
+    """Delete every expired entry, all users and scopes"""
+    removed = (
+        db.query(InsightsCacheEntry)
+        .filter(InsightsCacheEntry.expires_at <= datetime.now())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return removed
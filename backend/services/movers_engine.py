@@ -0,0 +1,298 @@
+"""
+Movers Engine - Per-Ticker Price Changes and Top Movers
+1D/1W/1M close-to-close changes for every ticker are computed once per price update
+as a vectorized diff over the (dates x tickers) close matrix and stored per ticker
+Per-user movers join the user's positions to the stored changes and take top-k with a heap
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import heapq
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.logging import configure_logging
+from core.metrics import record_cache, record_rows
+from domain.models_v2 import DailyPrice, Portfolio, PortfolioDailyValue, Ticker, TickerPriceChange
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Period -> calendar days back from the latest close; 1D is the previous close
+MOVER_PERIODS = {'1D': None, '1W': 7, '1M': 30}
+CHANGE_COLUMNS = {'1D': 'change_1d', '1W': 'change_1w', '1M': 'change_1m'}
+HISTORY_DAYS = 30 + 7  # Longest period plus a week to find its starting close
+
+def price_change_matrix(dates: List[date], closes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Latest close and percent changes for every ticker (column)
+
+    closes is (dates x tickers) with NaN where a ticker has no close. Each
+    ticker is measured from its own latest close: 1D against its previous
+    close, 1W/1M against the last close on or before 7/30 calendar days
+    earlier. Changes without a starting close are NaN.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    n_dates, n_tickers = closes.shape
+    columns = np.arange(n_tickers)
+    rows = np.arange(n_dates)[:, np.newaxis]
+
+    finite = np.isfinite(closes)
+    # Row of the last close at or before each row, -1 before the first close
+    filled_idx = np.maximum.accumulate(np.where(finite, rows, -1), axis=0)
+    last_idx = filled_idx[-1]
+    has_close = last_idx >= 0
+    last_idx = np.maximum(last_idx, 0)
+    last_close = np.where(has_close, closes[last_idx, columns], np.nan)
+
+    ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+    results = {'last_idx': last_idx, 'close': last_close, 'valid': has_close}
+    for period, days in MOVER_PERIODS.items():
+        if days is None:
+            start_row = last_idx - 1
+        else:
+            start_row = np.searchsorted(ordinals, ordinals[last_idx] - days, side='right') - 1
+        start_idx = np.where(start_row >= 0, filled_idx[np.maximum(start_row, 0), columns], -1)
+
+        ok = has_close & (start_idx >= 0)
+        start_close = closes[np.maximum(start_idx, 0), columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (last_close / start_close - 1.0) * 100
+        results[period] = np.where(ok & (start_close > 0), change, np.nan)
+    return results
+
+def split_movers(positions: Iterable[Dict], k: int = 5, key: str = 'change_pct') -> Dict[str, List[Dict]]:
+    """Top k gainers and losers among positions with a change, O(n log k)"""
+    up, down = [], []
+    for position in positions:
+        change = position.get(key)
+        if change is None:
+            continue
+        if change > 0:
+            up.append(position)
+        elif change < 0:
+            down.append(position)
+    return {
+        'up': heapq.nlargest(k, up, key=lambda p: p[key]),
+        'down': heapq.nsmallest(k, down, key=lambda p: p[key]),
+    }
+
+def largest_movers(positions: Iterable[Dict], k: int = 5, key: str = 'change_pct') -> List[Dict]:
+    """Top k positions by absolute change, O(n log k)"""
+    return heapq.nlargest(
+        k, (p for p in positions if p.get(key) is not None), key=lambda p: abs(p[key])
+    )
+
+class MoversEngine:
+    """Stores per-ticker price changes and ranks a user's positions by them"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def compute(self, as_of: date, ticker_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+        """ticker_id -> as_of_date, close_price and change_1d/1w/1m (percent, None when unknown)"""
+        import pandas as pd
+
+        query = (
+            self.db.query(DailyPrice.price_date, DailyPrice.ticker_id, DailyPrice.close_price)
+            .filter(
+                and_(
+                    DailyPrice.price_date > as_of - timedelta(days=HISTORY_DAYS),
+                    DailyPrice.price_date <= as_of
+                )
+            )
+        )
+        if ticker_ids is not None:
+            query = query.filter(DailyPrice.ticker_id.in_(ticker_ids))
+        rows = query.all()
+        if not rows:
+            return {}
+
+        closes = (
+            pd.DataFrame(rows, columns=['price_date', 'ticker_id', 'close_price'])
+            .pivot_table(index='price_date', columns='ticker_id', values='close_price', aggfunc='last')
+            .sort_index()
+        )
+        dates = closes.index.tolist()
+        matrix = price_change_matrix(dates, closes.to_numpy(dtype=np.float64))
+
+        results = {}
+        for j, ticker_id in enumerate(closes.columns):
+            if not matrix['valid'][j]:
+                continue
+            row = {
+                'as_of_date': dates[matrix['last_idx'][j]],
+                'close_price': float(matrix['close'][j]),
+            }
+            for period, column in CHANGE_COLUMNS.items():
+                value = float(matrix[period][j])
+                row[column] = None if np.isnan(value) else value
+            results[int(ticker_id)] = row
+        return results
+
+    def store(self, changes: Dict[int, Dict]) -> int:
+        """Upsert one row per ticker"""
+        if not changes:
+            return 0
+
+        existing = {
+            row.ticker_id: row for row in
+            self.db.query(TickerPriceChange)
+            .filter(TickerPriceChange.ticker_id.in_(list(changes)))
+            .all()
+        }
+
+        for ticker_id, values in changes.items():
+            row = existing.get(ticker_id)
+            if row is None:
+                row = TickerPriceChange(ticker_id=ticker_id)
+                self.db.add(row)
+            for name, value in values.items():
+                setattr(row, name, value)
+
+        self.db.commit()
+        return len(changes)
+
+    def changes(self, ticker_ids: List[int], as_of: date) -> Dict[int, Dict]:
+        """
+        Changes for the given tickers as of a date
+        Stored rows are used when they are current for as_of; the rest
+        (historical dates, tickers priced after the last refresh) are
+        computed for just those tickers
+        """
+        if not ticker_ids:
+            return {}
+
+        stored = {
+            row.ticker_id: row for row in
+            self.db.query(TickerPriceChange)
+            .filter(TickerPriceChange.ticker_id.in_(ticker_ids))
+            .all()
+        }
+        latest = dict(
+            self.db.query(DailyPrice.ticker_id, func.max(DailyPrice.price_date))
+            .filter(and_(DailyPrice.ticker_id.in_(ticker_ids), DailyPrice.price_date <= as_of))
+            .group_by(DailyPrice.ticker_id)
+            .all()
+        )
+
+        results, stale = {}, []
+        for ticker_id in ticker_ids:
+            row = stored.get(ticker_id)
+            if row is not None and row.as_of_date == latest.get(ticker_id):
+                results[ticker_id] = {
+                    name: getattr(row, name)
+                    for name in ['as_of_date', 'close_price', *CHANGE_COLUMNS.values()]
+                }
+            elif ticker_id in latest:
+                stale.append(ticker_id)
+
+        record_cache('ticker_price_changes', True, len(results))
+        if stale:
+            record_cache('ticker_price_changes', False, len(stale))
+            results.update(self.compute(as_of, stale))
+        return results
+
+    def load_positions(self, user_id: int, as_of: date) -> List[Dict]:
+        """The user's positions on their latest valuation date on or before as_of"""
+        latest = (
+            self.db.query(func.max(PortfolioDailyValue.date))
+            .join(Portfolio, PortfolioDailyValue.portfolio_id == Portfolio.portfolio_id)
+            .filter(and_(Portfolio.user_id == user_id, PortfolioDailyValue.date <= as_of))
+            .scalar()
+        )
+        if latest is None:
+            return []
+
+        rows = (
+            self.db.query(
+                Portfolio.ticker_id, Ticker.symbol,
+                func.sum(PortfolioDailyValue.units), func.max(PortfolioDailyValue.price),
+                func.sum(PortfolioDailyValue.position_val)
+            )
+            .join(PortfolioDailyValue, PortfolioDailyValue.portfolio_id == Portfolio.portfolio_id)
+            .join(Ticker, Ticker.ticker_id == Portfolio.ticker_id)
+            .filter(and_(Portfolio.user_id == user_id, PortfolioDailyValue.date == latest))
+            .group_by(Portfolio.ticker_id, Ticker.symbol)
+            .all()
+        )
+        return [
+            {'ticker_id': r[0], 'ticker': r[1], 'units': float(r[2] or 0),
+             'price': float(r[3]) if r[3] is not None else None, 'position_val': float(r[4] or 0)}
+            for r in rows
+        ]
+
+    def attach_changes(self, positions: List[Dict], as_of: date, period: str = '1D') -> List[Dict]:
+        """
+        Add change_pct and change_val (value gained over the period) to positions
+        Positions need ticker_id or ticker and position_val
+        """
+        column = CHANGE_COLUMNS[period]
+        missing_ids = {p['ticker'] for p in positions if p.get('ticker_id') is None}
+        if missing_ids:
+            ids = dict(self.db.query(Ticker.symbol, Ticker.ticker_id).filter(Ticker.symbol.in_(missing_ids)).all())
+            for position in positions:
+                if position.get('ticker_id') is None:
+                    position['ticker_id'] = ids.get(position['ticker'])
+
+        changes = self.changes([p['ticker_id'] for p in positions if p.get('ticker_id') is not None], as_of)
+        for position in positions:
+            change = changes.get(position.get('ticker_id'), {}).get(column)
+            position['change_pct'] = change
+            position['change_val'] = (
+                position['position_val'] - position['position_val'] / (1 + change / 100)
+                if change is not None and change > -100 else None
+            )
+        return positions
+
+    def top_movers(self, user_id: int, as_of: date, period: str = '1D', k: int = 5) -> Dict[str, List[Dict]]:
+        """Top k up and down positions for a user by the period's price change"""
+        positions = self.attach_changes(self.load_positions(user_id, as_of), as_of, period)
+        return split_movers(positions, k)
+
+def calculate_price_changes_job(as_of: Optional[date] = None, db: Optional[Session] = None) -> Dict:
+    """
+    Batch job: recompute and store price changes for every ticker
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        engine = MoversEngine(db)
+        rows = engine.store(engine.compute(as_of))
+        record_rows('price_changes', 'ticker_price_changes', rows)
+
+        logger.info(f"📊 Stored price changes for {rows} tickers")
+        return {'status': 'success', 'as_of': as_of.isoformat(), 'tickers': rows}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Price change calculation failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Per-ticker 1D/1W/1M price changes")
+    parser.add_argument("--date", type=str, help="As-of date (YYYY-MM-DD)")
+
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    result = calculate_price_changes_job(as_of)
+    print(f"Price change result: {result}")
@@ -0,0 +1,253 @@
+"""
+Performance Engine - Materialized Period Performance
+Computes 1W/1M/YTD/1Y/5Y return and risk rows for all users in one batch
+Rows are upserted into portfolio_period_performance so API reads are a single lookup
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+import warnings
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging import configure_logging
+from core.database import SessionLocal
+from domain.models_v2 import PortfolioPeriodPerformance
+from services.returns_engine import DAYS_PER_YEAR, window_start
+from services.risk_engine import RiskEngine
+from services.risk_metrics import flow_adjusted_returns, risk_metrics_matrix
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PERFORMANCE_PERIODS = ['1W', '1M', 'YTD', '1Y', '5Y']
+
+# Extra calendar days loaded before the longest period so its start falls on a stored value
+START_SLACK_DAYS = 7
+
+PERFORMANCE_FIELDS = [
+    'start_value', 'end_value', 'net_flows', 'total_return', 'total_gain_loss',
+    'annualized_return', 'volatility', 'sharpe_ratio', 'max_drawdown',
+]
+
+def period_bounds(dates: List[date], finite: np.ndarray, end_idx: np.ndarray, as_of: date,
+                  period: str) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Start column of a period and each user's start index within it
+
+    Returns (col, start_idx, partial, valid): col is the last date on or
+    before the period's calendar start, start_idx the user's first value at
+    or after col, partial marks users whose history begins after the period
+    start and valid marks users with at least two values in the period.
+    """
+    ordinals = np.array([d.toordinal() for d in dates])
+    start = window_start(period, as_of, dates[0]).toordinal()
+    col = int(np.searchsorted(ordinals, start, side='right')) - 1
+    before_history = col < 0
+    col = max(col, 0)
+
+    after = finite[:, col:]
+    start_idx = col + np.argmax(after, axis=1)
+    partial = before_history | (start_idx > col)
+    valid = after.any(axis=1) & (end_idx > start_idx)
+    return col, start_idx, partial, valid
+
+def last_valid_index(finite: np.ndarray) -> np.ndarray:
+    """Column of each row's last finite value"""
+    return finite.shape[1] - 1 - np.argmax(finite[:, ::-1], axis=1)
+
+def load_period_series(db: Session, as_of: date, user_ids: Optional[List[int]] = None):
+    """Users x dates values and flows covering the longest period"""
+    history_days = (as_of - window_start('5Y', as_of, as_of)).days + START_SLACK_DAYS
+    return RiskEngine(db, window_days=history_days).load_series(as_of, user_ids)
+
+def period_performance_matrix(dates: List[date], values: np.ndarray, flows: np.ndarray, as_of: date,
+                              periods: List[str] = PERFORMANCE_PERIODS,
+                              risk_free_rate: float = 0.0) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Performance of every user (row) over every period in one pass
+
+    Each period starts on the last date on or before its calendar start, or
+    on the user's first value when history is shorter (flagged partial).
+    total_return is the cumulative time-weighted return in percent,
+    total_gain_loss is the value change net of flows, annualized_return is
+    only set for spans of a year or more. volatility, sharpe_ratio and
+    max_drawdown come from risk_metrics_matrix over the period's columns.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    flows = np.atleast_2d(np.asarray(flows, dtype=np.float64))
+    n_users, n_dates = values.shape
+    rows = np.arange(n_users)
+    ordinals = np.array([d.toordinal() for d in dates])
+    finite = np.isfinite(values)
+
+    returns = flow_adjusted_returns(values, flows)
+    wealth = np.hstack([np.ones((n_users, 1)), np.cumprod(1.0 + np.nan_to_num(returns), axis=1)])
+    cumulative_flows = np.cumsum(np.nan_to_num(flows), axis=1)
+    end_idx = last_valid_index(finite)
+
+    results = {}
+    for period in periods:
+        col, start_idx, partial, valid = period_bounds(dates, finite, end_idx, as_of, period)
+
+        start_value = values[rows, start_idx]
+        end_value = values[rows, end_idx]
+        net_flows = cumulative_flows[rows, end_idx] - cumulative_flows[rows, start_idx]
+        span_years = (ordinals[end_idx] - ordinals[start_idx]) / DAYS_PER_YEAR
+
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            growth = wealth[rows, end_idx] / wealth[rows, start_idx]
+            annualized = np.where(span_years >= 1.0, growth ** (1.0 / span_years) - 1.0, np.nan)
+
+        risk = risk_metrics_matrix(values[:, col:], flows[:, col:], risk_free_rate=risk_free_rate)
+
+        period_result = {
+            'start_idx': start_idx,
+            'end_idx': end_idx,
+            'start_value': start_value,
+            'end_value': end_value,
+            'net_flows': net_flows,
+            'total_return': (growth - 1.0) * 100,
+            'total_gain_loss': end_value - start_value - net_flows,
+            'annualized_return': annualized * 100,
+            'volatility': risk['volatility_annualized'],
+            'sharpe_ratio': risk['sharpe_ratio'],
+            'max_drawdown': risk['max_drawdown'],
+            'partial': partial,
+            'valid': valid,
+        }
+        for name in PERFORMANCE_FIELDS:
+            period_result[name] = np.where(valid, period_result[name], np.nan)
+        results[period] = period_result
+    return results
+
+class PerformanceEngine:
+    """Batch materialization of per-period performance rows"""
+
+    def __init__(self, db: Session, risk_free_rate: Optional[float] = None):
+        self.db = db
+        self.risk_free_rate = settings.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+
+    def compute(self, as_of: date, user_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Dict]]:
+        """Period rows per user as of a date; NaN fields come back as None"""
+        users, dates, values, flows = load_period_series(self.db, as_of, user_ids)
+        if not users:
+            return {}
+
+        matrix = period_performance_matrix(dates, values, flows, as_of, risk_free_rate=self.risk_free_rate)
+
+        results = {user_id: {} for user_id in users}
+        for period, columns in matrix.items():
+            for i, user_id in enumerate(users):
+                if not columns['valid'][i]:
+                    continue
+                row = {
+                    'start_date': dates[columns['start_idx'][i]],
+                    'end_date': dates[columns['end_idx'][i]],
+                    'partial': bool(columns['partial'][i]),
+                }
+                for name in PERFORMANCE_FIELDS:
+                    value = float(columns[name][i])
+                    row[name] = None if np.isnan(value) else value
+                results[user_id][period] = row
+        return results
+
+    def store(self, as_of: date, results: Dict[int, Dict[str, Dict]]) -> int:
+        """Upsert period rows; periods a user no longer has data for are removed"""
+        if not results:
+            return 0
+
+        existing = {
+            (row.user_id, row.period): row for row in
+            self.db.query(PortfolioPeriodPerformance)
+            .filter(PortfolioPeriodPerformance.user_id.in_(list(results)))
+            .all()
+        }
+
+        written = 0
+        for user_id, periods in results.items():
+            for period in PERFORMANCE_PERIODS:
+                row = existing.get((user_id, period))
+                values = periods.get(period)
+                if values is None:
+                    if row is not None:
+                        self.db.delete(row)
+                    continue
+                if row is None:
+                    row = PortfolioPeriodPerformance(user_id=user_id, period=period)
+                    self.db.add(row)
+                row.as_of_date = as_of
+                for name, value in values.items():
+                    setattr(row, name, value)
+                written += 1
+
+        self.db.commit()
+        return written
+
+    def stored(self, user_id: int) -> Dict[str, Dict]:
+        """Materialized period rows for a user, keyed by period"""
+        rows = (
+            self.db.query(PortfolioPeriodPerformance)
+            .filter(PortfolioPeriodPerformance.user_id == user_id)
+            .all()
+        )
+        return {
+            row.period: {
+                'as_of_date': row.as_of_date,
+                'start_date': row.start_date,
+                'end_date': row.end_date,
+                'partial': row.partial,
+                **{name: getattr(row, name) for name in PERFORMANCE_FIELDS},
+            }
+            for row in sorted(rows, key=lambda row: PERFORMANCE_PERIODS.index(row.period)
+                              if row.period in PERFORMANCE_PERIODS else len(PERFORMANCE_PERIODS))
+        }
+
+def calculate_period_performance_job(as_of: Optional[date] = None, db: Optional[Session] = None,
+                                     user_ids: Optional[List[int]] = None) -> Dict:
+    """
+    Batch job: compute and store period performance for every user (or user_ids)
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        engine = PerformanceEngine(db)
+        results = engine.compute(as_of, user_ids)
+        rows = engine.store(as_of, results)
+
+        logger.info(f"📊 Stored {rows} period performance rows for {len(results)} users as of {as_of}")
+        return {'status': 'success', 'as_of': as_of.isoformat(), 'users': len(results), 'rows': rows}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Period performance calculation failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Batch period performance calculator")
+    parser.add_argument("--date", type=str, help="As-of date (YYYY-MM-DD)")
+    parser.add_argument("--user-id", type=int, action="append", help="Limit to these users")
+
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    result = calculate_period_performance_job(as_of, user_ids=args.user_id)
+    print(f"Period performance result: {result}")
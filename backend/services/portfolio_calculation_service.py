@@ -8,36 +8,50 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 import os
+import heapq
 import logging
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Union
 from decimal import Decimal, ROUND_HALF_UP
 import statistics
 import math
-import requests
 import time
+import numpy as np
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, text
 
 # Database imports
+from core.config import settings
 from core.database import SessionLocal
-from domain.models_v2 import Portfolio, DailyPrice, PortfolioDailyValue, PortfolioSummary, CashTransaction, User
+from domain.models_v2 import Portfolio, DailyPrice, PortfolioDailyValue, PortfolioSummary, CashTransaction, User, get_ticker_ids
+from services.returns_engine import invalidate_returns_cache
+from services.backfill_planner import plan_backfill, record_empty_fetches
+from services.classification_index import ASSET_CLASSES, classification_index
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Asset class constants
-ASSET_CLASSES = {
-    'STOCK': 'STOCK',
-    'BOND_ETF': 'BOND_ETF', 
-    'CRYPTO': 'CRYPTO',
-    'CASH': 'CASH',
-    'BOND_CASH': 'BOND_CASH'
+# by_class keys in the order used by the vectorized fast path
+CLASS_TOTAL_KEYS = ['equity_value', 'bond_etf_value', 'crypto_value', 'bond_cash_value']
+CLASS_CODES = [
+    ASSET_CLASSES['STOCK'],
+    ASSET_CLASSES['BOND_ETF'],
+    ASSET_CLASSES['CRYPTO'],
+    ASSET_CLASSES['BOND_CASH'],
+]
+CLASS_TOTAL_INDEX = {asset_class: code for code, asset_class in enumerate(CLASS_CODES)}
+
+# Days before a price counts as stale
+STALE_PRICE_DAYS = {
+    ASSET_CLASSES['STOCK']: 3,
+    ASSET_CLASSES['BOND_ETF']: 3,
+    ASSET_CLASSES['CRYPTO']: 1,
 }
 
-@dataclass
+CENT = Decimal('0.01')
+
+@dataclass(slots=True)
 class PositionSnapshot:
     portfolio_id: int
     ticker: str
@@ -48,60 +62,188 @@ class PositionSnapshot:
     missing_price: bool
     price_date: Optional[date] = None
 
+class PositionRow:
+    """
+    Read-only view of one row in a PositionArray
+    Exposes the PositionSnapshot attributes without copying the row
+    """
+    __slots__ = ('_positions', '_i')
+    
+    def __init__(self, positions: 'PositionArray', i: int):
+        self._positions = positions
+        self._i = i
+    
+    @property
+    def portfolio_id(self) -> int:
+        return int(self._positions.portfolio_id[self._i])
+    
+    @property
+    def ticker_id(self) -> int:
+        return int(self._positions.ticker_id[self._i])
+    
+    @property
+    def ticker(self) -> str:
+        return self._positions.tickers[self._i]
+    
+    @property
+    def asset_class(self) -> str:
+        return CLASS_CODES[self._positions.class_code[self._i]]
+    
+    @property
+    def units(self) -> float:
+        return float(self._positions.units[self._i])
+    
+    @property
+    def price(self) -> Optional[float]:
+        value = float(self._positions.price[self._i])
+        return None if math.isnan(value) else value
+    
+    @property
+    def position_val(self) -> float:
+        return float(self._positions.value[self._i])
+    
+    @property
+    def missing_price(self) -> bool:
+        return bool(np.isnan(self._positions.price[self._i]))
+    
+    @property
+    def price_age(self) -> Optional[int]:
+        age = int(self._positions.price_age[self._i])
+        return None if age < 0 else age
+    
+    @property
+    def price_date(self) -> Optional[date]:
+        age = self.price_age
+        return None if age is None else self._positions.as_of - timedelta(days=age)
+    
+    def __repr__(self) -> str:
+        return f"PositionRow(ticker={self.ticker!r}, units={self.units}, price={self.price}, position_val={self.position_val})"
+
+class PositionArray:
+    """
+    Struct-of-arrays position snapshot for one date
+    
+    One NumPy column per field instead of one object per position. Iterating
+    yields PositionRow views, so code written against List[PositionSnapshot]
+    keeps working. price is NaN when missing; price_age is days since the
+    price date, -1 when there is none (missing price or BOND_CASH).
+    """
+    __slots__ = ('as_of', 'portfolio_id', 'ticker_id', 'tickers', 'class_code',
+                 'units', 'price', 'value', 'price_age')
+    
+    def __init__(self, as_of: date, portfolio_id: np.ndarray, ticker_id: np.ndarray,
+                 tickers: List[str], class_code: np.ndarray, units: np.ndarray,
+                 price: np.ndarray, value: np.ndarray, price_age: np.ndarray):
+        self.as_of = as_of
+        self.portfolio_id = portfolio_id
+        self.ticker_id = ticker_id
+        self.tickers = tickers
+        self.class_code = class_code
+        self.units = units
+        self.price = price
+        self.value = value
+        self.price_age = price_age
+    
+    @classmethod
+    def empty(cls, as_of: date, n: int) -> 'PositionArray':
+        """Allocate columns for n positions"""
+        return cls(
+            as_of=as_of,
+            portfolio_id=np.zeros(n, dtype=np.int64),
+            ticker_id=np.zeros(n, dtype=np.int64),
+            tickers=[''] * n,
+            class_code=np.zeros(n, dtype=np.int8),
+            units=np.zeros(n, dtype=np.float64),
+            price=np.full(n, np.nan, dtype=np.float64),
+            value=np.zeros(n, dtype=np.float64),
+            price_age=np.full(n, -1, dtype=np.int32)
+        )
+    
+    @property
+    def missing(self) -> np.ndarray:
+        return np.isnan(self.price)
+    
+    def __len__(self) -> int:
+        return len(self.tickers)
+    
+    def __getitem__(self, i: int) -> PositionRow:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return PositionRow(self, i)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PositionRow(self, i)
+    
+    def class_totals(self) -> np.ndarray:
+        """Sum of position values per class code"""
+        return np.bincount(self.class_code, weights=self.value, minlength=len(CLASS_CODES))
+    
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Serialize all rows as plain dicts for API responses"""
+        prices = [None if math.isnan(p) else p for p in self.price.tolist()]
+        price_dates = [
+            None if age < 0 else (self.as_of - timedelta(days=age)).isoformat()
+            for age in self.price_age.tolist()
+        ]
+        return [
+            {
+                'portfolio_id': portfolio_id,
+                'ticker': ticker,
+                'asset_class': CLASS_CODES[code],
+                'units': units,
+                'price': price,
+                'position_val': value,
+                'missing_price': price is None,
+                'price_date': price_date
+            }
+            for portfolio_id, ticker, code, units, price, value, price_date in zip(
+                self.portfolio_id.tolist(), self.tickers, self.class_code.tolist(),
+                self.units.tolist(), prices, self.value.tolist(), price_dates
+            )
+        ]
+
 @dataclass
 class PortfolioSnapshot:
     date: date
-    by_position: List[PositionSnapshot]
+    by_position: Union[List[PositionSnapshot], PositionArray]
     by_class: Dict[str, Decimal]
     total_value: Decimal
     missing_prices: List[Dict[str, Any]]
+    valuation_drift: Optional[Decimal] = None  # Set when a fast snapshot was verified
 
 class PortfolioCalculationService:
     """Canonical portfolio calculation service with strict rules"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, fast_valuation: Optional[bool] = None,
+                 verify_valuation: Optional[bool] = None):
         self.db = db
         
+        # Numeric mode for snapshots (Decimal per position unless fast is enabled)
+        self.fast_valuation = settings.FAST_VALUATION if fast_valuation is None else fast_valuation
+        self.verify_valuation = settings.VERIFY_VALUATION if verify_valuation is None else verify_valuation
+        
         # API credentials from environment
         self.alpaca_api_key = os.getenv('ALPACA_API_KEY')
         self.alpaca_secret_key = os.getenv('ALPACA_SECRET_KEY')
         self.twelve_data_api_key = os.getenv('TWELVE_DATA_API_KEY')
         
         # API endpoints
-        self.alpaca_base_url = "https://paper-api.alpaca.markets"
-        self.twelve_data_base_url = "https://api.twelvedata.com"
+        self.alpaca_base_url = settings.ALPACA_BASE_URL
+        self.twelve_data_base_url = settings.TWELVE_DATA_BASE_URL
     
     def classify_asset(self, ticker: str, portfolio_asset_class: Optional[str] = None) -> str:
         """
         Classify asset type following canonical rules
         1. Check portfolio.asset_class first if available
-        2. Fall back to ticker-based classification
+        2. Fall back to the shared classification index
         """
         if portfolio_asset_class and portfolio_asset_class in ASSET_CLASSES.values():
             return portfolio_asset_class
         
-        # Known bond ETFs
-        bond_etfs = {
-            'BND', 'AGG', 'TLT', 'IEF', 'SHY', 'VGIT', 'VGLT', 'VTEB', 
-            'MUB', 'HYG', 'JNK', 'LQD', 'VCIT', 'VCLT', 'BSV', 'BIV', 'BLV'
-        }
-        
-        # Crypto symbols
-        crypto_symbols = {
-            'BTC-USD', 'ETH-USD', 'BTC', 'ETH', 'ADA-USD', 'SOL-USD', 
-            'DOT-USD', 'AVAX-USD', 'MATIC-USD', 'LINK-USD'
-        }
-        
-        if ticker.startswith('CASH') or ticker == 'CASH':
-            return ASSET_CLASSES['CASH']
-        elif ticker.startswith('BOND_CASH'):
-            return ASSET_CLASSES['BOND_CASH']
-        elif ticker in crypto_symbols or 'USD' in ticker:
-            return ASSET_CLASSES['CRYPTO']
-        elif ticker in bond_etfs:
-            return ASSET_CLASSES['BOND_ETF']
-        else:
-            return ASSET_CLASSES['STOCK']
+        return classification_index(self.db).asset_class(ticker)
     
     def latest_price(self, ticker: str, as_of: date) -> Optional[Tuple[Decimal, date]]:
         """
@@ -167,11 +309,16 @@ class PortfolioCalculationService:
         
         return total
     
-    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Alpaca API"""
+    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Alpaca API
+        Returns [] when the provider has none for the range, None when the request failed
+        """
+        import requests
+
         if not self.alpaca_api_key or not self.alpaca_secret_key:
             logger.warning(f"Alpaca credentials missing for {ticker}")
-            return []
+            return None
         
         headers = {
             'APCA-API-KEY-ID': self.alpaca_api_key,
@@ -205,13 +352,18 @@ class PortfolioCalculationService:
             
         except Exception as e:
             logger.error(f"Alpaca API error for {ticker}: {e}")
-            return []
+            return None
     
-    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Twelve Data API"""
+    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Twelve Data API
+        Returns [] when the provider has none for the range, None when the request failed
+        """
+        import requests
+
         if not self.twelve_data_api_key:
             logger.warning(f"Twelve Data API key missing for {ticker}")
-            return []
+            return None
         
         url = f"{self.twelve_data_base_url}/time_series"
         params = {
@@ -228,6 +380,11 @@ class PortfolioCalculationService:
             response.raise_for_status()
             data = response.json()
             
+            # Errors come back as 200s; "no data" for the range is an answer, anything else a failure
+            if data.get('status') == 'error' and 'no data' not in str(data.get('message', '')).lower():
+                logger.error(f"Twelve Data API error for {ticker}: {data.get('message')}")
+                return None
+            
             prices = []
             for item in data.get('values', []):
                 price_date = datetime.strptime(item['datetime'], '%Y-%m-%d').date()
@@ -241,7 +398,7 @@ class PortfolioCalculationService:
             
         except Exception as e:
             logger.error(f"Twelve Data API error for {ticker}: {e}")
-            return []
+            return None
     
     def update_daily_prices(self, stock_tickers: List[str], bond_etf_tickers: List[str], 
                           crypto_tickers: List[str], as_of: Optional[date] = None) -> Dict[str, int]:
@@ -249,85 +406,53 @@ class PortfolioCalculationService:
         Update daily prices following canonical rules
         Returns counts inserted per ticker
         """
-        if as_of is None:
-            as_of = date.today()
-        
         results = {}
         all_prices = []
         
-        # Process equity tickers (stocks + bond ETFs) via Alpaca
+        # Exact missing sessions per trading calendar, one plan for every ticker; new tickers get 365 days.
+        # Without as_of each calendar plans up to its last completed session
         equity_tickers = stock_tickers + bond_etf_tickers
-        for ticker in equity_tickers:
-            try:
-                # Get last saved date
-                last_date = (
-                    self.db.query(func.max(DailyPrice.price_date))
-                    .filter(DailyPrice.ticker == ticker)
-                    .scalar()
-                )
-                
-                if last_date is None:
-                    # Fetch 365 days of history
-                    start_date = as_of - timedelta(days=365)
-                else:
-                    start_date = last_date + timedelta(days=1)
-                
-                if start_date > as_of:
-                    results[ticker] = 0
-                    continue
-                
-                prices = self.fetch_alpaca_prices(ticker, start_date, as_of)
-                all_prices.extend(prices)
-                results[ticker] = len(prices)
-                
-                # Rate limiting
-                time.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"Error updating {ticker}: {e}")
-                results[ticker] = 0
-        
-        # Process crypto tickers via Twelve Data
-        for ticker in crypto_tickers:
-            try:
-                # Get last saved date
-                last_date = (
-                    self.db.query(func.max(DailyPrice.price_date))
-                    .filter(DailyPrice.ticker == ticker)
-                    .scalar()
-                )
-                
-                if last_date is None:
-                    # Fetch 365 days of history
-                    start_date = as_of - timedelta(days=365)
-                else:
-                    start_date = last_date + timedelta(days=1)
-                
-                if start_date > as_of:
-                    results[ticker] = 0
-                    continue
-                
-                prices = self.fetch_twelve_data_prices(ticker, start_date, as_of)
-                all_prices.extend(prices)
-                results[ticker] = len(prices)
-                
-                # Rate limiting
-                time.sleep(0.2)
-                
-            except Exception as e:
-                logger.error(f"Error updating crypto {ticker}: {e}")
+        plan = plan_backfill(self.db, {
+            **{ticker: ASSET_CLASSES['STOCK'] for ticker in equity_tickers},
+            **{ticker: ASSET_CLASSES['CRYPTO'] for ticker in crypto_tickers},
+        }, end=as_of, history_days=365)
+        
+        # Equity tickers (stocks + bond ETFs) via Alpaca, crypto via Twelve Data
+        providers = [
+            (equity_tickers, ASSET_CLASSES['STOCK'], self.fetch_alpaca_prices, 0.1),
+            (crypto_tickers, ASSET_CLASSES['CRYPTO'], self.fetch_twelve_data_prices, 0.2),
+        ]
+        for tickers, asset_class, fetch, pause in providers:
+            for ticker in tickers:
                 results[ticker] = 0
+                try:
+                    for span in plan.get(ticker, []):
+                        prices = fetch(ticker, span.start, span.end)
+                        if prices is not None:
+                            # Sessions the provider answered without a close are not asked for again
+                            record_empty_fetches(self.db, span, asset_class, (p['price_date'] for p in prices))
+                            all_prices.extend(prices)
+                            results[ticker] += len(prices)
+                        
+                        # Rate limiting
+                        time.sleep(pause)
+                    
+                except Exception as e:
+                    logger.error(f"Error updating {ticker}: {e}")
         
         # Bulk upsert prices
         inserted_count = 0
+        ticker_ids = get_ticker_ids(self.db, {p['ticker'] for p in all_prices})
         for price_data in all_prices:
             try:
+                ticker_id = ticker_ids[price_data['ticker']]
+                
                 # Check if exists
                 existing = (
                     self.db.query(DailyPrice)
                     .filter(
                         and_(
-                            DailyPrice.ticker == price_data['ticker'],
+                            DailyPrice.ticker_id == ticker_id,
                             DailyPrice.price_date == price_data['price_date']
                         )
                     )
@@ -340,7 +465,7 @@ class PortfolioCalculationService:
                 else:
                     # Insert
                     new_price = DailyPrice(
-                        ticker=price_data['ticker'],
+                        ticker_id=ticker_id,
                         price_date=price_data['price_date'],
                         close_price=float(price_data['close_price'])
                     )
@@ -359,6 +484,9 @@ class PortfolioCalculationService:
         """
         Compute portfolio snapshot following canonical rules
         """
+        if self.fast_valuation:
+            return self.compute_portfolio_snapshot_fast(user_id, as_of, verify=self.verify_valuation)
+        
         # Get all positions for user
         positions = (
             self.db.query(Portfolio)
@@ -462,6 +590,155 @@ class PortfolioCalculationService:
             missing_prices=missing_prices
         )
     
+    def latest_prices(self, ticker_ids: List[int], as_of: date) -> Dict[int, Tuple[float, date]]:
+        """
+        Latest price <= as_of for many tickers in one query
+        Returns {ticker_id: (close_price, price_date)}
+        """
+        if not ticker_ids:
+            return {}
+        
+        latest = (
+            self.db.query(
+                DailyPrice.ticker_id,
+                func.max(DailyPrice.price_date).label('price_date')
+            )
+            .filter(
+                and_(
+                    DailyPrice.ticker_id.in_(ticker_ids),
+                    DailyPrice.price_date <= as_of
+                )
+            )
+            .group_by(DailyPrice.ticker_id)
+            .subquery()
+        )
+        
+        rows = (
+            self.db.query(DailyPrice.ticker_id, DailyPrice.close_price, DailyPrice.price_date)
+            .join(
+                latest,
+                and_(
+                    DailyPrice.ticker_id == latest.c.ticker_id,
+                    DailyPrice.price_date == latest.c.price_date
+                )
+            )
+            .all()
+        )
+        
+        return {ticker_id: (close_price, price_date) for ticker_id, close_price, price_date in rows}
+    
+    def compute_portfolio_snapshot_fast(self, user_id: int, as_of: date, verify: bool = False) -> PortfolioSnapshot:
+        """
+        Compute portfolio snapshot with float64 vectorized math
+        
+        Same rules as compute_portfolio_snapshot, but prices are loaded in one
+        query and values summed over the whole position array. Positions come
+        back as a PositionArray of float columns; by_class and total_value
+        stay Decimal so callers are unchanged. With verify=True totals are re-checked in Decimal and
+        drift beyond a cent is logged and stored on valuation_drift.
+        """
+        positions = (
+            self.db.query(
+                Portfolio.portfolio_id, Portfolio.ticker, Portfolio.ticker_id,
+                Portfolio.asset_class, Portfolio.units, Portfolio.avg_price
+            )
+            .filter(Portfolio.user_id == user_id)
+            .all()
+        )
+        
+        # CASH positions are handled through cash_transactions
+        rows = []
+        for pos in positions:
+            asset_class = self.classify_asset(pos.ticker, pos.asset_class)
+            if asset_class != ASSET_CLASSES['CASH']:
+                rows.append((pos, asset_class))
+        
+        priced_ids = [
+            pos.ticker_id for pos, asset_class in rows
+            if asset_class != ASSET_CLASSES['BOND_CASH']
+        ]
+        prices = self.latest_prices(priced_ids, as_of)
+        
+        by_position = PositionArray.empty(as_of, len(rows))
+        missing_prices = []
+        
+        for i, (pos, asset_class) in enumerate(rows):
+            by_position.portfolio_id[i] = pos.portfolio_id
+            by_position.ticker_id[i] = pos.ticker_id or 0
+            by_position.tickers[i] = pos.ticker
+            by_position.class_code[i] = CLASS_TOTAL_INDEX[asset_class]
+            by_position.units[i] = pos.units
+            
+            if asset_class == ASSET_CLASSES['BOND_CASH']:
+                # Use avg_price, no daily repricing
+                by_position.price[i] = pos.avg_price
+                continue
+            
+            price_result = prices.get(pos.ticker_id)
+            if price_result is None:
+                missing_prices.append({
+                    'ticker': pos.ticker,
+                    'last_price_date': None,
+                    'reason': 'missing'
+                })
+                continue
+            
+            close_price, price_date = price_result
+            days_old = (as_of - price_date).days
+            by_position.price[i] = close_price
+            by_position.price_age[i] = days_old
+            if days_old > STALE_PRICE_DAYS[asset_class]:
+                missing_prices.append({
+                    'ticker': pos.ticker,
+                    'last_price_date': price_date.isoformat(),
+                    'days_old': days_old,
+                    'reason': 'stale'
+                })
+        
+        np.multiply(by_position.units, np.nan_to_num(by_position.price), out=by_position.value)
+        class_sums = by_position.class_totals()
+        
+        cash = self.cash_balance(user_id, as_of)
+        by_class = {key: Decimal(str(float(class_sums[i]))) for i, key in enumerate(CLASS_TOTAL_KEYS)}
+        by_class['cash'] = cash
+        total_value = Decimal(str(float(class_sums.sum()))) + cash
+        
+        snapshot = PortfolioSnapshot(
+            date=as_of,
+            by_position=by_position,
+            by_class=by_class,
+            total_value=total_value,
+            missing_prices=missing_prices
+        )
+        
+        if verify:
+            snapshot.valuation_drift = self.verify_snapshot(snapshot, user_id)
+        
+        return snapshot
+    
+    def verify_snapshot(self, snapshot: PortfolioSnapshot, user_id: int) -> Decimal:
+        """
+        Re-check fast snapshot totals in Decimal
+        Returns the largest absolute drift across class totals and the total
+        """
+        positions = snapshot.by_position
+        exact = [Decimal('0')] * len(CLASS_TOTAL_KEYS)
+        for u, p, c in zip(positions.units.tolist(), positions.price.tolist(), positions.class_code.tolist()):
+            if not math.isnan(p):
+                exact[c] += Decimal(str(u)) * Decimal(str(p))
+        
+        drifts = [abs(snapshot.by_class[key] - exact[i]) for i, key in enumerate(CLASS_TOTAL_KEYS)]
+        drifts.append(abs(snapshot.total_value - (sum(exact) + snapshot.by_class['cash'])))
+        drift = max(drifts)
+        
+        if drift > CENT:
+            logger.warning(
+                "Valuation drift %s for user %s on %s exceeds one cent",
+                drift, user_id, snapshot.date
+            )
+        
+        return drift
+    
     def upsert_daily_snapshot(self, user_id: int, as_of: date) -> PortfolioSnapshot:
         """
         Compute and persist daily snapshot
@@ -528,6 +805,7 @@ class PortfolioCalculationService:
             self.db.add(new_summary)
         
         self.db.commit()
+        invalidate_returns_cache(user_id)
         return snapshot
     
     def portfolio_created_date(self, user_id: int) -> Optional[date]:
@@ -589,12 +867,8 @@ class PortfolioCalculationService:
         """Get top k holdings by value"""
         snapshot = self.compute_portfolio_snapshot(user_id, as_of)
         
-        # Sort by position value and take top k
-        sorted_positions = sorted(
-            snapshot.by_position,
-            key=lambda x: x.position_val,
-            reverse=True
-        )
+        # Top k by position value without sorting every position
+        largest_positions = heapq.nlargest(k, snapshot.by_position, key=lambda x: x.position_val)
         
         return [
             {
@@ -603,13 +877,15 @@ class PortfolioCalculationService:
                 'price': float(pos.price) if pos.price else None,
                 'position_val': float(pos.position_val)
             }
-            for pos in sorted_positions[:k]
+            for pos in largest_positions
         ]
     
     def round_decimal(self, value: Decimal, places: int = 2) -> float:
         """Round decimal to specified places for response boundary"""
         if value is None:
             return None
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
         quantizer = Decimal('0.01') if places == 2 else Decimal('0.0001')
         return float(value.quantize(quantizer, rounding=ROUND_HALF_UP))
 
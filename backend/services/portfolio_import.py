@@ -0,0 +1,178 @@
+"""
+Portfolio Import - Broker CSV Parsing
+Vectorized validation and duplicate aggregation for brokerage exports
+"""
+
+import io
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from services.classification_index import (
+    ASSET_CLASSES, CATEGORY_ASSET_CLASSES, ClassificationIndex, classification_index, is_known_category
+)
+
+# Canonical column -> headers used by supported broker exports
+# master_portfolio_new.csv: account_name,symbol,asset_type,shares,purchase_price,total_cost,total_value
+# robinhood_portfolio_combined2.csv: Symbol,Classification,Quantity Owned,...
+COLUMN_ALIASES = {
+    'symbol': ['symbol', 'ticker', 'instrument'],
+    'units': ['shares', 'quantity owned', 'quantity', 'qty', 'units'],
+    'avg_price': ['purchase_price', 'average cost', 'avg cost', 'average price', 'avg_price'],
+    'total_cost': ['total_cost', 'cost basis', 'total cost'],
+    'asset_type': ['asset_type', 'classification', 'asset type', 'type'],
+    'account': ['account_name', 'account'],
+}
+REQUIRED_COLUMNS = ['symbol', 'units']
+
+# Cash sleeves keep the account's own spelling (Cash_Public), only tickers are upper-cased
+CASH_SYMBOL_PREFIXES = ('CASH', 'BOND_CASH')
+
+@dataclass
+class ImportRowError:
+    row: int  # 1-based line number in the file, header is line 1
+    symbol: Optional[str]
+    field: str
+    message: str
+
+@dataclass
+class ImportResult:
+    positions: pd.DataFrame  # one row per symbol: symbol, units, avg_price, total_cost, asset_type, asset_class, account
+    rows_read: int
+    rows_skipped: int
+    errors: List[ImportRowError] = field(default_factory=list)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Aggregated positions as plain dicts"""
+        return [
+            {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in record.items()}
+            for record in self.positions.to_dict('records')
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Structured result for API responses"""
+        return {
+            'rows_read': self.rows_read,
+            'rows_skipped': self.rows_skipped,
+            'positions': len(self.positions),
+            'errors': [error.__dict__ for error in self.errors],
+        }
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename broker headers to canonical column names"""
+    lookup = {alias: canonical for canonical, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    renames = {}
+    for column in df.columns:
+        canonical = lookup.get(str(column).strip().lower())
+        if canonical and canonical not in renames.values():
+            renames[column] = canonical
+    return df.rename(columns=renames)
+
+def _row_errors(df: pd.DataFrame, mask: pd.Series, column: str, message: str) -> List[ImportRowError]:
+    rows = df.loc[mask]
+    return [
+        ImportRowError(row=int(line), symbol=symbol or None, field=column, message=message)
+        for line, symbol in zip(rows['_line'], rows['symbol'])
+    ]
+
+def parse_portfolio_csv(source: Union[str, bytes, io.IOBase], index: Optional[ClassificationIndex] = None) -> ImportResult:
+    """
+    Parse a broker CSV into one aggregated position per symbol
+
+    Rows with zero units are skipped and blank units are derived from
+    total_cost / avg_price (cash lines); rows with a missing symbol, non-numeric
+    or negative values or an unknown asset_type are reported in errors and
+    left out. Symbols are upper-cased except cash sleeves (Cash_Public).
+    asset_class comes from the classification index: the asset type when it
+    names a class (Bond, Crypto, Cash), otherwise the ticker's own class. Duplicate symbols
+    (e.g. the same ticker in several accounts) are summed, with avg_price
+    weighted by units.
+    """
+    if isinstance(source, bytes):
+        source = io.StringIO(source.decode('utf-8-sig'))
+
+    df = normalize_columns(pd.read_csv(source, dtype=str, skipinitialspace=True))
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    rows_read = len(df)
+    df['_line'] = np.arange(rows_read) + 2
+    for column in ('asset_type', 'account'):
+        if column not in df.columns:
+            df[column] = None
+    df['symbol'] = df['symbol'].fillna('').str.strip()
+    asset_type = df['asset_type'].fillna('').str.strip().str.lower()
+    cash = (
+        asset_type.map(CATEGORY_ASSET_CLASSES).isin([ASSET_CLASSES['CASH'], ASSET_CLASSES['BOND_CASH']])
+        | df['symbol'].str.upper().str.startswith(CASH_SYMBOL_PREFIXES)
+    )
+    df['symbol'] = df['symbol'].where(cash, df['symbol'].str.upper())
+
+    # Numeric columns accept "$1,234.50" style values from broker exports
+    for column in ('units', 'avg_price', 'total_cost'):
+        if column in df.columns:
+            raw = df[column].fillna('').str.replace(r'[$,\s]', '', regex=True)
+            df[column] = pd.to_numeric(raw.replace('', np.nan), errors='coerce')
+            df[f'_{column}_invalid'] = df[column].isna() & (raw != '')
+        else:
+            df[column] = np.nan
+            df[f'_{column}_invalid'] = False
+
+    # Cash lines carry a balance and unit price but no share count
+    derive_units = (
+        df['units'].isna() & ~df['_units_invalid']
+        & df['total_cost'].notna() & (df['avg_price'] > 0)
+    )
+    df.loc[derive_units, 'units'] = df.loc[derive_units, 'total_cost'] / df.loc[derive_units, 'avg_price']
+
+    checks = [
+        (df['symbol'] == '', 'symbol', 'missing symbol'),
+        (df['_units_invalid'] | df['units'].isna(), 'units', 'units must be a number'),
+        (df['units'] < 0, 'units', 'units must not be negative'),
+        (df['_avg_price_invalid'], 'avg_price', 'avg_price must be a number'),
+        (df['avg_price'] < 0, 'avg_price', 'avg_price must not be negative'),
+        (df['_total_cost_invalid'], 'total_cost', 'total_cost must be a number'),
+        (~asset_type.map(is_known_category), 'asset_type', 'unknown asset_type'),
+    ]
+
+    errors = []
+    invalid = pd.Series(False, index=df.index)
+    for mask, column, message in checks:
+        mask = mask & ~invalid  # report the first problem per row
+        errors.extend(_row_errors(df, mask, column, message))
+        invalid |= mask
+
+    zero_units = ~invalid & (df['units'] == 0)
+    valid = df.loc[~invalid & ~zero_units].copy()
+
+    # Cost basis from the file when given, otherwise units * avg_price
+    valid['total_cost'] = valid['total_cost'].fillna(valid['units'] * valid['avg_price'].fillna(0.0))
+
+    positions = (
+        valid.groupby('symbol', sort=True)
+        .agg(
+            units=('units', 'sum'),
+            total_cost=('total_cost', 'sum'),
+            asset_type=('asset_type', 'first'),
+            account=('account', 'first'),
+        )
+        .reset_index()
+    )
+    positions['avg_price'] = positions['total_cost'] / positions['units']
+    index = index or classification_index()
+    positions['asset_class'] = [
+        index.category_asset_class(asset_type if isinstance(asset_type, str) else None, symbol)
+        for asset_type, symbol in zip(positions['asset_type'], positions['symbol'])
+    ]
+    positions = positions[['symbol', 'units', 'avg_price', 'total_cost', 'asset_type', 'asset_class', 'account']]
+
+    errors.sort(key=lambda error: error.row)
+    return ImportResult(
+        positions=positions,
+        rows_read=rows_read,
+        rows_skipped=int(zero_units.sum()) + int(invalid.sum()),
+        errors=errors
+    )
@@ -3,16 +3,20 @@ Portfolio Service - Perfect Business Logic
 Clean, focused, efficient
 """
 
+import heapq
+import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
 
 from services.data_service import DataService
+from services.movers_engine import MoversEngine, largest_movers
 from domain.schemas import (
     PortfolioResponse, HoldingResponse, PortfolioSummary,
     ReturnCalculationResponse, GLDMDebugResponse, UpdatePricesResponse
 )
-from core.logging import logger
+
+logger = logging.getLogger(__name__)
 
 class PortfolioService:
     """Perfect portfolio service - business logic layer"""
@@ -22,17 +26,17 @@ class PortfolioService:
     
     def get_portfolio_summary(self, user_id: int) -> PortfolioResponse:
         """Get complete portfolio summary with perfect data"""
-        logger.info(f"Getting portfolio summary for user {user_id}")
+        logger.debug("Getting portfolio summary for user %s", user_id)
         
         # Get user and holdings
         user = self.data_service.get_user(user_id)
         if not user:
-            logger.warning(f"User {user_id} not found")
+            logger.warning("User %s not found", user_id)
             return self._empty_portfolio_response("User not found")
         
         holdings = self.data_service.get_portfolio_holdings(user_id)
         if not holdings:
-            logger.info(f"No holdings found for user {user_id}")
+            logger.info("No holdings found for user %s", user_id)
             return self._empty_portfolio_response(user.name)
         
         # Convert to response format
@@ -76,13 +80,13 @@ class PortfolioService:
         )
         
         # Log key metrics
-        logger.info(f"Portfolio summary: {len(holdings)} holdings, ${float(total_value):,.2f} total value")
+        logger.debug("Portfolio summary: %d holdings, $%.2f total value", len(holdings), total_value)
         
         # Debug GLDM specifically
         gldm_items = [item for item in portfolio_items if item.Ticker == "GLDM"]
         if gldm_items:
             gldm = gldm_items[0]
-            logger.info(f"🔍 GLDM: ${gldm.Current_Price:.2f}, {gldm.Gain_Loss_Percent:.2f}%")
+            logger.debug("🔍 GLDM: $%.2f, %.2f%%", gldm.Current_Price, gldm.Gain_Loss_Percent)
         
         return PortfolioResponse(
             portfolio=portfolio_items,
@@ -92,7 +96,7 @@ class PortfolioService:
     
     def update_prices_from_csv(self, user_id: int, force_update: bool = False) -> UpdatePricesResponse:
         """Update all portfolio prices from CSV data"""
-        logger.info(f"Updating prices for user {user_id} (force={force_update})")
+        logger.info("Updating prices for user %s (force=%s)", user_id, force_update)
         
         holdings = self.data_service.get_portfolio_holdings(user_id)
         if not holdings:
@@ -124,18 +128,18 @@ class PortfolioService:
                     
                     if success:
                         updated_count += 1
-                        logger.debug(f"✅ Updated {holding.ticker}: ${holding.current_price:.2f} → ${latest_price:.2f}")
+                        logger.debug("✅ Updated %s: $%.2f → $%.2f", holding.ticker, holding.current_price, latest_price)
                     else:
                         errors.append(f"Failed to update {holding.ticker}")
                 
             except Exception as e:
                 error_msg = f"Error updating {holding.ticker}: {str(e)}"
                 errors.append(error_msg)
-                logger.error(error_msg)
+                logger.error("Error updating %s: %s", holding.ticker, e)
         
         status = "success" if not errors else ("partial_success" if updated_count > 0 else "error")
         
-        logger.info(f"Price update complete: {updated_count}/{len(holdings)} updated, {len(errors)} errors")
+        logger.info("Price update complete: %d/%d updated, %d errors", updated_count, len(holdings), len(errors))
         
         return UpdatePricesResponse(
             updated_count=updated_count,
@@ -152,14 +156,14 @@ class PortfolioService:
         end_date: date
     ) -> Optional[ReturnCalculationResponse]:
         """Calculate return for specific ticker between dates"""
-        logger.info(f"Calculating return for {ticker} from {start_date} to {end_date}")
+        logger.debug("Calculating return for %s from %s to %s", ticker, start_date, end_date)
         
         # Get prices from CSV
         start_price = self.data_service.get_price_on_date(ticker, start_date)
         end_price = self.data_service.get_price_on_date(ticker, end_date)
         
         if start_price is None or end_price is None:
-            logger.warning(f"Missing price data for {ticker}: start={start_price}, end={end_price}")
+            logger.warning("Missing price data for %s: start=%s, end=%s", ticker, start_price, end_price)
             return None
         
         # Calculate return with precision
@@ -176,7 +180,7 @@ class PortfolioService:
             return_percent=self._round_percentage(return_percent)
         )
         
-        logger.info(f"{ticker} return: {return_percent:.2f}% (${start_price:.2f} → ${end_price:.2f})")
+        logger.debug("%s return: %.2f%% ($%.2f → $%.2f)", ticker, return_percent, start_price, end_price)
         return result
     
     def get_gldm_debug_info(self, user_id: int) -> GLDMDebugResponse:
@@ -222,7 +226,7 @@ class PortfolioService:
     def get_top_holdings(self, user_id: int, limit: int = 10) -> List[HoldingResponse]:
         """Get top holdings by value"""
         holdings = self.data_service.get_portfolio_holdings(user_id)
-        top_holdings = sorted(holdings, key=lambda h: h.total_value, reverse=True)[:limit]
+        top_holdings = heapq.nlargest(limit, holdings, key=lambda h: h.total_value)
         
         return [
             HoldingResponse(
@@ -238,9 +242,15 @@ class PortfolioService:
         ]
     
     def get_top_movers(self, user_id: int, limit: int = 10) -> List[HoldingResponse]:
-        """Get top movers by percentage gain/loss"""
+        """Get top movers by the latest 1D price change, falling back to total gain/loss"""
         holdings = self.data_service.get_portfolio_holdings(user_id)
-        top_movers = sorted(holdings, key=lambda h: abs(h.gain_loss_percent), reverse=True)[:limit]
+        positions = MoversEngine(self.data_service.db).attach_changes(
+            [{'ticker': h.ticker, 'position_val': h.total_value, 'holding': h} for h in holdings],
+            date.today()
+        )
+        top_movers = [p['holding'] for p in largest_movers(positions, limit)]
+        if not top_movers:
+            top_movers = heapq.nlargest(limit, holdings, key=lambda h: abs(h.gain_loss_percent))
         
         return [
             HoldingResponse(
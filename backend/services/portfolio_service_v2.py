@@ -3,16 +3,19 @@ Perfect Portfolio Service V2 - Normalized Database
 Efficient calculations with proper table structure
 """
 
+import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, desc
+from sqlalchemy import and_, func, desc, insert
 
 from domain.models_v2 import (
     User, Portfolio, DailyPrice, PortfolioDailyValue, 
-    PortfolioSummary, AssetCategory, PortfolioTransaction
+    PortfolioSummary, AssetCategory, PortfolioTransaction, get_ticker_ids
 )
-from core.logging import logger
+from services.classification_index import classification_index, invalidate_classification_index
+
+logger = logging.getLogger(__name__)
 
 class PortfolioServiceV2:
     """Perfect portfolio service with normalized database"""
@@ -66,6 +69,61 @@ class PortfolioServiceV2:
         logger.info(f"Added position: {ticker} ({units} units @ ${avg_price:.2f})")
         return position
     
+    def bulk_add_portfolio_positions(
+        self,
+        user_id: int,
+        positions: List[Dict],
+        buy_date: date
+    ) -> int:
+        """
+        Add many positions in one transaction
+        positions are dicts with symbol, units, avg_price and optional asset_class/asset_type
+        (as produced by services.portfolio_import.parse_portfolio_csv)
+        """
+        if not positions:
+            return 0
+        
+        try:
+            symbols = [p['symbol'] for p in positions]
+            ticker_ids = get_ticker_ids(self.db, symbols)
+            
+            self.db.execute(insert(Portfolio), [
+                {
+                    'user_id': user_id,
+                    'ticker': p['symbol'],
+                    'ticker_id': ticker_ids[p['symbol']],
+                    'asset_class': p.get('asset_class'),
+                    'units': p['units'],
+                    'avg_price': p.get('avg_price') or 0.0,
+                    'buy_date': buy_date
+                }
+                for p in positions
+            ])
+            
+            # Record categories for symbols seen for the first time
+            known = {
+                row[0] for row in
+                self.db.query(AssetCategory.ticker).filter(AssetCategory.ticker.in_(symbols)).all()
+            }
+            categories = [
+                {'ticker': p['symbol'], 'category': p['asset_type']}
+                for p in positions
+                if p.get('asset_type') and p['symbol'] not in known
+            ]
+            if categories:
+                self.db.execute(insert(AssetCategory), categories)
+            
+            self.db.commit()
+            if categories:
+                # Bulk inserts skip the ORM events that normally drop the index
+                invalidate_classification_index()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        logger.info(f"Added {len(positions)} positions for user {user_id}")
+        return len(positions)
+    
     # Price operations
     def get_latest_price(self, ticker: str) -> Optional[float]:
         """Get latest price for ticker"""
@@ -364,12 +422,8 @@ class PortfolioServiceV2:
     # Utility methods
     def get_asset_category(self, ticker: str) -> str:
         """Get asset category for ticker"""
-        category_record = (
-            self.db.query(AssetCategory)
-            .filter(AssetCategory.ticker == ticker)
-            .first()
-        )
-        return category_record.category if category_record else "Other"
+        classification = classification_index(self.db).lookup(ticker)
+        return classification.category if classification else "Other"
     
     def _empty_portfolio_response(self, user_name: str = "Unknown") -> Dict:
         """Create empty portfolio response"""
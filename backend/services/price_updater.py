@@ -18,11 +18,14 @@ from sqlalchemy import func, and_
 
 # Database imports
 from core.database import SessionLocal
-from domain.models_v2 import DailyPrice, Portfolio, User
+from core.logging import configure_logging
+from domain.models_v2 import DailyPrice, Portfolio, User, get_ticker_ids
 from core.config import settings
+from core.metrics import record_provider_response, time_provider_fetch
+from services.backfill_planner import plan_backfill, record_empty_fetches
+from services.classification_index import ASSET_CLASSES, classification_index
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class PriceUpdater:
@@ -37,8 +40,8 @@ class PriceUpdater:
         self.twelve_data_api_key = os.getenv('TWELVE_DATA_API_KEY')
         
         # API endpoints
-        self.alpaca_base_url = "https://paper-api.alpaca.markets"  # or "https://api.alpaca.markets" for live
-        self.twelve_data_base_url = "https://api.twelvedata.com"
+        self.alpaca_base_url = settings.ALPACA_BASE_URL
+        self.twelve_data_base_url = settings.TWELVE_DATA_BASE_URL
         
         # Rate limiting
         self.alpaca_rate_limit = 200  # requests per minute
@@ -55,12 +58,15 @@ class PriceUpdater:
         
         return latest_record
     
-    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Alpaca API for stocks and bonds"""
+    def fetch_alpaca_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Alpaca API for stocks and bonds
+        Returns [] when the provider has none for the range, None when the request failed
+        """
         
         if not self.alpaca_api_key or not self.alpaca_secret_key:
             logger.error("Alpaca API credentials not found")
-            return []
+            return None
         
         headers = {
             'APCA-API-KEY-ID': self.alpaca_api_key,
@@ -83,7 +89,9 @@ class PriceUpdater:
         
         try:
             logger.info(f"Fetching Alpaca data for {ticker} from {start_str} to {end_str}")
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            with time_provider_fetch('alpaca') as fetch:
+                response = requests.get(url, headers=headers, params=params, timeout=30)
+                record_provider_response('alpaca', response, fetch)
             response.raise_for_status()
             
             data = response.json()
@@ -111,17 +119,20 @@ class PriceUpdater:
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Alpaca API error for {ticker}: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"❌ Unexpected error fetching Alpaca data for {ticker}: {e}")
-            return []
+            return None
     
-    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> List[Dict]:
-        """Fetch daily prices from Twelve Data API for crypto"""
+    def fetch_twelve_data_prices(self, ticker: str, start_date: date, end_date: date) -> Optional[List[Dict]]:
+        """
+        Fetch daily prices from Twelve Data API for crypto
+        Returns [] when the provider has none for the range, None when the request failed
+        """
         
         if not self.twelve_data_api_key:
             logger.error("Twelve Data API key not found")
-            return []
+            return None
         
         # Format dates for Twelve Data API
         start_str = start_date.strftime('%Y-%m-%d')
@@ -140,10 +151,20 @@ class PriceUpdater:
         
         try:
             logger.info(f"Fetching Twelve Data for {ticker} from {start_str} to {end_str}")
-            response = requests.get(url, params=params, timeout=30)
+            with time_provider_fetch('twelve_data') as fetch:
+                response = requests.get(url, params=params, timeout=30)
+                # Rate limits arrive as 200s with code 429 in the body
+                data = response.json() if response.status_code == 200 else None
+                record_provider_response('twelve_data', response, fetch, body=data)
             response.raise_for_status()
             
-            data = response.json()
+            # Errors come back as 200s; "no data" for the range is an answer, anything else a failure
+            if data.get('status') == 'error':
+                if 'no data' in str(data.get('message', '')).lower():
+                    logger.warning(f"No Twelve Data found for {ticker}")
+                    return []
+                logger.error(f"❌ Twelve Data API error for {ticker}: {data.get('message')}")
+                return None
             
             if 'values' not in data or not data['values']:
                 logger.warning(f"No Twelve Data found for {ticker}")
@@ -168,10 +189,10 @@ class PriceUpdater:
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Twelve Data API error for {ticker}: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"❌ Unexpected error fetching Twelve Data for {ticker}: {e}")
-            return []
+            return None
     
     def insert_prices_bulk(self, prices: List[Dict]) -> int:
         """Insert prices in bulk for efficiency"""
@@ -182,13 +203,18 @@ class PriceUpdater:
         inserted_count = 0
         
         try:
+            # Resolve symbols to integer ticker ids once for the whole batch
+            ticker_ids = get_ticker_ids(self.db, {p['ticker'] for p in prices})
+            
             for price_data in prices:
+                ticker_id = ticker_ids[price_data['ticker']]
+                
                 # Check if price already exists
                 existing = (
                     self.db.query(DailyPrice)
                     .filter(
                         and_(
-                            DailyPrice.ticker == price_data['ticker'],
+                            DailyPrice.ticker_id == ticker_id,
                             DailyPrice.price_date == price_data['price_date']
                         )
                     )
@@ -198,7 +224,7 @@ class PriceUpdater:
                 if not existing:
                     # Insert new price
                     daily_price = DailyPrice(
-                        ticker=price_data['ticker'],
+                        ticker_id=ticker_id,
                         price_date=price_data['price_date'],
                         close_price=price_data['close_price'],
                         open_price=price_data.get('open_price'),
@@ -230,32 +256,31 @@ class PriceUpdater:
     def update_ticker_prices(self, ticker: str, ticker_type: str) -> int:
         """Update prices for a single ticker"""
         
-        # Get latest date we have data for
-        latest_date = self.get_latest_price_date(ticker)
-        today = date.today()
-        
-        if latest_date is None:
-            # No data exists, fetch 1 year of historical data
-            start_date = today - timedelta(days=365)
-            logger.info(f"No existing data for {ticker}, fetching 1 year of history")
-        elif latest_date >= today:
-            # We're up to date
-            logger.info(f"✅ {ticker} is up to date (latest: {latest_date})")
-            return 0
-        else:
-            # Fetch missing data from last date + 1 until today
-            start_date = latest_date + timedelta(days=1)
-            logger.info(f"Updating {ticker} from {start_date} to {today}")
-        
         # Fetch prices based on ticker type
         if ticker_type in ['stock', 'bond', 'etf']:
-            prices = self.fetch_alpaca_prices(ticker, start_date, today)
+            fetch, asset_class = self.fetch_alpaca_prices, ASSET_CLASSES['STOCK']
         elif ticker_type == 'crypto':
-            prices = self.fetch_twelve_data_prices(ticker, start_date, today)
+            fetch, asset_class = self.fetch_twelve_data_prices, ASSET_CLASSES['CRYPTO']
         else:
             logger.warning(f"Unknown ticker type '{ticker_type}' for {ticker}")
             return 0
         
+        # Only the sessions missing from daily_prices; a new ticker gets 1 year of history
+        spans = plan_backfill(self.db, {ticker: asset_class}, history_days=365).get(ticker, [])
+        if not spans:
+            logger.info(f"✅ {ticker} is up to date")
+            return 0
+        
+        prices = []
+        for span in spans:
+            logger.info(f"Updating {ticker} from {span.start} to {span.end} ({span.missing} missing sessions)")
+            fetched = fetch(ticker, span.start, span.end)
+            if fetched is not None:
+                # Sessions the provider answered without a close are not asked for again
+                record_empty_fetches(self.db, span, asset_class, (p['price_date'] for p in fetched))
+                prices.extend(fetched)
+        self.db.commit()
+        
         # Insert prices
         return self.insert_prices_bulk(prices)
 
@@ -357,20 +382,21 @@ def get_portfolio_tickers() -> Tuple[List[str], List[str], List[str]]:
         tickers = db.query(Portfolio.ticker).distinct().all()
         ticker_list = [t[0] for t in tickers]
         
-        # Simple categorization (you can enhance this with AssetCategory table)
+        # Categorize through the shared classification index
         stock_tickers = []
         bond_tickers = []
         crypto_tickers = []
         
+        index = classification_index(db)
         for ticker in ticker_list:
-            if ticker.startswith('CASH'):
-                continue  # Skip cash entries
-            elif ticker in ['BTC-USD', 'ETH-USD', 'BTC', 'ETH'] or 'USD' in ticker:
+            asset_class = index.asset_class(ticker)
+            if asset_class == ASSET_CLASSES['CRYPTO']:
                 crypto_tickers.append(ticker)
-            elif ticker in ['BND', 'AGG', 'TLT', 'IEF', 'SHY']:  # Common bond ETFs
+            elif asset_class == ASSET_CLASSES['BOND_ETF']:
                 bond_tickers.append(ticker)
-            else:
+            elif asset_class == ASSET_CLASSES['STOCK']:
                 stock_tickers.append(ticker)
+            # Cash and bond cash have no market price
         
         logger.info(f"📊 Found {len(stock_tickers)} stocks, {len(bond_tickers)} bonds, {len(crypto_tickers)} crypto")
         
@@ -381,6 +407,7 @@ def get_portfolio_tickers() -> Tuple[List[str], List[str], List[str]]:
 
 # CLI interface for testing
 if __name__ == "__main__":
+    configure_logging()
     import argparse
     
     parser = argparse.ArgumentParser(description="Update Daily Prices")
@@ -0,0 +1,344 @@
+"""
+Projection Engine - Monte Carlo Portfolio Projections
+Simulates 1W/1M/1Y value paths for every user's current holdings in NumPy batches
+Bootstrap resamples whole historical days (keeping cross-asset correlation); gbm draws
+log returns with drift and variance from the asset covariance matrix
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging import configure_logging
+from core.database import SessionLocal
+from domain.models_v2 import DailyPrice, Portfolio, PortfolioDailyValue, PortfolioProjection, PortfolioSummary
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Horizon -> calendar days; simulated steps follow the observed price-days per calendar day
+PROJECTION_HORIZONS = {'1W': 7, '1M': 30, '1Y': 365}
+PROJECTION_METHODS = ['bootstrap', 'gbm']
+PERCENTILES = [5, 25, 50, 75, 95]
+CONFIDENCE_LEVEL = 0.90  # p5..p95 band
+
+# Upper bound on paths x steps x users held in memory per simulation chunk
+SIMULATION_CHUNK_ELEMENTS = 2 ** 22
+
+def horizon_steps(horizons: Dict[str, int], days_per_step: float) -> Dict[str, int]:
+    """Simulation steps per horizon, at least one"""
+    return {name: max(1, int(round(days / days_per_step))) for name, days in horizons.items()}
+
+def simulate_projections(asset_returns: np.ndarray, weights: np.ndarray, steps: Dict[str, int],
+                         paths: int = 10000, method: str = 'bootstrap', seed: Optional[int] = None,
+                         steps_per_year: float = 252.0, risk_free_rate: float = 0.0) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Monte Carlo terminal-return distribution for every user (row of weights)
+
+    asset_returns is (days x assets) simple daily returns, weights is
+    (users x assets) fractions of current value; whatever does not sum to one
+    is held as cash at zero return. Portfolios are constant-mix. Random draws
+    are shared across users, so users are compared on the same scenarios.
+
+    Returns horizon -> {'percentiles' (len(PERCENTILES) x users), 'mean',
+    'probability_of_loss', 'max_drawdown'} as fractions, plus '_risk' ->
+    {'volatility', 'sharpe_ratio'} annualized per user.
+    """
+    if method not in PROJECTION_METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+
+    asset_returns = np.atleast_2d(np.asarray(asset_returns, dtype=np.float64))
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    n_users = weights.shape[0]
+    max_steps = max(steps.values())
+    rng = np.random.default_rng(seed)
+
+    # Daily log returns of each constant-mix portfolio (days x users)
+    portfolio_log = np.log1p(asset_returns @ weights.T)
+    if method == 'bootstrap':
+        draws = rng.integers(0, portfolio_log.shape[0], size=(paths, max_steps))
+        path_log = portfolio_log.T.astype(np.float32)
+        daily_mean = portfolio_log.mean(axis=0)
+        daily_vol = portfolio_log.std(axis=0, ddof=1) if portfolio_log.shape[0] > 1 else np.zeros(n_users)
+    else:
+        asset_log = np.log1p(asset_returns)
+        covariance = np.atleast_2d(np.cov(asset_log, rowvar=False))
+        daily_mean = weights @ asset_log.mean(axis=0)
+        daily_vol = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', weights, covariance, weights), 0.0))
+        shocks = rng.standard_normal((paths, max_steps), dtype=np.float32)
+
+    results = {
+        name: {
+            'percentiles': np.empty((len(PERCENTILES), n_users)),
+            'mean': np.empty(n_users),
+            'probability_of_loss': np.empty(n_users),
+            'max_drawdown': np.empty(n_users),
+        }
+        for name in steps
+    }
+
+    # (users, paths, steps) keeps the step axis contiguous for cumsum/accumulate;
+    # paths are float32, summary statistics are accumulated in float64
+    chunk = max(1, SIMULATION_CHUNK_ELEMENTS // (paths * max_steps))
+    for start in range(0, n_users, chunk):
+        users = slice(start, min(start + chunk, n_users))
+        if method == 'bootstrap':
+            log_steps = path_log[users][:, draws]
+        else:
+            log_steps = (
+                daily_mean[users, np.newaxis, np.newaxis].astype(np.float32)
+                + daily_vol[users, np.newaxis, np.newaxis].astype(np.float32) * shocks[np.newaxis]
+            )
+
+        cumulative = np.cumsum(log_steps, axis=2)
+        peak = np.maximum(np.maximum.accumulate(cumulative, axis=2), 0.0)
+        worst = np.minimum.accumulate(cumulative - peak, axis=2)
+
+        for name, n_steps in steps.items():
+            terminal = np.expm1(cumulative[:, :, n_steps - 1].astype(np.float64))
+            result = results[name]
+            result['percentiles'][:, users] = np.percentile(terminal, PERCENTILES, axis=1)
+            result['mean'][users] = terminal.mean(axis=1)
+            result['probability_of_loss'][users] = (terminal < 0).mean(axis=1)
+            result['max_drawdown'][users] = np.median(np.expm1(worst[:, :, n_steps - 1]), axis=1)
+
+    volatility = daily_vol * np.sqrt(steps_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, (daily_mean * steps_per_year - risk_free_rate) / volatility, np.nan)
+    results['_risk'] = {'volatility': volatility, 'sharpe_ratio': sharpe}
+    return results
+
+def load_holding_weights(db: Session, as_of: date, user_ids: Optional[List[int]] = None) -> Tuple[List[int], List[int], np.ndarray, np.ndarray]:
+    """
+    Users, ticker_ids, (users x tickers) weights and current values
+    from each user's latest daily summary on or before as_of
+    Value not held in a priced position (cash) is left out of the weights
+    """
+    import pandas as pd
+
+    latest = (
+        db.query(PortfolioSummary.user_id, func.max(PortfolioSummary.date).label('date'))
+        .filter(PortfolioSummary.date <= as_of)
+    )
+    if user_ids is not None:
+        latest = latest.filter(PortfolioSummary.user_id.in_(user_ids))
+    latest = latest.group_by(PortfolioSummary.user_id).subquery()
+
+    totals = (
+        db.query(PortfolioSummary.user_id, PortfolioSummary.total_value)
+        .join(latest, and_(PortfolioSummary.user_id == latest.c.user_id, PortfolioSummary.date == latest.c.date))
+        .filter(PortfolioSummary.total_value > 0)
+        .all()
+    )
+    if not totals:
+        return [], [], np.empty((0, 0)), np.empty(0)
+
+    positions = pd.DataFrame(
+        db.query(Portfolio.user_id, Portfolio.ticker_id, func.sum(PortfolioDailyValue.position_val))
+        .join(PortfolioDailyValue, PortfolioDailyValue.portfolio_id == Portfolio.portfolio_id)
+        .join(latest, and_(Portfolio.user_id == latest.c.user_id, PortfolioDailyValue.date == latest.c.date))
+        .filter(Portfolio.ticker_id.isnot(None))
+        .group_by(Portfolio.user_id, Portfolio.ticker_id)
+        .all(),
+        columns=['user_id', 'ticker_id', 'position_val']
+    )
+
+    users = [r[0] for r in totals]
+    current_values = np.array([r[1] for r in totals], dtype=np.float64)
+    if positions.empty:
+        return users, [], np.zeros((len(users), 0)), current_values
+
+    matrix = (
+        positions.pivot_table(index='user_id', columns='ticker_id', values='position_val', aggfunc='sum')
+        .reindex(users)
+        .fillna(0.0)
+    )
+    weights = matrix.to_numpy(dtype=np.float64) / current_values[:, np.newaxis]
+    return users, matrix.columns.tolist(), weights, current_values
+
+class ProjectionEngine:
+    """Batch Monte Carlo projections over current holdings"""
+
+    def __init__(self, db: Session, paths: Optional[int] = None, method: Optional[str] = None,
+                 seed: Optional[int] = None, lookback_days: Optional[int] = None):
+        self.db = db
+        self.paths = paths or settings.PROJECTION_PATHS
+        self.method = method or settings.PROJECTION_METHOD
+        self.seed = settings.PROJECTION_SEED if seed is None else seed
+        self.lookback_days = lookback_days or settings.PROJECTION_LOOKBACK_DAYS
+
+    def load_holdings(self, as_of: date, user_ids: Optional[List[int]] = None) -> Tuple[List[int], List[int], np.ndarray, np.ndarray]:
+        """Users, ticker_ids, (users x tickers) weights and current values"""
+        return load_holding_weights(self.db, as_of, user_ids)
+
+    def load_asset_returns(self, ticker_ids: List[int], as_of: date) -> Tuple[np.ndarray, float]:
+        """
+        (days x tickers) daily returns over the lookback and calendar days per step
+        Tickers without history contribute zero returns
+        """
+        import pandas as pd
+
+        rows = (
+            self.db.query(DailyPrice.price_date, DailyPrice.ticker_id, DailyPrice.close_price)
+            .filter(
+                and_(
+                    DailyPrice.ticker_id.in_(ticker_ids),
+                    DailyPrice.price_date > as_of - timedelta(days=self.lookback_days),
+                    DailyPrice.price_date <= as_of
+                )
+            )
+            .all()
+        )
+        prices = pd.DataFrame(rows, columns=['price_date', 'ticker_id', 'close_price'])
+        if prices['price_date'].nunique() < 2:
+            return np.empty((0, len(ticker_ids))), 1.0
+
+        closes = (
+            prices.pivot_table(index='price_date', columns='ticker_id', values='close_price', aggfunc='last')
+            .sort_index()
+            .reindex(columns=ticker_ids)
+            .ffill()
+        )
+        returns = closes.pct_change().iloc[1:].fillna(0.0)
+        span_days = (closes.index[-1] - closes.index[0]).days
+        return returns.to_numpy(dtype=np.float64), span_days / len(returns)
+
+    def compute(self, as_of: date, user_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Dict]]:
+        """Projection rows per user and horizon; NaN fields come back as None"""
+        users, ticker_ids, weights, current_values = self.load_holdings(as_of, user_ids)
+        if not users or not ticker_ids:
+            return {}
+
+        asset_returns, days_per_step = self.load_asset_returns(ticker_ids, as_of)
+        if len(asset_returns) == 0:
+            logger.warning(f"⚠️ No price history before {as_of}, skipping projections")
+            return {}
+
+        steps = horizon_steps(PROJECTION_HORIZONS, days_per_step)
+        simulated = simulate_projections(
+            asset_returns, weights, steps,
+            paths=self.paths, method=self.method, seed=self.seed,
+            steps_per_year=365.0 / days_per_step, risk_free_rate=settings.RISK_FREE_RATE
+        )
+        risk = simulated['_risk']
+
+        results = {}
+        for i, user_id in enumerate(users):
+            current = float(current_values[i])
+            volatility = float(risk['volatility'][i])
+            sharpe = float(risk['sharpe_ratio'][i])
+            horizons = {}
+            for name, days in PROJECTION_HORIZONS.items():
+                bands = simulated[name]['percentiles'][:, i]
+                p5, p25, p50, p75, p95 = (current * (1.0 + bands)).tolist()
+                horizons[name] = {
+                    'projection_date': as_of + timedelta(days=days),
+                    'current_value': current,
+                    'projected_value': p50,
+                    'projected_return': float(bands[2] * 100),
+                    'projected_gain_loss': p50 - current,
+                    'expected_value': current * (1.0 + float(simulated[name]['mean'][i])),
+                    'p5_value': p5,
+                    'p25_value': p25,
+                    'p75_value': p75,
+                    'p95_value': p95,
+                    'confidence_level': CONFIDENCE_LEVEL,
+                    'probability_of_loss': float(simulated[name]['probability_of_loss'][i]),
+                    'volatility': volatility * 100,
+                    'sharpe_ratio': None if np.isnan(sharpe) else sharpe,
+                    'max_drawdown': float(simulated[name]['max_drawdown'][i] * 100),
+                    'method': self.method,
+                    'num_paths': self.paths,
+                }
+            results[user_id] = horizons
+        return results
+
+    def store(self, as_of: date, results: Dict[int, Dict[str, Dict]]) -> int:
+        """Upsert one row per user and horizon"""
+        if not results:
+            return 0
+
+        existing = {
+            (row.user_id, row.horizon): row for row in
+            self.db.query(PortfolioProjection)
+            .filter(PortfolioProjection.user_id.in_(list(results)))
+            .all()
+        }
+
+        written = 0
+        for user_id, horizons in results.items():
+            for horizon, values in horizons.items():
+                row = existing.get((user_id, horizon))
+                if row is None:
+                    row = PortfolioProjection(user_id=user_id, horizon=horizon)
+                    self.db.add(row)
+                row.as_of_date = as_of
+                for name, value in values.items():
+                    setattr(row, name, value)
+                written += 1
+
+        self.db.commit()
+        return written
+
+    def stored(self, user_id: int) -> Dict[str, PortfolioProjection]:
+        """Materialized projections for a user, keyed by horizon"""
+        rows = (
+            self.db.query(PortfolioProjection)
+            .filter(PortfolioProjection.user_id == user_id)
+            .all()
+        )
+        order = list(PROJECTION_HORIZONS)
+        return {
+            row.horizon: row
+            for row in sorted(rows, key=lambda row: order.index(row.horizon) if row.horizon in order else len(order))
+        }
+
+def calculate_projections_job(as_of: Optional[date] = None, db: Optional[Session] = None,
+                              user_ids: Optional[List[int]] = None) -> Dict:
+    """
+    Batch job: simulate and store projections for every user (or user_ids)
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        engine = ProjectionEngine(db)
+        results = engine.compute(as_of, user_ids)
+        rows = engine.store(as_of, results)
+
+        logger.info(f"🔮 Stored {rows} projections for {len(results)} users ({engine.paths} {engine.method} paths)")
+        return {'status': 'success', 'as_of': as_of.isoformat(), 'users': len(results), 'rows': rows}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Projection calculation failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Batch Monte Carlo projections")
+    parser.add_argument("--date", type=str, help="As-of date (YYYY-MM-DD)")
+    parser.add_argument("--user-id", type=int, action="append", help="Limit to these users")
+
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    result = calculate_projections_job(as_of, user_ids=args.user_id)
+    print(f"Projection result: {result}")
@@ -0,0 +1,259 @@
+"""
+Returns Engine - Time- and Money-Weighted Returns
+TWR chains flow-adjusted daily returns; MWR solves XIRR with bracketed, vectorized Newton steps
+All windows for a user are computed from one load of the daily summary series
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import calendar
+import logging
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from core.metrics import record_cache
+from domain.models_v2 import PortfolioSummary, CashTransaction
+from services.risk_metrics import flow_adjusted_returns, flow_columns
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+RETURN_WINDOWS = ['1W', '1M', 'YTD', '1Y', 'inception']
+
+DAYS_PER_YEAR = 365.0
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+# Candidate ln(1 + r) brackets: dense near zero, out to a 90% move in a single day
+XIRR_BRACKET = np.sinh(np.linspace(-np.arcsinh(1000.0), np.arcsinh(1000.0), 129))
+
+# (user_id, as_of) -> window results; cleared when summaries are rewritten
+_RETURNS_CACHE: "OrderedDict[Tuple[int, date], Dict[str, Dict]]" = OrderedDict()
+RETURNS_CACHE_SIZE = 1024
+
+def invalidate_returns_cache(user_id: Optional[int] = None):
+    """Drop cached returns for one user, or for everyone"""
+    if user_id is None:
+        _RETURNS_CACHE.clear()
+        return
+    for key in [key for key in _RETURNS_CACHE if key[0] == user_id]:
+        del _RETURNS_CACHE[key]
+
+def _months_ago(d: date, months: int) -> date:
+    """Same day n months earlier, clamped to the month's length"""
+    month_index = d.year * 12 + d.month - 1 - months
+    year, month = divmod(month_index, 12)
+    day = min(d.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+def window_start(window: str, as_of: date, inception: date) -> date:
+    """Calendar start of a return window"""
+    if window == '1W':
+        return as_of - timedelta(days=7)
+    if window == '1M':
+        return _months_ago(as_of, 1)
+    if window == 'YTD':
+        return date(as_of.year - 1, 12, 31)
+    if window == '1Y':
+        return _months_ago(as_of, 12)
+    if window == '5Y':
+        return _months_ago(as_of, 60)
+    if window == 'inception':
+        return inception
+    raise ValueError(f"Unknown return window: {window}")
+
+def _log_rate_npv(amounts: np.ndarray, years: np.ndarray, log_rate: np.ndarray):
+    """
+    NPV, gross flows and NPV slope per row at log rates ln(1 + r)
+
+    Each row is rescaled by its largest discount factor so deep losses over
+    long spans neither overflow nor underflow; the scale cancels in the
+    sign of the NPV and in its ratio to the gross flows.
+    """
+    exponent = np.where(amounts != 0, -log_rate[:, np.newaxis] * years, -np.inf)
+    exponent = exponent - exponent.max(axis=1, keepdims=True)
+    discount = np.exp(exponent)
+    npv = (amounts * discount).sum(axis=1)
+    gross = (np.abs(amounts) * discount).sum(axis=1)
+    slope = (-years * amounts * discount).sum(axis=1)
+    return npv, gross, slope
+
+def _xirr_log_rate(amounts: np.ndarray, years: np.ndarray, guess: float = 0.1) -> np.ndarray:
+    """
+    ln(1 + XIRR) for each row, solved together
+
+    Roots are bracketed by the NPV sign change on XIRR_BRACKET nearest the
+    guess, then refined by Newton steps that fall back to bisection when they
+    leave the bracket. A row is accepted only once |NPV| is within
+    XIRR_TOLERANCE of its gross discounted flows; anything else is NaN.
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=np.float64))
+    years = np.atleast_2d(np.asarray(years, dtype=np.float64))
+    rows = np.arange(amounts.shape[0])
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        grid_npv = np.column_stack([
+            _log_rate_npv(amounts, years, np.full(len(rows), x))[0] for x in XIRR_BRACKET
+        ])
+        signs = np.sign(grid_npv)
+        crossing = (signs[:, :-1] * signs[:, 1:] <= 0) & (signs[:, :-1] != signs[:, 1:])
+        midpoints = (XIRR_BRACKET[:-1] + XIRR_BRACKET[1:]) / 2.0
+        distance = np.where(crossing, np.abs(midpoints - np.log1p(guess)), np.inf)
+        k = distance.argmin(axis=1)
+        bracketed = np.isfinite(distance[rows, k])
+
+        lo, hi = XIRR_BRACKET[k], XIRR_BRACKET[k + 1]
+        lo_sign = signs[rows, k]
+        log_rate = (lo + hi) / 2.0
+        converged = ~bracketed
+        for _ in range(XIRR_MAX_ITERATIONS):
+            npv, gross, slope = _log_rate_npv(amounts, years, log_rate)
+            converged |= np.abs(npv) <= XIRR_TOLERANCE * gross
+            if converged.all():
+                break
+            below = np.sign(npv) == lo_sign
+            lo = np.where(below, log_rate, lo)
+            hi = np.where(below, hi, log_rate)
+            newton = log_rate - npv / slope
+            inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+            log_rate = np.where(converged, log_rate, np.where(inside, newton, (lo + hi) / 2.0))
+
+        npv, gross, _ = _log_rate_npv(amounts, years, log_rate)
+        accepted = bracketed & (np.abs(npv) <= XIRR_TOLERANCE * gross)
+    return np.where(accepted, log_rate, np.nan)
+
+def xirr(amounts: np.ndarray, years: np.ndarray, guess: float = 0.1) -> np.ndarray:
+    """
+    Annualized internal rate of return for each row, solved together
+
+    amounts and years are (rows x flows) matrices; zero-amount padding is
+    ignored. Rows without a bracketed root that zeroes the NPV come back as NaN.
+    """
+    with np.errstate(over='ignore'):
+        rate = np.expm1(_xirr_log_rate(amounts, years, guess))
+    return np.where(np.isfinite(rate), rate, np.nan)
+
+def window_returns(dates: List[date], values: np.ndarray, flows: np.ndarray,
+                   as_of: date, windows: List[str] = RETURN_WINDOWS) -> Dict[str, Dict]:
+    """
+    TWR and MWR for every window over one daily series
+
+    flows[i] is the net external flow booked on dates[i]. twr is the
+    cumulative time-weighted return in percent. mwr is the money-weighted
+    return in percent: the period rate for windows under a year and the
+    annualized XIRR otherwise. A window starting before the first value is
+    measured from the first value and flagged partial.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    flows = np.asarray(flows, dtype=np.float64)
+    ordinals = np.array([d.toordinal() for d in dates])
+
+    returns = flow_adjusted_returns(values, flows)[0]
+    wealth = np.concatenate([[1.0], np.cumprod(1.0 + np.nan_to_num(returns))])
+    end = len(dates) - 1
+
+    starts = np.array([window_start(w, as_of, dates[0]).toordinal() for w in windows])
+    start_idx = np.searchsorted(ordinals, starts, side='right') - 1
+    partial = start_idx < 0
+    start_idx = np.maximum(start_idx, 0)
+
+    # Cash-flow matrix per window: -V_start, -flows inside (start, end], +V_end
+    n_windows = len(windows)
+    amounts = np.zeros((n_windows, len(dates) + 1))
+    years = np.zeros_like(amounts)
+    for w, s in enumerate(start_idx):
+        inside = np.arange(s + 1, end + 1)
+        amounts[w, 0] = -values[s]
+        amounts[w, 1:len(inside) + 1] = -flows[inside]
+        amounts[w, -1] += values[end]
+        years[w, 1:len(inside) + 1] = (ordinals[inside] - ordinals[s]) / DAYS_PER_YEAR
+        years[w, -1] = (ordinals[end] - ordinals[s]) / DAYS_PER_YEAR
+
+    span_years = years[:, -1]
+    # Short windows compound the log rate directly; the annualized rate of a
+    # steep one-week loss is too close to -100% to survive the round trip
+    log_rate = _xirr_log_rate(amounts, years)
+    with np.errstate(over='ignore', invalid='ignore'):
+        mwr = np.expm1(np.where(span_years < 1.0, log_rate * span_years, log_rate))
+    mwr = np.where(np.isfinite(mwr), mwr, np.nan)
+    mwr = np.where((values[start_idx] > 0) & (span_years > 0), mwr, np.nan)
+
+    results = {}
+    for w, window in enumerate(windows):
+        s = start_idx[w]
+        twr = wealth[end] / wealth[s] - 1.0 if end > s else np.nan
+        results[window] = {
+            'start_date': dates[s].isoformat(),
+            'end_date': dates[end].isoformat(),
+            'start_value': float(values[s]),
+            'end_value': float(values[end]),
+            'net_flows': float(flows[s + 1:end + 1].sum()),
+            'twr': None if np.isnan(twr) else float(twr * 100),
+            'mwr': None if np.isnan(mwr[w]) else float(mwr[w] * 100),
+            'partial': bool(partial[w]),
+        }
+    return results
+
+class ReturnsEngine:
+    """Flow-aware return windows from portfolio_summary and cash_transactions"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def load_series(self, user_id: int, as_of: date) -> Tuple[List[date], np.ndarray, np.ndarray]:
+        """Daily values and booked cash flows up to as_of"""
+        rows = (
+            self.db.query(PortfolioSummary.date, PortfolioSummary.total_value)
+            .filter(and_(PortfolioSummary.user_id == user_id, PortfolioSummary.date <= as_of))
+            .order_by(PortfolioSummary.date)
+            .all()
+        )
+        if not rows:
+            return [], np.empty(0), np.empty(0)
+
+        dates = [r[0] for r in rows]
+        values = np.array([r[1] for r in rows], dtype=np.float64)
+        flows = np.zeros_like(values)
+
+        flow_rows = (
+            self.db.query(CashTransaction.transaction_date, func.sum(CashTransaction.amount))
+            .filter(
+                and_(
+                    CashTransaction.user_id == user_id,
+                    CashTransaction.transaction_date > dates[0],
+                    CashTransaction.transaction_date <= as_of
+                )
+            )
+            .group_by(CashTransaction.transaction_date)
+            .all()
+        )
+        if flow_rows:
+            cols = flow_columns(dates, [r[0] for r in flow_rows])
+            amounts = np.array([r[1] for r in flow_rows], dtype=np.float64)
+            inside = cols < len(dates)
+            np.add.at(flows, cols[inside], amounts[inside])
+
+        return dates, values, flows
+
+    def returns(self, user_id: int, as_of: date) -> Dict[str, Dict]:
+        """All return windows for a user, cached per user per day"""
+        key = (user_id, as_of)
+        cached = _RETURNS_CACHE.get(key)
+        record_cache('returns', cached is not None)
+        if cached is not None:
+            _RETURNS_CACHE.move_to_end(key)
+            return cached
+
+        dates, values, flows = self.load_series(user_id, as_of)
+        results = window_returns(dates, values, flows, as_of) if dates else {}
+
+        _RETURNS_CACHE[key] = results
+        if len(_RETURNS_CACHE) > RETURNS_CACHE_SIZE:
+            _RETURNS_CACHE.popitem(last=False)
+        return results
@@ -0,0 +1,228 @@
+"""
+Risk Engine - Batched Risk Metrics
+Computes risk metrics for all users from portfolio_summary in one pass and stores them
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging import configure_logging
+from core.database import SessionLocal
+from domain.models_v2 import PortfolioSummary, CashTransaction, DailyPrice, PortfolioRiskMetrics
+from services.risk_metrics import METRIC_NAMES, flow_columns, risk_metrics_matrix
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class RiskEngine:
+    """Vectorized risk metrics over each user's daily total-value series"""
+
+    def __init__(self, db: Session, benchmark_ticker: Optional[str] = None,
+                 risk_free_rate: Optional[float] = None, window_days: Optional[int] = None):
+        self.db = db
+        self.benchmark_ticker = benchmark_ticker or settings.RISK_BENCHMARK_TICKER
+        self.risk_free_rate = settings.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+        self.window_days = window_days or settings.RISK_WINDOW_DAYS
+
+    def load_series(self, as_of: date, user_ids: Optional[List[int]] = None) -> Tuple[List[int], List[date], np.ndarray, np.ndarray]:
+        """
+        Daily values and external cash flows as (users x dates) matrices
+        A flow is booked on the first summary date on or after its transaction date
+        """
+        import pandas as pd
+
+        start = as_of - timedelta(days=self.window_days)
+
+        query = (
+            self.db.query(PortfolioSummary.user_id, PortfolioSummary.date, PortfolioSummary.total_value)
+            .filter(and_(PortfolioSummary.date >= start, PortfolioSummary.date <= as_of))
+        )
+        if user_ids is not None:
+            query = query.filter(PortfolioSummary.user_id.in_(user_ids))
+
+        df = pd.DataFrame(query.all(), columns=['user_id', 'date', 'total_value'])
+        if df.empty:
+            return [], [], np.empty((0, 0)), np.empty((0, 0))
+
+        pivot = df.pivot(index='user_id', columns='date', values='total_value').sort_index(axis=1)
+        users = pivot.index.tolist()
+        dates = pivot.columns.tolist()
+        values = pivot.to_numpy(dtype=np.float64)
+
+        flows = np.zeros_like(values)
+        flow_rows = (
+            self.db.query(
+                CashTransaction.user_id,
+                CashTransaction.transaction_date,
+                func.sum(CashTransaction.amount)
+            )
+            .filter(
+                and_(
+                    CashTransaction.user_id.in_(users),
+                    CashTransaction.transaction_date > dates[0],
+                    CashTransaction.transaction_date <= as_of
+                )
+            )
+            .group_by(CashTransaction.user_id, CashTransaction.transaction_date)
+            .all()
+        )
+        if flow_rows:
+            user_index = {user_id: i for i, user_id in enumerate(users)}
+            rows = np.array([user_index[r[0]] for r in flow_rows])
+            cols = flow_columns(dates, [r[1] for r in flow_rows])
+            amounts = np.array([r[2] for r in flow_rows], dtype=np.float64)
+            inside = cols < len(dates)
+            np.add.at(flows, (rows[inside], cols[inside]), amounts[inside])
+
+        return users, dates, values, flows
+
+    def load_benchmark(self, dates: List[date]) -> Optional[np.ndarray]:
+        """Benchmark closes aligned to dates (last known close carried forward)"""
+        import pandas as pd
+
+        if not dates or not self.benchmark_ticker:
+            return None
+
+        rows = (
+            self.db.query(DailyPrice.price_date, DailyPrice.close_price)
+            .filter(
+                and_(
+                    DailyPrice.ticker == self.benchmark_ticker,
+                    DailyPrice.price_date >= dates[0] - timedelta(days=7),
+                    DailyPrice.price_date <= dates[-1]
+                )
+            )
+            .order_by(DailyPrice.price_date)
+            .all()
+        )
+        if not rows:
+            return None
+
+        closes = pd.Series([r[1] for r in rows], index=[r[0] for r in rows])
+        return closes.reindex(dates, method='ffill').to_numpy(dtype=np.float64)
+
+    def compute(self, as_of: date, user_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+        """Risk metrics per user as of a date; NaN metrics come back as None"""
+        users, dates, values, flows = self.load_series(as_of, user_ids)
+        if not users:
+            return {}
+
+        benchmark = self.load_benchmark(dates)
+        matrix = risk_metrics_matrix(values, flows, benchmark, self.risk_free_rate)
+
+        results = {}
+        for i, user_id in enumerate(users):
+            metrics = {}
+            for name in METRIC_NAMES:
+                value = float(matrix[name][i])
+                metrics[name] = None if np.isnan(value) else value
+            metrics['num_observations'] = int(matrix['num_observations'][i])
+            metrics['benchmark_ticker'] = self.benchmark_ticker if benchmark is not None else None
+            results[user_id] = metrics
+        return results
+
+    def store(self, as_of: date, results: Dict[int, Dict]) -> int:
+        """Upsert computed metrics for as_of"""
+        if not results:
+            return 0
+
+        existing = {
+            row.user_id: row for row in
+            self.db.query(PortfolioRiskMetrics)
+            .filter(
+                and_(
+                    PortfolioRiskMetrics.as_of_date == as_of,
+                    PortfolioRiskMetrics.window_days == self.window_days,
+                    PortfolioRiskMetrics.user_id.in_(list(results))
+                )
+            )
+            .all()
+        }
+
+        for user_id, metrics in results.items():
+            row = existing.get(user_id)
+            if row is None:
+                row = PortfolioRiskMetrics(user_id=user_id, as_of_date=as_of, window_days=self.window_days)
+                self.db.add(row)
+            for name, value in metrics.items():
+                setattr(row, name, value)
+
+        self.db.commit()
+        return len(results)
+
+    def stored(self, user_id: int, as_of: date) -> Optional[Dict]:
+        """Stored metrics for a user on as_of, if the batch has run"""
+        row = (
+            self.db.query(PortfolioRiskMetrics)
+            .filter(
+                and_(
+                    PortfolioRiskMetrics.user_id == user_id,
+                    PortfolioRiskMetrics.as_of_date == as_of,
+                    PortfolioRiskMetrics.window_days == self.window_days
+                )
+            )
+            .first()
+        )
+        if row is None:
+            return None
+
+        metrics = {name: getattr(row, name) for name in METRIC_NAMES}
+        metrics['num_observations'] = row.num_observations
+        metrics['benchmark_ticker'] = row.benchmark_ticker
+        return metrics
+
+    def metrics_for_user(self, user_id: int, as_of: date) -> Dict:
+        """Stored metrics when available, otherwise computed for this user only"""
+        metrics = self.stored(user_id, as_of)
+        if metrics is None:
+            metrics = self.compute(as_of, [user_id]).get(user_id, {})
+        return metrics
+
+def calculate_risk_metrics_job(as_of: Optional[date] = None, db: Optional[Session] = None) -> Dict:
+    """
+    Batch job: compute and store risk metrics for every user
+    """
+    if as_of is None:
+        as_of = date.today()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        engine = RiskEngine(db)
+        results = engine.compute(as_of)
+        stored = engine.store(as_of, results)
+
+        logger.info(f"📉 Stored risk metrics for {stored} users as of {as_of}")
+        return {'status': 'success', 'as_of': as_of.isoformat(), 'users': stored}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Risk metrics calculation failed: {e}")
+        return {'status': 'error', 'as_of': as_of.isoformat(), 'error': str(e)}
+    finally:
+        if owns_session:
+            db.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Batch risk metrics calculator")
+    parser.add_argument("--date", type=str, help="As-of date (YYYY-MM-DD)")
+
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    result = calculate_risk_metrics_job(as_of)
+    print(f"Risk metrics result: {result}")
@@ -0,0 +1,129 @@
+"""
+Risk Metrics - Vectorized Math
+Volatility, Sharpe, Sortino, max drawdown, beta and VaR over value series
+Rows are series (one per user), columns are dates; NaN marks a missing day
+"""
+
+import warnings
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 3  # values required before any metric is reported
+
+METRIC_NAMES = ['volatility_annualized', 'sharpe_ratio', 'sortino_ratio', 'max_drawdown', 'beta', 'var_95']
+
+def flow_columns(dates: List[date], flow_dates: List[date]) -> np.ndarray:
+    """
+    Column index each cash flow is booked on: the first series date on or
+    after the flow date (len(dates) when the flow is after the last date)
+    """
+    return np.searchsorted(
+        np.array(dates, dtype='datetime64[D]'),
+        np.array(flow_dates, dtype='datetime64[D]')
+    )
+
+def flow_adjusted_returns(values: np.ndarray, flows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Daily returns net of external cash flows
+    r_t = (V_t - F_t) / V_{t-1} - 1, NaN where either value is missing or V_{t-1} <= 0
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    prev = values[:, :-1]
+    cur = values[:, 1:]
+    if flows is not None:
+        cur = cur - np.atleast_2d(np.asarray(flows, dtype=np.float64))[:, 1:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = cur / prev - 1.0
+    returns[~(prev > 0)] = np.nan
+    return returns
+
+def risk_metrics_matrix(values: np.ndarray, flows: Optional[np.ndarray] = None,
+                        benchmark_values: Optional[np.ndarray] = None,
+                        risk_free_rate: float = 0.0, var_level: float = 0.95) -> Dict[str, np.ndarray]:
+    """
+    Risk metrics for every row of values in one pass
+
+    volatility_annualized, max_drawdown and var_95 are percentages
+    (max_drawdown <= 0, var_95 is the historical one-day loss at var_level);
+    sharpe_ratio, sortino_ratio and beta are unitless. Rows with fewer than
+    MIN_OBSERVATIONS values get NaN for everything.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    returns = flow_adjusted_returns(values, flows)
+    valid = np.isfinite(returns)
+    n_returns = valid.sum(axis=1)
+
+    rf_daily = risk_free_rate / TRADING_DAYS
+    excess = returns - rf_daily
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        std = np.nanstd(returns, axis=1, ddof=1)
+        mean_excess = np.nanmean(excess, axis=1)
+
+        volatility = std * np.sqrt(TRADING_DAYS) * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std > 0, mean_excess / std * np.sqrt(TRADING_DAYS), np.nan)
+
+            downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=1))
+            sortino = np.where(downside > 0, mean_excess / downside * np.sqrt(TRADING_DAYS), np.nan)
+
+        # Drawdown on the flow-adjusted wealth index
+        wealth = np.cumprod(1.0 + np.where(valid, returns, 0.0), axis=1)
+        wealth = np.hstack([np.ones((wealth.shape[0], 1)), wealth])
+        drawdown = wealth / np.maximum.accumulate(wealth, axis=1) - 1.0
+        max_drawdown = drawdown.min(axis=1) * 100
+
+        var_95 = -np.nanpercentile(returns, (1 - var_level) * 100, axis=1) * 100
+
+        beta = np.full(values.shape[0], np.nan)
+        if benchmark_values is not None:
+            bench = flow_adjusted_returns(np.asarray(benchmark_values, dtype=np.float64))[0]
+            both = valid & np.isfinite(bench)
+            r = np.where(both, returns, np.nan)
+            b = np.where(both, bench, np.nan)
+            k = both.sum(axis=1)
+            r_centered = r - np.nanmean(r, axis=1, keepdims=True)
+            b_centered = b - np.nanmean(b, axis=1, keepdims=True)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = np.nansum(r_centered * b_centered, axis=1) / (k - 1)
+                var_b = np.nansum(b_centered ** 2, axis=1) / (k - 1)
+                beta = np.where((k >= MIN_OBSERVATIONS - 1) & (var_b > 0), cov / var_b, np.nan)
+
+    metrics = {
+        'volatility_annualized': volatility,
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino,
+        'max_drawdown': max_drawdown,
+        'beta': beta,
+        'var_95': var_95,
+    }
+
+    n_values = np.isfinite(values).sum(axis=1)
+    insufficient = (n_values < MIN_OBSERVATIONS) | (n_returns < 2)
+    for name in METRIC_NAMES:
+        metrics[name] = np.where(insufficient, np.nan, metrics[name])
+    metrics['num_observations'] = n_values
+    return metrics
+
+def risk_metrics(values: np.ndarray, flows: Optional[np.ndarray] = None,
+                 benchmark_values: Optional[np.ndarray] = None,
+                 risk_free_rate: float = 0.0) -> Dict[str, Optional[float]]:
+    """Risk metrics for a single series, NaN returned as None"""
+    matrix = risk_metrics_matrix(
+        np.asarray(values, dtype=np.float64)[np.newaxis, :],
+        None if flows is None else np.asarray(flows, dtype=np.float64)[np.newaxis, :],
+        benchmark_values,
+        risk_free_rate
+    )
+    result = {}
+    for name in METRIC_NAMES:
+        value = float(matrix[name][0])
+        result[name] = None if np.isnan(value) else value
+    result['num_observations'] = int(matrix['num_observations'][0])
+    return result
@@ -0,0 +1,130 @@
+"""
+Trading Calendars - Which Days Have a Close
+NYSE sessions for stocks and bond ETFs (weekends, the exchange's holiday rules
+and a bundled table of unscheduled closures), every day for crypto. Cash and
+bond cash have no market prices and no calendar. A session's daily bar is final
+at its close: 16:00 New York time for NYSE, midnight UTC for crypto
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+from zoneinfo import ZoneInfo
+
+from services.classification_index import ASSET_CLASSES
+
+# Closures outside the holiday rules (national days of mourning, weather, 9/11)
+NYSE_SPECIAL_CLOSURES = frozenset({
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11),  # President Reagan
+    date(2007, 1, 2),  # President Ford
+    date(2012, 10, 29), date(2012, 10, 30),  # Hurricane Sandy
+    date(2018, 12, 5),  # President George H.W. Bush
+    date(2025, 1, 9),  # President Carter
+})
+
+def easter_sunday(year: int) -> date:
+    """Gregorian Easter (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th weekday (Monday=0) of the month; n=-1 is the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def observed(holiday: date) -> date:
+    """Saturday holidays close the Friday before, Sunday holidays the Monday after"""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> FrozenSet[date]:
+    """Full-day NYSE holidays in year (half days trade and have a close)"""
+    holidays = {
+        nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        easter_sunday(year) - timedelta(days=2),  # Good Friday
+        nth_weekday(year, 5, 0, -1),  # Memorial Day
+        observed(date(year, 7, 4)),
+        nth_weekday(year, 9, 0, 1),  # Labor Day
+        nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        observed(date(year, 12, 25)),
+    }
+    # A Saturday New Year's Day is not made up on the Friday, which closes the previous year
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(observed(new_year))
+    if year >= 2022:
+        holidays.add(observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays | {d for d in NYSE_SPECIAL_CLOSURES if d.year == year})
+
+class TradingCalendar:
+    """Every day is a session (crypto trades around the clock)"""
+    name = "24/7"
+    tz = timezone.utc
+
+    def is_session(self, day: date) -> bool:
+        return True
+
+    def session_close(self, day: date) -> datetime:
+        """When day's daily bar is final: midnight UTC at the end of the day"""
+        return datetime.combine(day + timedelta(days=1), time(0), tzinfo=self.tz)
+
+    def last_completed_session(self, now: Optional[datetime] = None) -> date:
+        """Latest session whose close has passed at now (default: the current time)"""
+        now = now or datetime.now(timezone.utc)
+        day = now.astimezone(self.tz).date()
+        while not self.is_session(day) or self.session_close(day) > now:
+            day -= timedelta(days=1)
+        return day
+
+    def sessions(self, start: date, end: date) -> List[date]:
+        """Sessions from start to end, both included"""
+        return [start + timedelta(days=i) for i in range((end - start).days + 1) if self.is_session(start + timedelta(days=i))]
+
+class ExchangeCalendar(TradingCalendar):
+    """Weekdays that are not exchange holidays"""
+    name = "XNYS"
+    tz = ZoneInfo("America/New_York")
+    close = time(16, 0)  # Half days close at 13:00; waiting for 16:00 only delays their fetch
+
+    def is_session(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+    def session_close(self, day: date) -> datetime:
+        return datetime.combine(day, self.close, tzinfo=self.tz)
+
+CALENDARS: Dict[str, TradingCalendar] = {
+    'XNYS': ExchangeCalendar(),
+    '24/7': TradingCalendar(),
+}
+
+ASSET_CLASS_CALENDARS = {
+    ASSET_CLASSES['STOCK']: 'XNYS',
+    ASSET_CLASSES['BOND_ETF']: 'XNYS',
+    ASSET_CLASSES['CRYPTO']: '24/7',
+}
+
+def calendar_for(asset_class: str) -> Optional[TradingCalendar]:
+    """The calendar an asset class prices on; None for cash and bond cash"""
+    name = ASSET_CLASS_CALENDARS.get(asset_class)
+    return CALENDARS[name] if name else None
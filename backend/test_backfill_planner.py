@@ -0,0 +1,141 @@
+"""
+Unit tests for trading calendars and the gap-aware price backfill planner
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, DailyPrice, PriceFetchEmpty
+from services.backfill_planner import FetchSpan, missing_spans, plan_backfill, record_empty_fetches
+from services.classification_index import ASSET_CLASSES
+from services.trading_calendar import calendar_for, easter_sunday, nyse_holidays
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+STOCK, CRYPTO = ASSET_CLASSES['STOCK'], ASSET_CLASSES['CRYPTO']
+END = date(2025, 7, 8)  # Tuesday after Independence Day
+NYSE = calendar_for(STOCK)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    sessions = NYSE.sessions(END - timedelta(days=60), END)
+    for day in sessions:
+        # FULL has every session, HOLE misses two runs, STALE stopped a month ago
+        session.add(DailyPrice(ticker="FULL", price_date=day, close_price=100.0))
+        if day not in (date(2025, 6, 23), date(2025, 6, 24), date(2025, 6, 26), date(2025, 7, 7)):
+            session.add(DailyPrice(ticker="HOLE", price_date=day, close_price=50.0))
+        if day <= date(2025, 5, 30):
+            session.add(DailyPrice(ticker="STALE", price_date=day, close_price=10.0))
+    for i in range(40):
+        if i != 5:
+            session.add(DailyPrice(ticker="BTC-USD", price_date=END - timedelta(days=i), close_price=60000.0))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_nyse_holidays():
+    assert easter_sunday(2025) == date(2025, 4, 20)
+    assert nyse_holidays(2022) == {
+        date(2022, 1, 17), date(2022, 2, 21), date(2022, 4, 15), date(2022, 5, 30), date(2022, 6, 20),
+        date(2022, 7, 4), date(2022, 9, 5), date(2022, 11, 24), date(2022, 12, 26),
+    }  # New Year's Day fell on a Saturday and was not made up
+    assert date(2025, 1, 9) in nyse_holidays(2025)  # Unscheduled closure
+    assert date(2027, 6, 18) in nyse_holidays(2027)  # Juneteenth on a Saturday closes the Friday
+
+def test_calendars_per_asset_class():
+    weekend = [date(2025, 7, 4), date(2025, 7, 5), date(2025, 7, 6)]
+
+    assert [NYSE.is_session(d) for d in weekend] == [False, False, False]
+    assert all(calendar_for(CRYPTO).is_session(d) for d in weekend)
+    assert calendar_for(ASSET_CLASSES['CASH']) is None
+    assert NYSE.sessions(date(2025, 7, 3), date(2025, 7, 8)) == [date(2025, 7, 3), date(2025, 7, 7), date(2025, 7, 8)]
+
+def test_last_completed_session():
+    utc = lambda *args: datetime(*args, tzinfo=timezone.utc)
+
+    assert NYSE.last_completed_session(utc(2025, 7, 8, 19, 59)) == date(2025, 7, 7)  # 15:59 in New York
+    assert NYSE.last_completed_session(utc(2025, 7, 8, 20, 0)) == date(2025, 7, 8)
+    assert NYSE.last_completed_session(utc(2025, 7, 7, 3, 0)) == date(2025, 7, 3)  # Over the holiday weekend
+    assert calendar_for(CRYPTO).last_completed_session(utc(2025, 7, 8, 23, 0)) == date(2025, 7, 7)
+
+def test_missing_spans_merge_across_closed_days_and_bridges():
+    sessions = NYSE.sessions(date(2025, 6, 30), date(2025, 7, 11))
+    stored = {date(2025, 6, 30), date(2025, 7, 8), date(2025, 7, 9)}
+
+    # 7/1-7/3 and 7/7 are one run (the holiday weekend is not a gap), 7/10-7/11 another
+    assert missing_spans(sessions, stored) == [
+        (date(2025, 7, 1), date(2025, 7, 7), 4, 4), (date(2025, 7, 10), date(2025, 7, 11), 2, 2),
+    ]
+    # Bridging the two stored sessions between them makes it one request
+    assert missing_spans(sessions, stored, bridge_sessions=2) == [(date(2025, 7, 1), date(2025, 7, 11), 6, 8)]
+
+def test_plan_only_requests_missing_sessions(db_session):
+    plan = plan_backfill(db_session, {"FULL": STOCK, "HOLE": STOCK, "STALE": STOCK, "BTC-USD": CRYPTO,
+                                      "CASH": ASSET_CLASSES['CASH']}, end=END, lookback_days=30, bridge_sessions=1)
+
+    assert "FULL" not in plan and "CASH" not in plan
+    assert plan["HOLE"] == [
+        FetchSpan("HOLE", date(2025, 6, 23), date(2025, 6, 26), 3, 4),
+        FetchSpan("HOLE", date(2025, 7, 7), date(2025, 7, 7), 1, 1),
+    ]
+    # A stale ticker is filled from its last close, past the lookback window
+    assert plan["STALE"][0].start == date(2025, 6, 2) and plan["STALE"][0].end == END
+    assert plan["BTC-USD"] == [FetchSpan("BTC-USD", END - timedelta(days=5), END - timedelta(days=5), 1, 1)]
+
+def test_plan_new_ticker_history(db_session):
+    plan = plan_backfill(db_session, {"NEW": STOCK}, end=END, lookback_days=10, history_days=365)
+
+    sessions = len(NYSE.sessions(date(2024, 7, 8), END))
+    assert plan["NEW"] == [FetchSpan("NEW", date(2024, 7, 8), END, sessions, sessions)]
+
+def test_plan_queries_are_independent_of_ticker_count(db_session):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_engine, "before_cursor_execute", listener)
+    try:
+        plan_backfill(db_session, {t: STOCK for t in ["FULL", "HOLE", "STALE", "NEW"]}, end=END)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", listener)
+
+    assert len([s for s in statements if "daily_prices" in s]) == 2
+
+def test_empty_fetches_are_not_requested_again(db_session):
+    span = plan_backfill(db_session, {"HOLE": STOCK}, end=END, lookback_days=30)["HOLE"][0]
+    assert (span.start, span.end) == (date(2025, 6, 23), date(2025, 6, 26))
+
+    # The provider only had 6/24 (and the bridged 6/25); 6/23 and 6/26 came back empty
+    db_session.add(DailyPrice(ticker="HOLE", price_date=date(2025, 6, 24), close_price=50.0))
+    assert record_empty_fetches(db_session, span, STOCK, [date(2025, 6, 24), date(2025, 6, 25)], grace_days=0) == 2
+    db_session.commit()
+
+    plan = plan_backfill(db_session, {"HOLE": STOCK}, end=END, lookback_days=30)
+    assert plan["HOLE"] == [FetchSpan("HOLE", date(2025, 7, 7), date(2025, 7, 7), 1, 1)]
+
+    # Recent sessions stay retryable: providers publish them late
+    today = date.today()
+    recent = FetchSpan("HOLE", today - timedelta(days=1), today, 2, 2)
+    assert record_empty_fetches(db_session, recent, CRYPTO, [], grace_days=3) == 0
+    assert db_session.query(PriceFetchEmpty).count() == 2
+
+def test_plan_ends_at_last_completed_session(db_session):
+    last = calendar_for(CRYPTO).last_completed_session()
+
+    plan = plan_backfill(db_session, {"NEW-USD": CRYPTO}, end=date.today() + timedelta(days=1), history_days=2)
+
+    assert plan["NEW-USD"] == [FetchSpan("NEW-USD", last - timedelta(days=2), last, 3, 3)]
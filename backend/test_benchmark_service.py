@@ -0,0 +1,94 @@
+"""
+Unit tests for the benchmark comparison service
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, PortfolioSummary, CashTransaction, DailyPrice
+from services import benchmark_service
+from services.benchmark_service import BenchmarkService, benchmark_comparison_matrix, benchmark_series, invalidate_benchmark_cache
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+DATES = [AS_OF - timedelta(days=9 - i) for i in range(10)]
+SPY = np.array([500.0, 505.0, 502.0, 510.0, 506.0, 515.0, 512.0, 520.0, 518.0, 525.0])
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    invalidate_benchmark_cache()
+    session = TestSessionLocal()
+
+    # User 1 holds exactly SPY; user 2 also gains 2% on day 5 and invests a $1000 deposit in SPY on day 3
+    user_values = {1: SPY * 2, 2: SPY * 2}
+    user_values[2][5:] *= 1.02
+    user_values[2][3:] += 1000.0 * SPY[3:] / SPY[3]
+
+    for user_id, values in user_values.items():
+        session.add(User(user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com"))
+        for day, value in zip(DATES, values):
+            session.add(PortfolioSummary(user_id=user_id, date=day, total_value=float(value)))
+    session.add(CashTransaction(user_id=2, amount=1000.0, transaction_date=DATES[3], type="deposit"))
+    for day, close in zip(DATES, SPY):
+        session.add(DailyPrice(ticker="SPY", price_date=day, close_price=float(close)))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+    invalidate_benchmark_cache()
+
+def test_matrix_tracking_the_benchmark():
+    """A portfolio that is the benchmark has zero excess return and tracking error"""
+    matrix = benchmark_comparison_matrix(DATES, SPY * 3, None, SPY, AS_OF, periods=['1W'])['1W']
+
+    assert matrix['portfolio_return'][0] == pytest.approx((SPY[-1] / SPY[2] - 1) * 100)
+    assert matrix['excess_return'][0] == pytest.approx(0.0)
+    assert matrix['tracking_error'][0] == pytest.approx(0.0, abs=1e-9)
+
+def test_benchmark_without_start_price_is_skipped():
+    """No benchmark close at the period start means no comparison"""
+    benchmark = SPY.copy()
+    benchmark[:5] = np.nan
+    matrix = benchmark_comparison_matrix(DATES, SPY, None, benchmark, AS_OF, periods=['1W'])['1W']
+    assert not matrix['valid'][0]
+    assert np.isnan(matrix['excess_return'][0])
+
+def test_compare_all_users(db_session):
+    """Deposits are not excess return; the 2% jump is"""
+    results = BenchmarkService(db_session, tickers=["SPY", "AGG"]).compare(AS_OF)
+
+    assert "AGG" not in results[1]  # no prices loaded
+    assert results[1]["SPY"]["1W"]["excess_return"] == pytest.approx(0.0, abs=1e-9)
+
+    week = results[2]["SPY"]["1W"]
+    spy_return = (SPY[-1] / SPY[2] - 1) * 100
+    assert week["benchmark_return"] == pytest.approx(spy_return)
+    assert week["excess_return"] > 1.0
+    assert week["tracking_error"] > 0
+    assert week["information_ratio"] > 0
+
+def test_series_cached_until_invalidated(db_session):
+    """Benchmark closes are read once until the cache is invalidated"""
+    first = benchmark_series("SPY", db_session)
+    db_session.add(DailyPrice(ticker="SPY", price_date=AS_OF + timedelta(days=1), close_price=530.0))
+    db_session.commit()
+
+    assert benchmark_series("SPY", db_session) is first
+    invalidate_benchmark_cache("SPY")
+    assert len(benchmark_series("SPY", db_session)) == len(first) + 1
+    assert "SPY" in benchmark_service._BENCHMARK_CACHE
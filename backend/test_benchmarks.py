@@ -0,0 +1,76 @@
+"""
+Tests for the benchmark suite: deterministic synthetic data and run comparison
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.run import compare, run_benchmarks, summarize
+from benchmarks.synthetic import SyntheticSpec, populate, price_paths, ticker_universe, trading_days
+from domain.models_v2 import DailyPrice, Portfolio, PortfolioSummary
+
+SMALL = SyntheticSpec(users=2, positions=4, years=1, seed=7)
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}", connect_args={"check_same_thread": False})
+    populate(engine, SMALL)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def test_price_paths_are_seeded():
+    tickers = ticker_universe(SMALL.universe)
+    days = trading_days(SMALL)
+    first = price_paths(SMALL, tickers, days)
+    again = price_paths(SMALL, tickers, days)
+    other = price_paths(SyntheticSpec(users=2, positions=4, years=1, seed=8), tickers, days)
+
+    assert np.array_equal(first, again, equal_nan=True)
+    assert not np.array_equal(first, other, equal_nan=True)
+
+def test_only_crypto_trades_on_weekends():
+    tickers = ticker_universe(SMALL.universe)
+    days = trading_days(SMALL)
+    closes = price_paths(SMALL, tickers, days)
+    saturday = next(i for i, d in enumerate(days) if d.weekday() == 5)
+
+    for j, ticker in enumerate(tickers):
+        assert np.isnan(closes[saturday, j]) == (ticker['asset_class'] != 'CRYPTO')
+
+def test_populate_writes_every_user_and_day(session_factory):
+    db = session_factory()
+    try:
+        assert db.query(func.count(Portfolio.portfolio_id)).scalar() == SMALL.users * SMALL.positions
+        assert db.query(func.count(PortfolioSummary.summary_id)).scalar() == SMALL.users * len(trading_days(SMALL))
+        assert db.query(func.max(DailyPrice.price_date)).scalar() == SMALL.as_of
+    finally:
+        db.close()
+
+def test_summarize_percentiles():
+    result = summarize("case", [0.004, 0.001, 0.002, 0.003, 0.010], queries=3)
+
+    assert result['min_ms'] == 1.0
+    assert result['median_ms'] == 3.0
+    assert result['p95_ms'] == 10.0
+    assert result['queries'] == 3
+
+def test_compare_flags_median_regressions():
+    baseline = {'results': [{'name': 'a', 'median_ms': 10.0}, {'name': 'b', 'median_ms': 10.0}]}
+    current = {'results': [{'name': 'a', 'median_ms': 11.0}, {'name': 'b', 'median_ms': 13.0}, {'name': 'new', 'median_ms': 1.0}]}
+
+    rows = {row['name']: row for row in compare(current, baseline, threshold=0.15)}
+
+    assert set(rows) == {'a', 'b'}
+    assert not rows['a']['regressed']
+    assert rows['b']['regressed']
+
+def test_run_benchmarks_times_every_case(session_factory):
+    results = run_benchmarks(session_factory, SMALL, repeat=1)
+
+    assert [r['name'] for r in results] == [
+        'snapshot_decimal', 'snapshot_fast', 'dashboard', 'chart_1y',
+        'calculate_date_range_7d', 'price_upsert_chunk', 'bulk_insert_prices'
+    ]
+    assert all(r['median_ms'] > 0 and r['queries'] for r in results)
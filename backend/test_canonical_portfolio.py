@@ -14,7 +14,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 # Local imports
-from core.database import Base
+from domain.models_v2 import Base
 from domain.models_v2 import User, Portfolio, DailyPrice, CashTransaction
 from services.portfolio_calculation_service import PortfolioCalculationService
 
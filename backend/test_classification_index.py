@@ -0,0 +1,78 @@
+"""
+Unit tests for the shared ticker classification index
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, AssetCategory
+from services import classification_index as classification_module
+from services.classification_index import ASSET_CLASSES, classification_index, invalidate_classification_index, load_seed
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    invalidate_classification_index()
+    session = TestSessionLocal()
+
+    session.add(AssetCategory(ticker="ACME", category="Stock", sector="Industrials", industry="Machinery"))
+    session.add(AssetCategory(ticker="BND", category="ETF"))  # Generic import category
+    session.add(AssetCategory(ticker="XBND", category="Bond"))
+    session.commit()
+    invalidate_classification_index()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+    invalidate_classification_index()
+
+def test_seed_covers_previous_ticker_sets():
+    """Every ticker the hard-coded sets knew keeps its class"""
+    seed = load_seed()
+    for ticker in ['BND', 'AGG', 'TLT', 'IEF', 'SHY', 'VGIT', 'VGLT', 'VTEB', 'MUB', 'HYG', 'JNK', 'LQD', 'VCIT', 'VCLT', 'BSV', 'BIV', 'BLV']:
+        assert seed[ticker].asset_class == ASSET_CLASSES['BOND_ETF']
+    for ticker in ['BTC-USD', 'ETH-USD', 'BTC', 'ETH', 'ADA-USD', 'SOL-USD', 'DOT-USD', 'AVAX-USD', 'MATIC-USD', 'LINK-USD']:
+        assert seed[ticker].asset_class == ASSET_CLASSES['CRYPTO']
+    assert seed['NVDA'].sector == 'Technology'
+    assert seed['JPM'].sector == 'Financial'
+
+def test_table_overlays_seed(db_session):
+    index = classification_index(db_session)
+
+    assert index.classify("ACME").sector == "Industrials"
+    assert index.asset_class("BND") == ASSET_CLASSES['BOND_ETF']  # "ETF" keeps the seed's class
+    assert index.sector("BND") == "Fixed Income"
+    assert index.asset_class("XBND") == ASSET_CLASSES['BOND_ETF']
+
+    # Naming rules for tickers nobody listed
+    assert index.asset_class("CASH_BROKERAGE") == ASSET_CLASSES['CASH']
+    assert index.asset_class("BOND_CASH_T1") == ASSET_CLASSES['BOND_CASH']
+    assert index.asset_class("DOGE-USD") == ASSET_CLASSES['CRYPTO']
+    assert index.classify("ZZZZ").sector == "Other"
+    assert index.lookup("ZZZZ") is None
+
+def test_grouped_sector_values(db_session):
+    sectors = classification_index(db_session).group_by_sector({"AAPL": 100.0, "MSFT": 50.0, "JPM": 25.0, "ZZZZ": 5.0})
+    assert sectors == {"Technology": 150.0, "Financial": 25.0, "Other": 5.0}
+
+def test_loaded_once_until_category_changes(db_session):
+    """The index is reused until an AssetCategory write invalidates it"""
+    index = classification_index(db_session)
+    assert classification_index(db_session) is index
+
+    db_session.add(AssetCategory(ticker="NEWCOIN", category="Crypto"))
+    db_session.commit()
+    assert classification_module._CLASSIFICATION_INDEX is None
+    assert classification_index(db_session).asset_class("NEWCOIN") == ASSET_CLASSES['CRYPTO']
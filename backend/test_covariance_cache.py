@@ -0,0 +1,151 @@
+"""
+Unit tests for the rolling covariance cache and diversification scoring
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, PortfolioDailyValue, PortfolioSummary, DailyPrice
+from services import covariance_cache
+from services.covariance_cache import (
+    DiversificationService, RollingCovariance, diversification_metrics, diversification_score,
+    invalidate_covariance_cache, refresh_covariance
+)
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+DAYS = 60
+
+def random_closes(days, tickers, seed):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, (days, tickers)), axis=0)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    invalidate_covariance_cache()
+    session = TestSessionLocal()
+
+    closes = random_closes(DAYS, 2, seed=5)
+    dates = [AS_OF - timedelta(days=DAYS - 1 - i) for i in range(DAYS)]
+    for ticker, column in (("SPY", 0), ("TLT", 1)):
+        for day, close in zip(dates, closes[:, column]):
+            session.add(DailyPrice(ticker=ticker, price_date=day, close_price=float(close)))
+
+    # User 1 is all SPY; user 2 splits the same value across SPY and TLT
+    holdings = {1: {"SPY": 1000.0}, 2: {"SPY": 500.0, "TLT": 500.0}}
+    last = {"SPY": closes[-1, 0], "TLT": closes[-1, 1]}
+    for user_id, positions in holdings.items():
+        session.add(User(user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com"))
+        for ticker, value in positions.items():
+            position = Portfolio(user_id=user_id, ticker=ticker, units=value / last[ticker], avg_price=90.0, buy_date=dates[0])
+            session.add(position)
+            session.flush()
+            session.add(PortfolioDailyValue(portfolio_id=position.portfolio_id, date=AS_OF, units=position.units,
+                                            price=float(last[ticker]), position_val=value))
+        session.add(PortfolioSummary(user_id=user_id, date=AS_OF, total_value=1000.0))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+    invalidate_covariance_cache()
+
+def test_incremental_matches_full_window():
+    """Adding days one at a time and expiring old ones equals np.cov over the last window"""
+    closes = random_closes(40, 3, seed=1)
+    dates = [AS_OF - timedelta(days=39 - i) for i in range(40)]
+
+    rolling = RollingCovariance(["A", "B", "C"], window=20)
+    for i in range(0, 40, 7):
+        rolling.extend(dates[i:i + 7], closes[i:i + 7])
+
+    returns = closes[1:] / closes[:-1] - 1.0
+    assert len(rolling.days) == 20
+    np.testing.assert_allclose(rolling.covariance(), np.cov(returns[-20:], rowvar=False), atol=1e-12)
+    np.testing.assert_allclose(rolling.correlation(["C", "A"]), np.corrcoef(returns[-20:, [2, 0]], rowvar=False), atol=1e-9)
+
+def test_missing_prices_use_shared_dates():
+    """A ticker's gap folds into its next return; pairs only use dates both priced"""
+    closes = random_closes(30, 2, seed=2)
+    gapped = closes.copy()
+    gapped[10:13, 1] = np.nan
+
+    rolling = RollingCovariance(["A", "B"], window=100)
+    rolling.extend(list(range(30)), gapped)
+
+    returns_b = gapped[:, 1][~np.isnan(gapped[:, 1])]
+    returns_b = returns_b[1:] / returns_b[:-1] - 1.0
+    assert rolling.count[1, 1] == len(returns_b)
+    assert rolling.covariance()[1, 1] == pytest.approx(np.var(returns_b, ddof=1))
+
+def test_effective_bets():
+    """Two equal uncorrelated assets are two bets; perfectly correlated ones are one"""
+    uncorrelated = diversification_metrics(np.array([[0.5, 0.5], [1.0, 0.0]]), np.eye(2) * 1e-4)
+    assert uncorrelated['effective_bets'] == pytest.approx([2.0, 1.0])
+    assert uncorrelated['risk_contribution'].sum(axis=1) == pytest.approx([1.0, 1.0])
+    assert diversification_score(2.0) == 50
+    assert diversification_score(1.0) == 0
+
+    correlated = diversification_metrics(np.array([[0.5, 0.5]]), np.full((2, 2), 1e-4))
+    assert correlated['effective_bets'][0] == pytest.approx(1.0)
+
+    cash = diversification_metrics(np.array([[0.0, 0.0]]), np.eye(2) * 1e-4)
+    assert np.isnan(cash['effective_bets'][0])
+
+def test_service_scores_users(db_session):
+    """The two-asset user is more diversified and less volatile than the SPY-only user"""
+    results = DiversificationService(db_session).compute(AS_OF)
+
+    assert results[1]['score'] == 0
+    assert results[1]['risk_contributions'] == {"SPY": pytest.approx(100.0)}
+    assert results[2]['score'] > 30
+    assert results[2]['volatility'] < results[1]['volatility']
+    assert sum(results[2]['risk_contributions'].values()) == pytest.approx(100.0)
+
+def test_refresh_reads_only_new_days(db_session):
+    """The cached window only loads dates after its last one"""
+    first = refresh_covariance(db_session, AS_OF - timedelta(days=1))
+    assert covariance_cache._COVARIANCE_CACHE is first
+    observations = len(first.days)
+
+    assert refresh_covariance(db_session, AS_OF) is first
+    assert len(first.days) == observations + 1
+    assert first.last_date == AS_OF
+
+    # An earlier as_of is served from a one-off window
+    historical = refresh_covariance(db_session, AS_OF - timedelta(days=10))
+    assert historical is not first
+    assert covariance_cache._COVARIANCE_CACHE is first
+
+def test_late_closes_rebuild_window(db_session):
+    """A close written later for an already cached date rebuilds the window"""
+    first = refresh_covariance(db_session, AS_OF)
+    spy = db_session.query(DailyPrice).filter(DailyPrice.price_date == AS_OF - timedelta(days=5)).first()
+    spy.close_price *= 1.10
+    db_session.commit()
+
+    rebuilt = refresh_covariance(db_session, AS_OF)
+    assert rebuilt is not first
+    assert covariance_cache._COVARIANCE_CACHE is rebuilt
+
+    invalidate_covariance_cache()
+    fresh = refresh_covariance(db_session, AS_OF)
+    np.testing.assert_allclose(rebuilt.covariance(), fresh.covariance())
+    assert not np.allclose(first.covariance(), fresh.covariance())
+
+    # Nothing changed since: the window is reused
+    assert refresh_covariance(db_session, AS_OF) is fresh
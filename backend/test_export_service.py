@@ -0,0 +1,47 @@
+"""
+Unit tests for streaming CSV/NDJSON export
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import gzip
+import json
+import pytest
+from datetime import date
+
+# Local imports
+from services.export_service import encode_records, gzip_chunks
+
+RECORDS = [
+    {"date": date(2025, 10, d), "ticker": "AAPL", "close_price": 170.0 + d}
+    for d in range(1, 6)
+]
+COLUMNS = ["date", "ticker", "close_price"]
+
+def test_csv_chunks():
+    """CSV has one header and chunk_rows records per chunk"""
+    chunks = list(encode_records(RECORDS, COLUMNS, "csv", chunk_rows=2))
+    assert len(chunks) == 3
+
+    lines = b"".join(chunks).decode().splitlines()
+    assert lines[0] == "date,ticker,close_price"
+    assert lines[1] == "2025-10-01,AAPL,171.0"
+    assert len(lines) == 6
+
+def test_ndjson_lines():
+    """NDJSON emits one JSON object per record"""
+    body = b"".join(encode_records(iter(RECORDS), COLUMNS, "ndjson"))
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    assert rows[-1] == {"date": "2025-10-05", "ticker": "AAPL", "close_price": 175.0}
+
+def test_gzip_roundtrip():
+    """Gzip output decompresses to the plain stream"""
+    plain = b"".join(encode_records(RECORDS, COLUMNS, "csv"))
+    compressed = b"".join(gzip_chunks(encode_records(RECORDS, COLUMNS, "csv")))
+    assert gzip.decompress(compressed) == plain
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        list(encode_records(RECORDS, COLUMNS, "xml"))
@@ -0,0 +1,98 @@
+"""
+Unit tests for the fast (float64) valuation path
+Rounded outputs must match the canonical Decimal path exactly
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base
+from services.portfolio_calculation_service import PortfolioCalculationService, PositionArray, PositionSnapshot
+from test_canonical_portfolio import setup_test_fixture
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    setup_test_fixture(session)
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+@pytest.mark.parametrize("as_of", [date(2025, 9, 30), date(2025, 10, 1), date(2025, 10, 10)])
+def test_fast_matches_decimal(db_session, as_of):
+    """Rounded totals, class buckets and missing prices are identical"""
+    round_decimal = PortfolioCalculationService(db_session).round_decimal
+    exact = PortfolioCalculationService(db_session, fast_valuation=False).compute_portfolio_snapshot(1, as_of)
+    fast = PortfolioCalculationService(db_session, fast_valuation=True).compute_portfolio_snapshot(1, as_of)
+
+    assert round_decimal(fast.total_value) == round_decimal(exact.total_value)
+    for key, value in exact.by_class.items():
+        assert round_decimal(fast.by_class[key]) == round_decimal(value), key
+    assert fast.missing_prices == exact.missing_prices
+
+    exact_positions = {p.ticker: p for p in exact.by_position}
+    for pos in fast.by_position:
+        assert pos.missing_price == exact_positions[pos.ticker].missing_price
+        assert round_decimal(pos.position_val) == round_decimal(exact_positions[pos.ticker].position_val)
+
+def test_fast_snapshot_values(db_session):
+    """Fast path applies canonical rules on 2025-10-01"""
+    service = PortfolioCalculationService(db_session, fast_valuation=True)
+    snapshot = service.compute_portfolio_snapshot(1, date(2025, 10, 1))
+
+    # AAPL 1750 + TLT 450 + BTC 30000 + B1 1000 + cash 5000
+    assert snapshot.total_value == Decimal('38200.0')
+    assert isinstance(snapshot.by_class['equity_value'], Decimal)
+    assert snapshot.by_class['bond_cash_value'] == Decimal('1000.0')
+    assert "CASH" not in [p.ticker for p in snapshot.by_position]
+    assert snapshot.valuation_drift is None
+
+def test_verify_reports_drift(db_session):
+    """Verification re-checks fast totals within a cent"""
+    service = PortfolioCalculationService(db_session, fast_valuation=True, verify_valuation=True)
+    snapshot = service.compute_portfolio_snapshot(1, date(2025, 10, 1))
+
+    assert snapshot.valuation_drift is not None
+    assert snapshot.valuation_drift <= Decimal('0.01')
+
+def test_position_array_rows(db_session):
+    """Fast snapshots hold columns and expose cheap row views"""
+    service = PortfolioCalculationService(db_session, fast_valuation=True)
+    positions = service.compute_portfolio_snapshot(1, date(2025, 10, 2)).by_position
+
+    assert isinstance(positions, PositionArray)
+    assert len(positions) == 4
+    assert positions.price_age.tolist() == [1, 1, 1, -1]
+
+    aapl = positions[0]
+    assert (aapl.ticker, aapl.asset_class, aapl.position_val) == ("AAPL", "STOCK", 1750.0)
+    assert aapl.price_date == date(2025, 10, 1)
+    assert positions[-1].price_date is None
+
+    records = positions.to_records()
+    assert records[1] == {
+        'portfolio_id': 2, 'ticker': 'TLT', 'asset_class': 'BOND_ETF', 'units': 5.0,
+        'price': 90.0, 'position_val': 450.0, 'missing_price': False, 'price_date': '2025-10-01'
+    }
+
+def test_position_snapshot_slots():
+    """Per-row snapshots carry no instance dict"""
+    pos = PositionSnapshot(1, "AAPL", "STOCK", Decimal('1'), None, Decimal('0'), True)
+    assert not hasattr(pos, '__dict__')
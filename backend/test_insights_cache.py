@@ -0,0 +1,107 @@
+"""
+Unit tests for the insights cache: fingerprints, expiry, retention and the front cache
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from core.config import settings
+from domain.models_v2 import Base, InsightsCacheEntry
+from insights_calculator import generate_metrics_hash, get_cached_insights, save_insights_to_cache
+from services.insights_cache import InsightsCache, invalidate_insights_cache, metrics_fingerprint, purge_expired_insights
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+METRICS = {
+    "net_worth": 327625.0,
+    "gain_loss_pct": 0.81,
+    "diversification_score": 74,
+    "top_sector": "Technology",
+    "sector_concentration": 45.2,
+    "num_positions": 15,
+}
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    invalidate_insights_cache()
+    session = TestSessionLocal()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+    invalidate_insights_cache()
+
+def test_fingerprint_buckets_small_moves():
+    """A small price move keeps the fingerprint; a changed sector or position count does not"""
+    moved = dict(METRICS, net_worth=328100.0, gain_loss_pct=0.93, sector_concentration=45.9, diversification_score=75)
+    assert metrics_fingerprint(moved) == metrics_fingerprint(METRICS)
+
+    assert metrics_fingerprint(dict(METRICS, gain_loss_pct=2.4)) != metrics_fingerprint(METRICS)
+    assert metrics_fingerprint(dict(METRICS, top_sector="Healthcare")) != metrics_fingerprint(METRICS)
+    assert metrics_fingerprint(dict(METRICS, num_positions=16)) != metrics_fingerprint(METRICS)
+
+def test_legacy_fingerprint_uses_ratio_steps():
+    legacy = {"net_worth": 50210.0, "diversification": 0.52, "sector_concentration": 0.41,
+              "category_breakdown": {"stocks": 40120.0, "cash": 1010.0}}
+    nearby = dict(legacy, net_worth=50390.0, diversification=0.51, category_breakdown={"stocks": 40300.0, "cash": 1005.0})
+    assert generate_metrics_hash(nearby) == generate_metrics_hash(legacy)
+    assert generate_metrics_hash(dict(legacy, sector_concentration=0.6)) != generate_metrics_hash(legacy)
+
+def test_entries_expire(db_session):
+    cache = InsightsCache(db_session)
+    fingerprint = metrics_fingerprint(METRICS)
+    cache.put(1, fingerprint, ["Short lived"], "rule", ttl=60)
+    assert cache.get(1, fingerprint)["insights"] == ["Short lived"]
+
+    # Age the row past its TTL; the front cache must not keep serving it either
+    row = db_session.query(InsightsCacheEntry).one()
+    row.expires_at = datetime.now() - timedelta(seconds=1)
+    db_session.commit()
+    invalidate_insights_cache()
+
+    assert cache.get(1, fingerprint) is None
+    assert cache.latest(1) is None
+    assert purge_expired_insights(db_session) == 1
+
+def test_retention_cap_keeps_newest(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "INSIGHTS_CACHE_MAX_PER_USER", 3)
+    cache = InsightsCache(db_session)
+    for i in range(6):
+        cache.put(1, f"hash-{i}", [f"Insight {i}"])
+    cache.put(2, "hash-0", ["Other user"])
+
+    kept = [r[0] for r in db_session.query(InsightsCacheEntry.metrics_hash).filter(InsightsCacheEntry.user_id == 1).all()]
+    assert sorted(kept) == ["hash-3", "hash-4", "hash-5"]
+    assert cache.latest(1)["insights"] == ["Insight 5"]
+    assert cache.latest(2)["insights"] == ["Other user"]
+
+def test_front_cache_serves_without_query(db_session):
+    cache = InsightsCache(db_session)
+    cache.put(1, "hash-a", ["Cached"], "ai")
+
+    # With the table gone only the in-memory entry can answer
+    db_session.query(InsightsCacheEntry).delete()
+    db_session.commit()
+    assert cache.latest(1)["insights"] == ["Cached"]
+    assert cache.get(1, "hash-a")["insight_type"] == "ai"
+
+    invalidate_insights_cache(1)
+    assert cache.latest(1) is None
+
+def test_legacy_scope_is_separate(db_session):
+    """The legacy endpoint's string insights never surface as a v2 user's latest"""
+    save_insights_to_cache(1, "legacy-hash", "Legacy text", False, db_session)
+    assert get_cached_insights(1, "legacy-hash", db_session) == "Legacy text"
+    assert InsightsCache(db_session).latest(1) is None
@@ -0,0 +1,131 @@
+"""
+Unit tests for the nightly insights worker and cache-only serving
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import asyncio
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, PortfolioSummary
+from insights_service import PortfolioInsightsService, parse_insights
+from services.insights_cache import invalidate_insights_cache
+from jobs.insights_worker import StubInsightsProvider, generate_batch, run_insights_job
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+
+class RecordingProvider:
+    """Counts calls and concurrency; user 2 never answers"""
+    name = "ai"
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate(self, metrics):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(10 if metrics.get("hang") else 0.01)
+            return {"assessment": f"Insight for {metrics['net_worth']:.0f}", "recommendations": ["Rebalance"],
+                    "risk_analysis": "Medium risk", "diversification_analysis": "Concentrated", "confidence": 0.8}
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    invalidate_insights_cache()
+    session = TestSessionLocal()
+
+    for user_id in (1, 2):
+        session.add(User(user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com"))
+        session.add(Portfolio(user_id=user_id, ticker="AAPL", units=10.0, avg_price=150.0, buy_date=AS_OF))
+        session.add(PortfolioSummary(user_id=user_id, date=AS_OF, total_value=1500.0 * user_id, total_gain_loss_percent=2.0))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+    invalidate_insights_cache()
+
+def test_batch_bounds_concurrency_and_timeouts():
+    """At most `concurrency` calls run at once; a hung call times out to None"""
+    provider = RecordingProvider()
+    requests = {user_id: {"net_worth": float(user_id)} for user_id in range(10)}
+    requests[3]["hang"] = True
+
+    results = asyncio.run(generate_batch(provider, requests, concurrency=3, timeout=0.5, deadline=30))
+
+    assert provider.max_in_flight <= 3
+    assert results[3] is None
+    assert results[7]["assessment"] == "Insight for 7"
+
+def test_deadline_cancels_pending():
+    provider = RecordingProvider()
+    requests = {user_id: {"net_worth": float(user_id), "hang": True} for user_id in range(4)}
+
+    results = asyncio.run(generate_batch(provider, requests, concurrency=2, timeout=60, deadline=0.2))
+    assert results == {}
+
+def test_stub_provider_is_deterministic():
+    metrics = {"gain_loss_pct": 3.0, "diversification_score": 40, "sector_concentration": 70.0,
+               "top_sector": "Technology", "crypto_percentage": 0.0}
+    first = asyncio.run(StubInsightsProvider().generate(metrics))
+    assert first == asyncio.run(StubInsightsProvider().generate(metrics))
+    assert "concentrated" in first["diversification_analysis"]
+    assert "Technology (70.0%)" in first["risk_analysis"]
+    assert first["recommendations"][0] != first["risk_analysis"]
+    assert first["confidence"] == 0.6
+
+def test_parse_insights_keeps_fields_and_confidence():
+    reply = """```json
+{"assessment": "Up 3%", "recommendations": ["Trim tech", "Add bonds"], "risk_analysis": "Tech heavy",
+ "diversification_analysis": "Few sectors", "confidence": 0.85}
+```"""
+
+    assert parse_insights(reply) == {
+        "assessment": "Up 3%", "recommendations": ["Trim tech", "Add bonds"], "risk_analysis": "Tech heavy",
+        "diversification_analysis": "Few sectors", "confidence": 0.85,
+    }
+    assert parse_insights("1. Up 3%\n2. Tech heavy") is None
+
+def test_job_fills_cache_and_requests_read_it(db_session):
+    """The batch writes every user; unchanged metrics are skipped next night"""
+    provider = RecordingProvider()
+    result = run_insights_job(AS_OF, db=db_session, provider=provider)
+    assert result["status"] == "success"
+    assert (result["generated"], result["fallback"]) == (2, 0)
+
+    served = PortfolioInsightsService(db_session).generate_insights(2)
+    assert served["source"] == "cache"
+    assert served["insight_type"] == "ai"
+    assert served["insights"] == ["Insight for 3000", "Concentrated", "Medium risk"]
+    assert served["structured"]["risk_analysis"] == "Medium risk"
+    assert served["structured"]["confidence"] == 0.8
+
+    again = run_insights_job(AS_OF, db=db_session, provider=provider)
+    assert again["unchanged"] == 2
+    assert provider.calls == 2
+
+def test_stub_job_runs_offline(db_session):
+    result = run_insights_job(AS_OF, db=db_session, provider=StubInsightsProvider(), user_ids=[1])
+    assert result["generated"] == 1
+    assert PortfolioInsightsService(db_session).get_latest_insights(1)["insight_type"] == "stub"
@@ -0,0 +1,152 @@
+"""
+Tests for the load-test harness and the provider stubs
+"""
+
+import asyncio
+import random
+from datetime import date
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.loadtest import MIXES, Sample, Scenario, drive, percentile, summarize_samples
+from benchmarks.stubs import RateLimiter, StubConfig, create_stub_app
+from benchmarks.synthetic import SyntheticSpec
+from insights_service import parse_insights
+
+ALPACA_HEADERS = {'APCA-API-KEY-ID': "key", 'APCA-API-SECRET-KEY': "secret"}
+
+def stub_client(**overrides) -> TestClient:
+    return TestClient(create_stub_app(StubConfig(latency_ms=0, jitter_ms=0, **overrides)))
+
+def test_rate_limiter_window():
+    limiter = RateLimiter(2, window=60.0)
+
+    assert limiter.retry_after(now=0.0) == 0
+    assert limiter.retry_after(now=1.0) == 0
+    assert limiter.retry_after(now=2.0) == 58.0
+    assert limiter.retry_after(now=60.5) == 0
+
+def test_alpaca_bars_skip_weekends_and_need_keys():
+    client = stub_client()
+
+    response = client.get("/v2/stocks/AAPL/bars", params={'start': "2025-09-26", 'end': "2025-09-29"}, headers=ALPACA_HEADERS)
+    days = [bar['t'][:10] for bar in response.json()['bars']]
+
+    assert days == ["2025-09-26", "2025-09-29"]
+    assert client.get("/v2/stocks/AAPL/bars", params={'start': "2025-09-26", 'end': "2025-09-29"}).status_code == 403
+
+def test_twelve_data_rate_limit():
+    client = stub_client(twelve_data_rpm=1)
+    params = {'symbol': "BTC-USD", 'start_date': "2025-09-26", 'end_date': "2025-09-28", 'apikey': "key", 'order': "ASC"}
+
+    first = client.get("/time_series", params=params)
+    second = client.get("/time_series", params=params)
+
+    assert [v['datetime'] for v in first.json()['values']] == ["2025-09-26", "2025-09-27", "2025-09-28"]
+    assert second.status_code == 200
+    assert second.json()['code'] == 429 and second.json()['status'] == "error"
+    assert client.get("/stats").json()['rate_limited'] == {'twelve_data': 1}
+
+def test_twelve_data_body_rate_limit_is_counted(monkeypatch):
+    """The updater counts the stub's 200-with-code-429 answer as a rate limit"""
+    from core import metrics
+    from services import enhanced_price_updater
+
+    client = stub_client(twelve_data_rpm=1)
+    monkeypatch.setattr(enhanced_price_updater.requests, 'get', lambda url, params=None, timeout=None: client.get(url, params=params))
+    updater = enhanced_price_updater.EnhancedPriceUpdater(db=None)
+    updater.twelve_data_base_url = "http://testserver"
+    updater.twelve_data_api_key = "key"
+    before = metrics.PROVIDER_RATE_LIMITED.value(provider='twelve_data')
+
+    assert len(updater.fetch_twelve_data_prices("BTC-USD", date(2025, 9, 26), date(2025, 9, 28))) == 3
+    assert updater.fetch_twelve_data_prices("BTC-USD", date(2025, 9, 26), date(2025, 9, 28)) is None
+    assert metrics.PROVIDER_RATE_LIMITED.value(provider='twelve_data') == before + 1
+
+def test_openai_chat_completion_shape():
+    client = stub_client()
+
+    response = client.post(
+        "/v1/chat/completions", headers={'Authorization': "Bearer key"},
+        json={'model': "gpt-4o-mini", 'messages': [{'role': "user", 'content': "Analyze"}]}
+    )
+    message = response.json()['choices'][0]['message']
+
+    assert message['role'] == "assistant"
+    assert parse_insights(message['content'])['confidence'] == 0.8
+
+def test_openai_provider_against_stub():
+    """The insights worker's OpenAI provider gets structured insights back from the stub"""
+    openai = pytest.importorskip("openai")
+    from jobs.insights_worker import OpenAIInsightsProvider
+
+    transport = httpx.ASGITransport(app=create_stub_app(StubConfig(latency_ms=0, jitter_ms=0)))
+    provider = OpenAIInsightsProvider("key")
+    provider.client = openai.AsyncOpenAI(
+        api_key="key", base_url="http://stub/v1", http_client=httpx.AsyncClient(transport=transport)
+    )
+    metrics = {
+        'net_worth': 100000.0, 'gain_loss_pct': 5.0, 'diversification_score': 70, 'top_sector': "Technology",
+        'sector_concentration': 35.0, 'crypto_percentage': 5.0, 'risk_level': "Medium", 'num_positions': 12,
+    }
+
+    async def generate():
+        try:
+            return await provider.generate(metrics)
+        finally:
+            await provider.close()
+
+    insights = asyncio.run(generate())
+
+    assert insights is not None
+    assert insights['assessment'] and len(insights['recommendations']) == 2
+
+def test_injected_errors():
+    client = stub_client(error_rate=1.0)
+
+    response = client.get("/v2/stocks/AAPL/bars", params={'start': "2025-09-26", 'end': "2025-09-29"}, headers=ALPACA_HEADERS)
+
+    assert response.status_code == 503
+
+def test_summarize_samples_percentiles():
+    samples = [Sample('a', 200, s / 1000) for s in range(1, 101)] + [Sample('a', 500, 0.2)]
+
+    summary = summarize_samples(samples, wall_seconds=10.0)
+
+    assert summary['requests'] == 101
+    assert summary['errors'] == 1
+    assert summary['throughput_rps'] == 10.1
+    assert summary['p50_ms'] == 51.0
+    assert summary['max_ms'] == 200.0
+    assert percentile([], 95) == 0.0
+
+def test_drive_follows_the_mix_and_request_budget():
+    app = FastAPI()
+
+    @app.get("/dashboard/{user_id}")
+    def dashboard(user_id: int):
+        return {'user_id': user_id}
+
+    mix = [
+        Scenario('dashboard', 3, lambda rng, spec: ("GET", f"/dashboard/{rng.randint(1, spec.users)}", None, None)),
+        Scenario('missing', 1, lambda rng, spec: ("GET", "/missing", None, None)),
+    ]
+    transport = httpx.ASGITransport(app=app)
+
+    result = asyncio.run(drive("http://test", mix, SyntheticSpec(users=3), concurrency=4, requests=40, transport=transport))
+
+    assert len(result.samples) == 40
+    assert {s.scenario for s in result.samples} == {'dashboard', 'missing'}
+    assert all((s.status == 200) == (s.scenario == 'dashboard') for s in result.samples)
+
+def test_mixes_build_requests():
+    spec = SyntheticSpec(users=3, positions=4)
+    rng = random.Random(1)
+
+    for scenarios in MIXES.values():
+        for scenario in scenarios:
+            method, path, params, body = scenario.build(rng, spec)
+            assert method in ("GET", "POST") and path.startswith("/")
@@ -0,0 +1,128 @@
+"""
+Tests for core/logging: formatters, hot-loop filters and the queued root handler
+"""
+
+import json
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from core import logging as core_logging
+from core.config import settings
+from core.logging import ColoredFormatter, JsonFormatter, RateLimitFilter, SamplingFilter, configure_logging
+
+def make_record(msg="No price data for %s on %s", args=("SPY", "2025-09-27"), level=logging.WARNING, name="jobs.calc", lineno=1):
+    return logging.LogRecord(name, level, __file__, lineno, msg, args, None)
+
+def test_colored_formatter_leaves_record_untouched():
+    record = make_record()
+
+    line = ColoredFormatter("%(levelname)8s | %(message)s").format(record)
+
+    assert record.levelname == "WARNING"
+    assert line == "\033[33m WARNING\033[0m | No price data for SPY on 2025-09-27"
+
+def test_json_formatter_includes_extras_and_exception():
+    record = make_record()
+    record.user_id = 7
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['level'] == "WARNING"
+    assert entry['logger'] == "jobs.calc"
+    assert entry['message'] == "No price data for SPY on 2025-09-27"
+    assert entry['user_id'] == 7
+    assert "ValueError: bad row" in entry['exc_info']
+
+def test_rate_limit_is_per_call_site_and_counts_suppressed(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(core_logging.time, "monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(rate=1.0, burst=2)
+
+    kept = [limiter.filter(make_record(args=(ticker, "d"))) for ticker in ("A", "B", "C", "D")]
+    other_line = limiter.filter(make_record(lineno=2))
+    other_level = limiter.filter(make_record(level=logging.INFO))
+    errors = limiter.filter(make_record(level=logging.ERROR))
+
+    assert kept == [True, True, False, False]
+    assert other_line and other_level and errors
+    assert limiter.suppressed_total == 2
+
+    clock[0] += 1.0
+    record = make_record()
+    assert limiter.filter(record)
+    assert record.suppressed == 2
+
+    # Counts no later record carried are reported, once
+    limiter.filter(make_record())
+    assert limiter.report_suppressed() == [("jobs.calc", __file__, 1, 1)]
+    assert limiter.report_suppressed() == []
+
+def test_rate_limit_exempts_access_log():
+    limiter = RateLimitFilter(rate=1.0, burst=1, exempt=["portora.access"])
+
+    access = [limiter.filter(make_record(level=logging.INFO, name="portora.access")) for _ in range(5)]
+    jobs = [limiter.filter(make_record(level=logging.INFO)) for _ in range(5)]
+
+    assert all(access)
+    assert jobs.count(True) == 1
+
+def test_sampling_matches_logger_prefixes():
+    sampler = SamplingFilter({"jobs": 0.0, "services.movers_engine": 1.0}, seed=1)
+
+    assert not sampler.filter(make_record(level=logging.INFO, name="jobs.enhanced_daily_calculator"))
+    assert sampler.filter(make_record(level=logging.WARNING, name="jobs.enhanced_daily_calculator"))
+    assert sampler.filter(make_record(level=logging.INFO, name="services.movers_engine"))
+    assert sampler.filter(make_record(level=logging.INFO, name="api"))
+
+@pytest.fixture
+def reconfigure(monkeypatch):
+    """configure_logging without the DEBUG log file; uninstalled again afterwards"""
+    monkeypatch.setattr(settings, "DEBUG", False)
+    level = logging.getLogger().level
+    yield configure_logging
+    core_logging.reset_logging()
+    logging.getLogger().setLevel(level)
+
+def test_queued_json_output(reconfigure, capsys):
+    reconfigure(json_output=True, use_queue=True, force=True)
+    logger = logging.getLogger("jobs.test_logging")
+
+    for i in range(200):
+        logger.info("row %s", i)
+    logger.error("failed for %s", "AAPL")
+    core_logging.shutdown_logging()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    rows = [line for line in lines if line['logger'] == "jobs.test_logging"]
+
+    assert rows[-2]['message'] == "failed for AAPL"
+    # The per-row message is capped at the burst (plus whatever refilled during the loop)
+    assert 1 < len(rows) - 2 < 200
+    # and the rows cut since the last one let through are reported at shutdown
+    assert rows[-1]['level'] == "WARNING" and "suppressed by the rate limit" in rows[-1]['message']
+
+def test_reset_removes_handlers(reconfigure):
+    root = logging.getLogger()
+    before = list(root.handlers)
+    reconfigure(use_queue=True, force=True)
+    assert core_logging._listener is not None
+
+    core_logging.reset_logging()
+
+    assert root.handlers == before
+    assert core_logging._listener is None
+
+def test_import_leaves_logging_unconfigured():
+    """Only entry points install handlers; importing the app and its services does not"""
+    code = "import logging, app, core.logging; print(len(logging.getLogger().handlers), core.logging._listener)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=str(Path(__file__).parent))
+
+    assert result.stdout.splitlines()[-1].split() == ["0", "None"], result.stderr
@@ -0,0 +1,98 @@
+"""
+Unit tests for the metrics registry, /metrics and the job exporters
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Local imports
+from core import metrics
+from core.config import settings
+from core.metrics import MetricsRegistry, export_job_metrics, record_provider_response, time_provider_fetch, time_stage
+from core.profiling import instrument_app
+
+app = FastAPI()
+instrument_app(app)
+
+@app.get("/portfolio/{user_id}")
+def portfolio(user_id: int):
+    return {"user_id": user_id}
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.clear()
+    yield
+    metrics.REGISTRY.clear()
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def test_text_exposition():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_rows", "Rows written", ["job"])
+    histogram = registry.histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+    counter.inc(3, job='prices')
+    counter.inc(job='prices')
+    histogram.observe(0.05, route='/a')
+    histogram.observe(0.5, route='/a')
+
+    text = registry.render()
+    assert '# HELP jobs_rows_total Rows' in text
+    assert '# TYPE jobs_rows_total counter' in text
+    assert 'jobs_rows_total{job="prices"} 4' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{route="/a"} 2' in text
+
+    with pytest.raises(ValueError):
+        counter.inc(job='prices', table='daily_prices')
+
+def test_metrics_endpoint_labels_route_templates():
+    client = TestClient(app)
+    client.get("/portfolio/1")
+    client.get("/portfolio/2")
+    client.get("/missing")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'portora_http_request_duration_seconds_count{method="GET",route="/portfolio/{user_id}",status="200"} 2' in response.text
+    assert 'route="unmatched",status="404"' in response.text
+    assert 'portora_http_request_db_queries_count{method="GET",route="/portfolio/{user_id}"} 2' in response.text
+
+def test_provider_fetch_counts_rate_limits():
+    with time_provider_fetch('alpaca') as fetch:
+        record_provider_response('alpaca', Response(429), fetch)
+    with time_provider_fetch('alpaca') as fetch:
+        record_provider_response('alpaca', Response(200), fetch)
+    with pytest.raises(ConnectionError):
+        with time_provider_fetch('twelve_data'):
+            raise ConnectionError("timeout")
+    # Twelve Data answers rate limits with a 200 and the code in the body
+    with time_provider_fetch('twelve_data') as fetch:
+        record_provider_response('twelve_data', Response(200), fetch, body={'status': "error", 'code': 429})
+
+    assert metrics.PROVIDER_RATE_LIMITED.value(provider='alpaca') == 1
+    assert metrics.PROVIDER_RATE_LIMITED.value(provider='twelve_data') == 1
+    assert metrics.PROVIDER_FETCH_DURATION.count(provider='twelve_data', outcome='rate_limited') == 1
+    assert metrics.PROVIDER_FETCH_DURATION.count(provider='alpaca', outcome='rate_limited') == 1
+    assert metrics.PROVIDER_FETCH_DURATION.count(provider='alpaca', outcome='ok') == 1
+    assert metrics.PROVIDER_FETCH_DURATION.count(provider='twelve_data', outcome='error') == 1
+
+def test_job_textfile_export(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_TEXTFILE_DIR", str(tmp_path))
+    with time_stage('daily_portfolio', 'risk_metrics'):
+        pass
+    metrics.record_rows('daily_portfolio', 'portfolio_summary', 12)
+    export_job_metrics('daily_portfolio')
+
+    text = (tmp_path / "portora_daily_portfolio.prom").read_text()
+    assert 'portora_job_stage_duration_seconds{job="daily_portfolio",stage="risk_metrics"}' in text
+    assert 'portora_job_rows_upserted_total{job="daily_portfolio",table="portfolio_summary"} 12' in text
+    assert 'portora_job_last_success_timestamp_seconds{job="daily_portfolio"}' in text
+    assert list(tmp_path.iterdir()) == [tmp_path / "portora_daily_portfolio.prom"]
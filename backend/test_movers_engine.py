@@ -0,0 +1,107 @@
+"""
+Unit tests for the per-ticker price change and top movers engine
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, PortfolioDailyValue, DailyPrice, Ticker, TickerPriceChange
+from services.movers_engine import MoversEngine, calculate_price_changes_job, largest_movers, price_change_matrix, split_movers
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+DATES = [AS_OF - timedelta(days=40 - i) for i in range(41)]
+
+# Daily closes growing at a constant rate per ticker; DOWN falls, FLAT has a single close
+RATES = {"UP": 0.01, "DOWN": -0.02, "SLOW": 0.001}
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    for ticker, rate in RATES.items():
+        for i, day in enumerate(DATES):
+            session.add(DailyPrice(ticker=ticker, price_date=day, close_price=100.0 * (1 + rate) ** i))
+    session.add(DailyPrice(ticker="FLAT", price_date=AS_OF, close_price=50.0))
+
+    session.add(User(user_id=1, name="User 1", email="user1@example.com"))
+    for ticker in [*RATES, "FLAT"]:
+        position = Portfolio(user_id=1, ticker=ticker, units=10.0, avg_price=90.0, buy_date=DATES[0])
+        session.add(position)
+        session.flush()
+        session.add(PortfolioDailyValue(portfolio_id=position.portfolio_id, date=AS_OF, units=10.0,
+                                        price=100.0, position_val=1000.0))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_change_matrix_uses_each_tickers_own_closes():
+    """1D skips a ticker's missing days; 1W/1M look back from its own last close"""
+    dates = [date(2025, 9, 1) + timedelta(days=i) for i in range(10)]
+    closes = np.full((10, 3), np.nan)
+    closes[:, 0] = np.arange(100.0, 110.0)
+    closes[[0, 3, 8], 1] = [10.0, 11.0, 12.0]  # gaps between closes, none on the last day
+
+    changes = price_change_matrix(dates, closes)
+
+    assert changes['1D'][0] == pytest.approx((109 / 108 - 1) * 100)
+    assert changes['1D'][1] == pytest.approx((12 / 11 - 1) * 100)
+    assert changes['1W'][0] == pytest.approx((109 / 102 - 1) * 100)
+    assert changes['1W'][1] == pytest.approx((12 / 10 - 1) * 100)
+    assert np.isnan(changes['1M'][0])  # no close 30 days back
+    assert not changes['valid'][2]
+
+def test_heap_ranking():
+    positions = [{'ticker': t, 'change_pct': c} for t, c in [('A', 3.0), ('B', -5.0), ('C', 1.0), ('D', None), ('E', -0.5)]]
+
+    movers = split_movers(positions, k=1)
+    assert [m['ticker'] for m in movers['up']] == ['A']
+    assert [m['ticker'] for m in movers['down']] == ['B']
+    assert [m['ticker'] for m in largest_movers(positions, k=3)] == ['B', 'A', 'C']
+
+def test_job_stores_changes_and_ranks_user(db_session):
+    """Stored changes drive the user's movers; tickers without history have no change"""
+    result = calculate_price_changes_job(AS_OF, db=db_session)
+    assert result == {'status': 'success', 'as_of': AS_OF.isoformat(), 'tickers': 4}
+
+    row = (
+        db_session.query(TickerPriceChange)
+        .join(Ticker, Ticker.ticker_id == TickerPriceChange.ticker_id)
+        .filter(Ticker.symbol == "UP")
+        .one()
+    )
+    assert row.change_1d == pytest.approx(1.0)
+    assert row.change_1w == pytest.approx((1.01 ** 7 - 1) * 100)
+    assert row.change_1m == pytest.approx((1.01 ** 30 - 1) * 100)
+
+    movers = MoversEngine(db_session).top_movers(1, AS_OF, k=5)
+    assert [m['ticker'] for m in movers['up']] == ['UP', 'SLOW']
+    assert [m['ticker'] for m in movers['down']] == ['DOWN']
+    assert movers['up'][0]['change_val'] == pytest.approx(1000.0 - 1000.0 / 1.01)
+
+def test_historical_as_of_is_computed(db_session):
+    """A date before the stored changes computes them for the user's tickers"""
+    calculate_price_changes_job(AS_OF, db=db_session)
+    earlier = AS_OF - timedelta(days=5)
+    db_session.query(TickerPriceChange).update({TickerPriceChange.change_1d: 99.0})
+    db_session.commit()
+
+    changes = MoversEngine(db_session).changes([row.ticker_id for row in db_session.query(TickerPriceChange)], earlier)
+    assert {c['as_of_date'] for c in changes.values()} == {earlier}
+    assert all(c['change_1d'] != 99.0 for c in changes.values())
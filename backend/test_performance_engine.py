@@ -0,0 +1,93 @@
+"""
+Unit tests for the materialized period performance engine
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, PortfolioSummary, CashTransaction, PortfolioPeriodPerformance
+from services.performance_engine import PerformanceEngine, period_performance_matrix, calculate_period_performance_job
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+DAYS = 400
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    # User 1 grows 0.1% a day for 400 days; user 2 starts 10 days ago with a deposit
+    session.add(User(user_id=1, name="User 1", email="user1@example.com"))
+    session.add(User(user_id=2, name="User 2", email="user2@example.com"))
+    for i in range(DAYS):
+        day = AS_OF - timedelta(days=DAYS - 1 - i)
+        session.add(PortfolioSummary(user_id=1, date=day, total_value=1000.0 * 1.001 ** i))
+    for i in range(10):
+        day = AS_OF - timedelta(days=9 - i)
+        session.add(PortfolioSummary(user_id=2, date=day, total_value=500.0 if i < 5 else 1500.0))
+    session.add(CashTransaction(user_id=2, amount=1000.0, transaction_date=AS_OF - timedelta(days=4), type="deposit"))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_matrix_constant_growth():
+    """Returns follow the daily growth and a one-way series has no drawdown"""
+    dates = [AS_OF - timedelta(days=9 - i) for i in range(10)]
+    values = np.array([[100.0 * 1.01 ** i for i in range(10)]])
+    matrix = period_performance_matrix(dates, values, np.zeros_like(values), AS_OF, periods=['1W', '1Y'])
+
+    week = matrix['1W']
+    assert week['total_return'][0] == pytest.approx((1.01 ** 7 - 1) * 100)
+    assert week['max_drawdown'][0] == pytest.approx(0.0)
+    assert not week['partial'][0]
+    assert np.isnan(week['annualized_return'][0])
+
+    year = matrix['1Y']
+    assert year['partial'][0]
+    assert year['total_return'][0] == pytest.approx((1.01 ** 9 - 1) * 100)
+
+def test_deposit_is_not_performance(db_session):
+    """A deposit raises the value but not the return or the gain"""
+    results = PerformanceEngine(db_session, risk_free_rate=0.0).compute(AS_OF)
+
+    week = results[2]['1W']
+    assert week['total_return'] == pytest.approx(0.0)
+    assert week['total_gain_loss'] == pytest.approx(0.0)
+    assert week['net_flows'] == pytest.approx(1000.0)
+    assert '5Y' in results[2] and results[2]['5Y']['partial']
+
+    year = results[1]['1Y']
+    assert year['total_return'] == pytest.approx((1.001 ** 365 - 1) * 100)
+    assert year['annualized_return'] == pytest.approx((1.001 ** 365 - 1) * 100)
+    assert year['volatility'] == pytest.approx(0.0, abs=1e-6)
+    assert year['max_drawdown'] == pytest.approx(0.0)
+
+def test_job_upserts_one_row_per_period(db_session):
+    """Rerunning the batch updates rows in place and the endpoint lookup reads them"""
+    first = calculate_period_performance_job(AS_OF, db=db_session)
+    assert first['status'] == 'success'
+    assert first['rows'] == 10
+
+    calculate_period_performance_job(AS_OF, db=db_session)
+    assert db_session.query(PortfolioPeriodPerformance).count() == 10
+
+    stored = PerformanceEngine(db_session).stored(1)
+    assert list(stored) == ['1W', '1M', 'YTD', '1Y', '5Y']
+    assert stored['1W']['end_date'] == AS_OF
+    assert stored['1W']['as_of_date'] == AS_OF
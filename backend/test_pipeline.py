@@ -0,0 +1,122 @@
+"""
+Tests for the pipeline runner: dependency order, parallel stages, checkpoints and resume
+"""
+
+import json
+import threading
+from datetime import date, datetime, time
+
+import pytest
+
+from jobs.nightly_pipeline import build_nightly_pipeline
+from jobs.pipeline import BLOCKED, COMPLETED, FAILED, SKIPPED, Pipeline, PipelineScheduler, Stage
+
+RUN_DATE = date(2025, 10, 14)
+
+def recording_stage(name, calls, depends_on=(), fail=False):
+    def run(run_date):
+        calls.append(name)
+        if fail:
+            raise RuntimeError(f"{name} broke")
+        return {'status': 'success', 'stage': name}
+    return Stage(name, run, tuple(depends_on))
+
+def diamond(tmp_path, calls, fail=()):
+    stages = [
+        recording_stage('report', calls, ('left', 'right'), 'report' in fail),
+        recording_stage('fetch', calls, fail='fetch' in fail),
+        recording_stage('left', calls, ('fetch',), 'left' in fail),
+        recording_stage('right', calls, ('fetch',), 'right' in fail),
+        recording_stage('audit', calls, fail='audit' in fail),
+    ]
+    return Pipeline('test', stages, max_workers=2, checkpoint_dir=str(tmp_path))
+
+def test_stages_run_after_their_dependencies(tmp_path):
+    calls = []
+
+    report = diamond(tmp_path, calls).run(RUN_DATE)
+
+    assert report.succeeded
+    assert calls.index('fetch') < calls.index('left') < calls.index('report')
+    assert calls.index('right') < calls.index('report')
+    assert [s.name for s in report.stages] == ['fetch', 'left', 'right', 'report', 'audit']
+
+def test_independent_stages_run_in_parallel(tmp_path):
+    # Each stage waits for the other; run one at a time this would time out
+    barrier = threading.Barrier(2, timeout=5)
+    stages = [Stage(name, lambda d: {'waited': barrier.wait()}) for name in ('equities', 'crypto')]
+
+    report = Pipeline('parallel', stages, max_workers=2, checkpoint_dir=str(tmp_path)).run(RUN_DATE)
+
+    assert report.succeeded
+
+def test_failure_blocks_dependants_only(tmp_path):
+    calls = []
+
+    report = diamond(tmp_path, calls, fail={'left'}).run(RUN_DATE)
+    status = {s.name: s.status for s in report.stages}
+
+    assert not report.succeeded
+    assert status == {'fetch': COMPLETED, 'left': FAILED, 'right': COMPLETED, 'report': BLOCKED, 'audit': COMPLETED}
+    assert report.stages[1].error == "left broke"
+
+def test_resume_skips_completed_stages(tmp_path):
+    first, second = [], []
+    diamond(tmp_path, first, fail={'left'}).run(RUN_DATE)
+
+    report = diamond(tmp_path, second).run(RUN_DATE)
+
+    assert report.succeeded
+    assert sorted(second) == ['left', 'report']
+    assert {s.name: s.status for s in report.stages}['fetch'] == SKIPPED
+    checkpoint = json.loads((tmp_path / "test_2025-10-14.json").read_text())
+    assert all(entry['status'] == COMPLETED for entry in checkpoint['stages'].values())
+
+    # Another date has its own checkpoint
+    third = []
+    diamond(tmp_path, third).run(date(2025, 10, 15))
+    assert len(third) == 5
+
+def test_rerun_includes_downstream_stages(tmp_path):
+    calls = []
+    pipeline = diamond(tmp_path, calls)
+    pipeline.run(RUN_DATE)
+    calls.clear()
+
+    pipeline.run(RUN_DATE, rerun=['right'])
+    assert sorted(calls) == ['report', 'right']
+
+    calls.clear()
+    pipeline.run(RUN_DATE, force=True)
+    assert len(calls) == 5
+
+def test_error_status_fails_the_stage(tmp_path):
+    stages = [Stage('risk', lambda d: {'status': 'error', 'error': 'no summaries'}), Stage('insights', lambda d: {}, ('risk',))]
+
+    report = Pipeline('jobs', stages, checkpoint_dir=str(tmp_path)).run(RUN_DATE)
+
+    assert [(s.status, s.error) for s in report.stages] == [(FAILED, 'no summaries'), (BLOCKED, None)]
+
+def test_invalid_graphs_are_rejected(tmp_path):
+    run = lambda d: None
+    with pytest.raises(ValueError, match="unknown"):
+        Pipeline('bad', [Stage('a', run, ('missing',))])
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline('bad', [Stage('a', run, ('b',)), Stage('b', run, ('a',))])
+    with pytest.raises(ValueError, match="Unknown stages"):
+        Pipeline('ok', [Stage('a', run)], checkpoint_dir=str(tmp_path)).run(RUN_DATE, rerun=['b'])
+
+def test_nightly_pipeline_shape():
+    pipeline = build_nightly_pipeline(shards=3)
+
+    assert pipeline.stages['valuation_2'].depends_on == ('fetch_equities', 'fetch_crypto')
+    assert pipeline.stages['risk_metrics'].depends_on == ('valuation_0', 'valuation_1', 'valuation_2')
+    assert pipeline.order[-1] == 'insights'
+    assert pipeline.downstream(['fetch_crypto'])[-1] == 'insights'
+
+def test_scheduler_next_run():
+    scheduler = PipelineScheduler(lambda: None, PipelineScheduler.parse_time("02:30"))
+
+    assert scheduler.next_run(datetime(2025, 10, 14, 1, 0)) == datetime(2025, 10, 14, 2, 30)
+    assert scheduler.next_run(datetime(2025, 10, 14, 2, 30)) == datetime(2025, 10, 15, 2, 30)
+    assert scheduler.next_run(datetime(2025, 10, 14, 23, 0)).time() == time(2, 30)
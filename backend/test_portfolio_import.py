@@ -0,0 +1,131 @@
+"""
+Unit tests for vectorized broker CSV import
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, AssetCategory
+from services import portfolio_import
+from services.classification_index import ClassificationIndex, load_seed
+from services.portfolio_import import parse_portfolio_csv
+from services.portfolio_service_v2 import PortfolioServiceV2
+
+MASTER_CSV = b"""account_name,symbol,asset_type,shares,purchase_price,total_cost,total_value
+Public,SCHD,ETF,10,27.00,270.00,280.00
+Robinhood,schd,ETF,30,28.00,840.00,850.00
+Public,VCIT,Bond,5,84.00,420.00,421.00
+Public,BTC-USD,Crypto,0.5,30000,15000,30000
+Public,,ETF,1,1,1,1
+Public,AAPL,Stock,abc,150,150,175
+Public,TSLA,Stock,-2,200,400,300
+Public,MSFT,Stock,0,300,0,0
+Public,Cash_Public,Cash,,1.0,2500.00,2500.00
+"""
+
+NAVIA_CSV = b"""account_name,symbol,asset_type,shares,purchase_price,total_cost,total_value
+Navia HSA,VTSAX,Stock/ETF,55.57,160.56,8922.32,8922.32
+Navia HSA,VEMAX,International,33.188,44.83,1487.82,1487.82
+Navia HSA,VGSLX,Other,5.281,129.9,686.00,686.00
+Navia HSA,PFLOAT,Annuity,1,100,100,100
+Navia HSA,BND,ETF,10,72.30,723.00,723.00
+"""
+
+ROBINHOOD_CSV = b"""Symbol,Classification,Quantity Owned
+NVDA,Stock,"1,200"
+ETH-USD,Crypto,2.5
+"""
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+@pytest.fixture(autouse=True)
+def seed_index(monkeypatch):
+    """Classify from the bundled seed file, not whatever database is configured"""
+    index = ClassificationIndex(load_seed())
+    monkeypatch.setattr(portfolio_import, "classification_index", lambda: index)
+    return index
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+    session.add(User(user_id=1, name="Test User", email="test@example.com"))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_duplicates_aggregated():
+    """Same symbol across accounts becomes one units-weighted position"""
+    result = parse_portfolio_csv(MASTER_CSV)
+    positions = {p['symbol']: p for p in result.records()}
+
+    assert list(positions) == ["BTC-USD", "Cash_Public", "SCHD", "VCIT"]
+    assert positions["SCHD"]["units"] == 40
+    assert positions["SCHD"]["avg_price"] == pytest.approx(1110.0 / 40)
+    assert positions["SCHD"]["asset_class"] == "STOCK"
+    assert positions["VCIT"]["asset_class"] == "BOND_ETF"
+    assert (positions["Cash_Public"]["units"], positions["Cash_Public"]["asset_class"]) == (2500.0, "CASH")
+
+def test_row_errors_reported():
+    """Invalid rows are skipped with their line number and reason"""
+    result = parse_portfolio_csv(MASTER_CSV)
+
+    assert result.rows_read == 9
+    assert result.rows_skipped == 4
+    assert [(e.row, e.symbol, e.field) for e in result.errors] == [
+        (6, None, "symbol"),
+        (7, "AAPL", "units"),
+        (8, "TSLA", "units"),
+    ]
+    assert result.summary()["errors"][2]["message"] == "units must not be negative"
+
+def test_robinhood_columns():
+    """Robinhood headers map to canonical columns without cost basis"""
+    result = parse_portfolio_csv(ROBINHOOD_CSV)
+    positions = {p['symbol']: p for p in result.records()}
+
+    assert positions["NVDA"]["units"] == 1200
+    assert positions["ETH-USD"]["asset_class"] == "CRYPTO"
+    assert not result.errors
+
+def test_fund_types_classified_and_unknown_rejected():
+    """Types that name no class defer to the ticker's own; an unknown type is an error, not a None class"""
+    result = parse_portfolio_csv(NAVIA_CSV)
+    positions = {p['symbol']: p for p in result.records()}
+
+    assert {symbol: p["asset_class"] for symbol, p in positions.items()} == {
+        "BND": "BOND_ETF", "VEMAX": "STOCK", "VGSLX": "STOCK", "VTSAX": "STOCK"
+    }
+    assert [(e.row, e.symbol, e.field) for e in result.errors] == [(5, "PFLOAT", "asset_type")]
+
+def test_missing_required_column():
+    with pytest.raises(ValueError):
+        parse_portfolio_csv(b"symbol,price\nAAPL,1\n")
+
+def test_bulk_insert(db_session):
+    """Positions and categories land in one transaction"""
+    result = parse_portfolio_csv(MASTER_CSV)
+    service = PortfolioServiceV2(db_session)
+
+    created = service.bulk_add_portfolio_positions(1, result.records(), date(2025, 9, 23))
+    assert created == 4
+
+    rows = db_session.query(Portfolio).order_by(Portfolio.ticker).all()
+    assert [(p.ticker, p.units) for p in rows] == [
+        ("BTC-USD", 0.5), ("Cash_Public", 2500.0), ("SCHD", 40.0), ("VCIT", 5.0)
+    ]
+    assert all(p.ticker_id is not None for p in rows)
+    assert db_session.query(AssetCategory).count() == 4
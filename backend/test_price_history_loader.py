@@ -0,0 +1,124 @@
+"""
+Unit tests for the chunked price-history loader
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import json
+import os
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Local imports
+from domain.models_v2 import Base, DailyPrice
+from jobs.price_history_loader import load_price_history, checkpoint_path_for
+from utils.price_csv import find_closes
+
+HISTORY_CSV = """ticker,type,date,close,volume
+AAPL,stock,2025-09-29,170.0,1000
+AAPL,stock,2025-09-30,171.0,
+TLT,etf,2025-09-29,90.0,500
+TLT,etf,2025-09-30,,500
+BTC-USD,crypto,2025-09-30,60000.0,
+AAPL,stock,2025-09-30,172.0,2000
+"""
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture
+def history_csv(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text(HISTORY_CSV)
+    return str(path)
+
+def prices(session):
+    return {
+        (p.ticker, p.price_date): (p.close_price, p.volume)
+        for p in session.query(DailyPrice).all()
+    }
+
+def test_chunked_upsert(db_session, history_csv):
+    """Chunks upsert by (ticker, date); later rows overwrite, blank closes are skipped"""
+    result = load_price_history(history_csv, chunk_rows=2, db=db_session)
+
+    assert result["status"] == "success"
+    assert result["rows_committed"] == 6
+    assert prices(db_session) == {
+        ("AAPL", date(2025, 9, 29)): (170.0, 1000),
+        ("AAPL", date(2025, 9, 30)): (172.0, 2000),
+        ("TLT", date(2025, 9, 29)): (90.0, 500),
+        ("BTC-USD", date(2025, 9, 30)): (60000.0, None),
+    }
+
+    with open(checkpoint_path_for(history_csv)) as f:
+        assert json.load(f)["rows_committed"] == 6
+
+def test_malformed_date_rejected(db_session, tmp_path):
+    """A row with an unparsable date is counted and skipped; the rest of its chunk still loads"""
+    path = tmp_path / "history.csv"
+    path.write_text(HISTORY_CSV.replace("TLT,etf,2025-09-29", "TLT,etf,2025-13-45"))
+
+    result = load_price_history(str(path), chunk_rows=2, db=db_session)
+
+    assert result["status"] == "success"
+    assert (result["rows_committed"], result["rows_rejected"]) == (6, 1)
+    assert ("TLT", date(2025, 9, 29)) not in prices(db_session)
+    assert ("AAPL", date(2025, 9, 30)) in prices(db_session)
+
+def test_resume_from_checkpoint(db_session, history_csv):
+    """A rerun seeks past the rows the checkpoint marks as committed"""
+    load_price_history(history_csv, chunk_rows=4, db=db_session)
+
+    # Simulate an interruption after the first chunk
+    checkpoint = checkpoint_path_for(history_csv)
+    with open(checkpoint) as f:
+        state = json.load(f)
+    assert state["byte_offset"] == len(HISTORY_CSV)
+    state["byte_offset"] = len("".join(HISTORY_CSV.splitlines(keepends=True)[:5]))
+    state["rows_committed"] = 4
+    with open(checkpoint, "w") as f:
+        json.dump(state, f)
+    db_session.query(DailyPrice).filter(DailyPrice.ticker == "BTC-USD").delete(synchronize_session=False)
+    db_session.commit()
+
+    result = load_price_history(history_csv, chunk_rows=4, db=db_session)
+    assert (result["start_row"], result["rows_read"]) == (4, 2)
+    assert ("BTC-USD", date(2025, 9, 30)) in prices(db_session)
+
+    assert load_price_history(history_csv, db=db_session)["rows_read"] == 0
+    assert load_price_history(history_csv, resume=False, db=db_session)["rows_read"] == 6
+
+def test_checkpoint_ignored_for_replaced_file(db_session, history_csv):
+    """A dump replaced by one of the same size, or only touched, loads from the top"""
+    load_price_history(history_csv, db=db_session)
+
+    Path(history_csv).write_text(HISTORY_CSV.replace("170.0", "169.0"))
+    result = load_price_history(history_csv, db=db_session)
+    assert (result["start_row"], result["rows_read"]) == (0, 6)
+    assert prices(db_session)[("AAPL", date(2025, 9, 29))] == (169.0, 1000)
+
+    stat = os.stat(history_csv)
+    os.utime(history_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_price_history(history_csv, db=db_session)["rows_read"] == 6
+
+def test_find_closes(history_csv):
+    closes = find_closes(history_csv, ["AAPL"], ["2025-09-30"], chunk_rows=2)
+    assert closes == {("AAPL", "2025-09-30"): 172.0}
@@ -0,0 +1,103 @@
+"""
+Unit tests for the Monte Carlo projection engine
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, PortfolioDailyValue, PortfolioSummary, DailyPrice, PortfolioProjection
+from services.projection_engine import ProjectionEngine, simulate_projections, calculate_projections_job
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 9, 30)
+DAYS = 120
+STEPS = {'1W': 5, '1M': 21, '1Y': 252}
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    rng = np.random.default_rng(7)
+    closes = 100.0 * np.cumprod(1.0 + rng.normal(0.001, 0.01, DAYS))
+    dates = [AS_OF - timedelta(days=DAYS - 1 - i) for i in range(DAYS)]
+    for day, close in zip(dates, closes):
+        session.add(DailyPrice(ticker="SPY", price_date=day, close_price=float(close)))
+
+    # User 1 is all SPY; user 2 holds the same SPY position plus an equal cash balance
+    for user_id, total in ((1, 1000.0), (2, 2000.0)):
+        session.add(User(user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com"))
+        position = Portfolio(user_id=user_id, ticker="SPY", units=1000.0 / closes[-1], avg_price=90.0, buy_date=dates[0])
+        session.add(position)
+        session.flush()
+        session.add(PortfolioDailyValue(portfolio_id=position.portfolio_id, date=AS_OF, units=position.units,
+                                        price=float(closes[-1]), position_val=1000.0))
+        session.add(PortfolioSummary(user_id=user_id, date=AS_OF, total_value=total))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_seeded_simulation_is_reproducible():
+    """The same seed gives the same bands for both methods"""
+    returns = np.random.default_rng(1).normal(0.0005, 0.01, (250, 3))
+    weights = np.array([[0.5, 0.3, 0.2], [1.0, 0.0, 0.0]])
+
+    for method in ("bootstrap", "gbm"):
+        first = simulate_projections(returns, weights, STEPS, paths=2000, method=method, seed=42)
+        second = simulate_projections(returns, weights, STEPS, paths=2000, method=method, seed=42)
+        np.testing.assert_array_equal(first['1Y']['percentiles'], second['1Y']['percentiles'])
+
+        bands = first['1M']['percentiles']
+        assert np.all(np.diff(bands, axis=0) >= 0)  # percentiles are ordered
+        assert np.all(first['1Y']['max_drawdown'] <= 0)
+
+def test_cash_scales_the_distribution():
+    """Half cash halves the spread of outcomes and the volatility"""
+    returns = np.random.default_rng(2).normal(0.0, 0.01, (500, 1))
+    weights = np.array([[1.0], [0.5]])
+    result = simulate_projections(returns, weights, STEPS, paths=4000, method="gbm", seed=3)
+
+    spread = result['1Y']['percentiles'][4] - result['1Y']['percentiles'][0]
+    assert spread[1] < spread[0] * 0.6
+    assert result['_risk']['volatility'][1] == pytest.approx(result['_risk']['volatility'][0] / 2, rel=0.01)
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        simulate_projections(np.zeros((10, 1)), np.ones((1, 1)), STEPS, paths=10, method="garch")
+
+def test_job_stores_bands(db_session):
+    """Projections are stored per user and horizon from current holdings"""
+    engine = ProjectionEngine(db_session, paths=1000, seed=11)
+    users, ticker_ids, weights, current = engine.load_holdings(AS_OF)
+    assert users == [1, 2]
+    assert weights[:, 0].tolist() == pytest.approx([1.0, 0.5])
+
+    engine.store(AS_OF, engine.compute(AS_OF))
+    assert db_session.query(PortfolioProjection).count() == 6
+
+    stored = engine.stored(2)
+    assert list(stored) == ['1W', '1M', '1Y']
+    year = stored['1Y']
+    assert year.p5_value <= year.p25_value <= year.projected_value <= year.p75_value <= year.p95_value
+    assert year.projection_date == AS_OF + timedelta(days=365)
+    assert year.current_value == pytest.approx(2000.0)
+    assert stored['1Y'].volatility == pytest.approx(engine.stored(1)['1Y'].volatility / 2, rel=0.01)
+
+    result = calculate_projections_job(AS_OF, db=db_session)
+    assert result['status'] == 'success'
+    assert db_session.query(PortfolioProjection).count() == 6
@@ -0,0 +1,85 @@
+"""
+Unit tests for per-request query counting and profile captures
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Local imports
+from core.config import settings
+from core.profiling import call_site, instrument_app, normalize_sql
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+def get_test_db():
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app = FastAPI()
+instrument_app(app)
+
+@app.get("/positions/{count}")
+def positions(count: int, db: Session = Depends(get_test_db)):
+    """One query per position, the N+1 shape the headers should expose"""
+    return [db.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(count)]
+
+@app.get("/async")
+async def async_endpoint():
+    return {"ok": True}
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_normalize_sql():
+    sql = "SELECT *\n  FROM daily_prices WHERE ticker_id IN (?, ?, ?) AND price_date > '2025-01-01' LIMIT 10"
+    assert normalize_sql(sql) == "SELECT * FROM daily_prices WHERE ticker_id IN (?...) AND price_date > ? LIMIT ?"
+
+def test_call_site_names_application_frame():
+    assert call_site().startswith("test_request_profiling.py:")
+
+def test_headers_count_queries_per_request(client):
+    response = client.get("/positions/3")
+    assert response.json() == [0, 1, 2]
+    assert response.headers["X-DB-Queries"] == "3"
+    assert float(response.headers["X-DB-Time"]) >= 0
+
+    # Counts are per request, not cumulative
+    assert client.get("/positions/1").headers["X-DB-Queries"] == "1"
+    assert client.get("/async").headers["X-DB-Queries"] == "0"
+
+def test_repeated_statement_and_slow_query_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "REPEATED_QUERY_WARN", 5)
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0)
+    with caplog.at_level("WARNING", logger="core.profiling"):
+        client.get("/positions/6")
+
+    assert any("ran one statement 6x: SELECT ?" in message for message in caplog.messages)
+    assert any("Slow query" in message and "at test_request_profiling.py:" in message for message in caplog.messages)
+
+def test_profile_header_writes_capture(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+
+    # Ignored while profiling is disabled
+    client.get("/positions/2", headers={"X-Profile": "cprofile"})
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    client.get("/positions/2", headers={"X-Profile": "cprofile"})
+    client.get("/async", headers={"X-Profile": "cprofile"})
+    captures = sorted(p.name for p in tmp_path.iterdir())
+    assert len(captures) == 2
+    assert all(name.endswith(".prof") for name in captures)
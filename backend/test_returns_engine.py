@@ -0,0 +1,121 @@
+"""
+Unit tests for the TWR/MWR returns engine
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, PortfolioSummary, CashTransaction
+from services.returns_engine import ReturnsEngine, window_returns, xirr, invalidate_returns_cache, _RETURNS_CACHE
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+AS_OF = date(2025, 10, 1)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+    invalidate_returns_cache()
+
+    session.add(User(user_id=1, name="Test User", email="test@example.com"))
+    values = [1000.0, 1100.0, 2100.0, 2310.0]  # +10%, deposit 1000 (0%), +10%
+    for i, value in enumerate(values):
+        session.add(PortfolioSummary(user_id=1, date=AS_OF - timedelta(days=3 - i), total_value=value))
+    session.add(CashTransaction(user_id=1, amount=1000.0, transaction_date=AS_OF - timedelta(days=1), type="deposit"))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_xirr_known_rates():
+    """Rows solve independently to their internal rates"""
+    amounts = np.array([[-1000.0, 1100.0, 0.0], [-1000.0, 0.0, 1210.0]])
+    years = np.array([[0.0, 1.0, 0.0], [0.0, 0.0, 2.0]])
+    assert xirr(amounts, years) == pytest.approx([0.10, 0.10])
+
+def test_xirr_short_window_deep_loss():
+    """A one-week 20% loss annualizes to almost -100% rather than NaN"""
+    rate = xirr(np.array([-100.0, 80.0]), np.array([0.0, 7 / 365.0]))
+    assert np.isfinite(rate[0])
+    assert rate[0] == pytest.approx(0.8 ** (365 / 7) - 1)
+
+def test_xirr_rejects_rows_without_root():
+    """Flows that never change sign have no rate that zeroes the NPV"""
+    rate = xirr(np.array([[-100.0, -50.0], [-100.0, 110.0]]), np.array([[0.0, 1.0], [0.0, 1.0]]))
+    assert np.isnan(rate[0])
+    assert rate[1] == pytest.approx(0.10)
+
+@pytest.mark.parametrize('daily_loss', [0.01, 0.03])
+def test_mwr_deep_losses_with_deposit(daily_loss):
+    """A constant daily loss is also the money-weighted rate, deposit or not"""
+    n = 366
+    dates = [AS_OF - timedelta(days=n - 1 - i) for i in range(n)]
+    flows = np.zeros(n)
+    values = np.zeros(n)
+    value = 1000.0
+    for i in range(n):
+        if i == n // 2:
+            value += 1000.0
+            flows[i] = 1000.0
+        values[i] = value
+        value *= 1 - daily_loss
+
+    results = window_returns(dates, values, flows, AS_OF)
+    for window, result in results.items():
+        assert result['mwr'] is not None, window
+        assert -100.0 < result['mwr'] < 0.0
+        assert result['mwr'] == pytest.approx(result['twr'], rel=1e-6, abs=1e-6)
+
+def test_twr_ignores_deposits():
+    """TWR chains daily returns around a deposit; MWR weights the larger balance"""
+    dates = [AS_OF - timedelta(days=3 - i) for i in range(4)]
+    values = np.array([1000.0, 1100.0, 2100.0, 2310.0])
+    flows = np.array([0.0, 0.0, 1000.0, 0.0])
+
+    results = window_returns(dates, values, flows, AS_OF, ['1W', 'inception'])
+    assert results['inception']['twr'] == pytest.approx(21.0)
+    assert results['inception']['net_flows'] == 1000.0
+    assert results['1W']['partial'] is True
+    assert results['inception']['partial'] is False
+
+    # Money-weighted: NPV of flows at the period rate is zero
+    period = results['inception']['mwr'] / 100
+    years = np.array([0, 2, 3]) / 365.0
+    span = 3 / 365.0
+    annual = (1 + period) ** (1 / span) - 1
+    npv = (np.array([-1000.0, -1000.0, 2310.0]) * (1 + annual) ** -years).sum()
+    assert npv == pytest.approx(0.0, abs=1e-6)
+
+def test_long_window_annualized():
+    """Windows of a year or more report annualized MWR"""
+    dates = [date(2023, 10, 1), date(2024, 10, 1), date(2025, 10, 1)]
+    results = window_returns(dates, np.array([100.0, 110.0, 121.0]), np.zeros(3), date(2025, 10, 1), ['1Y', 'inception'])
+    assert results['1Y']['twr'] == pytest.approx(10.0)
+    assert results['inception']['twr'] == pytest.approx(21.0)
+    assert results['inception']['mwr'] == pytest.approx(10.0, abs=0.02)  # 2024 is a leap year
+
+def test_engine_cache(db_session):
+    """Windows come from the database once per user per day"""
+    engine = ReturnsEngine(db_session)
+    results = engine.returns(1, AS_OF)
+
+    assert set(results) == {'1W', '1M', 'YTD', '1Y', 'inception'}
+    assert results['inception']['twr'] == pytest.approx(21.0)
+    assert engine.returns(1, AS_OF) is results
+
+    invalidate_returns_cache(1)
+    assert (1, AS_OF) not in _RETURNS_CACHE
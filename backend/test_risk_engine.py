@@ -0,0 +1,101 @@
+"""
+Unit tests for the vectorized risk engine
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, PortfolioSummary, CashTransaction, DailyPrice, PortfolioRiskMetrics
+from services.risk_engine import RiskEngine
+from services.risk_metrics import risk_metrics, risk_metrics_matrix
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+START = date(2025, 9, 1)
+USER_VALUES = {
+    1: [100.0, 102.0, 101.0, 105.0, 103.0, 108.0],
+    2: [200.0, 200.0, 1200.0, 1210.0, 1190.0, 1220.0],  # $1000 deposit on day 3
+}
+SPY_CLOSES = [500.0, 505.0, 502.0, 510.0, 506.0, 515.0]
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    for user_id, values in USER_VALUES.items():
+        session.add(User(user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com"))
+        for i, value in enumerate(values):
+            session.add(PortfolioSummary(user_id=user_id, date=START + timedelta(days=i), total_value=value))
+    session.add(CashTransaction(user_id=2, amount=1000.0, transaction_date=START + timedelta(days=2), type="deposit"))
+    for i, close in enumerate(SPY_CLOSES):
+        session.add(DailyPrice(ticker="SPY", price_date=START + timedelta(days=i), close_price=close))
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_single_series_metrics():
+    """Volatility, Sharpe and drawdown match direct formulas"""
+    values = np.array(USER_VALUES[1])
+    returns = values[1:] / values[:-1] - 1
+    metrics = risk_metrics(values)
+
+    assert metrics["volatility_annualized"] == pytest.approx(returns.std(ddof=1) * np.sqrt(252) * 100)
+    assert metrics["sharpe_ratio"] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+    assert metrics["max_drawdown"] == pytest.approx((103.0 / 105.0 - 1) * 100)
+    assert metrics["var_95"] > 0
+    assert metrics["beta"] is None
+    assert metrics["num_observations"] == 6
+
+def test_insufficient_data():
+    """Fewer than three values give no metrics"""
+    metrics = risk_metrics(np.array([100.0, 101.0]))
+    assert all(metrics[name] is None for name in ("sharpe_ratio", "volatility_annualized", "max_drawdown"))
+
+def test_flows_and_beta_batched():
+    """Deposits are not returns; a series tracking the benchmark has beta 1"""
+    spy = np.array(SPY_CLOSES)
+    values = np.vstack([spy * 2, [100.0, 100.0, 1100.0, 1100.0, 1100.0, 1100.0]])
+    flows = np.zeros_like(values)
+    flows[1, 2] = 1000.0
+
+    matrix = risk_metrics_matrix(values, flows, benchmark_values=spy)
+    assert matrix["beta"][0] == pytest.approx(1.0)
+    assert matrix["volatility_annualized"][1] == pytest.approx(0.0)
+    assert matrix["max_drawdown"][1] == pytest.approx(0.0)
+
+def test_engine_compute_and_store(db_session):
+    """All users are computed in one batch and stored per as_of date"""
+    engine = RiskEngine(db_session, benchmark_ticker="SPY", risk_free_rate=0.0, window_days=30)
+    as_of = START + timedelta(days=5)
+
+    results = engine.compute(as_of)
+    assert set(results) == {1, 2}
+    assert results[1]["sharpe_ratio"] == pytest.approx(risk_metrics(np.array(USER_VALUES[1]))["sharpe_ratio"])
+    assert results[2]["benchmark_ticker"] == "SPY"
+
+    # The deposit day is flat after removing the flow
+    deposit_adjusted = risk_metrics(
+        np.array(USER_VALUES[2]), np.array([0, 0, 1000.0, 0, 0, 0])
+    )
+    assert results[2]["volatility_annualized"] == pytest.approx(deposit_adjusted["volatility_annualized"])
+
+    assert engine.store(as_of, results) == 2
+    assert engine.store(as_of, results) == 2
+    assert db_session.query(PortfolioRiskMetrics).count() == 2
+    assert engine.stored(1, as_of)["beta"] == pytest.approx(results[1]["beta"])
+    assert engine.stored(1, as_of + timedelta(days=1)) is None
@@ -0,0 +1,122 @@
+"""
+Tests for server.py: every router under its prefix in one app, sharing one engine and the caches
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import time
+from datetime import date
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Local imports
+import api_canonical
+import server
+from core.database import get_db
+from domain.models_v2 import Base, Portfolio, PortfolioDailyValue, User
+from services import benchmark_service
+
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+Base.metadata.create_all(bind=test_engine)
+
+def get_test_db():
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def client():
+    server.app.dependency_overrides[get_db] = get_test_db
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+def schema_paths(app):
+    return set(app.openapi()['paths'])
+
+def test_routers_mounted_under_prefixes():
+    served = schema_paths(server.app)
+
+    assert "/api/v1/top-holdings/{user_id}" in served
+    assert "/api/v2/prices/{ticker}" in served
+    assert "/api/v2/canonical/dashboard/{user_id}" in served
+    assert "/api/v3/portfolio/{user_id}/holdings" in served
+    # Root path aliases are served but kept out of the schema
+    assert "/top-holdings/{user_id}" not in served
+
+def test_unprefixed_aliases(client):
+    assert client.get("/api/v1/health").status_code == 200
+    # UNPREFIXED_ROUTERS keeps the legacy paths the frontend calls; other routers are prefix-only
+    assert client.get("/dashboard/audit/1").status_code != 404
+    assert client.get("/prices/SPY").status_code == 404
+    assert TestClient(server.create_app(unprefixed=[])).get("/dashboard/audit/1").status_code == 404
+
+def test_system_endpoints(client):
+    assert client.get("/health").json()["service"] == "portora-server"
+    assert client.get("/").json()["apis"]["canonical"] == "/api/v2/canonical"
+    assert client.get("/api/v2/canonical/health").json()["service"] == "canonical-portfolio-api"
+
+def test_endpoints_profiled_once():
+    endpoints = [route.endpoint for router, _ in server.MOUNTS.values() for route in router.routes if isinstance(route, APIRoute)]
+
+    assert endpoints and all(getattr(endpoint, '__profiled__', False) for endpoint in endpoints)
+    # Serving a router from a second app must not stack another profiling wrapper
+    assert not any(getattr(endpoint.__wrapped__, '__profiled__', False) for endpoint in endpoints)
+
+def test_price_write_invalidates_benchmark_cache(client):
+    benchmark_service._BENCHMARK_CACHE['SPY'] = (time.monotonic(), None)
+    benchmark_service._BENCHMARK_CACHE['QQQ'] = (time.monotonic(), None)
+
+    response = client.post("/api/v2/prices/", json={"ticker": "SPY", "price_date": "2025-10-01", "close_price": 570.5})
+
+    assert response.status_code == 201
+    assert 'SPY' not in benchmark_service._BENCHMARK_CACHE
+    assert 'QQQ' in benchmark_service._BENCHMARK_CACHE
+    assert client.get("/api/v2/prices/SPY").json()[0]["close_price"] == 570.5
+    benchmark_service.invalidate_benchmark_cache()
+
+def test_daily_values_default_to_json(client):
+    db = TestSessionLocal()
+    db.add(User(user_id=7, name="Daily", email="daily@example.com"))
+    position = Portfolio(user_id=7, ticker="AAPL", units=10.0, avg_price=150.0, buy_date=date(2025, 9, 1))
+    db.add(position)
+    db.flush()
+    for day in (date(2025, 10, 1), date(2025, 10, 2)):
+        db.add(PortfolioDailyValue(portfolio_id=position.portfolio_id, date=day, units=10.0, price=170.0, position_val=1700.0))
+    db.commit()
+    db.close()
+
+    response = client.get("/api/v2/daily-values/7", params={"start_date": "2025-10-01", "end_date": "2025-10-02"})
+
+    # Existing clients call response.json() on multi-day ranges
+    assert response.headers["content-type"] == "application/json"
+    assert [day["date"] for day in response.json()] == ["2025-10-01", "2025-10-02"]
+    assert response.json()[0]["total_value"] == 1700.0
+    assert client.get("/api/v2/daily-values/7", params={"format": "xml"}).status_code == 400
+
+def test_standalone_apps_still_serve_their_routes():
+    served = schema_paths(api_canonical.app)
+
+    assert "/dashboard/{user_id}" in served
+    assert "/health/ready" in served
+
+def test_lifespan_starts_and_stops_scheduler(monkeypatch):
+    """The nightly scheduler runs for the app's lifetime"""
+    monkeypatch.setattr(server.settings, "PIPELINE_SCHEDULE", "02:00")
+    monkeypatch.setattr(server, "configure_logging", lambda: None)
+    monkeypatch.setattr(server.db_manager, "readiness", lambda: {'ready': True, 'checks': {'schema': {'current': "head"}}})
+    app = server.create_app(unprefixed=[])
+
+    with TestClient(app):
+        thread = app.state.scheduler._thread
+        assert thread.is_alive()
+    assert not thread.is_alive()
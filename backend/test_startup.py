@@ -0,0 +1,68 @@
+"""
+Tests for startup: deferred heavy imports, the import-time profile and Alembic readiness
+"""
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine
+
+from benchmarks.startup import ENTRY_POINTS, StartupProfile, check, interpreter_baseline, parse_importtime, profile_entry_point
+from core.database import db_manager
+from domain.models_v2 import Base
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       5000 | core.config
+import time:       800 |       1500 |     pandas._libs
+"""
+
+def test_parse_importtime():
+    timings = parse_importtime(IMPORTTIME)
+
+    assert [(t.module, t.self_us, t.cumulative_us, t.depth) for t in timings] == [
+        ('_io', 120, 120, 1), ('core.config', 2000, 5000, 0), ('pandas._libs', 800, 1500, 2),
+    ]
+
+def test_check_reports_budget_and_deferred_imports():
+    entry = ENTRY_POINTS[0]
+
+    assert check(StartupProfile(entry.name, entry.module, 100.0), entry) == []
+    problems = check(StartupProfile(entry.name, entry.module, 100.0, loaded_deferred=['pandas']), entry, budget_ms=50)
+    assert len(problems) == 2
+
+def test_api_entry_points_defer_heavy_imports():
+    baseline = interpreter_baseline()
+
+    for entry in ENTRY_POINTS:
+        if entry.name in ('app', 'api_canonical'):
+            profile = profile_entry_point(entry, baseline)
+            assert profile.loaded_deferred == [], entry.name
+            assert profile.import_ms > 0
+
+def test_readiness_follows_alembic(tmp_path):
+    url = f"sqlite:///{tmp_path / 'ready.db'}"
+    engine = create_engine(url)
+
+    before = db_manager.readiness(engine)
+    db_manager.upgrade(url=url)
+    after = db_manager.readiness(engine)
+
+    assert not before['ready'] and before['checks']['database']['ok']
+    assert before['checks']['schema']['current'] is None
+    assert after['ready']
+    assert after['checks']['schema']['current'] == db_manager.head_revision()
+
+    # Migrations alone produce every table and column the v2 models use
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    assert [d for d in diff if isinstance(d, tuple) and d[0] in ('add_table', 'add_column')] == []
+    engine.dispose()
+
+def test_readiness_reports_unreachable_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'db.sqlite'}")
+
+    report = db_manager.readiness(engine)
+
+    assert not report['ready']
+    assert not report['checks']['database']['ok'] and 'schema' not in report['checks']
@@ -0,0 +1,95 @@
+"""
+Unit tests for the tickers dimension
+Symbols are stored once and referenced by integer ticker_id
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Local imports
+from domain.models_v2 import Base, User, Portfolio, DailyPrice, Ticker, get_ticker_ids
+
+# Test database setup
+test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+@pytest.fixture
+def db_session():
+    """Create test database session"""
+    Base.metadata.create_all(bind=test_engine)
+    session = TestSessionLocal()
+
+    session.add(User(user_id=1, name="Test User", email="test@example.com"))
+    session.add(Portfolio(
+        portfolio_id=1, user_id=1, ticker="AAPL", asset_class="STOCK",
+        units=10.0, avg_price=150.0, buy_date=date(2025, 9, 1)
+    ))
+    session.add_all([
+        DailyPrice(ticker="AAPL", price_date=date(2025, 10, 1), close_price=175.0),
+        DailyPrice(ticker="TLT", price_date=date(2025, 10, 1), close_price=90.0),
+    ])
+    session.commit()
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+def test_symbols_resolved_on_flush(db_session):
+    """New prices and positions get a shared integer ticker_id"""
+    symbols = {t.symbol: t.ticker_id for t in db_session.query(Ticker).all()}
+    assert set(symbols) == {"AAPL", "TLT"}
+
+    position = db_session.query(Portfolio).one()
+    aapl_price = db_session.query(DailyPrice).filter(DailyPrice.ticker == "AAPL").one()
+    assert position.ticker_id == symbols["AAPL"]
+    assert aapl_price.ticker_id == symbols["AAPL"]
+    assert aapl_price.ticker == "AAPL"
+
+def test_symbol_comparisons(db_session):
+    """Symbol filters translate to ticker_id lookups"""
+    rows = (
+        db_session.query(DailyPrice.ticker, DailyPrice.close_price)
+        .filter(DailyPrice.ticker.in_(["AAPL", "TLT"]))
+        .order_by(DailyPrice.ticker)
+        .all()
+    )
+    assert rows == [("AAPL", 175.0), ("TLT", 90.0)]
+
+    others = db_session.query(DailyPrice).filter(DailyPrice.ticker != "AAPL").all()
+    assert [p.ticker for p in others] == ["TLT"]
+
+    assert db_session.query(DailyPrice).filter(DailyPrice.ticker == "MISSING").count() == 0
+
+def test_get_ticker_ids(db_session):
+    """Existing symbols are reused, unknown ones created on demand"""
+    existing = get_ticker_ids(db_session, ["AAPL"], create=False)
+    assert list(existing) == ["AAPL"]
+
+    assert get_ticker_ids(db_session, ["BTC-USD"], create=False) == {}
+
+    ids = get_ticker_ids(db_session, ["AAPL", "BTC-USD"])
+    assert ids["AAPL"] == existing["AAPL"]
+    assert db_session.query(Ticker).filter(Ticker.symbol == "BTC-USD").one().ticker_id == ids["BTC-USD"]
+
+def test_position_join_on_ticker_id(db_session):
+    """Positions join to prices through the integer key"""
+    rows = (
+        db_session.query(Portfolio.ticker, DailyPrice.close_price)
+        .join(DailyPrice, Portfolio.ticker_id == DailyPrice.ticker_id)
+        .filter(DailyPrice.price_date == date(2025, 10, 1))
+        .all()
+    )
+    assert rows == [("AAPL", 175.0)]
+
+    # Changing a position's symbol moves it to the new ticker_id
+    position = db_session.query(Portfolio).one()
+    position.ticker = "TLT"
+    db_session.commit()
+    assert position.ticker_id == get_ticker_ids(db_session, ["TLT"])["TLT"]
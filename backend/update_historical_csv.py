@@ -5,21 +5,20 @@ Update the historical CSV file with the correct GLDM data for Sep 24-30, 2025
 
 import pandas as pd
 from datetime import datetime, timedelta
+from utils.price_csv import find_closes
 
 def update_historical_csv():
     """Update historical CSV with correct GLDM data"""
     
-    # Read the existing CSV
+    # Read only the header of the existing CSV
     csv_path = "/Users/kishorecm/Documents/EaseLi/Portfolio CSV files/portfolio_history_10y.csv"
-    df = pd.read_csv(csv_path)
-    
-    print(f"Original CSV has {len(df)} rows")
-    print(f"Latest date: {df['date'].max()}")
+    columns = pd.read_csv(csv_path, nrows=0).columns
     
     # Check current GLDM data
-    gldm_data = df[df['ticker'] == 'GLDM'].tail(10)
+    existing = find_closes(csv_path, ['GLDM'])
     print("\nCurrent GLDM data (last 10 rows):")
-    print(gldm_data[['date', 'close']])
+    for (_, day), close in sorted(existing.items())[-10:]:
+        print(f"  {day}: {close}")
     
     # Add missing GLDM data for Sep 24-30, 2025
     new_gldm_data = [
@@ -29,22 +28,18 @@ def update_historical_csv():
         {'ticker': 'GLDM', 'type': 'stock', 'date': '2025-09-27', 'close': 75.67},  # Weekend, but adding data
         {'ticker': 'GLDM', 'type': 'stock', 'date': '2025-09-30', 'close': 76.45},  # Your target price
     ]
+    new_gldm_data = [row for row in new_gldm_data if ('GLDM', row['date']) not in existing]
     
-    # Convert to DataFrame and append
-    new_df = pd.DataFrame(new_gldm_data)
-    df_updated = pd.concat([df, new_df], ignore_index=True)
-    
-    print(f"\nAdded {len(new_gldm_data)} new GLDM rows")
-    print(f"Updated CSV has {len(df_updated)} rows")
+    # Append new rows instead of rewriting the whole file
+    new_df = pd.DataFrame(new_gldm_data).reindex(columns=columns)
+    new_df.to_csv(csv_path, mode='a', header=False, index=False)
     
-    # Check the new GLDM data
-    gldm_updated = df_updated[df_updated['ticker'] == 'GLDM'].tail(10)
-    print("\nUpdated GLDM data (last 10 rows):")
-    print(gldm_updated[['date', 'close']])
+    print(f"\nAppended {len(new_gldm_data)} new GLDM rows")
     
     # Calculate the return
-    sep_23_price = df_updated[(df_updated['ticker'] == 'GLDM') & (df_updated['date'] == '2025-09-23')]['close'].iloc[0]
-    sep_30_price = df_updated[(df_updated['ticker'] == 'GLDM') & (df_updated['date'] == '2025-09-30')]['close'].iloc[0]
+    closes = {**existing, **{('GLDM', row['date']): row['close'] for row in new_gldm_data}}
+    sep_23_price = closes[('GLDM', '2025-09-23')]
+    sep_30_price = closes[('GLDM', '2025-09-30')]
     
     return_pct = ((sep_30_price - sep_23_price) / sep_23_price) * 100
     print(f"\nGLDM Return Calculation:")
@@ -52,11 +47,9 @@ def update_historical_csv():
     print(f"Sep 30: ${sep_30_price:.2f}")
     print(f"Return: {return_pct:.2f}%")
     
-    # Save the updated CSV
-    df_updated.to_csv(csv_path, index=False)
     print(f"\n✅ Updated CSV saved to {csv_path}")
     
-    return df_updated
+    return new_df
 
 if __name__ == "__main__":
     update_historical_csv()
@@ -3,12 +3,12 @@
 Simple solution: Use the historical CSV file directly to calculate returns
 """
 
-import pandas as pd
 import os
 import sys
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine, Base
 from models import PortfolioValues, User
+from utils.price_csv import find_closes
 
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 sys.path.insert(0, parent_dir)
@@ -18,14 +18,13 @@ def use_historical_csv_simple():
     
     # Read the historical CSV
     csv_path = "/Users/kishorecm/Documents/EaseLi/Portfolio CSV files/portfolio_history_10y.csv"
-    df = pd.read_csv(csv_path)
     
     print("📊 Using Historical CSV Data")
-    print(f"Total historical records: {len(df)}")
     
-    # Get Sep 23 and Sep 30 prices for GLDM
-    gldm_sep23 = df[(df['ticker'] == 'GLDM') & (df['date'] == '2025-09-23')]['close'].iloc[0]
-    gldm_sep30 = df[(df['ticker'] == 'GLDM') & (df['date'] == '2025-09-30')]['close'].iloc[0]
+    # Get Sep 23 and Sep 30 prices for GLDM (scanned in chunks)
+    closes = find_closes(csv_path, ['GLDM'], ['2025-09-23', '2025-09-30'])
+    gldm_sep23 = closes[('GLDM', '2025-09-23')]
+    gldm_sep30 = closes[('GLDM', '2025-09-30')]
     
     print(f"\nGLDM Historical Data:")
     print(f"Sep 23, 2025: ${gldm_sep23:.2f}")
@@ -0,0 +1,87 @@
+"""
+Price history CSV reading
+Typed, chunked access to vendor price dumps (ticker,type,date,close[,open,high,low,volume])
+"""
+
+import csv
+import io
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+REQUIRED_COLUMNS = ['ticker', 'date', 'close']
+
+PRICE_DTYPES = {
+    'ticker': 'string',
+    'type': 'category',
+    'close': 'float64',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'volume': 'float64',
+}
+
+def read_price_header(csv_path: str) -> Tuple[List[str], int]:
+    """Column names and the byte offset of the first data row"""
+    with open(csv_path, 'rb') as f:
+        line = f.readline()
+        return [column.strip() for column in next(csv.reader([line.decode('utf-8-sig')]))], f.tell()
+
+def iter_price_chunks(csv_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, offset: int = 0) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    Read a price-history CSV in typed chunks of (frame, byte offset after the chunk)
+    A non-zero offset (one a previous chunk reported) seeks straight to that row, so
+    resuming costs nothing for the rows before it. Rows are split on newlines:
+    vendor dumps have no quoted multi-line fields
+    """
+    header, data_start = read_price_header(csv_path)
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"{csv_path} is missing required columns: {', '.join(missing)}")
+
+    usecols = [column for column in header if column in PRICE_DTYPES or column == 'date']
+    dtypes = {column: PRICE_DTYPES[column] for column in usecols if column in PRICE_DTYPES}
+
+    with open(csv_path, 'rb') as f:
+        f.seek(max(offset, data_start))
+        while True:
+            lines = []
+            for _ in range(chunk_rows):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+            if not lines:
+                return
+
+            block = b''.join(lines)
+            if block.strip():
+                # The header only comes once, so each chunk gets the column names through names=
+                yield pd.read_csv(
+                    io.BytesIO(block),
+                    header=None,
+                    names=header,
+                    usecols=usecols,
+                    dtype=dtypes,
+                    parse_dates=['date']
+                ), f.tell()
+
+def find_closes(csv_path: str, tickers: Iterable[str], dates: Optional[Iterable[str]] = None,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[Tuple[str, str], float]:
+    """
+    Scan a price-history CSV for selected closes without loading it whole
+    Returns {(ticker, 'YYYY-MM-DD'): close}; later rows win on duplicates
+    """
+    tickers = set(tickers)
+    wanted_dates = pd.to_datetime(list(dates)) if dates is not None else None
+
+    closes = {}
+    for chunk, _ in iter_price_chunks(csv_path, chunk_rows):
+        mask = chunk['ticker'].isin(tickers)
+        if wanted_dates is not None:
+            mask &= chunk['date'].isin(wanted_dates)
+        for ticker, day, close in chunk.loc[mask, ['ticker', 'date', 'close']].itertuples(index=False):
+            closes[(ticker, day.strftime('%Y-%m-%d'))] = close
+    return closes